@@ -0,0 +1,72 @@
+"""
+Benchmark of the sparse and dense imputation paths in observatorio_ipa.local.imputation
+
+Times impute_tac_day() for increasing fractions of missing pixels (TAC==0) and reports the
+crossover point where the dense path becomes faster than the sparse path.
+
+usage: python benchmarks/bench_sparse_imputation.py [--rows 1000] [--cols 1000] [--repeat 5]
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from observatorio_ipa.local import imputation
+
+MISSING_FRACTIONS = [0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.75]
+
+
+def make_cube(
+    rng: np.random.Generator, shape: tuple[int, int], missing_fraction: float
+):
+    """Random 5 day cube where every day has approximately `missing_fraction` pixels with TAC==0"""
+    cube_shape = (5,) + shape
+    tac_cube = rng.choice(
+        np.array([50, 100], dtype=np.uint8), size=cube_shape, p=[0.6, 0.4]
+    )
+    tac_cube[rng.random(cube_shape) < missing_fraction] = 0
+    qa_cube = rng.choice(np.array([10, 11, 12], dtype=np.uint8), size=cube_shape)
+    dem = rng.integers(0, 6000, size=shape, dtype=np.int16)
+    return tac_cube, qa_cube, dem
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--cols", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'missing':>8} {'dense (ms)':>11} {'sparse (ms)':>12} {'faster':>7}")
+    crossover = None
+    for fraction in MISSING_FRACTIONS:
+        tac_cube, qa_cube, dem = make_cube(rng, (args.rows, args.cols), fraction)
+        timings = {}
+        for mode in ("dense", "sparse"):
+            timings[mode] = (
+                min(
+                    timeit.repeat(
+                        lambda: imputation.impute_tac_day(
+                            tac_cube, qa_cube, 2, dem, mode=mode
+                        ),
+                        number=1,
+                        repeat=args.repeat,
+                    )
+                )
+                * 1000
+            )
+        faster = "sparse" if timings["sparse"] < timings["dense"] else "dense"
+        if faster == "dense" and crossover is None:
+            crossover = fraction
+        print(
+            f"{fraction:>8.2f} {timings['dense']:>11.1f} {timings['sparse']:>12.1f} {faster:>7}"
+        )
+
+    print(f"\nDense path faster from missing fraction: {crossover}")
+    print(f"Current DEFAULT_SPARSE_THRESHOLD: {imputation.DEFAULT_SPARSE_THRESHOLD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Local index of the images exported to asset collections, to find pending periods without listing
+the collections on every run.
+
+The index keeps, for each collection or folder, the exported images with the period in their name
+("YYYY", "YYYY-MM" or "YYYY-MM-DD"), their update time and their properties. It's refreshed
+incrementally: the first use lists the whole collection, later refreshes only list images updated
+since the previous refresh (a single small request). Images of completed export tasks are added
+directly with update_from_tasks(). A full refresh is done every FULL_REFRESH_DAYS days to drop
+images deleted outside the scripts.
+
+Pending-period detection becomes a set lookup, e.g.:
+
+    exported_months = get_index().periods(monthly_collection_path, name_prefix)
+    pending = sorted(set(expected_months) - exported_months)
+
+The index is saved as JSON so it's kept between runs. main() installs the shared index (see
+set_index()), without it the export processes list the collections.
+"""
+
+import json
+import logging
+import re
+import threading
+from datetime import UTC as datetime_UTC
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import ee
+
+from observatorio_ipa.gee import call_policy
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+FULL_REFRESH_DAYS = 7
+REFRESH_INTERVAL = 300  # seconds, collections are not listed again within this time
+REFRESH_OVERLAP = 600  # seconds, margin for clock differences with GEE
+PERIOD_PATTERN = re.compile(r"[_-]?(\d{4})(?:_(\d{2}))?(?:_(\d{2}))?")
+
+
+def image_period(image_name: str, name_prefix: str = "") -> str | None:
+    """
+    Get the period of an exported image from its name "<prefix>[_]YYYY[_MM[_DD]]"
+
+    Args:
+        image_name (str): Name of the image (not the full path)
+        name_prefix (str): Prefix of the image names. Defaults to "".
+
+    Returns:
+        str | None: Period "YYYY", "YYYY-MM" or "YYYY-MM-DD", None if the name doesn't match
+    """
+    if not image_name.startswith(name_prefix):
+        return None
+    match = PERIOD_PATTERN.fullmatch(image_name[len(name_prefix) :])
+    if match is None:
+        return None
+    return "-".join(part for part in match.groups() if part)
+
+
+def _utc_timestamp(dt: datetime) -> str:
+    return dt.astimezone(datetime_UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_timestamp(timestamp: str) -> datetime:
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+
+class AssetIndex:
+    """
+    Index of exported images by collection and name, see module docstring.
+
+    Thread-safe, concurrent lookups of the same collection refresh it once.
+
+    Args:
+        path (str | Path | None): JSON file where the index is kept between runs. Defaults to None
+            (index kept in memory only).
+        full_refresh_days (int): Days between full listings of a collection. Defaults to
+            FULL_REFRESH_DAYS.
+        refresh_interval (float): Seconds during which a refreshed collection is not listed
+            again. Defaults to REFRESH_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        full_refresh_days: int = FULL_REFRESH_DAYS,
+        refresh_interval: float = REFRESH_INTERVAL,
+    ):
+        self.path = Path(path) if path else None
+        self.full_refresh_days = full_refresh_days
+        self.refresh_interval = refresh_interval
+        self._collections = self._load()
+        self._lock = threading.RLock()
+
+    def _load(self) -> dict:
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                raise ValueError(f"unsupported version {data.get('version')}")
+            return data["collections"]
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Asset index {self.path} ignored, it will be rebuilt: {e}")
+            return {}
+
+    def save(self) -> None:
+        """Write the index to its file, if any"""
+        if self.path is None:
+            return
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {"version": INDEX_VERSION, "collections": self._collections}, f
+                )
+            tmp_path.replace(self.path)
+
+    def _list_images(self, collection_path: str, updated_after: str | None) -> dict:
+        params = {"parent": collection_path}
+        if updated_after:
+            params["filter"] = f'updateTime > "{updated_after}"'
+        response = call_policy.gee_call(ee.data.listAssets, params)
+        return {
+            asset["name"].split("/")[-1]: {
+                "update_time": asset.get("updateTime"),
+                "properties": asset.get("properties", {}),
+            }
+            for asset in response.get("assets", [])
+            if asset.get("type") == "IMAGE"
+        }
+
+    def refresh(self, collection_path: str, full: bool = False) -> int:
+        """
+        Update the images of a collection from GEE
+
+        Lists only the images updated since the previous refresh, unless full is True, the
+        collection is not in the index or its last full listing is older than full_refresh_days.
+        If GEE rejects the incremental listing (e.g. folders) the collection is listed in full.
+
+        Args:
+            collection_path (str): Path to asset collection or folder
+            full (bool): List the whole collection. Defaults to False.
+
+        Returns:
+            int: Number of images added or updated
+        """
+        collection_path = collection_path.rstrip("/")
+        with self._lock:
+            now = datetime.now(datetime_UTC)
+            collection = self._collections.get(collection_path)
+            full = (
+                full
+                or collection is None
+                or not collection.get("incremental", True)
+                or now - _parse_timestamp(collection["full_refresh"])
+                > timedelta(days=self.full_refresh_days)
+            )
+
+            images = None
+            if not full:
+                updated_after = _utc_timestamp(
+                    _parse_timestamp(collection["refreshed"])
+                    - timedelta(seconds=REFRESH_OVERLAP)
+                )
+                try:
+                    images = self._list_images(collection_path, updated_after)
+                    collection["images"].update(images)
+                except Exception as e:
+                    logger.debug(
+                        f"Incremental listing of {collection_path} failed, listing all images: {e}"
+                    )
+                    collection["incremental"] = False
+
+            if images is None:
+                images = self._list_images(collection_path, None)
+                incremental = (
+                    collection.get("incremental", True) if collection else True
+                )
+                collection = {
+                    "images": images,
+                    "full_refresh": _utc_timestamp(now),
+                    "incremental": incremental,
+                }
+                self._collections[collection_path] = collection
+
+            collection["refreshed"] = _utc_timestamp(now)
+            logger.debug(
+                f"Asset index of {collection_path} refreshed ({'full' if full else 'incremental'}): "
+                f"{len(images)} images updated"
+            )
+            self.save()
+            return len(images)
+
+    def images(self, collection_path: str, name_prefix: str = "") -> dict[str, dict]:
+        """
+        Exported images of a collection, refreshing it if it wasn't refreshed recently
+
+        Args:
+            collection_path (str): Path to asset collection or folder
+            name_prefix (str): Only images whose name starts with this prefix. Defaults to "".
+
+        Returns:
+            dict[str, dict]: Dictionary with image names as keys and dictionaries with keys
+                'period', 'update_time' and 'properties' as values. Properties of images added
+                from export tasks are None until the next refresh.
+        """
+        collection_path = collection_path.rstrip("/")
+        with self._lock:
+            collection = self._collections.get(collection_path)
+            if collection is None or datetime.now(datetime_UTC) - _parse_timestamp(
+                collection["refreshed"]
+            ) > timedelta(seconds=self.refresh_interval):
+                self.refresh(collection_path)
+            return {
+                name: {**image, "period": image_period(name, name_prefix)}
+                for name, image in self._collections[collection_path]["images"].items()
+                if name.startswith(name_prefix)
+            }
+
+    def periods(self, collection_path: str, name_prefix: str) -> set[str]:
+        """
+        Periods of the exported images of a collection
+
+        Args:
+            collection_path (str): Path to asset collection or folder
+            name_prefix (str): Prefix of the image names
+
+        Returns:
+            set[str]: Periods "YYYY", "YYYY-MM" or "YYYY-MM-DD" of the images
+        """
+        return {
+            image["period"]
+            for image in self.images(collection_path, name_prefix).values()
+            if image["period"]
+        }
+
+    def add(self, asset_path: str, properties: dict | None = None) -> None:
+        """
+        Add an exported image without listing its collection
+
+        Args:
+            asset_path (str): Path of the image asset
+            properties (dict | None): Properties of the image, None if unknown. Defaults to None.
+        """
+        collection_path, _, name = asset_path.rstrip("/").rpartition("/")
+        with self._lock:
+            collection = self._collections.get(collection_path)
+            if collection is None:
+                # unknown collections are listed in full on first use
+                return
+            collection["images"][name] = {
+                "update_time": _utc_timestamp(datetime.now(datetime_UTC)),
+                "properties": properties,
+            }
+
+    def update_from_tasks(self, export_tasks: list[dict]) -> int:
+        """
+        Add the images of completed export tasks
+
+        Stacked images are not added, they're deleted once split (see
+        gee.exports.split_stacked_exports()).
+
+        Args:
+            export_tasks (list[dict]): Export tasks returned by gee.exports.track_exports(), with
+                the 'asset_id' set by gee.exports.create_image_export_task()
+
+        Returns:
+            int: Number of completed tasks
+        """
+        completed = [
+            task
+            for task in export_tasks
+            if task.get("status") == "completed"
+            and task.get("asset_id")
+            and "split" not in task
+        ]
+        with self._lock:
+            for task in completed:
+                self.add(task["asset_id"])
+            self.save()
+        return len(completed)
+
+
+_index = None
+
+
+def get_index() -> AssetIndex | None:
+    """Current asset index shared by the export processes, None if not installed"""
+    return _index
+
+
+def set_index(index: AssetIndex | None) -> None:
+    """Replace the asset index shared by the export processes"""
+    global _index
+    _index = index
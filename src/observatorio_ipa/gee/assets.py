@@ -3,6 +3,8 @@ import ee, ee.data
 from ee.ee_exception import EEException
 from gee_toolbox.gee.assets import ALLOWED_ASSET_TYPES
 
+from observatorio_ipa.gee import call_policy
+
 logger = logging.getLogger("observatorio_ipa." + __name__)
 
 # cSpell:enableCompoundWords
@@ -32,7 +34,7 @@ def check_asset_exists(path: str, asset_type: str | None = None) -> bool:
             raise ValueError(f"Invalid asset type: {asset_type}")
 
     try:
-        asset = ee.data.getAsset(path)
+        asset = call_policy.gee_call(ee.data.getAsset, path)
         if asset:
             if asset_type:
                 return asset["type"] == asset_type
@@ -55,7 +57,7 @@ def check_container_exists(path) -> bool:
         bool: True if the asset exists and is a folder or image collection, False otherwise.
     """
     try:
-        asset = ee.data.getAsset(path)
+        asset = call_policy.gee_call(ee.data.getAsset, path)
         if asset:
             return asset["type"] in ["FOLDER", "IMAGE_COLLECTION"]
         else:
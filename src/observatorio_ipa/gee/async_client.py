@@ -0,0 +1,174 @@
+"""
+Asyncio wrapper of blocking GEE client calls (ee.data.*, getInfo(), asset listings).
+
+The earthengine-api client is synchronous, so independent metadata requests (asset checks,
+collection dates, asset listings) add up their latencies when called one after another.
+AsyncGEEClient runs the calls on a bounded thread pool and exposes them as coroutines, so they
+overlap. All threads share the GEE session (credentials and HTTP session) initialized with
+ee.Initialize().
+
+Every call has a timeout. A call that times out raises TimeoutError in the caller, but its thread
+can't be interrupted and finishes in the background.
+
+The get_asset(), list_assets(), get_info() and get_collection_dates() helpers apply the shared
+call policy (rate limiting and retries, see gee.call_policy). Functions passed to call() or
+run_concurrently() should do the same, e.g. (call_policy.gee_call, ee.data.getAsset, path).
+
+Synchronous code can use run_concurrently(), e.g.:
+
+    terra_dates, aqua_dates = run_concurrently(
+        [
+            (utils.get_collection_dates, ee_terra_ic),
+            (utils.get_collection_dates, ee_aqua_ic),
+        ]
+    )
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import ee
+
+from observatorio_ipa.gee import call_policy
+from observatorio_ipa.gee import utils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 300  # seconds
+
+
+class AsyncGEEClient:
+    """
+    Run blocking GEE calls on a bounded thread pool behind async methods.
+
+    Can be used as an async context manager, the thread pool is shut down on exit.
+
+    Args:
+        max_workers (int): Max number of concurrent calls. Defaults to DEFAULT_MAX_WORKERS.
+        timeout (float | None): Default timeout in seconds of each call. None waits forever.
+            Defaults to DEFAULT_TIMEOUT.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        timeout: float | None = DEFAULT_TIMEOUT,
+    ):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="gee"
+        )
+
+    async def __aenter__(self) -> "AsyncGEEClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the thread pool without waiting for running calls"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def call(
+        self, func: Callable, *args, timeout: float | None = None, **kwargs
+    ) -> Any:
+        """
+        Run a blocking function on the thread pool
+
+        Args:
+            func (Callable): Blocking function, e.g. ee.data.getAsset
+            *args: Positional arguments of func
+            timeout (float | None): Timeout in seconds. Defaults to None (client timeout).
+            **kwargs: Keyword arguments of func
+
+        Returns:
+            Any: Value returned by func
+
+        Raises:
+            TimeoutError: If the call doesn't finish before the timeout
+        """
+        loop = asyncio.get_running_loop()
+        # Run with the context of the caller so calls count in its trace spans (utils.tracing)
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(
+            self._executor, functools.partial(context.run, func, *args, **kwargs)
+        )
+        return await asyncio.wait_for(future, timeout or self.timeout)
+
+    async def gather(
+        self, calls: list[tuple], return_exceptions: bool = False
+    ) -> list[Any]:
+        """
+        Run calls concurrently
+
+        Args:
+            calls (list[tuple]): Calls as tuples (func, *args)
+            return_exceptions (bool): Return exceptions as results instead of raising the first
+                one. Defaults to False.
+
+        Returns:
+            list[Any]: Results in the same order as calls
+        """
+        return await asyncio.gather(
+            *(self.call(func, *args) for func, *args in calls),
+            return_exceptions=return_exceptions,
+        )
+
+    async def get_asset(self, path: str) -> dict:
+        """Asset metadata, see ee.data.getAsset()"""
+        return await self.call(call_policy.gee_call, ee.data.getAsset, path)
+
+    async def list_assets(self, parent: str) -> list[dict]:
+        """Assets of a folder or image collection, see ee.data.listAssets()"""
+        assets = await self.call(
+            call_policy.gee_call, ee.data.listAssets, {"parent": parent}
+        )
+        return assets.get("assets", [])
+
+    async def get_info(self, ee_object: ee.computedobject.ComputedObject) -> Any:
+        """Compute an object, see ee.computedobject.ComputedObject.getInfo()"""
+        return await self.call(call_policy.get_info, ee_object)
+
+    async def get_collection_dates(
+        self, ee_collection: ee.imagecollection.ImageCollection
+    ) -> list[str]:
+        """Dates "YYYY-MM-DD" of the images of a collection, see gee.utils.get_collection_dates()"""
+        return await self.call(utils.get_collection_dates, ee_collection)
+
+
+def run_concurrently(
+    calls: list[tuple],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: float | None = DEFAULT_TIMEOUT,
+    return_exceptions: bool = False,
+) -> list[Any]:
+    """
+    Run blocking GEE calls concurrently from synchronous code
+
+    Starts its own event loop, so it can't be called from a running event loop (use
+    AsyncGEEClient.gather() there).
+
+    Args:
+        calls (list[tuple]): Calls as tuples (func, *args)
+        max_workers (int): Max number of concurrent calls. Defaults to DEFAULT_MAX_WORKERS.
+        timeout (float | None): Timeout in seconds of each call. Defaults to DEFAULT_TIMEOUT.
+        return_exceptions (bool): Return exceptions as results instead of raising the first one.
+            Defaults to False.
+
+    Returns:
+        list[Any]: Results in the same order as calls
+
+    Raises:
+        TimeoutError: If a call doesn't finish before the timeout (unless return_exceptions)
+    """
+
+    async def _gather() -> list[Any]:
+        async with AsyncGEEClient(max_workers=max_workers, timeout=timeout) as client:
+            return await client.gather(calls, return_exceptions=return_exceptions)
+
+    return asyncio.run(_gather())
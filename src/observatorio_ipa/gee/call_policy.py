@@ -0,0 +1,269 @@
+"""
+Shared call policy for GEE requests: rate limiting and retries of transient errors.
+
+All GEE calls of the project (getInfo(), ee.data.*, task.start() and task.status()) go through
+gee_call() or get_info(), which apply the current policy:
+
+- Rate limiting: a token bucket shared by all threads (see gee.async_client) keeps the request
+  rate under the quota. When GEE answers 'Too Many Requests' the bucket is paused for all callers
+  (Retry-After if given, otherwise the backoff delay), so concurrent callers back off together
+  instead of turning one rejection into an error storm.
+- Retries: exponential backoff with full jitter, up to max_retries. Retry-After is respected.
+- Idempotency: idempotent calls (reads, task.start() which reuses its request id so GEE doesn't
+  start the task twice) are retried on any transient error. Non-idempotent calls are only retried
+  when the request was rejected by the rate limiter, as other errors (e.g. a 503 or a timeout) may
+  come after the request was processed.
+
+The earthengine-api client already retries failed HTTP requests a few times. This policy works at
+the level of whole calls and throttles requests before they are sent.
+
+The default policy only retries. main() installs a policy with a rate limiter of
+--gee-requests-per-second (see set_policy()).
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable
+
+import ee
+
+from observatorio_ipa.utils import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUESTS_PER_SECOND = 10
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0  # seconds
+DEFAULT_MAX_DELAY = 60.0  # seconds
+
+# GEE errors are EEException with the message only, the HTTP status is read from the HttpError of
+# the client when available. Messages are matched in lower case
+RATE_LIMIT_STATUS = [429]
+TRANSIENT_STATUS = [500, 502, 503, 504]
+RATE_LIMIT_ERRORS = ["too many requests", "rate limit", "concurrency limit"]
+TRANSIENT_ERRORS = [
+    "internal error",
+    "backend error",
+    "service unavailable",
+    "bad gateway",
+    "gateway timeout",
+    "deadline exceeded",
+    "connection reset",
+    "connection aborted",
+    "timed out",
+]
+TRANSIENT_EXCEPTIONS = (ConnectionError, TimeoutError)
+
+
+def _http_response(exc: BaseException | None):
+    """
+    Get the HTTP response of the HttpError of an exception, None if not available
+
+    EEException doesn't keep the HTTP response, but it's raised while handling the HttpError of the
+    client, so the HttpError is looked up in the exception context.
+    """
+    while exc is not None:
+        response = getattr(exc, "resp", None)
+        if response is not None:
+            return response
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """True if the request was rejected by the rate limiter (429 Too Many Requests)"""
+    response = _http_response(exc)
+    if getattr(response, "status", None) in RATE_LIMIT_STATUS:
+        return True
+    return any(error in str(exc).lower() for error in RATE_LIMIT_ERRORS)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True if the error may not happen again when retrying (rate limit, 5xx, network errors)"""
+    if isinstance(exc, TRANSIENT_EXCEPTIONS) or is_rate_limited(exc):
+        return True
+    response = _http_response(exc)
+    if getattr(response, "status", None) in TRANSIENT_STATUS:
+        return True
+    return any(error in str(exc).lower() for error in TRANSIENT_ERRORS)
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """
+    Get the Retry-After header (seconds) of the HTTP error of an exception
+
+    Args:
+        exc (BaseException): Exception raised by a GEE call
+
+    Returns:
+        float | None: Seconds to wait, None if the header is not available
+    """
+    response = _http_response(exc)
+    try:
+        return float(response.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate (float): Tokens (requests) added per second
+        burst (int | None): Max tokens, the number of requests allowed at once. Defaults to rate.
+    """
+
+    def __init__(self, rate: float, burst: int | None = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Wait for a token
+
+        Returns:
+            float: Seconds waited
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = max(
+                    self._paused_until - now, (1 - self._tokens) / self.rate, 0.001
+                )
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens to all callers for some seconds"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class CallPolicy:
+    """
+    Rate limiting and retries of GEE calls, see module docstring.
+
+    Args:
+        rate_limiter (RateLimiter | None): Shared rate limiter. Defaults to None (no limit).
+        max_retries (int): Max number of retries of a call. Defaults to DEFAULT_MAX_RETRIES.
+        base_delay (float): Delay of the first retry in seconds. Defaults to DEFAULT_BASE_DELAY.
+        max_delay (float): Max delay between retries in seconds. Defaults to DEFAULT_MAX_DELAY.
+    """
+
+    def __init__(
+        self,
+        rate_limiter: RateLimiter | None = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ):
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff_delay(self, attempt: int, exc: BaseException | None = None) -> float:
+        """
+        Delay before a retry: Retry-After if given, otherwise exponential backoff with full jitter
+
+        Args:
+            attempt (int): Number of the retry, starting at 0
+            exc (BaseException | None): Error of the failed call. Defaults to None.
+
+        Returns:
+            float: Seconds to wait
+        """
+        delay = retry_after(exc) if exc is not None else None
+        if delay is not None:
+            return min(delay, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def call(self, func: Callable, *args, idempotent: bool = True, **kwargs) -> Any:
+        """
+        Call a function applying the policy
+
+        Args:
+            func (Callable): Function making a GEE request
+            *args: Positional arguments of func
+            idempotent (bool): The call can be repeated without side effects. Defaults to True.
+            **kwargs: Keyword arguments of func
+
+        Returns:
+            Any: Value returned by func
+
+        Raises:
+            Exception: The error of the last attempt, or the first error that is not retried
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            tracing.count("gee_calls")
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                retry = is_rate_limited(e) or (idempotent and is_transient(e))
+                if not retry or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                if self.rate_limiter and is_rate_limited(e):
+                    self.rate_limiter.pause(delay)
+                name = getattr(func, "__qualname__", repr(func))
+                logger.warning(
+                    f"GEE call {name} failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+                attempt += 1
+
+
+_policy = CallPolicy()
+
+
+def get_policy() -> CallPolicy:
+    """Current call policy shared by all GEE calls"""
+    return _policy
+
+
+def set_policy(policy: CallPolicy) -> None:
+    """Replace the call policy shared by all GEE calls"""
+    global _policy
+    _policy = policy
+
+
+def gee_call(func: Callable, *args, idempotent: bool = True, **kwargs) -> Any:
+    """
+    Make a GEE call with the current policy, see CallPolicy.call()
+
+    Args:
+        func (Callable): Function making a GEE request, e.g. ee.data.getAsset
+        *args: Positional arguments of func
+        idempotent (bool): The call can be repeated without side effects. Defaults to True.
+        **kwargs: Keyword arguments of func
+
+    Returns:
+        Any: Value returned by func
+    """
+    return _policy.call(func, *args, idempotent=idempotent, **kwargs)
+
+
+def get_info(ee_object: ee.computedobject.ComputedObject) -> Any:
+    """Compute an object with getInfo() using the current policy"""
+    return _policy.call(ee_object.getInfo)
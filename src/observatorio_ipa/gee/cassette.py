@@ -0,0 +1,290 @@
+"""
+Record and replay of GEE requests (cassettes) to run the control plane offline.
+
+RecordingTransport is an HTTP transport for ee.Initialize() that appends every request to the Earth
+Engine API (ee.data calls, getInfo(), task start and status, including the API discovery and the
+algorithms loaded by ee.Initialize()) and its response and latency to a cassette file. Requests to
+other hosts (e.g. OAuth token refresh) are not recorded, and only the status and content type of
+response headers are kept, so cassettes don't contain credentials.
+
+ReplayTransport serves the recorded responses locally, without credentials or network, with the
+recorded latencies or with zero latency. Requests are matched by method, URI and body. Task request
+ids (random uuids) are ignored when matching. Repeated requests (e.g. task status polls) are served
+in the recorded order, the last response is repeated once they run out. ReplayTransport.summary()
+counts the round-trips, to measure how many requests a change saves.
+
+A cassette is a JSON lines file: one line with the cassette version followed by one line per
+interaction.
+"""
+
+import base64
+import json
+import logging
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import ee
+import httplib2
+import requests
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+RECORDED_HOST = "earthengine.googleapis.com"
+RECORDED_HEADERS = ["status", "content-type"]
+IGNORED_QUERY_PARAMS = ["key"]
+IGNORED_BODY_KEYS = ["requestId"]
+DEFAULT_PROJECT = "earthengine-legacy"
+LATENCY_MODES = ["zero", "recorded"]
+
+
+class CassetteMiss(Exception):
+    """A request has no recorded response in the cassette"""
+
+
+def _normalize_uri(uri: str) -> str:
+    """URI without ignored query parameters (API key) and with sorted parameters"""
+    parts = urlsplit(uri)
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in IGNORED_QUERY_PARAMS
+    )
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _drop_keys(value, keys: list[str]):
+    if isinstance(value, dict):
+        return {k: _drop_keys(v, keys) for k, v in value.items() if k not in keys}
+    if isinstance(value, list):
+        return [_drop_keys(v, keys) for v in value]
+    return value
+
+
+def _normalize_body(body: str | bytes | None) -> str:
+    """Body as sorted JSON without ignored keys (request ids), or as is if it's not JSON"""
+    if not body:
+        return ""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    try:
+        return json.dumps(
+            _drop_keys(json.loads(body), IGNORED_BODY_KEYS), sort_keys=True
+        )
+    except ValueError:
+        return body
+
+
+def request_key(method: str, uri: str, body: str | bytes | None = None) -> str:
+    """
+    Key used to match a request with its recorded response
+
+    Args:
+        method (str): HTTP method
+        uri (str): Request URI
+        body (str | bytes | None): Request body. Defaults to None.
+
+    Returns:
+        str: Key "METHOD URI BODY"
+    """
+    return f"{method.upper()} {_normalize_uri(uri)} {_normalize_body(body)}"
+
+
+def _encode_content(content: bytes) -> dict:
+    try:
+        return {"content": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"content_b64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_content(interaction: dict) -> bytes:
+    if "content_b64" in interaction:
+        return base64.b64decode(interaction["content_b64"])
+    return interaction.get("content", "").encode("utf-8")
+
+
+def read_cassette(path: str | Path) -> list[dict]:
+    """
+    Read the interactions of a cassette
+
+    Args:
+        path (str | Path): Cassette file
+
+    Returns:
+        list[dict]: Interactions with keys 'key', 'status', 'headers', 'content' or 'content_b64'
+            and 'latency' (seconds)
+
+    Raises:
+        ValueError: If the file is not a cassette of a supported version
+    """
+    with open(path, "r") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get("version") != CASSETTE_VERSION:
+        raise ValueError(f"Not a cassette file (version {CASSETTE_VERSION}): {path}")
+    return lines[1:]
+
+
+def cassette_project(interactions: list[dict]) -> str:
+    """
+    Client project of a recorded run, taken from the algorithms request of ee.Initialize()
+
+    Args:
+        interactions (list[dict]): Recorded interactions
+
+    Returns:
+        str: Project ID, DEFAULT_PROJECT if it isn't found
+    """
+    for interaction in interactions:
+        match = re.search(r"/projects/([^/]+)/algorithms", interaction["key"])
+        if match:
+            return match.group(1)
+    return DEFAULT_PROJECT
+
+
+class RecordingTransport:
+    """
+    httplib2.Http-like transport that records requests to the Earth Engine API in a cassette.
+
+    The cassette file is written as requests are made, so it's complete even if the run fails.
+
+    Args:
+        path (str | Path): Cassette file, overwritten
+        http (object | None): Transport making the requests. Defaults to None (requests session).
+    """
+
+    def __init__(self, path: str | Path, http=None):
+        self.path = Path(path)
+        self._http = http or ee._cloud_api_utils._Http(requests.Session())
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w") as f:
+            f.write(json.dumps({"version": CASSETTE_VERSION}) + "\n")
+
+    def request(
+        self,
+        uri: str,
+        method: str = "GET",
+        body: str | bytes | None = None,
+        headers: dict | None = None,
+        redirections: int | None = None,
+        connection_type=None,
+    ) -> tuple[httplib2.Response, bytes]:
+        start = time.perf_counter()
+        response, content = self._http.request(
+            uri,
+            method=method,
+            body=body,
+            headers=headers,
+            redirections=redirections,
+            connection_type=connection_type,
+        )
+        latency = time.perf_counter() - start
+        if urlsplit(uri).hostname != RECORDED_HOST:
+            return response, content
+
+        interaction = {
+            "key": request_key(method, uri, body),
+            "status": int(response.status),
+            "headers": {
+                key: response[key] for key in RECORDED_HEADERS[1:] if key in response
+            },
+            "latency": round(latency, 4),
+        }
+        interaction.update(_encode_content(content or b""))
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(interaction) + "\n")
+        return response, content
+
+
+class ReplayTransport:
+    """
+    httplib2.Http-like transport that serves the responses recorded in a cassette.
+
+    Args:
+        path (str | Path): Cassette file
+        latency (str): 'zero' to answer immediately or 'recorded' to wait the recorded latency.
+            Defaults to 'zero'.
+
+    Raises:
+        ValueError: If latency is not a valid mode or the file is not a cassette
+    """
+
+    def __init__(self, path: str | Path, latency: str = "zero"):
+        if latency not in LATENCY_MODES:
+            raise ValueError(f"Invalid latency mode: {latency}")
+        self.latency = latency
+        self.interactions = read_cassette(path)
+        self.project = cassette_project(self.interactions)
+        self.requests = 0
+        self.recorded_latency = 0.0
+        self._responses = defaultdict(deque)
+        self._last = {}
+        for interaction in self.interactions:
+            self._responses[interaction["key"]].append(interaction)
+        self._lock = threading.Lock()
+
+    def request(
+        self,
+        uri: str,
+        method: str = "GET",
+        body: str | bytes | None = None,
+        headers: dict | None = None,
+        redirections: int | None = None,
+        connection_type=None,
+    ) -> tuple[httplib2.Response, bytes]:
+        key = request_key(method, uri, body)
+        with self._lock:
+            if self._responses[key]:
+                interaction = self._responses[key].popleft()
+                self._last[key] = interaction
+            elif key in self._last:
+                interaction = self._last[key]
+            else:
+                raise CassetteMiss(f"No recorded response for request: {key[:500]}")
+            self.requests += 1
+            self.recorded_latency += interaction["latency"]
+
+        if self.latency == "recorded":
+            time.sleep(interaction["latency"])
+        response = httplib2.Response(
+            {**interaction["headers"], "status": interaction["status"]}
+        )
+        return response, _decode_content(interaction)
+
+    def summary(self) -> dict:
+        """
+        Requests served so far
+
+        Returns:
+            dict: Dictionary with the number of 'requests' served, the 'recorded_latency' of those
+                requests in seconds and the number of 'interactions' in the cassette
+        """
+        return {
+            "requests": self.requests,
+            "recorded_latency": round(self.recorded_latency, 3),
+            "interactions": len(self.interactions),
+        }
+
+
+def initialize_replay(path: str | Path, latency: str = "zero") -> ReplayTransport:
+    """
+    Initialize the GEE client to replay a cassette, without credentials or network
+
+    Args:
+        path (str | Path): Cassette file
+        latency (str): 'zero' or 'recorded'. Defaults to 'zero'.
+
+    Returns:
+        ReplayTransport: Transport serving the requests, see ReplayTransport.summary()
+    """
+    transport = ReplayTransport(path, latency=latency)
+    ee.Initialize(credentials=None, project=transport.project, http_transport=transport)
+    logger.info(
+        f"Replaying {len(transport.interactions)} recorded GEE requests from {path}"
+    )
+    return transport
@@ -0,0 +1,298 @@
+"""
+Export profiles for image exports to GEE assets.
+
+A profile defines how snow products are encoded when exported:
+- dtype: output type of the bands. TAC bands (0-100) are multiplied by scale_factor and rounded
+  before casting, QA bands are cast without scaling. None keeps the type of the computed image.
+- scale_factor: factor applied to TAC bands. Saved as image property 'scale_factor' so readers (and
+  the yearly and provisional monthly processes) can recover the original values.
+- pyramiding_policy: policy per band prefix, e.g. mean for TAC and mode for QA bands.
+- shard_size: size in pixels of the tiles the export is computed in. None uses the GEE default.
+- max_pixels: max number of pixels allowed in the export.
+"""
+
+import logging
+import ee
+
+from observatorio_ipa.defaults import DEFAULT_CHI_PROJECTION, DEFAULT_SCALE
+from observatorio_ipa.gee import call_policy
+
+logger = logging.getLogger(__name__)
+
+TAC_BANDS = ["Snow_TAC", "Cloud_TAC"]
+QA_BANDS = ["QA_CR"]
+DEFAULT_MAX_PIXELS = 180000000
+
+DTYPE_BYTES = {"uint8": 1, "uint16": 2, "float32": 4, None: 8}
+DTYPE_MAX_VALUE = {"uint8": 255, "uint16": 65535}
+
+EXPORT_PROFILES = {
+    # keeps the type of the computed image (double for means)
+    "default": {
+        "dtype": None,
+        "scale_factor": 1,
+        "pyramiding_policy": {},
+        "shard_size": None,
+        "max_pixels": DEFAULT_MAX_PIXELS,
+    },
+    "float32": {
+        "dtype": "float32",
+        "scale_factor": 1,
+        "pyramiding_policy": {"Snow_TAC": "mean", "Cloud_TAC": "mean", "QA_CR": "mode"},
+        "shard_size": None,
+        "max_pixels": DEFAULT_MAX_PIXELS,
+    },
+    # 0.5% resolution for TAC bands
+    "uint8": {
+        "dtype": "uint8",
+        "scale_factor": 2,
+        "pyramiding_policy": {"Snow_TAC": "mean", "Cloud_TAC": "mean", "QA_CR": "mode"},
+        "shard_size": 256,
+        "max_pixels": DEFAULT_MAX_PIXELS,
+    },
+    # 0.01% resolution for TAC bands
+    "uint16": {
+        "dtype": "uint16",
+        "scale_factor": 100,
+        "pyramiding_policy": {"Snow_TAC": "mean", "Cloud_TAC": "mean", "QA_CR": "mode"},
+        "shard_size": 256,
+        "max_pixels": DEFAULT_MAX_PIXELS,
+    },
+}
+
+
+def get_export_profile(name: str) -> dict:
+    """
+    Get a copy of an export profile by name
+
+    Args:
+        name (str): Name of the profile, one of EXPORT_PROFILES
+
+    Returns:
+        dict: Export profile
+
+    Raises:
+        ValueError: If the profile doesn't exist or is not valid
+    """
+    if name not in EXPORT_PROFILES:
+        raise ValueError(f"Invalid export profile: {name}")
+    profile = dict(EXPORT_PROFILES[name])
+    profile["pyramiding_policy"] = dict(profile["pyramiding_policy"])
+    check_export_profile(profile)
+    return profile
+
+
+def check_export_profile(profile: dict) -> dict:
+    """
+    Check that an export profile is valid
+
+    Args:
+        profile (dict): Export profile
+
+    Returns:
+        dict: The same profile
+
+    Raises:
+        ValueError: If the profile is not valid
+    """
+    if profile["dtype"] not in DTYPE_BYTES:
+        raise ValueError(f"Invalid export dtype: {profile['dtype']}")
+
+    if profile["scale_factor"] <= 0:
+        raise ValueError("scale_factor must be a positive number")
+
+    # TAC values go from 0 to 100
+    max_value = DTYPE_MAX_VALUE.get(profile["dtype"])
+    if max_value is not None and 100 * profile["scale_factor"] > max_value:
+        raise ValueError(
+            f"scale_factor {profile['scale_factor']} overflows dtype {profile['dtype']}"
+        )
+
+    for band, policy in profile["pyramiding_policy"].items():
+        if policy.lower() not in ["mean", "sample", "min", "max", "mode"]:
+            raise ValueError(f"Invalid pyramiding policy for {band}: {policy}")
+
+    if profile["shard_size"] is not None and profile["shard_size"] < 1:
+        raise ValueError("shard_size must be a positive integer")
+
+    return profile
+
+
+def _cast(ee_image: ee.image.Image, dtype: str | None) -> ee.image.Image:
+    """Cast an image to dtype, None keeps the image type"""
+    match dtype:
+        case "uint8":
+            return ee_image.toUint8()
+        case "uint16":
+            return ee_image.toUint16()
+        case "float32":
+            return ee_image.toFloat()
+        case _:
+            return ee_image
+
+
+def apply_export_profile(
+    ee_image: ee.image.Image,
+    profile: dict | None,
+    tac_bands: list[str] = TAC_BANDS,
+    qa_bands: list[str] | None = None,
+) -> ee.image.Image:
+    """
+    Encode an image with the dtype and scale factor of an export profile.
+
+    Only tac_bands and qa_bands are kept. The scale factor is saved in property 'scale_factor'.
+
+    Args:
+        ee_image (ee.image.Image): Image to encode
+        profile (dict | None): Export profile. None returns the image unchanged.
+        tac_bands (list[str]): TAC bands (0-100) to scale. Defaults to TAC_BANDS.
+        qa_bands (list[str] | None): QA bands to cast without scaling. Defaults to None.
+
+    Returns:
+        ee.image.Image: Encoded image
+    """
+    if profile is None:
+        return ee_image
+
+    ee_tac_img = ee_image.select(tac_bands)
+    if profile["scale_factor"] != 1:
+        ee_tac_img = ee_tac_img.multiply(profile["scale_factor"])
+    if profile["dtype"] in DTYPE_MAX_VALUE:
+        ee_tac_img = ee_tac_img.round()
+    ee_encoded_img = _cast(ee_tac_img, profile["dtype"])
+
+    if qa_bands:
+        ee_encoded_img = ee_encoded_img.addBands(
+            _cast(ee_image.select(qa_bands), profile["dtype"])
+        )
+
+    return ee.image.Image(
+        ee_encoded_img.copyProperties(ee_image, ee_image.propertyNames())
+    ).set("scale_factor", profile["scale_factor"])
+
+
+def unscale_image(
+    ee_image: ee.image.Image, tac_bands: list[str] = TAC_BANDS
+) -> ee.image.Image:
+    """
+    Get the original TAC values (0-100) of an image exported with apply_export_profile()
+
+    Images without the 'scale_factor' property are returned as float without changes.
+
+    Args:
+        ee_image (ee.image.Image): Exported image
+        tac_bands (list[str]): TAC bands to unscale. Defaults to TAC_BANDS.
+
+    Returns:
+        ee.image.Image: Image with float TAC bands
+    """
+    ee_scale_factor = ee.ee_number.Number(
+        ee.Algorithms.If(
+            ee_image.propertyNames().contains("scale_factor"),
+            ee_image.get("scale_factor"),
+            1,
+        )
+    )
+    return ee_image.select(tac_bands).toFloat().divide(ee_scale_factor)
+
+
+def pyramiding_policy(
+    profile: dict | None, band_names: list[str] | None = None
+) -> dict | None:
+    """
+    Get the pyramidingPolicy parameter of an export for the bands of an image.
+
+    Policies in the profile apply to bands with the same name or that start with '<name>_'
+    (bands of stacked images, e.g. 'QA_CR_2023_01_01').
+
+    Args:
+        profile (dict | None): Export profile
+        band_names (list[str] | None): Bands of the exported image. Defaults to None.
+
+    Returns:
+        dict | None: pyramidingPolicy by band name, None if the profile doesn't define policies
+    """
+    if not profile or not profile["pyramiding_policy"]:
+        return None
+
+    policy = {}
+    for band in band_names or list(profile["pyramiding_policy"]):
+        for prefix, band_policy in profile["pyramiding_policy"].items():
+            if band == prefix or band.startswith(prefix + "_"):
+                policy[band] = band_policy
+                break
+    return policy or None
+
+
+def estimate_export_size(
+    profile: dict,
+    ee_region: ee.featurecollection.FeatureCollection,
+    n_bands: int,
+    scale: float = DEFAULT_SCALE,
+) -> dict:
+    """
+    Estimate the number of pixels and bytes of an export of a region with an export profile.
+
+    Pixels are estimated from the area of the bounds of the region in DEFAULT_CHI_PROJECTION. Bytes
+    are the uncompressed size of all bands.
+
+    Args:
+        profile (dict): Export profile
+        ee_region (ee.featurecollection.FeatureCollection): Export region
+        n_bands (int): Number of bands of the exported image
+        scale (float): Export scale in meters. Defaults to DEFAULT_SCALE.
+
+    Returns:
+        dict: Dictionary with keys 'pixels' and 'bytes'
+
+    Raises:
+        ValueError: If the number of pixels is more than the profile's max_pixels
+    """
+    ee_projection = ee.projection.Projection(DEFAULT_CHI_PROJECTION)
+    area = call_policy.get_info(
+        ee_region.geometry()
+        .bounds(maxError=scale, proj=ee_projection)
+        .area(maxError=scale, proj=ee_projection)
+    )
+    pixels = int(area / scale**2)
+    estimate = {
+        "pixels": pixels,
+        "bytes": pixels * n_bands * DTYPE_BYTES[profile["dtype"]],
+    }
+    logger.debug(f"Estimated export size: {estimate}")
+
+    if pixels > profile["max_pixels"]:
+        raise ValueError(
+            f"Export region has ~{pixels} pixels, more than max_pixels {profile['max_pixels']}"
+        )
+    return estimate
+
+
+def count_region_pixels(
+    ee_region: ee.featurecollection.FeatureCollection, scale: float = DEFAULT_SCALE
+) -> int:
+    """
+    Count the pixels of a region rasterized in DEFAULT_CHI_PROJECTION.
+
+    Unlike estimate_export_size(), only pixels with their center inside the region are counted,
+    not all pixels of its bounds.
+
+    Args:
+        ee_region (ee.featurecollection.FeatureCollection): Region, e.g. the AOI
+        scale (float): Scale in meters. Defaults to DEFAULT_SCALE.
+
+    Returns:
+        int: Number of pixels
+    """
+    pixels = call_policy.get_info(
+        ee.image.Image.constant(1)
+        .reduceRegion(
+            reducer=ee.reducer.Reducer.count(),
+            geometry=ee_region.geometry(),
+            scale=scale,
+            crs=DEFAULT_CHI_PROJECTION,
+            maxPixels=DEFAULT_MAX_PIXELS,
+        )
+        .get("constant")
+    )
+    return int(pixels or 0)
@@ -1,8 +1,15 @@
 import ee
+import ee.batch
 import logging
+import pathlib
 from time import sleep
 import copy
 
+from observatorio_ipa.defaults import DEFAULT_CHI_PROJECTION, DEFAULT_SCALE
+from observatorio_ipa.gee import call_policy
+from observatorio_ipa.gee import export_profiles
+from observatorio_ipa.utils import tracing
+
 logger = logging.getLogger(__name__)
 
 GEE_TASK_FINISHED_STATUS = ["COMPLETED", "FAILED", "CANCELLED", "UNSUBMITTED"]
@@ -13,24 +20,136 @@ SKIP_TASK_STATUS = [
     "MOCK_CREATED",
     "MOCK_TASK_SKIPPED",
 ]
+DEFAULT_MAX_PIXELS = export_profiles.DEFAULT_MAX_PIXELS
+# Task status fields kept in the export task dictionaries (timing and cost, see utils.metrics)
+TASK_STATUS_FIELDS = [
+    "creation_timestamp_ms",
+    "start_timestamp_ms",
+    "update_timestamp_ms",
+    "batch_eecu_usage_seconds",
+]
+
+
+def create_image_export_task(
+    ee_image: ee.image.Image,
+    image_name: str,
+    collection_path: str,
+    ee_region: ee.featurecollection.FeatureCollection | ee.geometry.Geometry,
+    overwrite: bool = False,
+    profile: dict | None = None,
+    band_names: list[str] | None = None,
+) -> dict:
+    """
+    Create an export task (not started) of an image to a GEE asset collection or folder.
+
+    Errors creating the task are not raised, they are returned in the task dictionary with status
+    'failed_to_create' so the rest of the exports can continue.
+
+    The image must already be encoded with the profile (see export_profiles.apply_export_profile),
+    the profile here only sets the export parameters (pyramiding policy, shard size, max pixels).
+
+    Args:
+        ee_image (ee.image.Image): Image to export
+        image_name (str): Name of the image asset, also used as task description
+        collection_path (str): Path to the asset collection or folder where the image is exported
+        ee_region (ee.featurecollection.FeatureCollection | ee.geometry.Geometry): Region to
+            export
+        overwrite (bool): Replace the image if it already exists. Defaults to False.
+        profile (dict | None): Export profile. Defaults to None.
+        band_names (list[str] | None): Bands of the image, used for the pyramiding policy. Defaults to None.
+
+    Returns:
+        dict: Export task dictionary with keys ["task", "image", "target", "status", "asset_id"]
+            as expected by track_exports()
+    """
+    export_params = {}
+    if profile:
+        export_params["pyramidingPolicy"] = export_profiles.pyramiding_policy(
+            profile, band_names
+        )
+        export_params["shardSize"] = profile["shard_size"]
+    export_params = {
+        key: value for key, value in export_params.items() if value is not None
+    }
+    max_pixels = profile["max_pixels"] if profile else DEFAULT_MAX_PIXELS
+    asset_id = pathlib.Path(collection_path, image_name).as_posix()
+
+    try:
+        if isinstance(ee_region, ee.geometry.Geometry):
+            ee_geometry = ee_region
+        else:
+            ee_geometry = ee_region.geometry()
+        ee_task = ee.batch.Export.image.toAsset(
+            image=ee_image,
+            description=image_name,
+            assetId=asset_id,
+            region=ee_geometry,
+            scale=DEFAULT_SCALE,
+            crs=DEFAULT_CHI_PROJECTION,
+            maxPixels=max_pixels,
+            overwrite=overwrite,
+            **export_params,
+        )
+        logger.debug(f"Export task created for image: {image_name}")
+        return {
+            "task": ee_task,
+            "image": image_name,
+            "target": "GEE Asset",
+            "status": "created",
+            "asset_id": asset_id,
+        }
+    except Exception as e:
+        logger.debug(f"Export task creation failed for image: {image_name}")
+        return {
+            "task": None,
+            "image": image_name,
+            "target": "GEE Asset",
+            "status": "failed_to_create",
+            "error": str(e),
+        }
+
+
+def _start_task(task: dict) -> bool:
+    """Starts an export task and updates its status. Returns True if the task was started"""
+    with tracing.span("submit_task", image=task["image"]) as submit_span:
+        try:
+            # start() keeps its request id between attempts, GEE doesn't start the task twice
+            call_policy.gee_call(task["task"].start)
+            task["status"] = "started"
+            submit_span.set("task_id", getattr(task["task"], "id", None))
+            return True
+        except Exception as e:
+            task["status"] = "failed_to_start"
+            task["error"] = str(e)
+            logger.error(f"Failed to start task: {task['image']} to {task['target']}")
+            logger.error(e)
+            return False
 
 
-def track_exports(export_tasks: list, sleep_time: int = 60):
+def track_exports(
+    export_tasks: list, sleep_time: int = 60, max_concurrent: int | None = None
+):
     """
     Start and track export tasks in the export_tasks list.
 
     Process will skip all tasks that are not dictionaries or do not have the required keys.
     required keys: ["task", "image", "target"]
 
+    If max_concurrent is given, at most max_concurrent tasks are running at the same time. The rest
+    are started, in order, as running tasks finish.
+
     Args:
         export_tasks (list): List of dictionaries containing the export tasks.
         sleep_time (int): Time in seconds to sleep between checking task status.
+        max_concurrent (int | None): Max number of tasks running at the same time. Defaults to None (no limit).
 
     Returns:
-        list: List of dictionaries containing the export tasks with updated status.
+        list: List of dictionaries containing the export tasks with updated status, and the
+            TASK_STATUS_FIELDS reported by GEE.
 
     raises:
         TypeError: If export_tasks is not a list of dictionaries.
+        ValueError: If max_concurrent is not a positive integer.
     """
 
     logger.debug("Starting export tasks...")
@@ -39,6 +158,9 @@ def track_exports(export_tasks: list, sleep_time: int = 60):
     if not isinstance(export_tasks, list):
         raise TypeError("export_tasks must be a list of dictionaries")
 
+    if max_concurrent is not None and max_concurrent < 1:
+        raise ValueError("max_concurrent must be a positive integer")
+
     skipped_tasks = 0
     clean_export_tasks = []
     for task in export_tasks:
@@ -49,43 +171,37 @@ def track_exports(export_tasks: list, sleep_time: int = 60):
             continue
         # Skip if dictionary does not have the right keys
         required_keys = ["task", "image", "target"]
-        if not all(
-            [key in required_keys for key in task.keys() if key in required_keys]
-        ):
+        if not all([key in task.keys() for key in required_keys]):
             logger.error(f"skipping task - missing keys: {task}")
             skipped_tasks += 1
             continue
-        try:
-            current_status = task.get("status", "pending").upper()
-            if current_status in SKIP_TASK_STATUS:
-                logger.info(
-                    f"Skipping task: {task['image']} with status {current_status}"
-                )
-            if current_status == "MOCK_CREATED":
-                task["status"] = "mock_task_skipped"
-            else:
-                task["task"].start()
-                task["status"] = "started"
-        except Exception as e:
-            task["status"] = "failed_to_start"
-            task["error"] = str(e)
-            logger.error(f"Failed to start task: {task['image']} to {task['target']}")
-            logger.error(e)
+        current_status = task.get("status", "pending").upper()
+        if current_status in SKIP_TASK_STATUS:
+            logger.info(f"Skipping task: {task['image']} with status {current_status}")
+        if current_status == "MOCK_CREATED":
+            task["status"] = "mock_task_skipped"
         clean_export_tasks.append(task)
 
-    # Track tasks
-    finished_tasks = []
-    continue_export_tracking = True
-    while continue_export_tracking:
-        continue_export_tracking = False
-        for i, task in enumerate(clean_export_tasks):
-            if i not in finished_tasks:
-                # skip failed exports and starts
-                if task.get("status", "pending").upper() in SKIP_TASK_STATUS:
-                    finished_tasks.append(i)
-                    continue
+    # Tasks are started in order, keeping at most max_concurrent running
+    tasks_to_start = [
+        i
+        for i, task in enumerate(clean_export_tasks)
+        if task.get("status", "pending").upper() not in SKIP_TASK_STATUS
+    ]
+    with tracing.span("track_exports", tasks=len(tasks_to_start)):
+        running_tasks = []
+        while True:
+            for i in list(running_tasks):
+                task = clean_export_tasks[i]
                 try:
-                    status = task["task"].status()
+                    status = call_policy.gee_call(task["task"].status)
+                    task.update(
+                        {
+                            field: status[field]
+                            for field in TASK_STATUS_FIELDS
+                            if field in status
+                        }
+                    )
                     status = status["state"]
                 except Exception as e:
                     status = "FAILED_TO_GET_STATUS"
@@ -94,19 +210,186 @@ def track_exports(export_tasks: list, sleep_time: int = 60):
                 task["status"] = status.lower()
 
                 if status in GEE_TASK_UNFINISHED_STATUS:
-                    continue_export_tracking = True
+                    continue
                 elif status in GEE_TASK_FINISHED_STATUS:
                     logger.info(
                         f"Task {task['image']} to {task['target']} finished with status: {status.lower()}"
                     )
-                    finished_tasks.append(i)
                 else:
                     logger.warning(
                         f"Task {task['image']} to {task['target']} finished with unknown status: {status.lower()}"
                     )
-                    finished_tasks.append(i)
+                running_tasks.remove(i)
+
+            while tasks_to_start and (
+                max_concurrent is None or len(running_tasks) < max_concurrent
+            ):
+                i = tasks_to_start.pop(0)
+                if _start_task(clean_export_tasks[i]):
+                    running_tasks.append(i)
 
-        if continue_export_tracking:
+            if not running_tasks:
+                break
             sleep(sleep_time)
 
     return clean_export_tasks
+
+
+def stack_images(
+    ee_images: list[ee.image.Image],
+    band_names: list[str],
+    suffixes: list[str],
+    properties: list[str] | None = None,
+) -> ee.image.Image:
+    """
+    Stack images into a single multi-band image so they can be exported in one task.
+
+    Bands of each image are renamed to '<band>_<suffix>', e.g. 'Snow_TAC_2023_01_01'. Properties
+    of each image are kept in the stacked image as '<property>_<suffix>'.
+
+    Args:
+        ee_images (list[ee.image.Image]): Images to stack, all with bands band_names
+        band_names (list[str]): Bands to keep from each image
+        suffixes (list[str]): Suffix of each image, must be unique
+        properties (list[str] | None): Properties to keep from each image. Defaults to None.
+
+    Returns:
+        ee.image.Image: Multi-band image with len(ee_images) * len(band_names) bands
+
+    Raises:
+        ValueError: If ee_images and suffixes have different lengths or suffixes are not unique
+    """
+    if len(ee_images) != len(suffixes):
+        raise ValueError("ee_images and suffixes must have the same length")
+    if len(set(suffixes)) != len(suffixes):
+        raise ValueError("suffixes must be unique")
+
+    ee_renamed_imgs = [
+        ee_img.select(band_names, [f"{band}_{suffix}" for band in band_names])
+        for ee_img, suffix in zip(ee_images, suffixes)
+    ]
+    ee_stacked_img = ee.image.Image.cat(ee_renamed_imgs)
+    for ee_img, suffix in zip(ee_images, suffixes):
+        for _property in properties or []:
+            ee_stacked_img = ee_stacked_img.set(
+                f"{_property}_{suffix}", ee_img.get(_property)
+            )
+    return ee_stacked_img
+
+
+def split_stacked_image(
+    ee_stacked_img: ee.image.Image, band_names: list[str], suffix: str
+) -> ee.image.Image:
+    """
+    Get one image from a stacked image created with stack_images()
+
+    Args:
+        ee_stacked_img (ee.image.Image): Stacked image
+        band_names (list[str]): Original band names
+        suffix (str): Suffix of the image to get
+
+    Returns:
+        ee.image.Image: Image with bands band_names
+    """
+    return ee_stacked_img.select(
+        [f"{band}_{suffix}" for band in band_names], band_names
+    )
+
+
+def create_split_export_tasks(stack_task: dict) -> list[dict]:
+    """
+    Create the export tasks that split an exported stacked image into one asset per image.
+
+    The stacked image is read from its asset, so split tasks don't recompute the original images.
+    stack_task['split'] must be a dictionary with keys:
+        - "asset": path of the exported stacked image
+        - "collection_path": path of the asset collection or folder for the split images
+        - "band_names": original band names
+        - "images": list of dicts with keys "image" (asset name), "suffix" and "time_start" (date "YYYY-MM-DD")
+        - "properties" (optional): properties stored with stack_images(properties=...)
+        - "profile" (optional): export profile the stacked images were encoded with
+
+    Args:
+        stack_task (dict): Export task of the stacked image
+
+    Returns:
+        list[dict]: Export tasks (not started) of the split images
+    """
+    split = stack_task["split"]
+    ee_stacked_img = ee.image.Image(split["asset"])
+    ee_region = ee_stacked_img.geometry()
+
+    split_tasks = []
+    for image in split["images"]:
+        ee_img = split_stacked_image(
+            ee_stacked_img, split["band_names"], image["suffix"]
+        ).set("system:time_start", ee.ee_date.Date(image["time_start"]).millis())
+        for _property in split.get("properties", []):
+            ee_img = ee_img.set(
+                _property, ee_stacked_img.get(f"{_property}_{image['suffix']}")
+            )
+        profile = split.get("profile")
+        if profile:
+            ee_img = ee_img.set("scale_factor", profile["scale_factor"])
+        split_task = create_image_export_task(
+            ee_img,
+            image["image"],
+            split["collection_path"],
+            ee_region,
+            overwrite=True,
+            profile=profile,
+            band_names=split["band_names"],
+        )
+        split_task["stack"] = stack_task["image"]
+        split_tasks.append(split_task)
+    return split_tasks
+
+
+def split_stacked_exports(
+    export_tasks: list, sleep_time: int = 60, max_concurrent: int | None = None
+) -> list:
+    """
+    Split the stacked images of completed export tasks into one asset per image.
+
+    Only tasks with a 'split' key and status 'completed' are split. Stacked images are deleted once
+    all their split tasks complete, otherwise they're kept and the images are exported again in the
+    next run.
+
+    Args:
+        export_tasks (list): Export tasks returned by track_exports()
+        sleep_time (int): Time in seconds to sleep between checking task status.
+        max_concurrent (int | None): Max number of tasks running at the same time. Defaults to None (no limit).
+
+    Returns:
+        list: Split export tasks with their final status
+    """
+    split_tasks = []
+    stack_assets = {}
+    for task in export_tasks:
+        if not isinstance(task, dict) or "split" not in task:
+            continue
+        if task.get("status", "") != "completed":
+            logger.info(
+                f"Skipping split of {task['image']} with status {task.get('status')}"
+            )
+            continue
+        stack_assets[task["image"]] = task["split"]["asset"]
+        split_tasks.extend(create_split_export_tasks(task))
+
+    if not split_tasks:
+        return []
+
+    split_tasks = track_exports(
+        split_tasks, sleep_time=sleep_time, max_concurrent=max_concurrent
+    )
+
+    for stack, asset in stack_assets.items():
+        stack_split_tasks = [task for task in split_tasks if task["stack"] == stack]
+        if all([task["status"] == "completed" for task in stack_split_tasks]):
+            try:
+                call_policy.gee_call(ee.data.deleteAsset, asset, idempotent=False)
+                logger.debug(f"Stacked image deleted: {asset}")
+            except Exception as e:
+                logger.warning(f"Failed to delete stacked image {asset}: {e}")
+
+    return split_tasks
@@ -0,0 +1,112 @@
+"""
+Fingerprints of the inputs of exported images, to re-export an image only when its inputs change.
+
+A fingerprint is a short hash of the inputs of an image (dates and ingestion versions of the daily
+images used, update times of the auxiliary assets, processing parameters and code version), stored
+in the 'fingerprint' property of the exported image. Comparing stored and current fingerprints only
+needs metadata reads: the ingestion versions of all daily images of a date range are read with a
+single request and the asset update times with one request per asset.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import UTC as datetime_UTC
+from datetime import date, datetime, timedelta
+from importlib import metadata
+
+import ee
+
+from observatorio_ipa.gee import async_client
+from observatorio_ipa.gee import call_policy
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_PROPERTY = "fingerprint"
+FINGERPRINT_LENGTH = 16
+PACKAGE_NAME = "observatorio_ipa"
+
+
+def code_version() -> str:
+    """Version of the installed package, 'unknown' if it's not installed"""
+    try:
+        return metadata.version(PACKAGE_NAME)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def make_fingerprint(inputs: dict) -> str:
+    """
+    Hash the inputs of an image
+
+    Args:
+        inputs (dict): JSON serializable inputs. Key order doesn't change the fingerprint.
+
+    Returns:
+        str: Hex digest of FINGERPRINT_LENGTH characters
+    """
+    serialized = json.dumps(inputs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:FINGERPRINT_LENGTH]
+
+
+def get_asset_update_times(paths: list[str]) -> dict[str, str | None]:
+    """
+    Get the update time of assets, with concurrent requests
+
+    Args:
+        paths (list[str]): Asset paths
+
+    Returns:
+        dict[str, str | None]: Dictionary with asset paths as keys and update times (RFC 3339) as
+            values
+    """
+    assets = async_client.run_concurrently(
+        [(call_policy.gee_call, ee.data.getAsset, path) for path in paths]
+    )
+    return {path: asset.get("updateTime") for path, asset in zip(paths, assets)}
+
+
+def get_image_versions(
+    collections: list[str], first_day: str, last_day: str
+) -> dict[str, dict[str, int]]:
+    """
+    Get the ingestion version ('system:version') of the daily images of collections in a date
+    range, with a single request
+
+    Args:
+        collections (list[str]): Image collection IDs
+        first_day (str): First day "YYYY-MM-DD"
+        last_day (str): Last day "YYYY-MM-DD" (inclusive)
+
+    Returns:
+        dict[str, dict[str, int]]: Dictionary with collection IDs as keys and dictionaries of
+            date "YYYY-MM-DD" to image version as values
+    """
+    end_day = str(date.fromisoformat(last_day) + timedelta(days=1))
+    ee_columns = ee.ee_list.List(
+        [
+            ee.ee_list.List(
+                [
+                    ee_ic.aggregate_array("system:time_start"),
+                    ee_ic.aggregate_array("system:version"),
+                ]
+            )
+            for ee_ic in (
+                ee.imagecollection.ImageCollection(collection).filterDate(
+                    first_day, end_day
+                )
+                for collection in collections
+            )
+        ]
+    )
+    columns = call_policy.get_info(ee_columns)
+
+    versions = {}
+    for collection, (times_ms, image_versions) in zip(collections, columns):
+        versions[collection] = {
+            datetime.fromtimestamp(_ms / 1000, datetime_UTC).strftime(
+                "%Y-%m-%d"
+            ): _version
+            for _ms, _version in zip(times_ms, image_versions)
+        }
+    return versions
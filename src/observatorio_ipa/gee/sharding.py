@@ -0,0 +1,291 @@
+"""
+Region-sharded exports for large AOIs.
+
+The bounds of the AOI are split into square tiles (shards) aligned to a grid on
+DEFAULT_CHI_PROJECTION, and each shard that intersects the AOI is exported as its own asset and
+task. Once all shards of an image are exported, a mosaic task reads the shard assets and exports
+the final image, so the result is still one logical image. Shard assets are deleted after the
+mosaic completes.
+
+Failed shards can be retried without exporting again the shards that already completed.
+
+Shard assets are named 'shard_<image_name>_<index>', so they're not taken as exported images by
+processes that filter assets by their name prefix.
+"""
+
+import logging
+import math
+import ee
+
+from observatorio_ipa.defaults import DEFAULT_CHI_PROJECTION, DEFAULT_SCALE
+from observatorio_ipa.gee import call_policy
+from observatorio_ipa.gee import exports as gee_exports
+
+logger = logging.getLogger(__name__)
+
+SHARD_NAME_PREFIX = "shard_"
+SHARD_RETRY_STATUS = ["failed", "cancelled", "failed_to_start", "failed_to_get_status"]
+
+
+def make_shard_grid(
+    ee_region: ee.featurecollection.FeatureCollection,
+    shard_size: int,
+    scale: float = DEFAULT_SCALE,
+) -> list[list[float]]:
+    """
+    Split the bounds of a region in square shards aligned to a grid on DEFAULT_CHI_PROJECTION.
+
+    The grid origin is the origin of the projection, so shards of different images and runs are
+    always the same. Only shards that intersect the region are returned.
+
+    Args:
+        ee_region (ee.featurecollection.FeatureCollection): Region to split
+        shard_size (int): Size of the shards side in pixels
+        scale (float): Pixel size in meters. Defaults to DEFAULT_SCALE.
+
+    Returns:
+        list[list[float]]: Bounds [xmin, ymin, xmax, ymax] of each shard in projection coordinates
+
+    Raises:
+        ValueError: If shard_size is not a positive integer
+    """
+    if shard_size < 1:
+        raise ValueError("shard_size must be a positive integer")
+
+    ee_projection = ee.projection.Projection(DEFAULT_CHI_PROJECTION)
+    bounds = call_policy.get_info(
+        ee_region.geometry()
+        .bounds(maxError=scale, proj=ee_projection)
+        .transform(ee_projection, scale)
+        .coordinates()
+    )
+    xs = [point[0] for point in bounds[0]]
+    ys = [point[1] for point in bounds[0]]
+
+    tile = shard_size * scale
+    x_start = math.floor(min(xs) / tile)
+    x_end = math.ceil(max(xs) / tile)
+    y_start = math.floor(min(ys) / tile)
+    y_end = math.ceil(max(ys) / tile)
+    shards = [
+        [ix * tile, iy * tile, (ix + 1) * tile, (iy + 1) * tile]
+        for iy in range(y_start, y_end)
+        for ix in range(x_start, x_end)
+    ]
+
+    # keep only shards that intersect the region (single request)
+    ee_shards_fc = ee.featurecollection.FeatureCollection(
+        [
+            ee.feature.Feature(_shard_geometry(shard), {"shard": i})
+            for i, shard in enumerate(shards)
+        ]
+    )
+    intersecting = call_policy.get_info(
+        ee_shards_fc.filterBounds(ee_region.geometry()).aggregate_array("shard")
+    )
+    shards = [shard for i, shard in enumerate(shards) if i in set(intersecting)]
+    logger.debug(f"Region split in {len(shards)} shards of {shard_size} pixels")
+    return shards
+
+
+def _shard_geometry(shard: list[float]) -> ee.geometry.Geometry:
+    """Rectangle of a shard in DEFAULT_CHI_PROJECTION"""
+    return ee.geometry.Geometry.Rectangle(
+        shard, proj=DEFAULT_CHI_PROJECTION, geodesic=False
+    )
+
+
+def shard_asset_name(image_name: str, index: int) -> str:
+    """Asset name of a shard of an image"""
+    return f"{SHARD_NAME_PREFIX}{image_name}_{index:03d}"
+
+
+def _shard_export_task(shard_info: dict) -> dict:
+    """Create the export task of one shard, see create_sharded_export_tasks()"""
+    task = gee_exports.create_image_export_task(
+        shard_info["ee_image"],
+        shard_asset_name(shard_info["image"], shard_info["index"]),
+        shard_info["collection_path"],
+        ee.featurecollection.FeatureCollection(
+            [ee.feature.Feature(_shard_geometry(shard_info["bounds"]))]
+        ),
+        overwrite=True,
+        profile=shard_info["profile"],
+        band_names=shard_info["band_names"],
+    )
+    task["shard"] = shard_info
+    return task
+
+
+def create_sharded_export_tasks(
+    ee_image: ee.image.Image,
+    image_name: str,
+    collection_path: str,
+    ee_region: ee.featurecollection.FeatureCollection,
+    shards: list[list[float]],
+    overwrite: bool = False,
+    profile: dict | None = None,
+    band_names: list[str] | None = None,
+) -> list[dict]:
+    """
+    Create one export task per shard of an image.
+
+    Each task has a 'shard' key with the information needed to retry it and to mosaic the shards
+    with complete_sharded_exports().
+
+    Args:
+        ee_image (ee.image.Image): Image to export
+        image_name (str): Name of the final image asset
+        collection_path (str): Path to the asset collection or folder of the final image
+        ee_region (ee.featurecollection.FeatureCollection): Export region of the final image
+        shards (list[list[float]]): Shard bounds, see make_shard_grid()
+        overwrite (bool): Replace the final image if it already exists. Defaults to False.
+        profile (dict | None): Export profile. Defaults to None.
+        band_names (list[str] | None): Bands of the image, used for the pyramiding policy. Defaults to None.
+
+    Returns:
+        list[dict]: Export tasks (not started) of the shards
+    """
+    return [
+        _shard_export_task(
+            {
+                "image": image_name,
+                "index": i,
+                "n_shards": len(shards),
+                "bounds": shard,
+                "collection_path": collection_path,
+                "ee_image": ee_image,
+                "ee_region": ee_region,
+                "overwrite": overwrite,
+                "profile": profile,
+                "band_names": band_names,
+            }
+        )
+        for i, shard in enumerate(shards)
+    ]
+
+
+def retry_failed_shards(
+    export_tasks: list, sleep_time: int = 60, max_concurrent: int | None = None
+) -> list:
+    """
+    Export again only the shards that failed. Shards that completed are not exported again.
+
+    Args:
+        export_tasks (list): Export tasks returned by track_exports()
+        sleep_time (int): Time in seconds to sleep between checking task status.
+        max_concurrent (int | None): Max number of tasks running at the same time. Defaults to None (no limit).
+
+    Returns:
+        list: Export tasks with the failed shards replaced by their retries
+    """
+    failed = [
+        i
+        for i, task in enumerate(export_tasks)
+        if isinstance(task, dict)
+        and "shard" in task
+        and task.get("status", "") in SHARD_RETRY_STATUS
+    ]
+    if not failed:
+        return export_tasks
+
+    logger.info(f"Retrying {len(failed)} failed shards")
+    retry_tasks = gee_exports.track_exports(
+        [_shard_export_task(export_tasks[i]["shard"]) for i in failed],
+        sleep_time=sleep_time,
+        max_concurrent=max_concurrent,
+    )
+    export_tasks = list(export_tasks)
+    for i, retry_task in zip(failed, retry_tasks):
+        export_tasks[i] = retry_task
+    return export_tasks
+
+
+def mosaic_shards(shard_tasks: list[dict]) -> dict:
+    """
+    Create the export task of the final image as a mosaic of its exported shard assets.
+
+    Args:
+        shard_tasks (list[dict]): Completed export tasks of all the shards of an image
+
+    Returns:
+        dict: Export task (not started) of the final image
+    """
+    shard_info = shard_tasks[0]["shard"]
+    shard_assets = [
+        f"{task['shard']['collection_path']}/{shard_asset_name(task['shard']['image'], task['shard']['index'])}"
+        for task in shard_tasks
+    ]
+    ee_shard_imgs = [ee.image.Image(asset) for asset in shard_assets]
+    ee_mosaic_img = ee.image.Image(
+        ee.imagecollection.ImageCollection.fromImages(ee_shard_imgs)
+        .mosaic()
+        .copyProperties(ee_shard_imgs[0], ee_shard_imgs[0].propertyNames())
+    )
+    task = gee_exports.create_image_export_task(
+        ee_mosaic_img,
+        shard_info["image"],
+        shard_info["collection_path"],
+        shard_info["ee_region"],
+        overwrite=shard_info["overwrite"],
+        profile=shard_info["profile"],
+        band_names=shard_info["band_names"],
+    )
+    task["shard_assets"] = shard_assets
+    return task
+
+
+def complete_sharded_exports(
+    export_tasks: list, sleep_time: int = 60, max_concurrent: int | None = None
+) -> list:
+    """
+    Retry failed shards and mosaic the images whose shards all completed.
+
+    Shard assets are deleted once their mosaic completes. Images with shards that failed after the
+    retry are not mosaicked and are exported again in the next run.
+
+    Args:
+        export_tasks (list): Export tasks returned by track_exports()
+        sleep_time (int): Time in seconds to sleep between checking task status.
+        max_concurrent (int | None): Max number of tasks running at the same time. Defaults to None (no limit).
+
+    Returns:
+        list: Retried shard tasks and mosaic tasks with their final status
+    """
+    if not any(isinstance(task, dict) and "shard" in task for task in export_tasks):
+        return []
+
+    retried_tasks = retry_failed_shards(
+        export_tasks, sleep_time=sleep_time, max_concurrent=max_concurrent
+    )
+    new_tasks = [
+        task
+        for task, original in zip(retried_tasks, export_tasks)
+        if task is not original
+    ]
+
+    shards_by_image = {}
+    for task in retried_tasks:
+        if isinstance(task, dict) and "shard" in task:
+            shards_by_image.setdefault(task["shard"]["image"], []).append(task)
+
+    mosaic_tasks = []
+    for image_name, shard_tasks in shards_by_image.items():
+        if not all(task["status"] == "completed" for task in shard_tasks):
+            logger.warning(f"Skipping mosaic of {image_name}, some shards failed")
+            continue
+        mosaic_tasks.append(mosaic_shards(shard_tasks))
+
+    mosaic_tasks = gee_exports.track_exports(
+        mosaic_tasks, sleep_time=sleep_time, max_concurrent=max_concurrent
+    )
+    for task in mosaic_tasks:
+        if task["status"] != "completed":
+            continue
+        for asset in task["shard_assets"]:
+            try:
+                call_policy.gee_call(ee.data.deleteAsset, asset, idempotent=False)
+            except Exception as e:
+                logger.warning(f"Failed to delete shard {asset}: {e}")
+
+    return new_tasks + mosaic_tasks
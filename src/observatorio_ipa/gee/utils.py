@@ -3,6 +3,8 @@ from datetime import datetime, timedelta, date
 from dateutil.relativedelta import relativedelta
 from datetime import UTC as datetime_UTC
 
+from observatorio_ipa.gee import call_policy
+
 
 def set_date_property(image: ee.image.Image) -> ee.image.Image:
     """Sets a date property named 'simpleTime' with the image's date in string format YYYY-MM-dd
@@ -103,7 +105,9 @@ def get_collection_dates(
     ValueError: If the Images don't have the property 'system:time_start'
     """
     # get "system:time_start" of all images in image collection
-    image_dates_in_ms = ee_collection.aggregate_array("system:time_start").getInfo()
+    image_dates_in_ms = call_policy.get_info(
+        ee_collection.aggregate_array("system:time_start")
+    )
 
     if not image_dates_in_ms:
         raise ValueError(
@@ -131,7 +135,7 @@ def get_image_date(ee_image: ee.image.Image) -> str:
     ValueError: If the image doesn't have the property 'system:time_start'
     """
 
-    img_date_in_ms = ee_image.get("system:time_start").getInfo()
+    img_date_in_ms = call_policy.get_info(ee_image.get("system:time_start"))
 
     if img_date_in_ms is None:
         raise ValueError("Image does not have a 'system:time_start' property")
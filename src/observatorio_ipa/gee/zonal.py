@@ -0,0 +1,165 @@
+"""
+Zonal statistics of snow products by feature (e.g. basins and sub-basins) in GEE.
+
+Features are rasterized once to a label image with an integer property of the features (e.g. a
+basin code). The mean of the Snow_TAC and Cloud_TAC bands of all features is then computed with a
+single grouped reduction (Reducer.mean().group()) per image, instead of one reduction per feature.
+
+The mean of Snow_TAC and Cloud_TAC over a feature is its snow and cloud cover percentage, for daily
+images (0 or 100 per pixel) and for monthly or yearly means. Images exported with a scaled export
+profile are unscaled first. Optionally, the pixel count of each QA_CR value is computed in the same
+reduction.
+"""
+
+import logging
+import ee
+
+from observatorio_ipa.defaults import DEFAULT_CHI_PROJECTION, DEFAULT_SCALE
+from observatorio_ipa.gee import call_policy
+from observatorio_ipa.gee import export_profiles
+
+logger = logging.getLogger(__name__)
+
+ZONAL_BANDS = ["Snow_TAC", "Cloud_TAC"]
+LABEL_BAND = "label"
+DEFAULT_MAX_PIXELS = export_profiles.DEFAULT_MAX_PIXELS
+
+
+def label_image(
+    ee_fc: ee.featurecollection.FeatureCollection, label_property: str
+) -> ee.image.Image:
+    """
+    Rasterize features to an int32 label image
+
+    Args:
+        ee_fc (ee.featurecollection.FeatureCollection): Features, e.g. basins
+        label_property (str): Integer property of the features used as label
+
+    Returns:
+        ee.image.Image: Image with band 'label'
+    """
+    return (
+        ee_fc.reduceToImage([label_property], ee.reducer.Reducer.first())
+        .toInt32()
+        .rename(LABEL_BAND)
+    )
+
+
+def image_zonal_means(
+    ee_image: ee.image.Image,
+    ee_label_img: ee.image.Image,
+    ee_region: ee.featurecollection.FeatureCollection,
+    bands: list[str] = ZONAL_BANDS,
+    scale: float = DEFAULT_SCALE,
+    qa_band: str | None = None,
+) -> ee.feature.Feature:
+    """
+    Mean of the bands of an image for all features with a single grouped reduction
+
+    Args:
+        ee_image (ee.image.Image): Image with the bands to reduce
+        ee_label_img (ee.image.Image): Label image, see label_image()
+        ee_region (ee.featurecollection.FeatureCollection): Region to reduce, e.g. the AOI
+        bands (list[str]): Bands to reduce. Defaults to ZONAL_BANDS.
+        scale (float): Scale of the reduction in meters. Defaults to DEFAULT_SCALE.
+        qa_band (str | None): QA band to count pixels of each value. Defaults to None.
+
+    Returns:
+        ee.feature.Feature: Feature without geometry with properties 'system:time_start' of the
+            image and 'groups', a list of dictionaries with keys 'label', 'mean' (list with the
+            mean of each band) and 'histogram' (pixel count of each QA value, only with qa_band)
+    """
+    ee_reducer = ee.reducer.Reducer.mean().repeat(len(bands))
+    ee_stats_img = export_profiles.unscale_image(ee_image, bands)
+    if qa_band:
+        ee_reducer = ee_reducer.combine(
+            ee.reducer.Reducer.frequencyHistogram().unweighted(), sharedInputs=False
+        )
+        ee_stats_img = ee_stats_img.addBands(ee_image.select(qa_band))
+    n_inputs = len(bands) + (1 if qa_band else 0)
+    ee_reducer = ee_reducer.group(groupField=n_inputs, groupName=LABEL_BAND)
+
+    ee_stats = ee_stats_img.addBands(ee_label_img).reduceRegion(
+        reducer=ee_reducer,
+        geometry=ee_region.geometry(),
+        scale=scale,
+        crs=DEFAULT_CHI_PROJECTION,
+        maxPixels=DEFAULT_MAX_PIXELS,
+    )
+    return ee.feature.Feature(
+        None,
+        {
+            "system:time_start": ee_image.get("system:time_start"),
+            "groups": ee_stats.get("groups"),
+        },
+    )
+
+
+def _parse_zonal_features(features: list[dict], bands: list[str]) -> list[dict]:
+    """
+    Convert the features of image_zonal_means() to one record per image and label
+
+    Args:
+        features (list[dict]): Features from getInfo()
+        bands (list[str]): Reduced bands, in the same order as the reduction
+
+    Returns:
+        list[dict]: Records with keys 'time_start' (milliseconds), 'label', one key per band and
+            'qa_counts' if the QA band was reduced
+    """
+    records = []
+    for feature in features:
+        properties = feature["properties"]
+        for group in properties.get("groups") or []:
+            record = {
+                "time_start": properties.get("system:time_start"),
+                "label": group[LABEL_BAND],
+            }
+            record.update(dict(zip(bands, group["mean"])))
+            if "histogram" in group:
+                record["qa_counts"] = {
+                    int(float(value)): int(count)
+                    for value, count in group["histogram"].items()
+                }
+            records.append(record)
+    return records
+
+
+def ic_zonal_means(
+    ee_ic: ee.imagecollection.ImageCollection,
+    ee_fc: ee.featurecollection.FeatureCollection,
+    label_property: str,
+    bands: list[str] = ZONAL_BANDS,
+    scale: float = DEFAULT_SCALE,
+    qa_band: str | None = None,
+) -> list[dict]:
+    """
+    Mean of the bands of all images of a collection for all features.
+
+    The features are rasterized once, and the statistics of all images are requested with a single
+    getInfo() call.
+
+    Args:
+        ee_ic (ee.imagecollection.ImageCollection): Daily, monthly or yearly images
+        ee_fc (ee.featurecollection.FeatureCollection): Features, e.g. basins
+        label_property (str): Integer property of the features used as label
+        bands (list[str]): Bands to reduce. Defaults to ZONAL_BANDS.
+        scale (float): Scale of the reduction in meters. Defaults to DEFAULT_SCALE.
+        qa_band (str | None): QA band to count pixels of each value. Defaults to None.
+
+    Returns:
+        list[dict]: Records with keys 'time_start' (milliseconds), 'label', one key per band and
+            'qa_counts' (only with qa_band)
+    """
+    ee_label_img = label_image(ee_fc, label_property)
+    ee_stats_fc = ee.featurecollection.FeatureCollection(
+        ee_ic.map(
+            lambda ee_image: image_zonal_means(
+                ee.image.Image(ee_image), ee_label_img, ee_fc, bands, scale, qa_band
+            )
+        )
+    )
+    features = call_policy.get_info(ee_stats_fc)["features"]
+    records = _parse_zonal_features(features, bands)
+    logger.debug(f"Zonal statistics of {len(features)} images: {len(records)} records")
+    return records
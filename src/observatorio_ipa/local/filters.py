@@ -0,0 +1,127 @@
+"""
+Neighbourhood filters for local (in-memory) rasters using numpy.
+
+Implements a separable sliding min filter with the van Herk/Gil-Werman algorithm. The raster is split
+in blocks of the window size and prefix and suffix minimums are computed within each block. The min of
+any window is then the min of one suffix and one prefix value, so the cost per pixel is constant and
+doesn't grow with the window size. A square (2r+1)x(2r+1) window is computed as a row pass followed
+by a column pass.
+
+Used to compute the minimum DEM of snow covered neighbours (the DEM 'snowline') in spatial_8.
+
+DEM: Digital Elevation Model
+"""
+
+import numpy as np
+
+# nodata value for int16 DEM rasters
+DEM_NODATA_INT16 = np.iinfo(np.int16).min
+
+
+def dem_sentinel(dtype: np.dtype) -> int | float:
+    """
+    Value larger or equal than any value of dtype, used to ignore pixels in a min reduction
+
+    Args:
+        dtype (np.dtype): dtype of the raster
+
+    Returns:
+        int | float: max value for integer dtypes, inf for float dtypes
+    """
+    if np.issubdtype(dtype, np.integer):
+        return np.iinfo(dtype).max
+    return np.inf
+
+
+def dem_to_int16(dem: np.ndarray, nodata: int = DEM_NODATA_INT16) -> np.ndarray:
+    """
+    Converts a DEM raster to int16 (meters), replacing NaN and out of range values with nodata.
+
+    Args:
+        dem (np.ndarray): DEM raster
+        nodata (int): nodata value for the int16 raster. Defaults to DEM_NODATA_INT16.
+
+    Returns:
+        np.ndarray: int16 DEM raster
+    """
+    dem = np.asarray(dem)
+    if dem.dtype == np.int16:
+        return dem
+    info = np.iinfo(np.int16)
+    valid = np.isfinite(dem) & (dem > info.min) & (dem < info.max)
+    return np.where(valid, np.round(np.where(valid, dem, 0)), nodata).astype(np.int16)
+
+
+def sliding_min(values: np.ndarray, radius: int, axis: int = -1) -> np.ndarray:
+    """
+    Sliding window min of size 2*radius+1 along one axis using the van Herk/Gil-Werman algorithm.
+
+    Windows are centered on each pixel. Pixels outside the array are ignored.
+
+    Args:
+        values (np.ndarray): Array to filter
+        radius (int): Window radius, window size is 2*radius+1
+        axis (int): Axis to filter along. Defaults to -1.
+
+    Returns:
+        np.ndarray: Array with the same shape and dtype as values
+
+    Raises:
+        ValueError: If radius is negative
+    """
+    if radius < 0:
+        raise ValueError("radius must be a positive integer")
+    if radius == 0:
+        return values.copy()
+
+    axis = axis % values.ndim
+    n = values.shape[axis]
+    size = 2 * radius + 1
+    n_blocks = -(-(n + 2 * radius) // size)
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (radius, n_blocks * size - n - radius)
+    padded = np.pad(values, pad, constant_values=dem_sentinel(values.dtype))
+
+    # split the filtered axis in blocks of the window size and get prefix and suffix mins per block.
+    # Each pass over the in-block positions works on 1/size of the pixels, so the total cost is O(n).
+    blocks_shape = padded.shape[:axis] + (n_blocks, size) + padded.shape[axis + 1 :]
+    blocks = padded.reshape(blocks_shape)
+    prefix = blocks.copy()
+    suffix = blocks.copy()
+    block_pos = [slice(None)] * (axis + 1)
+    for j in range(1, size):
+        current = tuple(block_pos + [j])
+        previous = tuple(block_pos + [j - 1])
+        np.minimum(prefix[current], prefix[previous], out=prefix[current])
+        current = tuple(block_pos + [size - 1 - j])
+        previous = tuple(block_pos + [size - j])
+        np.minimum(suffix[current], suffix[previous], out=suffix[current])
+    prefix = prefix.reshape(padded.shape)
+    suffix = suffix.reshape(padded.shape)
+
+    # window of pixel i spans padded[i : i + size], min(suffix[i], prefix[i + size - 1])
+    return np.minimum(
+        suffix.take(np.arange(n), axis=axis),
+        prefix.take(np.arange(size - 1, size - 1 + n), axis=axis),
+    )
+
+
+def masked_min_filter(
+    values: np.ndarray, mask: np.ndarray, radius: int = 1
+) -> np.ndarray:
+    """
+    Min of the masked values in a square (2*radius+1)x(2*radius+1) window around each pixel.
+
+    Pixels where mask is False are ignored. Windows without any masked pixel get dem_sentinel(dtype).
+    The window includes the center pixel.
+
+    Args:
+        values (np.ndarray): 2D array to filter
+        mask (np.ndarray): 2D boolean array, True for the pixels to include in the min
+        radius (int): Window radius. Defaults to 1 (3x3 window).
+
+    Returns:
+        np.ndarray: 2D array with the same shape and dtype as values
+    """
+    masked = np.where(mask, values, dem_sentinel(values.dtype)).astype(values.dtype)
+    return sliding_min(sliding_min(masked, radius, axis=1), radius, axis=0)
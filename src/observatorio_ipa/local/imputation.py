@@ -0,0 +1,402 @@
+"""
+Functions to impute TAC values in local (in-memory) rasters using numpy.
+
+Implements the same imputation steps as the GEE processes in observatorio_ipa.processes.imputation
+(temporal, spatial_4 and spatial_8) for daily TAC and QA_CR rasters that are already available locally.
+
+Only pixels where TAC==0 (cloud/nodata) can change during imputation. Each step has a dense
+implementation that works on the full raster and a sparse implementation that gathers and scatters
+values only at the flat indices of the missing pixels. The flat indices are extracted once per day
+and shrink as pixels get imputed. impute_tac_day() selects the sparse or dense path automatically
+using the fraction of missing pixels of the day.
+
+The following conventions are used:
+- TAC rasters are 2D arrays (rows, cols) with values 0 (cloud/nodata), 50 (land) and 100 (snow)
+- QA_CR rasters are 2D arrays with the same shape as TAC
+- Cubes are 3D arrays (days, rows, cols) of consecutive days
+- Pixels outside the raster are treated as masked, same as masked pixels in GEE neighbourhood reductions
+
+GLOSSARY
+TAC: Terra-Aqua Classification?
+QA_CR: Quality Assessment - C? R?
+DEM: Digital Elevation Model
+"""
+
+import numpy as np
+
+from observatorio_ipa.local import bitplanes, filters
+
+# Fraction of missing pixels (TAC==0) below which the sparse path is used.
+# See benchmarks/bench_sparse_imputation.py for the crossover point.
+DEFAULT_SPARSE_THRESHOLD = 0.4
+
+# (trailing days, leading days, QA value) in the same order as temporal.ic_impute_tac_temporal()
+TEMPORAL_STEPS = [(1, 1, 20), (2, 1, 21), (1, 2, 22)]
+TEMPORAL_BUFFER_DAYS = 2
+
+QA_SPATIAL4 = 40
+QA_SPATIAL8 = 50
+
+TAC_CLOUD = 0
+TAC_LAND = 50
+TAC_SNOW = 100
+
+# (row, col) offsets of the neighbouring pixels used by spatial_4
+NEIGHBOURS_4 = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+def missing_pixels_index(tac: np.ndarray) -> np.ndarray:
+    """
+    Get the flat indices of the pixels where TAC==0 (cloud/nodata)
+
+    Args:
+        tac (np.ndarray): 2D TAC raster
+
+    Returns:
+        np.ndarray: 1D array with the flat indices of missing pixels
+    """
+    return np.flatnonzero(tac == TAC_CLOUD)
+
+
+def _neighbour_index(
+    missing_idx: np.ndarray, shape: tuple[int, int], offset: tuple[int, int]
+) -> np.ndarray:
+    """
+    Get the flat index of the neighbour at `offset` for each missing pixel.
+
+    Neighbours that fall outside the raster are replaced by the index of the missing pixel itself.
+    Since a missing pixel has TAC==0 it never counts as a snow or land neighbour.
+    """
+    n_rows, n_cols = shape
+    rows, cols = np.divmod(missing_idx, n_cols)
+    d_row, d_col = offset
+    valid = np.ones(missing_idx.shape, dtype=bool)
+    if d_row < 0:
+        valid &= rows >= -d_row
+    elif d_row > 0:
+        valid &= rows < n_rows - d_row
+    if d_col < 0:
+        valid &= cols >= -d_col
+    elif d_col > 0:
+        valid &= cols < n_cols - d_col
+    return np.where(valid, missing_idx + d_row * n_cols + d_col, missing_idx)
+
+
+# ---------- TEMPORAL ----------
+
+
+def _temporal_dense(tac, qa, trailing_tac, leading_tac, qa_value):
+    """Dense version of temporal.impute_tac_temporal(). Updates tac and qa in place."""
+    match = (tac == TAC_CLOUD) & (trailing_tac == leading_tac) & (trailing_tac > 0)
+    tac[match] = trailing_tac[match]
+    qa[match] = np.maximum(qa[match], qa_value)
+
+
+def _temporal_sparse(tac, qa, trailing_tac, leading_tac, qa_value, missing_idx):
+    """
+    Sparse version of temporal.impute_tac_temporal(). Updates tac and qa in place.
+
+    Returns the indices of the pixels that are still missing.
+    """
+    trailing_values = trailing_tac.ravel()[missing_idx]
+    leading_values = leading_tac.ravel()[missing_idx]
+    match = (trailing_values == leading_values) & (trailing_values > 0)
+    imputed_idx = missing_idx[match]
+    tac.ravel()[imputed_idx] = trailing_values[match]
+    qa_flat = qa.ravel()
+    qa_flat[imputed_idx] = np.maximum(qa_flat[imputed_idx], qa_value)
+    return missing_idx[~match]
+
+
+# ---------- SPATIAL 4 ----------
+
+
+def _spatial4_decision(n_snow: np.ndarray, n_land: np.ndarray) -> np.ndarray:
+    """
+    Decode snow and land neighbour counts into the imputed TAC value.
+
+    Equivalent to the 'TACReclass_sum' remap in spatial_4.impute_tac_spatial4(): at least 3 land
+    neighbours impute land, at least 3 snow neighbours impute snow, anything else stays as cloud.
+    """
+    imputed = np.zeros(n_snow.shape, dtype=np.uint8)
+    imputed[n_land >= 3] = TAC_LAND
+    imputed[n_snow >= 3] = TAC_SNOW
+    return imputed
+
+
+def _spatial4_dense(tac, qa):
+    """
+    Dense version of spatial_4.impute_tac_spatial4(). Updates tac and qa in place.
+
+    Uses the bit-parallel implementation on packed snow and land bitplanes.
+    """
+    tac[...], qa[...] = bitplanes.impute_tac_spatial4(tac, qa)
+
+
+def _spatial4_sparse(tac, qa, missing_idx):
+    """
+    Sparse version of spatial_4.impute_tac_spatial4(). Updates tac and qa in place.
+
+    All neighbours are gathered before any value is scattered back, so imputed values are not
+    used as neighbours within the same step. Returns the indices of the pixels that are still missing.
+    """
+    tac_flat = tac.ravel()
+    n_snow = np.zeros(missing_idx.shape, dtype=np.uint8)
+    n_land = np.zeros(missing_idx.shape, dtype=np.uint8)
+    for offset in NEIGHBOURS_4:
+        neighbour_tac = tac_flat[_neighbour_index(missing_idx, tac.shape, offset)]
+        n_snow += neighbour_tac == TAC_SNOW
+        n_land += neighbour_tac == TAC_LAND
+
+    imputed = _spatial4_decision(n_snow, n_land)
+    mask = imputed > 0
+    imputed_idx = missing_idx[mask]
+    tac_flat[imputed_idx] = imputed[mask]
+    qa_flat = qa.ravel()
+    qa_flat[imputed_idx] = np.maximum(qa_flat[imputed_idx], QA_SPATIAL4)
+    return missing_idx[~mask]
+
+
+# ---------- SPATIAL 8 (DEM) ----------
+
+
+def _valid_dem(dem: np.ndarray, dem_nodata: int | float | None) -> np.ndarray:
+    """Mask of DEM pixels with data. NaN values and dem_nodata are treated as nodata"""
+    valid = np.isfinite(dem) if np.issubdtype(dem.dtype, np.floating) else True
+    if dem_nodata is not None:
+        valid = valid & (dem != dem_nodata)
+    return np.broadcast_to(valid, dem.shape)
+
+
+def _dem_nodata(dem: np.ndarray, dem_nodata: int | float | None) -> int | float | None:
+    """DEM nodata value, DEM_NODATA_INT16 by default for int16 DEMs (see filters.dem_to_int16())"""
+    if dem_nodata is None and dem.dtype == np.int16:
+        return filters.DEM_NODATA_INT16
+    return dem_nodata
+
+
+def _window_offsets(radius: int) -> list[tuple[int, int]]:
+    """(row, col) offsets of all pixels in a square window around a pixel, excluding the pixel"""
+    return [
+        (d_row, d_col)
+        for d_row in range(-radius, radius + 1)
+        for d_col in range(-radius, radius + 1)
+        if (d_row, d_col) != (0, 0)
+    ]
+
+
+def _spatial8_dense(tac, qa, dem, radius=1, dem_nodata=None):
+    """
+    Dense version of spatial_8.impute_tac_spatial_dem(). Updates tac and qa in place.
+
+    The minimum DEM of snow covered neighbours is computed with a separable sliding min filter whose
+    cost doesn't depend on the radius. The filter window includes the center pixel, but only pixels
+    where TAC==0 are imputed and those are never snow, so the result is the same as excluding it.
+    """
+    valid_dem = _valid_dem(dem, dem_nodata)
+    snow_min = filters.masked_min_filter(dem, (tac == TAC_SNOW) & valid_dem, radius)
+
+    mask = (tac == TAC_CLOUD) & valid_dem & (dem > snow_min)
+    tac[mask] = TAC_SNOW
+    qa[mask] = np.maximum(qa[mask], QA_SPATIAL8)
+
+
+def _spatial8_sparse(tac, qa, dem, missing_idx, radius=1, dem_nodata=None):
+    """
+    Sparse version of spatial_8.impute_tac_spatial_dem(). Updates tac and qa in place.
+
+    The cost per missing pixel grows with the number of pixels in the window.
+    Returns the indices of the pixels that are still missing.
+    """
+    sentinel = filters.dem_sentinel(dem.dtype)
+    tac_flat = tac.ravel()
+    dem_flat = dem.ravel()
+    snow_min = np.full(missing_idx.shape, sentinel, dtype=dem.dtype)
+    for offset in _window_offsets(radius):
+        neighbour_idx = _neighbour_index(missing_idx, tac.shape, offset)
+        neighbour_dem = dem_flat[neighbour_idx]
+        neighbour_snow = (tac_flat[neighbour_idx] == TAC_SNOW) & _valid_dem(
+            neighbour_dem, dem_nodata
+        )
+        snow_min = np.minimum(
+            snow_min, np.where(neighbour_snow, neighbour_dem, sentinel)
+        )
+
+    missing_dem = dem_flat[missing_idx]
+    mask = _valid_dem(missing_dem, dem_nodata) & (missing_dem > snow_min)
+    imputed_idx = missing_idx[mask]
+    tac_flat[imputed_idx] = TAC_SNOW
+    qa_flat = qa.ravel()
+    qa_flat[imputed_idx] = np.maximum(qa_flat[imputed_idx], QA_SPATIAL8)
+    return missing_idx[~mask]
+
+
+def impute_tac_spatial_dem(
+    tac: np.ndarray,
+    qa: np.ndarray,
+    dem: np.ndarray,
+    radius: int = 1,
+    dem_nodata: int | float | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Imputes missing TAC values using DEM and TAC data of neighbouring pixels.
+
+    Local version of spatial_8.impute_tac_spatial_dem(). Pixels where TAC==0 are imputed as snow (100)
+    if their DEM is higher than the minimum DEM of the snow covered pixels (TAC==100) in a square window
+    around them. QA_CR is set to 50 for imputed pixels.
+
+    radius=1 uses the 3x3 window (8 neighbours) of spatial_8. Larger radius values (2 for 5x5, 3 for 7x7)
+    have the same cost per pixel.
+
+    For int16 DEMs the whole computation is done in int16. Use filters.dem_to_int16() to convert a float DEM.
+
+    Args:
+        tac (np.ndarray): 2D TAC raster
+        qa (np.ndarray): 2D QA_CR raster
+        dem (np.ndarray): 2D Digital Elevation Model (DEM) raster
+        radius (int): Window radius. Defaults to 1.
+        dem_nodata (int | float | None): DEM nodata value. NaN is always treated as nodata.
+            Defaults to None (filters.DEM_NODATA_INT16 for int16 DEMs, no nodata value otherwise).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: New TAC and QA_CR rasters
+    """
+    tac = tac.copy()
+    qa = qa.copy()
+    dem_nodata = _dem_nodata(dem, dem_nodata)
+    _spatial8_dense(tac, qa, dem, radius=radius, dem_nodata=dem_nodata)
+    return tac, qa
+
+
+# ---------- DAY & CUBE ----------
+
+
+def impute_tac_day(
+    tac_cube: np.ndarray,
+    qa_cube: np.ndarray,
+    day: int,
+    dem: np.ndarray,
+    mode: str = "auto",
+    sparse_threshold: float = DEFAULT_SPARSE_THRESHOLD,
+    dem_radius: int = 1,
+    dem_nodata: int | float | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Imputes missing TAC values of one day of a cube applying the temporal, spatial_4 and spatial_8 steps.
+
+    Leading and trailing TAC values for the temporal steps are always taken from the original cube.
+    The target day must have 2 trailing and 2 leading days in the cube.
+
+    With mode='auto' the sparse path is used when the fraction of missing pixels (TAC==0) is
+    lower or equal than `sparse_threshold`, otherwise the dense path is used. Both paths produce the same result.
+
+    Args:
+        tac_cube (np.ndarray): 3D array (days, rows, cols) with original TAC values of consecutive days
+        qa_cube (np.ndarray): 3D array (days, rows, cols) with original QA_CR values
+        day (int): Index of the target day in the cube
+        dem (np.ndarray): 2D array (rows, cols) with Digital Elevation Model (DEM) data
+        mode (str): One of 'auto', 'sparse' or 'dense'. Defaults to 'auto'.
+        sparse_threshold (float): Max fraction of missing pixels to use the sparse path in 'auto' mode.
+        dem_radius (int): Window radius for the spatial_8 DEM step. Defaults to 1 (3x3 window).
+        dem_nodata (int | float | None): DEM nodata value. NaN is always treated as nodata.
+            Defaults to None (filters.DEM_NODATA_INT16 for int16 DEMs, no nodata value otherwise).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Imputed TAC and QA_CR rasters for the target day
+
+    Raises:
+        ValueError: If mode is not valid or the target day doesn't have the required buffer days
+    """
+    if mode not in ("auto", "sparse", "dense"):
+        raise ValueError(f"Invalid imputation mode: {mode}")
+
+    if day < TEMPORAL_BUFFER_DAYS or day >= tac_cube.shape[0] - TEMPORAL_BUFFER_DAYS:
+        raise ValueError(
+            f"Day {day} doesn't have {TEMPORAL_BUFFER_DAYS} leading and trailing days"
+        )
+
+    tac = tac_cube[day].copy()
+    qa = qa_cube[day].copy()
+    dem_nodata = _dem_nodata(dem, dem_nodata)
+
+    missing_idx = missing_pixels_index(tac)
+    if mode == "auto":
+        missing_fraction = missing_idx.size / tac.size if tac.size else 0
+        mode = "sparse" if missing_fraction <= sparse_threshold else "dense"
+
+    if mode == "dense":
+        for trail_buffer, lead_buffer, qa_value in TEMPORAL_STEPS:
+            _temporal_dense(
+                tac,
+                qa,
+                tac_cube[day - trail_buffer],
+                tac_cube[day + lead_buffer],
+                qa_value,
+            )
+        _spatial4_dense(tac, qa)
+        _spatial8_dense(tac, qa, dem, radius=dem_radius, dem_nodata=dem_nodata)
+        return tac, qa
+
+    for trail_buffer, lead_buffer, qa_value in TEMPORAL_STEPS:
+        if not missing_idx.size:
+            return tac, qa
+        missing_idx = _temporal_sparse(
+            tac,
+            qa,
+            tac_cube[day - trail_buffer],
+            tac_cube[day + lead_buffer],
+            qa_value,
+            missing_idx,
+        )
+    if missing_idx.size:
+        missing_idx = _spatial4_sparse(tac, qa, missing_idx)
+    if missing_idx.size:
+        _spatial8_sparse(
+            tac, qa, dem, missing_idx, radius=dem_radius, dem_nodata=dem_nodata
+        )
+    return tac, qa
+
+
+def impute_tac_cube(
+    tac_cube: np.ndarray,
+    qa_cube: np.ndarray,
+    dem: np.ndarray,
+    mode: str = "auto",
+    sparse_threshold: float = DEFAULT_SPARSE_THRESHOLD,
+    dem_radius: int = 1,
+    dem_nodata: int | float | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Imputes missing TAC values of all days in a cube that have the required buffer days.
+
+    Same as temporal.ic_impute_tac_temporal(), days without 2 leading and 2 trailing days are dropped,
+    so the output cubes have 4 days less than the input cubes.
+
+    Args:
+        tac_cube (np.ndarray): 3D array (days, rows, cols) with original TAC values of consecutive days
+        qa_cube (np.ndarray): 3D array (days, rows, cols) with original QA_CR values
+        dem (np.ndarray): 2D array (rows, cols) with Digital Elevation Model (DEM) data
+        mode (str): One of 'auto', 'sparse' or 'dense'. Defaults to 'auto'.
+        sparse_threshold (float): Max fraction of missing pixels to use the sparse path in 'auto' mode.
+        dem_radius (int): Window radius for the spatial_8 DEM step. Defaults to 1 (3x3 window).
+        dem_nodata (int | float | None): DEM nodata value. NaN is always treated as nodata.
+            Defaults to None (filters.DEM_NODATA_INT16 for int16 DEMs, no nodata value otherwise).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Imputed TAC and QA_CR cubes
+    """
+    n_days = max(tac_cube.shape[0] - 2 * TEMPORAL_BUFFER_DAYS, 0)
+    imputed_tac = np.empty((n_days,) + tac_cube.shape[1:], dtype=tac_cube.dtype)
+    imputed_qa = np.empty((n_days,) + qa_cube.shape[1:], dtype=qa_cube.dtype)
+    for i in range(n_days):
+        imputed_tac[i], imputed_qa[i] = impute_tac_day(
+            tac_cube,
+            qa_cube,
+            i + TEMPORAL_BUFFER_DAYS,
+            dem,
+            mode=mode,
+            sparse_threshold=sparse_threshold,
+            dem_radius=dem_radius,
+            dem_nodata=dem_nodata,
+        )
+    return imputed_tac, imputed_qa
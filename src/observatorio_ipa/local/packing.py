@@ -0,0 +1,393 @@
+"""
+Bit-packed representation of TAC and QA_CR cubes.
+
+TAC only takes the values 0 (cloud/nodata), 50 (land) and 100 (snow), so each pixel is stored as a
+2-bit code and 4 pixels are packed in each byte. Pixel k of a row is stored in bits 2*(k%4) and
+2*(k%4)+1 of byte k//4. Rows are padded with NODATA codes to a multiple of 4 pixels.
+
+QA_CR only takes a handful of values, so it is stored as a uint8 index into QA_CR_VALUES.
+
+Comparisons between packed arrays (temporal and neighbour comparisons) work directly on the packed
+bytes with bitwise operations, without unpacking. The results of these comparisons are 'field masks':
+packed arrays with all bits of a pixel field set (0b11) where the comparison is true and 0b00 otherwise.
+
+GLOSSARY
+TAC: Terra-Aqua Classification?
+QA_CR: Quality Assessment - C? R?
+"""
+
+import numpy as np
+
+# 2-bit codes for TAC values
+CODE_CLOUD = 0
+CODE_LAND = 1
+CODE_SNOW = 2
+CODE_NODATA = 3
+
+PIXELS_PER_BYTE = 4
+TAC_NODATA = 255
+
+# TAC value decoded for each 2-bit code
+TAC_VALUES = np.array([0, 50, 100, TAC_NODATA], dtype=np.uint8)
+
+# 2-bit code for each TAC value. Any value that is not 0, 50 or 100 is NODATA
+_TAC_TO_CODE = np.full(256, CODE_NODATA, dtype=np.uint8)
+_TAC_TO_CODE[[0, 50, 100]] = [CODE_CLOUD, CODE_LAND, CODE_SNOW]
+
+# QA_CR values produced by merge, temporal, spatial_4 and spatial_8
+QA_CR_VALUES = np.array([10, 11, 12, 20, 21, 22, 40, 50], dtype=np.uint8)
+QA_NODATA_CODE = 255
+
+_QA_TO_CODE = np.full(256, QA_NODATA_CODE, dtype=np.uint8)
+_QA_TO_CODE[QA_CR_VALUES] = np.arange(QA_CR_VALUES.size, dtype=np.uint8)
+_CODE_TO_QA = np.zeros(256, dtype=np.uint8)
+_CODE_TO_QA[: QA_CR_VALUES.size] = QA_CR_VALUES
+
+_LOW_BITS = np.uint8(0x55)  # low bit of every 2-bit field
+_SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+
+
+def packed_width(n_cols: int) -> int:
+    """Number of bytes needed to pack a row of n_cols pixels"""
+    return -(-n_cols // PIXELS_PER_BYTE)
+
+
+def code_word(code: int) -> np.uint8:
+    """Byte with the same 2-bit code in all 4 pixel fields"""
+    return np.uint8(code * 0x55)
+
+
+def pack_tac(tac: np.ndarray) -> np.ndarray:
+    """
+    Packs TAC values (0, 50, 100) into 2-bit codes, 4 pixels per byte, along the last axis.
+
+    Values other than 0, 50 and 100 are stored as NODATA.
+
+    Args:
+        tac (np.ndarray): Array of TAC values with at least 1 dimension
+
+    Returns:
+        np.ndarray: uint8 array with the last axis packed to packed_width(n_cols) bytes
+    """
+    tac = np.asarray(tac)
+    codes = _TAC_TO_CODE[tac.astype(np.uint8, copy=False)]
+    n_cols = tac.shape[-1]
+    pad = packed_width(n_cols) * PIXELS_PER_BYTE - n_cols
+    if pad:
+        pad_width = [(0, 0)] * (tac.ndim - 1) + [(0, pad)]
+        codes = np.pad(codes, pad_width, constant_values=CODE_NODATA)
+    codes = codes.reshape(codes.shape[:-1] + (-1, PIXELS_PER_BYTE))
+    return np.bitwise_or.reduce(codes << _SHIFTS, axis=-1).astype(np.uint8)
+
+
+def unpack_codes(packed: np.ndarray, n_cols: int) -> np.ndarray:
+    """
+    Unpacks 2-bit codes along the last axis.
+
+    Args:
+        packed (np.ndarray): uint8 array of packed codes
+        n_cols (int): Number of pixels in each unpacked row
+
+    Returns:
+        np.ndarray: uint8 array with one 2-bit code per pixel
+    """
+    codes = (packed[..., np.newaxis] >> _SHIFTS) & np.uint8(0b11)
+    codes = codes.reshape(packed.shape[:-1] + (-1,))
+    return codes[..., :n_cols]
+
+
+def unpack_tac(packed: np.ndarray, n_cols: int) -> np.ndarray:
+    """
+    Unpacks TAC values along the last axis. NODATA pixels are returned as TAC_NODATA (255).
+
+    Args:
+        packed (np.ndarray): uint8 array of packed codes
+        n_cols (int): Number of pixels in each unpacked row
+
+    Returns:
+        np.ndarray: uint8 array with TAC values (0, 50, 100 or 255)
+    """
+    return TAC_VALUES[unpack_codes(packed, n_cols)]
+
+
+def encode_qa(qa: np.ndarray) -> np.ndarray:
+    """Encodes QA_CR values as uint8 indices into QA_CR_VALUES. Unknown values are QA_NODATA_CODE"""
+    return _QA_TO_CODE[np.asarray(qa).astype(np.uint8, copy=False)]
+
+
+def decode_qa(qa_codes: np.ndarray) -> np.ndarray:
+    """Decodes uint8 indices into QA_CR values. QA_NODATA_CODE is decoded as 0"""
+    return _CODE_TO_QA[qa_codes]
+
+
+# ---------- BITWISE OPERATIONS ON PACKED WORDS ----------
+
+
+def _expand_low_bits(low_bits: np.ndarray) -> np.ndarray:
+    """Turns a mask with the low bit of each field set into a full field mask"""
+    return low_bits | (low_bits << np.uint8(1))
+
+
+def packed_equal(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Compares two packed arrays pixel by pixel.
+
+    Args:
+        a (np.ndarray): Packed array
+        b (np.ndarray): Packed array with the same shape as a, or a single packed byte
+
+    Returns:
+        np.ndarray: Field mask, 0b11 for pixels with equal codes and 0b00 otherwise
+    """
+    diff = a ^ b
+    low_bits = ~(diff | (diff >> np.uint8(1))) & _LOW_BITS
+    return _expand_low_bits(low_bits)
+
+
+def packed_is(packed: np.ndarray, code: int) -> np.ndarray:
+    """Field mask of pixels with a given 2-bit code"""
+    return packed_equal(packed, code_word(code))
+
+
+def count_pixels(field_mask: np.ndarray) -> int:
+    """Counts the pixels set in a field mask"""
+    return int(np.bitwise_count(field_mask & _LOW_BITS).sum())
+
+
+def shift_pixels(
+    packed: np.ndarray,
+    n: int,
+    fill_code: int = CODE_NODATA,
+    n_cols: int | None = None,
+) -> np.ndarray:
+    """
+    Shifts packed pixels along the last axis so each pixel gets the code of its neighbour at column offset n.
+
+    n=-1 gives each pixel the code of its left neighbour and n=1 the code of its right neighbour.
+    Pixels shifted in from outside the row get fill_code. With n=1 the last pixel of a row whose
+    width is not a multiple of 4 only gets fill_code if n_cols is given, otherwise it gets the
+    padding of its byte (NODATA).
+
+    Args:
+        packed (np.ndarray): Packed array
+        n (int): Column offset of the neighbour, -1 or 1
+        fill_code (int): Code for pixels outside the row. Defaults to CODE_NODATA.
+        n_cols (int | None): Number of pixels in each row. Defaults to None (a multiple of 4).
+
+    Returns:
+        np.ndarray: Packed array with the same shape as packed
+
+    Raises:
+        ValueError: If n is not -1 or 1
+    """
+    carry = np.empty_like(packed)
+    if n == -1:
+        # pixel k gets pixel k-1: shift fields up, carry top field of previous byte
+        carry[..., 1:] = packed[..., :-1] >> np.uint8(6)
+        carry[..., 0] = fill_code
+        return (packed << np.uint8(2)) | carry
+    if n == 1:
+        # pixel k gets pixel k+1: shift fields down, carry bottom field of next byte
+        carry[..., :-1] = packed[..., 1:] << np.uint8(6)
+        carry[..., -1] = fill_code << 6
+        shifted = (packed >> np.uint8(2)) | carry
+        if n_cols is not None and n_cols % PIXELS_PER_BYTE:
+            # the last pixel got the padding field of its own byte
+            shift = np.uint8(2 * ((n_cols - 1) % PIXELS_PER_BYTE))
+            mask = np.uint8(0b11) << shift
+            shifted[..., -1] = (shifted[..., -1] & ~mask) | (
+                np.uint8(fill_code) << shift
+            )
+        return shifted
+    raise ValueError("n must be -1 or 1")
+
+
+def shift_rows(packed: np.ndarray, n: int, fill_code: int = CODE_NODATA) -> np.ndarray:
+    """
+    Shifts packed rows so each pixel gets the code of its neighbour at row offset n (-1 above, 1 below).
+
+    Args:
+        packed (np.ndarray): Packed array with at least 2 dimensions (..., rows, packed cols)
+        n (int): Row offset of the neighbour, -1 or 1
+        fill_code (int): Code for pixels outside the raster. Defaults to CODE_NODATA.
+
+    Returns:
+        np.ndarray: Packed array with the same shape as packed
+
+    Raises:
+        ValueError: If n is not -1 or 1
+    """
+    shifted = np.full_like(packed, code_word(fill_code))
+    if n == -1:
+        shifted[..., 1:, :] = packed[..., :-1, :]
+    elif n == 1:
+        shifted[..., :-1, :] = packed[..., 1:, :]
+    else:
+        raise ValueError("n must be -1 or 1")
+    return shifted
+
+
+def impute_temporal_packed(
+    target: np.ndarray, trailing: np.ndarray, leading: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Packed version of the temporal imputation rule in temporal.impute_tac_temporal().
+
+    Pixels that are cloud in the target day get the code of the trailing day where the trailing and
+    leading days have the same land or snow code.
+
+    Args:
+        target (np.ndarray): Packed TAC of the target day
+        trailing (np.ndarray): Packed TAC of the trailing day
+        leading (np.ndarray): Packed TAC of the leading day
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Packed imputed TAC and field mask of imputed pixels
+    """
+    imputed = (
+        packed_is(target, CODE_CLOUD)
+        & packed_equal(trailing, leading)
+        & ~packed_is(trailing, CODE_CLOUD)
+        & ~packed_is(trailing, CODE_NODATA)
+    )
+    # Cloud fields are 0b00, so OR-ing the trailing code sets the imputed value
+    return target | (trailing & imputed), imputed
+
+
+class PackedTACCube:
+    """
+    A daily TAC and QA_CR cube stored with 2 bits per TAC pixel and a uint8 code per QA_CR pixel.
+
+    Attributes:
+    -----------
+    tac_words : np.ndarray
+        uint8 array (days, rows, packed cols) with packed TAC codes.
+    qa_codes : np.ndarray | None
+        uint8 array (days, rows, cols) with QA_CR codes, or None if the cube has no QA_CR band.
+    shape : tuple[int, int, int]
+        Unpacked shape (days, rows, cols) of the cube.
+
+    Methods:
+    --------
+    from_arrays(tac, qa=None) -> PackedTACCube
+        Packs TAC and QA_CR arrays.
+    from_cloud_snow(cloud_tac, snow_tac, qa=None) -> PackedTACCube
+        Packs Cloud_TAC and Snow_TAC arrays.
+    tac(), qa(), cloud_tac(), snow_tac() -> np.ndarray
+        Unpacks the cube into full width arrays.
+    save(path), load(path)
+        Writes and reads the packed cube to and from a .npz file.
+    """
+
+    def __init__(
+        self,
+        tac_words: np.ndarray,
+        shape: tuple[int, int, int],
+        qa_codes: np.ndarray | None = None,
+    ) -> None:
+        shape = tuple(int(i) for i in shape)
+        if len(shape) != 3:
+            raise ValueError("shape must be (days, rows, cols)")
+        expected_words = shape[:2] + (packed_width(shape[2]),)
+        if tac_words.shape != expected_words or tac_words.dtype != np.uint8:
+            raise ValueError(
+                f"tac_words must be a uint8 array with shape {expected_words}"
+            )
+        if qa_codes is not None and qa_codes.shape != shape:
+            raise ValueError(f"qa_codes must have shape {shape}")
+
+        self.tac_words = tac_words
+        self.qa_codes = qa_codes
+        self.shape = shape
+
+    @classmethod
+    def from_arrays(
+        cls, tac: np.ndarray, qa: np.ndarray | None = None
+    ) -> "PackedTACCube":
+        """
+        Packs a TAC cube and an optional QA_CR cube.
+
+        Args:
+            tac (np.ndarray): 3D array (days, rows, cols) with TAC values 0, 50 or 100
+            qa (np.ndarray | None): 3D array (days, rows, cols) with QA_CR values
+
+        Returns:
+            PackedTACCube: Packed cube
+        """
+        tac = np.asarray(tac)
+        if tac.ndim != 3:
+            raise ValueError("tac must be a 3D array (days, rows, cols)")
+        qa_codes = encode_qa(qa) if qa is not None else None
+        return cls(pack_tac(tac), tac.shape, qa_codes)
+
+    @classmethod
+    def from_cloud_snow(
+        cls,
+        cloud_tac: np.ndarray,
+        snow_tac: np.ndarray,
+        qa: np.ndarray | None = None,
+    ) -> "PackedTACCube":
+        """
+        Packs a cube from the split Cloud_TAC and Snow_TAC bands (0, 100).
+
+        Pixels that are neither cloud nor snow are land. Pixels flagged as both are stored as NODATA.
+
+        Args:
+            cloud_tac (np.ndarray): 3D array with Cloud_TAC values
+            snow_tac (np.ndarray): 3D array with Snow_TAC values
+            qa (np.ndarray | None): 3D array with QA_CR values
+
+        Returns:
+            PackedTACCube: Packed cube
+        """
+        cloud = np.asarray(cloud_tac) == 100
+        snow = np.asarray(snow_tac) == 100
+        tac = np.full(cloud.shape, 50, dtype=np.uint8)
+        tac[cloud] = 0
+        tac[snow] = 100
+        tac[cloud & snow] = TAC_NODATA
+        return cls.from_arrays(tac, qa)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the packed arrays"""
+        qa_bytes = self.qa_codes.nbytes if self.qa_codes is not None else 0
+        return self.tac_words.nbytes + qa_bytes
+
+    def day(self, i: int) -> np.ndarray:
+        """Packed TAC words of day i"""
+        return self.tac_words[i]
+
+    def tac(self) -> np.ndarray:
+        """Unpacked TAC cube, NODATA pixels as TAC_NODATA (255)"""
+        return unpack_tac(self.tac_words, self.shape[2])
+
+    def qa(self) -> np.ndarray | None:
+        """Decoded QA_CR cube"""
+        if self.qa_codes is None:
+            return None
+        return decode_qa(self.qa_codes)
+
+    def cloud_tac(self) -> np.ndarray:
+        """Cloud_TAC cube: 100 where TAC is cloud, 0 otherwise"""
+        codes = unpack_codes(self.tac_words, self.shape[2])
+        return np.where(codes == CODE_CLOUD, 100, 0).astype(np.uint8)
+
+    def snow_tac(self) -> np.ndarray:
+        """Snow_TAC cube: 100 where TAC is snow, 0 otherwise"""
+        codes = unpack_codes(self.tac_words, self.shape[2])
+        return np.where(codes == CODE_SNOW, 100, 0).astype(np.uint8)
+
+    def save(self, path) -> None:
+        """Saves the packed cube to an uncompressed .npz file"""
+        arrays = {"tac_words": self.tac_words, "shape": np.array(self.shape)}
+        if self.qa_codes is not None:
+            arrays["qa_codes"] = self.qa_codes
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path) -> "PackedTACCube":
+        """Loads a packed cube saved with PackedTACCube.save()"""
+        with np.load(path) as data:
+            qa_codes = data["qa_codes"] if "qa_codes" in data else None
+            return cls(data["tac_words"], tuple(data["shape"]), qa_codes)
@@ -0,0 +1,247 @@
+"""
+Per-pixel snow phenology of local daily Snow_TAC and QA_CR cubes using numpy.
+
+Products are computed per hydrological year (April to March, labelled with the year it starts) for
+every pixel:
+    - onset: day of the hydrological year (0 = April 1st) of the first snow day
+    - melt_out: day of the hydrological year after the last snow day
+    - duration: number of snow days (snow cover duration)
+    - imputed: number of days imputed for clouds (QA_CR >= 20)
+
+With min_run > 1, only snow periods of at least min_run consecutive days count for onset and
+melt_out, so isolated snowfalls don't set the dates. Pixels without snow in a year get
+NO_SNOW_DAY for onset and melt_out.
+
+Days are processed in one streaming pass over time. PhenologyAccumulator keeps running state arrays
+(current snow run, onset, melt_out, counts) for the pixels of a spatial chunk, so cubes can be
+processed in time-major chunks of any number of days, see phenology_from_store(). The only loop
+is over days, every day is a vectorized update of all pixels.
+
+GLOSSARY
+TAC: Terra-Aqua Classification?
+QA_CR: Quality Assessment - C? R?
+"""
+
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from observatorio_ipa.local import rechunk
+
+HYDRO_YEAR_START_MONTH = 4
+QA_IMPUTED_MIN = 20
+SNOW_THRESHOLD = 50
+NO_SNOW_DAY = -1
+PHENOLOGY_PRODUCTS = ["onset", "melt_out", "duration", "imputed"]
+
+
+def hydro_year(day: date) -> int:
+    """Hydrological year of a date, labelled with the year it starts"""
+    return day.year if day.month >= HYDRO_YEAR_START_MONTH else day.year - 1
+
+
+def hydro_year_start(year: int) -> date:
+    """First day of a hydrological year"""
+    return date(year, HYDRO_YEAR_START_MONTH, 1)
+
+
+class PhenologyAccumulator:
+    """
+    Running state of the snow phenology of the pixels of a spatial chunk.
+
+    Days must be added in order with update(). Products of a hydrological year are finalized when
+    the first day of the next year is added, or with finalize().
+
+    Args:
+        shape (tuple[int, ...]): Shape (rows, cols) of the pixels
+        min_run (int): Min number of consecutive snow days for onset and melt_out. Defaults to 1.
+        snow_threshold (float): Snow_TAC values >= snow_threshold are snow. Defaults to SNOW_THRESHOLD.
+    """
+
+    def __init__(
+        self,
+        shape: tuple[int, ...],
+        min_run: int = 1,
+        snow_threshold: float = SNOW_THRESHOLD,
+    ):
+        if min_run < 1:
+            raise ValueError("min_run must be a positive integer")
+        self.shape = tuple(shape)
+        self.min_run = min_run
+        self.snow_threshold = snow_threshold
+        self.results = {}
+        self.year = None
+        self.last_day = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.n_days = 0
+        self.run = np.zeros(self.shape, dtype=np.int16)
+        self.onset = np.full(self.shape, NO_SNOW_DAY, dtype=np.int16)
+        self.melt_out = np.full(self.shape, NO_SNOW_DAY, dtype=np.int16)
+        self.duration = np.zeros(self.shape, dtype=np.int16)
+        self.imputed = np.zeros(self.shape, dtype=np.int16)
+
+    def _finalize_year(self) -> None:
+        if self.year is None or not self.n_days:
+            return
+        self.results[self.year] = {
+            "onset": self.onset,
+            "melt_out": self.melt_out,
+            "duration": self.duration,
+            "imputed": self.imputed,
+            "n_days": self.n_days,
+        }
+        self._reset()
+
+    def update(
+        self, snow_tac: np.ndarray, qa: np.ndarray | None, start_day: date
+    ) -> None:
+        """
+        Add consecutive days to the running state
+
+        Args:
+            snow_tac (np.ndarray): Array (days, rows, cols) with Snow_TAC values
+            qa (np.ndarray | None): Array (days, rows, cols) with QA_CR values. None doesn't count
+                imputed days.
+            start_day (date): Date of the first day of the arrays
+
+        Raises:
+            ValueError: If the days are not consecutive to the last day added
+        """
+        if self.last_day is not None and start_day != self.last_day + timedelta(1):
+            raise ValueError(
+                f"Days must be consecutive, expected {self.last_day + timedelta(1)}, got {start_day}"
+            )
+
+        for i in range(snow_tac.shape[0]):
+            day = start_day + timedelta(i)
+            year = hydro_year(day)
+            if year != self.year:
+                self._finalize_year()
+                self.year = year
+            t = (day - hydro_year_start(year)).days
+
+            snow = snow_tac[i] >= self.snow_threshold
+            self.run = np.where(snow, self.run + 1, 0).astype(np.int16)
+            self.duration += snow
+            in_run = self.run >= self.min_run
+            # first day of the first run of min_run snow days
+            np.copyto(
+                self.onset,
+                np.int16(t - self.min_run + 1),
+                where=(self.onset == NO_SNOW_DAY) & (self.run == self.min_run),
+            )
+            # day after the last day of the last run
+            np.copyto(self.melt_out, np.int16(t + 1), where=in_run)
+            if qa is not None:
+                self.imputed += qa[i] >= QA_IMPUTED_MIN
+            self.n_days += 1
+
+        self.last_day = start_day + timedelta(snow_tac.shape[0] - 1)
+
+    def finalize(self) -> dict[int, dict]:
+        """
+        Finalize the current hydrological year and get the products of all years
+
+        Returns:
+            dict[int, dict]: Products by hydrological year. Each year is a dictionary with an array
+                (rows, cols) per product in PHENOLOGY_PRODUCTS and 'n_days', the number of days of
+                the year that were added (less than 365 for partial years)
+        """
+        self._finalize_year()
+        return self.results
+
+
+def snow_phenology(
+    snow_tac: np.ndarray,
+    qa: np.ndarray | None,
+    start_day: date,
+    min_run: int = 1,
+    snow_threshold: float = SNOW_THRESHOLD,
+) -> dict[int, dict]:
+    """
+    Snow phenology products of in-memory cubes, see PhenologyAccumulator.
+
+    Args:
+        snow_tac (np.ndarray): Array (days, rows, cols) with Snow_TAC values of consecutive days
+        qa (np.ndarray | None): Array (days, rows, cols) with QA_CR values. Defaults to None.
+        start_day (date): Date of the first day
+        min_run (int): Min number of consecutive snow days for onset and melt_out. Defaults to 1.
+        snow_threshold (float): Snow_TAC values >= snow_threshold are snow. Defaults to SNOW_THRESHOLD.
+
+    Returns:
+        dict[int, dict]: Products by hydrological year
+    """
+    accumulator = PhenologyAccumulator(
+        snow_tac.shape[1:], min_run=min_run, snow_threshold=snow_threshold
+    )
+    accumulator.update(snow_tac, qa, start_day)
+    return accumulator.finalize()
+
+
+def phenology_from_store(
+    snow_tac_store: str | Path,
+    start_day: date,
+    qa_store: str | Path | None = None,
+    min_run: int = 1,
+    snow_threshold: float = SNOW_THRESHOLD,
+) -> dict[int, dict]:
+    """
+    Snow phenology products of cubes saved as chunk stores, see local.rechunk.
+
+    Each spatial chunk is streamed over time, one chunk at a time, so only the chunks and the
+    running state of one spatial chunk are in memory. Time-major stores (many days per chunk) are
+    read with the fewest files.
+
+    Args:
+        snow_tac_store (str | Path): Directory of the Snow_TAC chunk store
+        start_day (date): Date of the first day of the store
+        qa_store (str | Path | None): Directory of the QA_CR chunk store with the same shape. Defaults to
+            None (imputed days are not counted).
+        min_run (int): Min number of consecutive snow days for onset and melt_out. Defaults to 1.
+        snow_threshold (float): Snow_TAC values >= snow_threshold are snow. Defaults to SNOW_THRESHOLD.
+
+    Returns:
+        dict[int, dict]: Products by hydrological year, arrays with the full (rows, cols) shape
+    """
+    manifest = rechunk.read_manifest(snow_tac_store)
+    (n_days, n_rows, n_cols), (chunk_days, chunk_rows, chunk_cols) = (
+        manifest["shape"],
+        manifest["chunks"],
+    )
+
+    results = {}
+    for row in range(0, n_rows, chunk_rows):
+        for col in range(0, n_cols, chunk_cols):
+            rows = slice(row, min(row + chunk_rows, n_rows))
+            cols = slice(col, min(col + chunk_cols, n_cols))
+            accumulator = PhenologyAccumulator(
+                (rows.stop - rows.start, cols.stop - cols.start),
+                min_run=min_run,
+                snow_threshold=snow_threshold,
+            )
+            for day in range(0, n_days, chunk_days):
+                days = slice(day, min(day + chunk_days, n_days))
+                accumulator.update(
+                    rechunk.read_region(snow_tac_store, (days, rows, cols)),
+                    (
+                        rechunk.read_region(qa_store, (days, rows, cols))
+                        if qa_store
+                        else None
+                    ),
+                    start_day + timedelta(day),
+                )
+
+            for year, products in accumulator.finalize().items():
+                if year not in results:
+                    results[year] = {
+                        product: np.empty((n_rows, n_cols), dtype=np.int16)
+                        for product in PHENOLOGY_PRODUCTS
+                    }
+                    results[year]["n_days"] = products["n_days"]
+                for product in PHENOLOGY_PRODUCTS:
+                    results[year][product][rows, cols] = products[product]
+
+    return results
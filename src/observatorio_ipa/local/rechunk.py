@@ -0,0 +1,489 @@
+"""
+Out-of-core rechunking of local cubes (TAC, Snow_TAC, QA_CR) between layouts.
+
+Cubes are 3D arrays (days, rows, cols) stored on disk as a chunk store: a directory with a
+'manifest.json' file (shape, dtype and chunk shape) and one .npy file per chunk. Processing prefers
+space-major chunks (large area, few days) and per-pixel time series prefer time-major chunks (small
+area, many days). rechunk() converts a store to a new chunk shape without loading the cube in
+memory, in two passes through an intermediate store (the multi-stage plan of the rechunker
+algorithm):
+    1. Source chunks are read in 'read groups', blocks of source chunks that fit the memory budget.
+       Each group is split into intermediate cells and each cell is saved to its own file.
+    2. Target chunks are written in 'write groups', blocks of target chunks that fit the memory
+       budget. Each group is assembled from its intermediate cells.
+
+Write groups are the target chunks consolidated up to the memory budget, and read groups the source
+chunks consolidated up to the memory budget along the axes where the write groups are larger. The
+cell grid is the union of the read and write group boundaries, so every cell belongs to one read
+group and one write group, and cells are as large as the memory budget allows instead of the
+intersection of source and target chunks (e.g. 8x64x64 cells between 8x1024x1024 and 365x64x64
+chunks). The memory used is about one group. Chunks larger than the memory budget are not grouped,
+they are read and written through memory maps one cell at a time, with cells split until they fit
+the memory budget.
+
+Rechunking is resumable. Files are written to a temporary name and renamed when complete. Read
+groups already split and target chunks already assembled are skipped when rechunk() runs again with
+the same arguments. The intermediate store is deleted once the target store is complete.
+
+Usage:
+    python -m observatorio_ipa.local.rechunk SOURCE TARGET --chunks 365,64,64 --max-memory 512MB
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+DEFAULT_MAX_MEMORY = 256 * 2**20
+MEMORY_UNITS = {"B": 1, "KB": 2**10, "MB": 2**20, "GB": 2**30}
+
+
+# ---------- CHUNK STORE ----------
+
+
+def _chunk_file(store: Path, index: tuple[int, ...]) -> Path:
+    return store / ("c." + ".".join(str(i) for i in index) + ".npy")
+
+
+def _boundaries(size: int, chunk: int) -> list[int]:
+    """Chunk boundaries along an axis, including 0 and size"""
+    return list(range(0, size, chunk)) + [size]
+
+
+def _chunk_slices(shape: tuple, chunks: tuple, index: tuple) -> tuple[slice, ...]:
+    return tuple(
+        slice(i * c, min((i + 1) * c, n)) for i, c, n in zip(index, chunks, shape)
+    )
+
+
+def _chunk_indices(shape: tuple, chunks: tuple):
+    return itertools.product(*[range(math.ceil(n / c)) for n, c in zip(shape, chunks)])
+
+
+def _write_npy(path: Path, array: np.ndarray) -> None:
+    """Write an array to a temporary file and rename it, so incomplete files are never left"""
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def create_store(
+    path: str | Path, shape: tuple[int, ...], dtype: str, chunks: tuple[int, ...]
+) -> dict:
+    """
+    Create an empty chunk store
+
+    Args:
+        path (str | Path): Directory of the store
+        shape (tuple[int, ...]): Shape of the cube (days, rows, cols)
+        dtype (str): dtype of the cube
+        chunks (tuple[int, ...]): Chunk shape
+
+    Returns:
+        dict: Manifest of the store
+
+    Raises:
+        ValueError: If the chunk shape is not valid or a different store already exists in path
+    """
+    if len(chunks) != len(shape) or any(c < 1 for c in chunks):
+        raise ValueError(f"Invalid chunk shape {chunks} for cube shape {shape}")
+
+    manifest = {
+        "shape": list(shape),
+        "dtype": np.dtype(dtype).str,
+        "chunks": [min(c, n) if n else c for c, n in zip(chunks, shape)],
+    }
+    path = Path(path)
+    if (path / MANIFEST_FILE).exists():
+        if read_manifest(path) != manifest:
+            raise ValueError(f"A different chunk store already exists: {path}")
+        return manifest
+
+    path.mkdir(parents=True, exist_ok=True)
+    with open(path / MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def read_manifest(path: str | Path) -> dict:
+    """Read the manifest of a chunk store"""
+    with open(Path(path) / MANIFEST_FILE, "r") as f:
+        return json.load(f)
+
+
+def write_store(path: str | Path, cube: np.ndarray, chunks: tuple[int, ...]) -> dict:
+    """
+    Save a cube as a chunk store
+
+    Args:
+        path (str | Path): Directory of the store
+        cube (np.ndarray): Cube to save
+        chunks (tuple[int, ...]): Chunk shape
+
+    Returns:
+        dict: Manifest of the store
+    """
+    manifest = create_store(path, cube.shape, cube.dtype, chunks)
+    for index in _chunk_indices(cube.shape, manifest["chunks"]):
+        slices = _chunk_slices(cube.shape, manifest["chunks"], index)
+        _write_npy(_chunk_file(Path(path), index), cube[slices])
+    return manifest
+
+
+def read_region(path: str | Path, slices: tuple[slice, ...]) -> np.ndarray:
+    """
+    Read a region of a chunk store. Only the chunks that intersect the region are read.
+
+    Args:
+        path (str | Path): Directory of the store
+        slices (tuple[slice, ...]): Region to read, one slice (with step 1) per axis
+
+    Returns:
+        np.ndarray: Region of the cube
+    """
+    path = Path(path)
+    manifest = read_manifest(path)
+    shape, chunks = manifest["shape"], manifest["chunks"]
+    bounds = [s.indices(n)[:2] for s, n in zip(slices, shape)]
+    region = np.empty(
+        [max(stop - start, 0) for start, stop in bounds], dtype=manifest["dtype"]
+    )
+    ranges = [
+        range(start // c, math.ceil(stop / c)) if stop > start else range(0)
+        for (start, stop), c in zip(bounds, chunks)
+    ]
+    for index in itertools.product(*ranges):
+        chunk_slices = _chunk_slices(shape, chunks, index)
+        chunk = np.load(_chunk_file(path, index), mmap_mode="r")
+        src, dst = [], []
+        for (start, stop), chunk_slice in zip(bounds, chunk_slices):
+            lo, hi = max(start, chunk_slice.start), min(stop, chunk_slice.stop)
+            src.append(slice(lo - chunk_slice.start, hi - chunk_slice.start))
+            dst.append(slice(lo - start, hi - start))
+        region[tuple(dst)] = chunk[tuple(src)]
+    return region
+
+
+def read_store(path: str | Path) -> np.ndarray:
+    """Read a full chunk store in memory"""
+    return read_region(path, tuple(slice(None) for _ in read_manifest(path)["shape"]))
+
+
+# ---------- RECHUNK ----------
+
+
+def parse_memory(value: str | int) -> int:
+    """
+    Parse a memory size like '512MB', '2GB' or a number of bytes
+
+    Args:
+        value (str | int): Memory size
+
+    Returns:
+        int: Number of bytes
+
+    Raises:
+        ValueError: If the value is not a valid memory size
+    """
+    if isinstance(value, int):
+        return value
+    text = value.strip().upper()
+    for unit in sorted(MEMORY_UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            number = text[: -len(unit)]
+            break
+    else:
+        unit, number = "B", text
+    try:
+        return int(float(number) * MEMORY_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid memory size: {value}")
+
+
+def _consolidate_chunks(
+    shape: list[int],
+    chunks: list[int],
+    itemsize: int,
+    max_memory: int,
+    limits: list[int] | None = None,
+) -> list[int]:
+    """
+    Largest multiple of a chunk shape that fits in max_memory.
+
+    Axes are grown in order, each up to its limit (rounded down to a multiple of the chunk) or the
+    full axis. Chunks larger than max_memory are returned unchanged.
+    """
+    limits = limits or shape
+    consolidated = list(chunks)
+    for axis, (n, c, limit) in enumerate(zip(shape, chunks, limits)):
+        headroom = max_memory // (math.prod(consolidated) * itemsize)
+        if headroom <= 1:
+            break
+        size = min(c * headroom, limit)
+        consolidated[axis] = n if size >= n else max(c, size // c * c)
+    return consolidated
+
+
+def _rechunk_plan(
+    shape: list[int],
+    source_chunks: list[int],
+    target_chunks: list[int],
+    itemsize: int,
+    max_memory: int,
+) -> tuple[list[int], list[int]]:
+    """
+    Shapes of the read and write groups.
+
+    Write groups are the target chunks consolidated up to max_memory. Read groups are the source
+    chunks consolidated up to max_memory only along the axes where the write groups are larger, up
+    to the size of the write groups.
+
+    Returns:
+        tuple[list[int], list[int]]: Read group and write group shapes
+    """
+    write_chunks = _consolidate_chunks(shape, target_chunks, itemsize, max_memory)
+    read_limits = [max(s, w) for s, w in zip(source_chunks, write_chunks)]
+    read_chunks = _consolidate_chunks(
+        shape, source_chunks, itemsize, max_memory, read_limits
+    )
+    return read_chunks, write_chunks
+
+
+def _cell_boundaries(
+    shape: list[int],
+    read_chunks: list[int],
+    write_chunks: list[int],
+    itemsize: int,
+    max_memory: int,
+) -> list[list[int]]:
+    """
+    Boundaries of the intermediate cells along each axis.
+
+    Union of the read and write group boundaries (see _rechunk_plan()), with the largest cells split
+    in half (along their largest axis) until a cell fits in max_memory.
+    """
+    boundaries = [
+        sorted(set(_boundaries(n, r)) | set(_boundaries(n, w)))
+        for n, r, w in zip(shape, read_chunks, write_chunks)
+    ]
+    while True:
+        widths = [max(np.diff(b), default=0) for b in boundaries]
+        if math.prod(widths) * itemsize <= max_memory:
+            return boundaries
+        axis = int(np.argmax(widths))
+        if widths[axis] <= 1:
+            raise ValueError(f"max_memory {max_memory} is smaller than a single pixel")
+        new_boundaries = [boundaries[axis][0]]
+        for lo, hi in zip(boundaries[axis][:-1], boundaries[axis][1:]):
+            if hi - lo == widths[axis]:
+                new_boundaries.append(lo + (hi - lo) // 2)
+            new_boundaries.append(hi)
+        boundaries[axis] = new_boundaries
+
+
+def _cells_in(boundaries: list[list[int]], slices: tuple[slice, ...]):
+    """Indices of the intermediate cells within a chunk"""
+    return itertools.product(
+        *[range(b.index(s.start), b.index(s.stop)) for b, s in zip(boundaries, slices)]
+    )
+
+
+def _cell_slices(boundaries: list[list[int]], cell: tuple) -> tuple[slice, ...]:
+    return tuple(slice(b[i], b[i + 1]) for b, i in zip(boundaries, cell))
+
+
+def _relative(slices: tuple[slice, ...], origin: tuple[slice, ...]) -> tuple:
+    return tuple(
+        slice(s.start - o.start, s.stop - o.start) for s, o in zip(slices, origin)
+    )
+
+
+def _nbytes(slices: tuple[slice, ...], itemsize: int) -> int:
+    return math.prod(s.stop - s.start for s in slices) * itemsize
+
+
+def _chunks_in(chunks: list[int], slices: tuple[slice, ...]):
+    """Indices of the chunks within a group"""
+    return itertools.product(
+        *[range(s.start // c, math.ceil(s.stop / c)) for c, s in zip(chunks, slices)]
+    )
+
+
+def rechunk(
+    source: str | Path,
+    target: str | Path,
+    target_chunks: tuple[int, ...],
+    max_memory: int | str = DEFAULT_MAX_MEMORY,
+    intermediate: str | Path | None = None,
+) -> dict:
+    """
+    Rechunk a chunk store to a new chunk shape with bounded memory.
+
+    Args:
+        source (str | Path): Directory of the source store
+        target (str | Path): Directory of the target store
+        target_chunks (tuple[int, ...]): Chunk shape of the target store
+        max_memory (int | str): Memory budget in bytes or as '512MB', '2GB'. Defaults to
+            DEFAULT_MAX_MEMORY.
+        intermediate (str | Path | None): Directory of the intermediate store. Defaults to
+            '<target>.intermediate'.
+
+    Returns:
+        dict: Manifest of the target store
+
+    Raises:
+        ValueError: If the chunk shape or memory budget is not valid
+    """
+    source, target = Path(source), Path(target)
+    intermediate = (
+        Path(intermediate)
+        if intermediate
+        else target.with_name(target.name + ".intermediate")
+    )
+    max_memory = parse_memory(max_memory)
+
+    manifest = read_manifest(source)
+    shape, source_chunks = manifest["shape"], manifest["chunks"]
+    dtype = np.dtype(manifest["dtype"])
+    target_manifest = create_store(target, shape, dtype, target_chunks)
+    target_chunks = target_manifest["chunks"]
+
+    if all(
+        _chunk_file(target, index).exists()
+        for index in _chunk_indices(shape, target_chunks)
+    ):
+        logger.debug(f"Target store already complete: {target}")
+        return target_manifest
+
+    read_chunks, write_chunks = _rechunk_plan(
+        shape, source_chunks, target_chunks, dtype.itemsize, max_memory
+    )
+    boundaries = _cell_boundaries(
+        shape, read_chunks, write_chunks, dtype.itemsize, max_memory
+    )
+    intermediate.mkdir(parents=True, exist_ok=True)
+    logger.debug(
+        f"Rechunking {source} {source_chunks} -> {target} {target_chunks} "
+        f"(read groups {read_chunks}, write groups {write_chunks}) "
+        f"with {math.prod(len(b) - 1 for b in boundaries)} intermediate cells"
+    )
+
+    # Pass 1: split read groups into cells
+    for index in _chunk_indices(shape, read_chunks):
+        done_marker = intermediate / ("done." + ".".join(map(str, index)))
+        if done_marker.exists():
+            continue
+        group_slices = _chunk_slices(shape, read_chunks, index)
+        # groups larger than max_memory are single source chunks, read one cell at a time
+        group = (
+            read_region(source, group_slices)
+            if _nbytes(group_slices, dtype.itemsize) <= max_memory
+            else None
+        )
+        for cell in _cells_in(boundaries, group_slices):
+            cell_slices = _cell_slices(boundaries, cell)
+            _write_npy(
+                _chunk_file(intermediate, cell),
+                (
+                    group[_relative(cell_slices, group_slices)]
+                    if group is not None
+                    else read_region(source, cell_slices)
+                ),
+            )
+        del group
+        done_marker.touch()
+
+    # Pass 2: assemble write groups from cells and write their target chunks
+    for index in _chunk_indices(shape, write_chunks):
+        group_slices = _chunk_slices(shape, write_chunks, index)
+        pending = [
+            chunk_index
+            for chunk_index in _chunks_in(target_chunks, group_slices)
+            if not _chunk_file(target, chunk_index).exists()
+        ]
+        if not pending:
+            continue
+
+        if _nbytes(group_slices, dtype.itemsize) <= max_memory:
+            group = np.empty(tuple(s.stop - s.start for s in group_slices), dtype=dtype)
+            for cell in _cells_in(boundaries, group_slices):
+                cell_slices = _cell_slices(boundaries, cell)
+                group[_relative(cell_slices, group_slices)] = np.load(
+                    _chunk_file(intermediate, cell)
+                )
+            for chunk_index in pending:
+                chunk_slices = _chunk_slices(shape, target_chunks, chunk_index)
+                _write_npy(
+                    _chunk_file(target, chunk_index),
+                    group[_relative(chunk_slices, group_slices)],
+                )
+            del group
+            continue
+
+        # groups larger than max_memory are single target chunks, assembled one cell at a time
+        chunk_file = _chunk_file(target, pending[0])
+        tmp_file = chunk_file.with_suffix(".tmp")
+        chunk = np.lib.format.open_memmap(
+            tmp_file,
+            mode="w+",
+            dtype=dtype,
+            shape=tuple(s.stop - s.start for s in group_slices),
+        )
+        for cell in _cells_in(boundaries, group_slices):
+            cell_slices = _cell_slices(boundaries, cell)
+            chunk[_relative(cell_slices, group_slices)] = np.load(
+                _chunk_file(intermediate, cell)
+            )
+        chunk.flush()
+        del chunk
+        os.replace(tmp_file, chunk_file)
+
+    shutil.rmtree(intermediate)
+    return target_manifest
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Rechunk a local cube chunk store with bounded memory"
+    )
+    parser.add_argument("source", help="Directory of the source chunk store")
+    parser.add_argument("target", help="Directory of the target chunk store")
+    parser.add_argument(
+        "--chunks",
+        required=True,
+        help="Target chunk shape 'days,rows,cols', e.g. 365,64,64 (time-major) or 8,1024,1024 (space-major)",
+    )
+    parser.add_argument(
+        "--max-memory",
+        default=os.getenv("OSN_MAX_MEMORY", "256MB"),
+        help="Memory budget, e.g. 512MB or 2GB. Default is 256MB",
+    )
+    parser.add_argument(
+        "--intermediate",
+        default=None,
+        help="Directory of the intermediate store. Default is '<target>.intermediate'",
+    )
+    args = parser.parse_args(argv)
+
+    rechunk(
+        args.source,
+        args.target,
+        tuple(int(c) for c in args.chunks.split(",")),
+        max_memory=args.max_memory,
+        intermediate=args.intermediate,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,255 @@
+"""
+Shared memory rasters for multiprocess local workers.
+
+Every local worker needs the same DEM and AOI mask. Instead of pickling them with every task, the
+parent process copies them once into multiprocessing.shared_memory blocks with SharedRasterStore, and
+workers attach to the blocks by name and get numpy views without copying the data.
+
+Only small SharedArraySpec descriptors (block name, shape and dtype) are sent to the workers.
+
+Lifecycle:
+- The parent owns the blocks. SharedRasterStore unlinks them when the `with` block exits (also on
+  exceptions), when close() is called, when the store is garbage collected and at interpreter exit.
+- If the parent is killed without running any Python cleanup, the multiprocessing resource tracker
+  unlinks the blocks it created.
+- Workers only attach. They never unlink and don't register the blocks with the resource tracker, so
+  a worker exiting or crashing doesn't remove a block that other workers still use.
+
+Example:
+    with SharedRasterStore() as store:
+        specs = {
+            "dem": store.add_dem(dem),
+            "aoi": store.add_aoi(aoi_mask),
+        }
+        with ProcessPoolExecutor(initializer=init_worker, initargs=(specs,)) as pool:
+            pool.map(process_day, days)
+
+    # in process_day()
+    dem = get_shared_array("dem")
+"""
+
+import atexit
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from observatorio_ipa.local import filters
+
+logger = logging.getLogger(__name__)
+
+# blocks attached in the current (worker) process, by key
+_attached_arrays: dict[str, tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+# resource_tracker.register is replaced while attaching in Python < 3.13
+_register_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SharedArraySpec:
+    """Picklable description of an array stored in a shared memory block"""
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to an existing shared memory block without registering it with the resource tracker.
+
+    Python 3.13+ supports track=False. Older versions always register the block, so registering is
+    skipped while attaching. Unregistering afterwards isn't an option: workers share the resource
+    tracker of the parent, and it would drop the registration the parent relies on to unlink the
+    block if it's killed.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    with _register_lock:
+        register = resource_tracker.register
+
+        def _register_except_shared_memory(rname: str, rtype: str) -> None:
+            if rtype != "shared_memory":
+                register(rname, rtype)
+
+        resource_tracker.register = _register_except_shared_memory
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def attach_array(
+    spec: SharedArraySpec,
+) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    """
+    Attach to a shared memory block and get a read-only numpy view of the array.
+
+    The returned SharedMemory object must be kept alive while the view is used.
+
+    Args:
+        spec (SharedArraySpec): Description of the shared array
+
+    Returns:
+        tuple[shared_memory.SharedMemory, np.ndarray]: Attached block and numpy view
+    """
+    block = _attach_block(spec.name)
+    array = np.ndarray(spec.shape, dtype=np.dtype(spec.dtype), buffer=block.buf)
+    array.flags.writeable = False
+    return block, array
+
+
+def init_worker(specs: dict[str, SharedArraySpec]) -> None:
+    """
+    Process pool initializer. Attaches to all shared arrays so tasks can use get_shared_array().
+
+    Args:
+        specs (dict[str, SharedArraySpec]): Shared arrays by key, as returned by SharedRasterStore.add()
+    """
+    if not _attached_arrays:
+        atexit.register(release_worker)
+    for key, spec in specs.items():
+        if key in _attached_arrays:
+            continue
+        _attached_arrays[key] = attach_array(spec)
+
+
+def get_shared_array(key: str) -> np.ndarray:
+    """
+    Get the read-only view of a shared array attached with init_worker().
+
+    Args:
+        key (str): Key of the shared array
+
+    Returns:
+        np.ndarray: numpy view of the shared array
+
+    Raises:
+        KeyError: If the array was not attached in this process
+    """
+    try:
+        return _attached_arrays[key][1]
+    except KeyError:
+        raise KeyError(f"Shared array not attached in this process: {key}")
+
+
+def release_worker() -> None:
+    """Closes all blocks attached in the current process. Does not unlink them."""
+    while _attached_arrays:
+        key, (block, array) = _attached_arrays.popitem()
+        del array
+        try:
+            block.close()
+        except BufferError:
+            # a view of the block is still referenced, it's released when the process exits
+            logger.debug(f"Shared array still in use, not closed: {key}")
+
+
+def _release_blocks(blocks: list[shared_memory.SharedMemory]) -> None:
+    """Closes and unlinks shared memory blocks, ignoring blocks that were already removed"""
+    while blocks:
+        block = blocks.pop()
+        try:
+            block.close()
+        except BufferError:
+            logger.debug(f"Shared memory block still in use, not closed: {block.name}")
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedRasterStore:
+    """
+    Owner of the shared memory blocks used to share rasters (DEM, AOI mask) with worker processes.
+
+    Attributes:
+    -----------
+    specs : dict[str, SharedArraySpec]
+        Shared arrays by key. Pass this to init_worker() in the workers.
+
+    Methods:
+    --------
+    add(key, array) -> SharedArraySpec
+        Copies an array into a new shared memory block.
+    add_dem(dem), add_aoi(aoi_mask) -> SharedArraySpec
+        Copies the DEM as int16 and the rasterized AOI as a boolean mask.
+    get(key) -> np.ndarray
+        Numpy view of a shared array in the parent process.
+    close() -> None
+        Closes and unlinks all blocks.
+    """
+
+    def __init__(self) -> None:
+        self.specs: dict[str, SharedArraySpec] = {}
+        self._views: dict[str, np.ndarray] = {}
+        self._blocks: list[shared_memory.SharedMemory] = []
+        # unlink blocks on close(), garbage collection or interpreter exit, whichever comes first
+        self._finalizer = weakref.finalize(self, _release_blocks, self._blocks)
+
+    def __enter__(self) -> "SharedRasterStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def add(self, key: str, array: np.ndarray) -> SharedArraySpec:
+        """
+        Copies an array into a new shared memory block.
+
+        Args:
+            key (str): Key to identify the array, e.g. 'dem' or 'aoi'
+            array (np.ndarray): Array to share
+
+        Returns:
+            SharedArraySpec: Picklable description of the shared array
+
+        Raises:
+            ValueError: If key was already added or the store is closed
+        """
+        if not self._finalizer.alive:
+            raise ValueError("SharedRasterStore is closed")
+        if key in self.specs:
+            raise ValueError(f"Shared array already exists: {key}")
+
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks.append(block)
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        view[...] = array
+        view.flags.writeable = False
+
+        spec = SharedArraySpec(block.name, tuple(array.shape), array.dtype.str)
+        self.specs[key] = spec
+        self._views[key] = view
+        logger.debug(
+            f"Shared array {key} created: {array.nbytes} bytes in {block.name}"
+        )
+        return spec
+
+    def add_dem(self, dem: np.ndarray, key: str = "dem") -> SharedArraySpec:
+        """Adds a DEM raster as int16, see filters.dem_to_int16()"""
+        return self.add(key, filters.dem_to_int16(dem))
+
+    def add_aoi(self, aoi_mask: np.ndarray, key: str = "aoi") -> SharedArraySpec:
+        """Adds a rasterized AOI as a boolean mask"""
+        return self.add(key, np.asarray(aoi_mask, dtype=bool))
+
+    def get(self, key: str) -> np.ndarray:
+        """Read-only numpy view of a shared array in the parent process"""
+        return self._views[key]
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the shared arrays"""
+        return sum(view.nbytes for view in self._views.values())
+
+    def close(self) -> None:
+        """Closes and unlinks all blocks. Views returned by get() can't be used afterwards."""
+        self._views.clear()
+        self._finalizer()
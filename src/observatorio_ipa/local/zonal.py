@@ -0,0 +1,195 @@
+"""
+Zonal statistics of local (in-memory) rasters by feature (e.g. basins and sub-basins) using numpy.
+
+Features are rasterized once to an int32 label grid with the same shape as the rasters: pixels
+whose center is inside feature i get label i+1 and pixels outside all features get label 0. The
+statistics of all features are then computed with a single numpy.bincount pass per day over the
+label grid, so the cost doesn't grow with the number of features.
+
+Snow and cloud cover percentages are computed over pixels with a valid TAC value, the same as the
+mean of the Snow_TAC and Cloud_TAC bands over a feature in GEE (see gee.zonal).
+
+The following conventions are used:
+- TAC rasters are 2D arrays (rows, cols) with values 0 (cloud/nodata), 50 (land) and 100 (snow).
+  Any other value is nodata.
+- Cubes are 3D arrays (days, rows, cols) of consecutive days
+- Geotransforms are GDAL geotransforms (x_origin, pixel_width, 0, y_origin, 0, -pixel_height) and
+  feature coordinates are in the same projection as the raster
+
+GLOSSARY
+TAC: Terra-Aqua Classification?
+"""
+
+import numpy as np
+
+# Class of each TAC value, used to count all classes of all features in a single bincount
+CLASS_CLOUD = 0
+CLASS_LAND = 1
+CLASS_SNOW = 2
+CLASS_NODATA = 3
+N_CLASSES = 4
+
+_TAC_TO_CLASS = np.full(256, CLASS_NODATA, dtype=np.int32)
+_TAC_TO_CLASS[[0, 50, 100]] = [CLASS_CLOUD, CLASS_LAND, CLASS_SNOW]
+
+
+def _polygon_mask(
+    rings: list, shape: tuple[int, int], geotransform: tuple
+) -> np.ndarray:
+    """
+    Mask of the pixels whose center is inside a polygon (even-odd rule, so holes are excluded)
+
+    Args:
+        rings (list): Polygon rings, lists of [x, y] coordinates. First ring is the exterior.
+        shape (tuple[int, int]): Shape (rows, cols) of the raster
+        geotransform (tuple): GDAL geotransform of the raster
+
+    Returns:
+        np.ndarray: 2D boolean mask
+    """
+    x_origin, pixel_width, _, y_origin, _, pixel_height = geotransform
+    n_rows, n_cols = shape
+    # number of edge crossings to the left of each pixel center, per row
+    toggles = np.zeros((n_rows, n_cols + 1), dtype=np.int32)
+    row_centers = np.arange(n_rows) + 0.5
+
+    for ring in rings:
+        points = np.asarray(ring, dtype=np.float64)
+        if points.shape[0] < 3:
+            continue
+        if not np.array_equal(points[0], points[-1]):
+            points = np.vstack([points, points[:1]])
+        # ring in pixel coordinates
+        px = (points[:, 0] - x_origin) / pixel_width
+        py = (points[:, 1] - y_origin) / pixel_height
+        xa, ya, xb, yb = px[:-1], py[:-1], px[1:], py[1:]
+
+        crosses = (ya[None, :] <= row_centers[:, None]) != (
+            yb[None, :] <= row_centers[:, None]
+        )
+        rows, edges = np.nonzero(crosses)
+        x_cross = xa[edges] + (row_centers[rows] - ya[edges]) * (
+            xb[edges] - xa[edges]
+        ) / (yb[edges] - ya[edges])
+        # first pixel whose center is right of the crossing
+        cols = np.clip(np.ceil(x_cross - 0.5), 0, n_cols).astype(np.intp)
+        np.add.at(toggles, (rows, cols), 1)
+
+    return (np.cumsum(toggles[:, :n_cols], axis=1) % 2).astype(bool)
+
+
+def rasterize_labels(
+    geometries: list[dict], shape: tuple[int, int], geotransform: tuple
+) -> np.ndarray:
+    """
+    Rasterize features to an int32 label grid.
+
+    Pixels whose center is inside geometry i get label i+1, pixels outside all geometries get 0.
+    Where geometries overlap, the last geometry wins.
+
+    Args:
+        geometries (list[dict]): GeoJSON geometries of type Polygon or MultiPolygon
+        shape (tuple[int, int]): Shape (rows, cols) of the raster
+        geotransform (tuple): GDAL geotransform of the raster
+
+    Returns:
+        np.ndarray: 2D int32 label grid
+
+    Raises:
+        ValueError: If a geometry type is not Polygon or MultiPolygon
+    """
+    labels = np.zeros(shape, dtype=np.int32)
+    for i, geometry in enumerate(geometries):
+        match geometry["type"]:
+            case "Polygon":
+                polygons = [geometry["coordinates"]]
+            case "MultiPolygon":
+                polygons = geometry["coordinates"]
+            case _:
+                raise ValueError(f"Invalid geometry type: {geometry['type']}")
+        for rings in polygons:
+            labels[_polygon_mask(rings, shape, geotransform)] = i + 1
+    return labels
+
+
+def tac_class_counts(tac: np.ndarray, labels: np.ndarray, n_labels: int) -> np.ndarray:
+    """
+    Count the pixels of each TAC class in each feature with a single bincount
+
+    Args:
+        tac (np.ndarray): 2D TAC raster
+        labels (np.ndarray): 2D int32 label grid, see rasterize_labels()
+        n_labels (int): Number of features
+
+    Returns:
+        np.ndarray: Array (n_labels, N_CLASSES) with the pixel counts of each class. Pixels
+            outside all features (label 0) are not included.
+    """
+    if tac.dtype != np.uint8:
+        tac = np.where((tac >= 0) & (tac <= 255), tac, 255).astype(np.uint8)
+    index = labels.ravel() * N_CLASSES + _TAC_TO_CLASS[tac.ravel()]
+    counts = np.bincount(index, minlength=(n_labels + 1) * N_CLASSES)
+    return counts.reshape(n_labels + 1, N_CLASSES)[1:]
+
+
+def zonal_tac_percentages(
+    tac_cube: np.ndarray, labels: np.ndarray, n_labels: int
+) -> dict[str, np.ndarray]:
+    """
+    Snow and cloud cover percentages of each feature and day of a TAC cube.
+
+    Percentages are computed over the pixels with a valid TAC value (cloud, land or snow).
+    Features without valid pixels in a day get NaN.
+
+    Args:
+        tac_cube (np.ndarray): 3D array (days, rows, cols) with TAC values
+        labels (np.ndarray): 2D int32 label grid, see rasterize_labels()
+        n_labels (int): Number of features
+
+    Returns:
+        dict[str, np.ndarray]: Arrays (days, n_labels) with keys 'snow' and 'cloud' (percentages)
+            and 'n_pixels' (number of valid pixels)
+    """
+    n_days = tac_cube.shape[0]
+    counts = np.empty((n_days, n_labels, N_CLASSES), dtype=np.int64)
+    for day in range(n_days):
+        counts[day] = tac_class_counts(tac_cube[day], labels, n_labels)
+
+    n_pixels = counts[..., :CLASS_NODATA].sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        snow = 100 * counts[..., CLASS_SNOW] / n_pixels
+        cloud = 100 * counts[..., CLASS_CLOUD] / n_pixels
+    return {"snow": snow, "cloud": cloud, "n_pixels": n_pixels}
+
+
+def zonal_means(
+    values: np.ndarray,
+    labels: np.ndarray,
+    n_labels: int,
+    valid: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Mean of a raster in each feature, e.g. Snow_TAC or Cloud_TAC of a monthly image.
+
+    Args:
+        values (np.ndarray): 2D raster
+        labels (np.ndarray): 2D int32 label grid, see rasterize_labels()
+        n_labels (int): Number of features
+        valid (np.ndarray | None): 2D boolean mask of valid pixels. Defaults to None (all finite
+            values are valid).
+
+    Returns:
+        np.ndarray: Array (n_labels,) with the mean of each feature, NaN for features without
+            valid pixels
+    """
+    values = np.asarray(values, dtype=np.float64)
+    is_valid = np.isfinite(values)
+    if valid is not None:
+        is_valid &= valid
+    index = np.where(is_valid, labels, 0).ravel()
+    sums = np.bincount(
+        index, weights=np.where(is_valid, values, 0).ravel(), minlength=n_labels + 1
+    )
+    n_pixels = np.bincount(index, minlength=n_labels + 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums / n_pixels)[1:]
@@ -1,21 +1,30 @@
-from math import log
 import sys
 import logging, logging.config
-import logging_tree
-import pprint
 import json
+import time
 from datetime import datetime
-import ee
-import logging_tree.format
-from nbconvert import export
 
-from observatorio_ipa.gee import exports as gee_exports
-from observatorio_ipa.processes import monthly_export
 from observatorio_ipa.utils import logs
 from observatorio_ipa.utils import command_line
 from observatorio_ipa.utils import scripting
 from observatorio_ipa.utils import messaging
-
+from observatorio_ipa.utils import metrics
+from observatorio_ipa.utils import tracing
+from observatorio_ipa.utils.lazy import lazy_import
+
+# GEE modules are only loaded once they are used (after config validation) to keep startup fast
+ee = lazy_import("ee")
+gee_asset_index = lazy_import("observatorio_ipa.gee.asset_index")
+gee_call_policy = lazy_import("observatorio_ipa.gee.call_policy")
+gee_cassette = lazy_import("observatorio_ipa.gee.cassette")
+gee_export_profiles = lazy_import("observatorio_ipa.gee.export_profiles")
+gee_exports = lazy_import("observatorio_ipa.gee.exports")
+gee_sharding = lazy_import("observatorio_ipa.gee.sharding")
+basin_stats_export = lazy_import("observatorio_ipa.processes.basin_stats_export")
+daily_export = lazy_import("observatorio_ipa.processes.daily_export")
+monthly_export = lazy_import("observatorio_ipa.processes.monthly_export")
+yearly_export = lazy_import("observatorio_ipa.processes.yearly_export")
+watch = lazy_import("observatorio_ipa.processes.watch")
 
 # TODO: Give user an option to change log file
 # TODO: move string rep of datetime to functions that use it
@@ -93,12 +102,222 @@ def make_export_results_report(export_tasks: list) -> str:
     return export_results_report
 
 
-def main():
+def make_cost_estimate_report(estimate: dict, max_exports: int) -> str:
+    """
+    Create a report of the cost estimate of an export plan.
+
+    Parameters:
+    -----------
+    estimate : dict
+        A dictionary containing the cost estimate, see monthly_export.estimate_monthly_export_cost.
+    max_exports : int
+        Max number of export tasks running at the same time.
+
+    Returns:
+    --------
+    str
+        A string containing the cost estimate report.
+    """
+
+    cost_report = "\n"
+    cost_report += "---------------------------------------------\n"
+    cost_report += "Cost Estimate (dry run, no tasks created):\n"
+    cost_report += "---------------------------------------------\n"
+    cost_report += f"- Images: {estimate['images']}\n"
+    cost_report += f"- Days processed (incl. buffer days): {estimate['days']}\n"
+    cost_report += f"- AOI pixels: {estimate['pixels']}\n"
+    cost_report += f"- Pixels x days: {estimate['pixel_days']}\n"
+    cost_report += f"- Output size: ~{estimate['bytes'] / 1e6:.1f} MB\n"
+    cost_report += f"- Graph size per image: ~{estimate['graph_bytes'] / 1e3:.1f} KB\n"
+    cost_report += f"- Shards per image: {estimate['shards']}\n"
+    cost_report += f"- Tasks: {estimate['tasks']} in {estimate['rounds']} rounds of max {max_exports} exports\n"
+
+    return cost_report
+
+
+def run_export_processes(
+    config: dict,
+    export_profile: dict,
+    email_service: messaging.EmailSender | None,
+    script_start_time: datetime,
+) -> None:
+    """
+    Run the daily, monthly and yearly export processes and the basin statistics, track the
+    exports and report the results. The run is traced in config['trace_file'] and its metrics
+    written to config['metrics_file'], if set.
+
+    Parameters:
+    -----------
+    config : dict
+        A dictionary containing the configuration parameters.
+    export_profile : dict
+        Export profile of the exported images.
+    email_service : messaging.EmailSender | None
+        Email service to send the results, if enabled.
+    script_start_time : datetime
+        Start time of the run, used in the results email.
+    """
+    logger = logging.getLogger("observatorio_ipa")
+
+    # Trace the phases of the run, also used for the stage durations of the metrics
+    tracer = None
+    if config.get("trace_file") or config.get("metrics_file"):
+        tracer = tracing.start()
+
+    export_plans = []
+    with tracing.span("run") as run_span:
+        ## ------ EXPORT MONTHLY IMAGES ---------
+        export_tasks = []
+        export_results = ""
+        if config.get("monthly_assets_path", False):
+            with tracing.span("monthly_export"):
+                monthly_export_results = monthly_export.monthly_export_proc(
+                    monthly_collection_path=config["monthly_assets_path"],
+                    name_prefix=config["monthly_image_prefix"],
+                    aoi_path=config["aoi_asset_path"],
+                    dem_path=config["dem_asset_path"],
+                    months_list=config["months_list"],
+                    provisional=config["monthly_provisional"],
+                    stack_size=config["monthly_stack_size"],
+                    export_profile=export_profile,
+                    region_shard_size=config.get("region_shard_size"),
+                    revalidate=config.get("revalidate", False),
+                )
+            export_tasks.extend(monthly_export_results["export_tasks"])
+            export_plans.append(monthly_export_results)
+            export_results += make_export_plan_report(monthly_export_results)
+
+        else:
+            logger.debug("Skipping Monthly Export Process")
+        ## ------- EXPORT YEARLY IMAGES ---------
+        if config.get("yearly_assets_path", False):
+            logger.debug("Starting Yearly Export Process")
+            with tracing.span("yearly_export"):
+                yearly_export_results = yearly_export.yearly_export_proc(
+                    yearly_collection_path=config["yearly_assets_path"],
+                    monthly_collection_path=config["monthly_assets_path"],
+                    aoi_path=config["aoi_asset_path"],
+                    name_prefix=config["yearly_image_prefix"],
+                    monthly_name_prefix=config["monthly_image_prefix"],
+                    years_list=config["years_list"],
+                    export_profile=export_profile,
+                )
+            export_tasks.extend(yearly_export_results["export_tasks"])
+            export_plans.append(yearly_export_results)
+            export_results += make_export_plan_report(yearly_export_results)
+        else:
+            logger.debug("Skipping Yearly Export Process")
+
+        ## ------- EXPORT DAILY IMAGES ---------
+        if config.get("daily_assets_path", False):
+            logger.debug("Starting Daily Export Process")
+            with tracing.span("daily_export"):
+                daily_export_results = daily_export.daily_export_proc(
+                    daily_collection_path=config["daily_assets_path"],
+                    aoi_path=config["aoi_asset_path"],
+                    dem_path=config["dem_asset_path"],
+                    name_prefix=config["daily_image_prefix"],
+                    days_list=config["days_list"],
+                    batch_size=config["daily_batch_size"],
+                    export_mode=config["daily_export_mode"],
+                    export_profile=export_profile,
+                )
+            export_tasks.extend(daily_export_results["export_tasks"])
+            export_plans.append(daily_export_results)
+            export_results += make_export_plan_report(daily_export_results)
+        else:
+            logger.debug("Skipping Daily Export Process")
+
+        ## ------- START & TRACK EXPORTS ---------
+        export_tasks = gee_exports.track_exports(
+            export_tasks, max_concurrent=config["max_exports"]
+        )
+        # Split stacked (multi-day or multi-month) images into one asset per image
+        with tracing.span("split_exports"):
+            export_tasks.extend(
+                gee_exports.split_stacked_exports(
+                    export_tasks, max_concurrent=config["max_exports"]
+                )
+            )
+        # Retry failed shards and mosaic sharded images
+        with tracing.span("complete_sharded_exports"):
+            export_tasks.extend(
+                gee_sharding.complete_sharded_exports(
+                    export_tasks, max_concurrent=config["max_exports"]
+                )
+            )
+        run_span.set("export_tasks", len(export_tasks))
+        # Exported images are pending no more, without listing the collections again
+        asset_index = gee_asset_index.get_index()
+        if asset_index is not None:
+            asset_index.update_from_tasks(export_tasks)
+
+        ## ------- BASIN STATISTICS ---------
+        if config.get("basin_stats_path", False) and config.get(
+            "daily_assets_path", False
+        ):
+            # all exported daily images missing from the store, not only this run's
+            try:
+                with tracing.span("basin_stats") as basin_stats_span:
+                    basin_stats_results = basin_stats_export.basin_stats_proc(
+                        daily_collection_path=config["daily_assets_path"],
+                        name_prefix=config["daily_image_prefix"],
+                        basins_path=config["basins_asset_path"],
+                        basin_id_property=config["basin_id_property"],
+                        stats_path=config["basin_stats_path"],
+                    )
+                    basin_stats_span.set("images", basin_stats_results["images"])
+                export_results += f"\nBasin statistics: {basin_stats_results['rows']} rows of {basin_stats_results['images']} daily images\n"
+                if basin_stats_results["images_failed"]:
+                    export_results += f"Basin statistics failed for {basin_stats_results['images_failed']} daily images, retried in the next run\n"
+            except Exception as e:
+                logger.error(f"Basin statistics failed: {e}")
+                export_results += f"\nBasin statistics failed: {e}\n"
+
+        ## ------- REPORT RESULTS ---------
+        export_results += make_export_results_report(export_tasks)
+        print(export_results)
+
+        if email_service:
+            with tracing.span("email"):
+                messaging.email_results(
+                    email_service=email_service,
+                    script_start_time=script_start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                    results=export_results,
+                )
+
+    if config.get("trace_file"):
+        tracing.write_chrome_trace(config["trace_file"])
+
+    ## ------- METRICS ---------
+    if config.get("metrics_file"):
+        try:
+            last_dates = watch.poll_last_dates()
+        except Exception as e:
+            logger.warning(f"Catalog lag not available: {e}")
+            last_dates = None
+        try:
+            metrics.write_textfile(
+                config["metrics_file"],
+                metrics.run_metrics(
+                    run_duration=run_span.duration,
+                    stage_durations=tracer.durations(run_span),
+                    export_plans=export_plans,
+                    export_tasks=export_tasks,
+                    last_dates=last_dates,
+                    end_time=time.time(),
+                ),
+            )
+        except OSError as e:
+            logger.error(f"Writing metrics failed: {e}")
+
+
+def main(argv: list[str] | None = None):
     script_start_time = datetime.now()
 
     ## ------ PARSE ARGUMENTS ---------
     parser = command_line.set_argument_parser()
-    args = parser.parse_args("")
+    args = parser.parse_args(argv)
     config = vars(args)
     # pprint.pprint(config)
 
@@ -134,17 +353,43 @@ def main():
     # Connect to GEE using service account for automation
     logger.debug("Connecting to GEE")
 
+    # A replayed run serves the responses of a recorded run (cassette), without credentials
+    replay_transport = None
     try:
-        with open(config["service_credentials_file"], "r") as f:
-            service_account_data = json.load(f)
-        service_user = service_account_data["client_email"]
+        if config.get("gee_replay"):
+            replay_transport = gee_cassette.initialize_replay(
+                config["gee_replay"], latency=config["gee_replay_latency"]
+            )
+        else:
+            with open(config["service_credentials_file"], "r") as f:
+                service_account_data = json.load(f)
+            service_user = service_account_data["client_email"]
+
+            credentials = ee._helpers.ServiceAccountCredentials(
+                email=service_user,
+                key_data=json.dumps(service_account_data),
+            )
+            http_transport = None
+            if config.get("gee_record"):
+                logger.info(f"Recording GEE requests to {config['gee_record']}")
+                http_transport = gee_cassette.RecordingTransport(config["gee_record"])
+            ee.Initialize(credentials, http_transport=http_transport)
+        logger.debug("GEE connection successful")
 
-        credentials = ee._helpers.ServiceAccountCredentials(
-            email=service_user,
-            key_data=json.dumps(service_account_data),
+        # Rate limit and retry all GEE calls
+        requests_per_second = config.get("gee_requests_per_second") or (
+            gee_call_policy.DEFAULT_REQUESTS_PER_SECOND
         )
-        ee.Initialize(credentials)
-        logger.debug("GEE connection successful")
+        gee_call_policy.set_policy(
+            gee_call_policy.CallPolicy(
+                gee_call_policy.RateLimiter(
+                    requests_per_second, burst=max(1, int(2 * requests_per_second))
+                )
+            )
+        )
+
+        # Look up exported images in an index instead of listing the collections
+        gee_asset_index.set_index(gee_asset_index.AssetIndex(config.get("asset_index")))
 
     except FileNotFoundError as e:
         scripting.terminate_error(
@@ -176,51 +421,89 @@ def main():
         )
         return 1
 
-    ## ------ EXPORT MONTHLY IMAGES ---------
-    export_tasks = []
-    export_results = ""
-    if config.get("monthly_assets_path", False):
-        monthly_export_results = monthly_export.monthly_export_proc(
+    ## ------ Validate Export Profile ------------
+    try:
+        export_profile = gee_export_profiles.get_export_profile(
+            config["export_profile"]
+        )
+        # Daily images are the ones with more bands (Cloud_TAC, Snow_TAC, QA_CR)
+        export_size = gee_export_profiles.estimate_export_size(
+            export_profile,
+            ee.featurecollection.FeatureCollection(config["aoi_asset_path"]),
+            n_bands=3,
+        )
+        logger.info(
+            f"Export profile {config['export_profile']}: ~{export_size['bytes'] / 1e6:.1f} MB per image"
+        )
+
+    except ValueError as e:
+        scripting.terminate_error(
+            err_message=str(e),
+            script_start_time=script_start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            email_service=email_service,
+        )
+        return 1
+
+    ## ------ DRY RUN ---------
+    # Plan the monthly export and estimate its cost, without creating export tasks
+    if config.get("dry_run", False):
+        if not config.get("monthly_assets_path", False):
+            logger.warning("Dry run only plans the monthly export, nothing to plan")
+            return 0
+        name_prefix = config["monthly_image_prefix"]
+        if not name_prefix.endswith("_") and not name_prefix.endswith("-"):
+            name_prefix += "_"
+        monthly_plan = monthly_export.plan_monthly_export(
             monthly_collection_path=config["monthly_assets_path"],
-            name_prefix=config["monthly_image_prefix"],
+            name_prefix=name_prefix,
+            months_list=config["months_list"],
+            provisional=config["monthly_provisional"],
             aoi_path=config["aoi_asset_path"],
             dem_path=config["dem_asset_path"],
-            months_list=config["months_list"],
+            revalidate=config.get("revalidate", False),
         )
-        export_tasks.extend(monthly_export_results["export_tasks"])
-        export_results += make_export_plan_report(monthly_export_results)
-
-    else:
-        logger.debug("Skipping Monthly Export Process")
-    ## ------- EXPORT YEARLY IMAGES ---------
-    if config.get("yearly_assets_path", False):
-        logger.debug("Starting Yearly Export Process")
-        # TODO: Implement yearly export
-    else:
-        logger.debug("Skipping Yearly Export Process")
-
-    ## ------- EXPORT DAILY IMAGES ---------
-    if config.get("daily_assets_path", False):
-        logger.debug("Starting Daily Export Process")
-        # TODO: Implement daily export  - Daily requirement is still TBD
-    else:
-        logger.debug("Skipping Daily Export Process")
-
-    ## ------- START & TRACK EXPORTS ---------
-    export_tasks = gee_exports.track_exports(export_tasks)
-
-    ## ------- REPORT RESULTS ---------
-    export_results += make_export_results_report(export_tasks)
-    print(export_results)
-
-    if email_service:
-        messaging.email_results(
-            email_service=email_service,
-            script_start_time=script_start_time.strftime("%Y-%m-%d %H:%M:%S"),
-            results=export_results,
+        cost_estimate = monthly_export.estimate_monthly_export_cost(
+            monthly_plan,
+            aoi_path=config["aoi_asset_path"],
+            dem_path=config["dem_asset_path"],
+            export_profile=export_profile,
+            stack_size=config["monthly_stack_size"],
+            region_shard_size=config.get("region_shard_size"),
+            max_exports=config["max_exports"],
         )
+        print(
+            make_export_plan_report(monthly_plan)
+            + make_cost_estimate_report(cost_estimate, config["max_exports"])
+        )
+        logger.debug("---- DRY RUN FINISHED ----")
+        return 0
+
+    ## ------ EXPORT, TRACK & REPORT ---------
+    run_export_processes(config, export_profile, email_service, script_start_time)
+
+    ## ------- SERVICE MODE ---------
+    # Keep the GEE session open and export newly completed months
+    if config.get("daemon", False):
+        try:
+            watch.watch(
+                lambda months: run_export_processes(
+                    watch.incremental_config(config, months),
+                    export_profile,
+                    email_service,
+                    datetime.now(),
+                ),
+                poll_interval=config["poll_interval"],
+            )
+        except KeyboardInterrupt:
+            logger.info("Service stopped")
 
     ## ------- CLEANUP ---------
+    if replay_transport is not None:
+        replay_summary = replay_transport.summary()
+        logger.info(
+            f"Replayed {replay_summary['requests']} GEE requests"
+            f" ({replay_summary['recorded_latency']}s of recorded latency)"
+        )
     logger.debug("---- SCRIPT FINISHED ----")
     return 0
 
@@ -0,0 +1,141 @@
+import logging
+import ee
+from datetime import date
+from gee_toolbox.gee import assets
+
+from observatorio_ipa.gee import asset_index
+from observatorio_ipa.gee import zonal as gee_zonal
+from observatorio_ipa.utils import basin_stats
+
+logger = logging.getLogger(__name__)
+
+# Max number of daily images reduced with a single request
+DEFAULT_STATS_BATCH_SIZE = 100
+
+
+def _get_exported_days(daily_collection_path: str, name_prefix: str) -> list[str]:
+    """
+    Get the days of the exported daily images
+
+    Exported images are looked up in the shared asset index if installed (see gee.asset_index),
+    otherwise the collection is listed.
+
+    Args:
+        daily_collection_path (str): Path to asset collection or folder with the daily images
+        name_prefix (str): Prefix of the daily image names
+
+    Returns:
+        list[str]: Sorted days "YYYY-MM-DD"
+    """
+    index = asset_index.get_index()
+    if index is not None:
+        exported_days = index.periods(daily_collection_path, name_prefix)
+    else:
+        exported_images = assets.list_assets(
+            parent=daily_collection_path, asset_types=["Image"]
+        )
+        exported_images = assets.get_asset_names(exported_images)
+        exported_images = [img.split("/")[-1] for img in exported_images]
+
+        # Excludes stacked images. Expects names to end with "YYYY_MM_DD"
+        exported_days = [
+            img[-10:].replace("_", "-")
+            for img in exported_images
+            if img.startswith(name_prefix)
+        ]
+    return sorted(_day for _day in exported_days if _day and len(_day) == 10)
+
+
+def basin_stats_proc(
+    daily_collection_path: str,
+    name_prefix: str,
+    basins_path: str,
+    basin_id_property: str,
+    stats_path: str,
+    batch_size: int = DEFAULT_STATS_BATCH_SIZE,
+) -> dict:
+    """
+    Append the snow and cloud cover statistics per basin of exported daily images to the basin
+    statistics store.
+
+    Statistics are computed for all exported daily images whose day is not in the store yet, so
+    days of runs where the statistics failed or were not enabled are filled in by later runs.
+    Images are processed in batches of batch_size images, each computed in GEE with one grouped
+    reduction per image and a single request (see gee.zonal.ic_zonal_means()) and appended as new
+    files of the store (see utils.basin_stats). Batches that fail are logged and retried in the
+    next run.
+
+    Args:
+        daily_collection_path (str): Path to asset collection or folder with the daily images
+        name_prefix (str): Prefix of the daily image names
+        basins_path (str): Path to the basins feature collection
+        basin_id_property (str): Integer property of the basins used as basin_id
+        stats_path (str): Directory of the basin statistics store
+        batch_size (int): Max number of images per request. Defaults to DEFAULT_STATS_BATCH_SIZE.
+
+    Returns:
+        dict: Results dictionary with the number of images pending, processed and failed, the
+            number of rows and the files written
+
+    Raises:
+        ValueError: If batch_size is not a positive integer
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+
+    logger.info("Starting Basin Statistics Process")
+    if not name_prefix.endswith("_") and not name_prefix.endswith("-"):
+        name_prefix += "_"
+
+    stored_dates = basin_stats.stored_dates(stats_path)
+    days_pending = [
+        _day
+        for _day in _get_exported_days(daily_collection_path, name_prefix)
+        if date.fromisoformat(_day) not in stored_dates
+    ]
+    results_dict = {
+        "images_pending": len(days_pending),
+        "images": 0,
+        "images_failed": 0,
+        "rows": 0,
+        "files": [],
+    }
+    logger.info(f"Basin statistics pending for {len(days_pending)} daily images")
+    if not days_pending:
+        return results_dict
+
+    ee_basins_fc = ee.featurecollection.FeatureCollection(basins_path)
+    with basin_stats.BasinStatsWriter(stats_path) as writer:
+        for i in range(0, len(days_pending), batch_size):
+            batch_days = days_pending[i : i + batch_size]
+            ee_daily_ic = ee.imagecollection.ImageCollection.fromImages(
+                [
+                    ee.image.Image(
+                        f"{daily_collection_path}/{name_prefix}{_day.replace('-', '_')}"
+                    )
+                    for _day in batch_days
+                ]
+            )
+            try:
+                records = gee_zonal.ic_zonal_means(
+                    ee_daily_ic, ee_basins_fc, basin_id_property, qa_band="QA_CR"
+                )
+            except Exception as e:
+                logger.error(
+                    f"Basin statistics failed for {batch_days[0]} to {batch_days[-1]}: {e}"
+                )
+                results_dict["images_failed"] += len(batch_days)
+                continue
+
+            rows = basin_stats.records_from_zonal_means(records)
+            # write each batch, so a later failure doesn't lose it
+            writer.add(rows)
+            writer.flush()
+            results_dict["images"] += len(batch_days)
+            results_dict["rows"] += len(rows)
+
+    results_dict["files"] = [str(path) for path in writer.written_files]
+    logger.info(
+        f"Basin statistics: {results_dict['rows']} rows of {results_dict['images']} images"
+    )
+    return results_dict
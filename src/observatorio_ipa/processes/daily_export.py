@@ -0,0 +1,391 @@
+import logging
+import ee
+from datetime import date, timedelta
+from gee_toolbox.gee import assets
+
+from observatorio_ipa.defaults import (
+    DEFAULT_TERRA_COLLECTION,
+    DEFAULT_AQUA_COLLECTION,
+    DEFAULT_START_DT,
+)
+from observatorio_ipa.gee import asset_index
+from observatorio_ipa.gee import async_client
+from observatorio_ipa.gee import export_profiles
+from observatorio_ipa.gee import exports as gee_exports
+from observatorio_ipa.gee import utils
+from observatorio_ipa.processes import reclass_and_impute
+
+logger = logging.getLogger(__name__)
+
+DAILY_TAC_BANDS = ["Cloud_TAC", "Snow_TAC"]
+DAILY_QA_BANDS = ["QA_CR"]
+DAILY_BANDS = DAILY_TAC_BANDS + DAILY_QA_BANDS
+DEFAULT_DAILY_BATCH_SIZE = 30
+DAILY_EXPORT_MODES = ["stack", "parallel"]
+STACK_NAME_PREFIX = "stack_"
+
+
+def _daily_images_pending_export(
+    expected_dates: list[str], daily_collection_path: str, name_prefix: str
+) -> list[str]:
+    """
+    Get the dates of daily images that have not been exported to assets
+
+    Exported images are looked up in the shared asset index if installed (see gee.asset_index),
+    otherwise the collection is listed.
+
+    Args:
+        expected_dates (list[str]): List of expected dates in the format "YYYY-MM-DD"
+        daily_collection_path (str): Path to asset collection or folder with exported images
+        name_prefix (str): Prefix of the image names
+
+    Raises:
+        TypeError: If expected_dates is not a list
+
+    Returns:
+        list[str]: List of dates that have not been exported
+    """
+    if not isinstance(expected_dates, list):
+        raise TypeError("expected_dates must be a list")
+
+    index = asset_index.get_index()
+    if index is not None:
+        exported_image_dts = index.periods(daily_collection_path, name_prefix)
+    else:
+        # Get names of images already exported to assets
+        exported_images = assets.list_assets(
+            parent=daily_collection_path, asset_types=["Image"]
+        )
+        exported_images = assets.get_asset_names(exported_images)
+        exported_images = [img.split("/")[-1] for img in exported_images]
+
+        # Get only images that start with the required prefix. Excludes stacked images
+        exported_images = [
+            img for img in exported_images if img.startswith(name_prefix)
+        ]
+
+        # Get dates from image names. Expects names to end with "YYYY_MM_DD"
+        exported_image_dts = [img[-10:].replace("_", "-") for img in exported_images]
+
+    images_pending_export = list(set(expected_dates) - set(exported_image_dts))
+    images_pending_export.sort()
+
+    return images_pending_export
+
+
+def _check_days_are_complete(
+    days: list[str],
+    reference_dates: list[str],
+    leading_days: int = 0,
+) -> list[str]:
+    """
+    Check if days are 'complete' within a list of reference_dates.
+
+    A complete day has an image in reference_dates and at least one reference date after the
+    required leading buffer days, so no new images are expected that would change its imputation.
+
+    Args:
+    days (list[str]): List of dates in the format "YYYY-MM-DD"
+    reference_dates (list[str]): List of dates in the format "YYYY-MM-DD"
+    leading_days (int, optional): Number of leading days required. Defaults to 0.
+
+    Returns:
+    list[str]: List of days that are complete in the reference dates
+    """
+    if not isinstance(days, list) or not isinstance(reference_dates, list):
+        raise TypeError("days and reference_dates must be lists")
+
+    if not days or not reference_dates:
+        return []
+
+    reference_set = set(reference_dates)
+    max_reference_date = max(reference_dates)
+    complete_days = [
+        _day
+        for _day in days
+        if _day in reference_set
+        and str(date.fromisoformat(_day) + timedelta(days=leading_days))
+        <= max_reference_date
+    ]
+    complete_days.sort()
+    return complete_days
+
+
+def _group_consecutive_dates(dates: list[str], max_size: int) -> list[list[str]]:
+    """
+    Group dates into batches of consecutive days with at most max_size days each
+
+    Args:
+        dates (list[str]): List of dates in the format "YYYY-MM-DD"
+        max_size (int): Max number of days in a batch
+
+    Returns:
+        list[list[str]]: Sorted batches of sorted consecutive dates
+
+    Raises:
+        ValueError: If max_size is not a positive integer
+    """
+    if max_size < 1:
+        raise ValueError("max_size must be a positive integer")
+
+    batches = []
+    previous_date = None
+    for _date in sorted(set(dates)):
+        current_date = date.fromisoformat(_date)
+        if (
+            batches
+            and previous_date == current_date - timedelta(days=1)
+            and len(batches[-1]) < max_size
+        ):
+            batches[-1].append(_date)
+        else:
+            batches.append([_date])
+        previous_date = current_date
+    return batches
+
+
+def daily_image_names(name_prefix: str, days: list[str]) -> list[str]:
+    """
+    Get the asset names of the daily images of a list of days
+
+    Args:
+        name_prefix (str): Prefix of the daily image names
+        days (list[str]): Days in the format "YYYY-MM-DD"
+
+    Returns:
+        list[str]: Image names in the format "<prefix>YYYY_MM_DD"
+    """
+    if not name_prefix.endswith("_") and not name_prefix.endswith("-"):
+        name_prefix += "_"
+    return [name_prefix + _day.replace("-", "_") for _day in days]
+
+
+def _get_daily_image(
+    ee_collection: ee.imagecollection.ImageCollection,
+    day: str,
+    export_profile: dict | None = None,
+) -> ee.image.Image:
+    """
+    Get the image of a day "YYYY-MM-DD" from a collection with the daily bands encoded with
+    export_profile, or as uint8 without a profile
+    """
+    next_day = str(date.fromisoformat(day) + timedelta(days=1))
+    ee_daily_img = ee.image.Image(ee_collection.filterDate(day, next_day).first())
+    if export_profile is None:
+        return ee_daily_img.select(DAILY_BANDS).toUint8()
+    return export_profiles.apply_export_profile(
+        ee_daily_img, export_profile, DAILY_TAC_BANDS, DAILY_QA_BANDS
+    )
+
+
+def daily_export_proc(
+    daily_collection_path: str,
+    aoi_path: str,
+    dem_path: str,
+    name_prefix: str,
+    days_list: list[str] | None = None,
+    batch_size: int = DEFAULT_DAILY_BATCH_SIZE,
+    export_mode: str = "stack",
+    export_profile: dict | None = None,
+):
+    """
+    Export daily images with bands Cloud_TAC, Snow_TAC and QA_CR for the pending days.
+
+    Pending days are grouped in batches of consecutive days, so the reclass and imputation of a
+    batch shares the same buffer days. Export modes:
+        - "stack": each batch is exported in one task as a multi-band image. Once completed it's
+          split into one asset per day with gee.exports.split_stacked_exports().
+        - "parallel": one task per day. Use track_exports(max_concurrent=...) to cap the number of
+          tasks running at the same time.
+
+    Args:
+        daily_collection_path (str): Path to asset collection or folder for the daily images
+        aoi_path (str): Path to the AOI feature collection
+        dem_path (str): Path to the DEM image
+        name_prefix (str): Prefix of the daily image names
+        days_list (list[str] | None): Days to export "YYYY-MM-DD". Defaults to all days since
+            DEFAULT_START_DT.
+        batch_size (int): Max number of consecutive days in a batch. Defaults to DEFAULT_DAILY_BATCH_SIZE.
+        export_mode (str): "stack" or "parallel". Defaults to "stack".
+        export_profile (dict | None): Export profile (dtype, pyramiding policy, etc.), see
+            gee.export_profiles. Defaults to None (uint8 bands).
+
+    Returns:
+        dict: Results dictionary with the export plan and export tasks
+
+    Raises:
+        ValueError: If export_mode is not valid
+    """
+    # No error control added here since it's expected that all paths and parameters have been checked in main.py
+    # This process will not overwrite an image if it already exists in the target collection
+
+    if export_mode not in DAILY_EXPORT_MODES:
+        raise ValueError(f"Invalid daily export mode: {export_mode}")
+
+    logger.info("Starting Daily Export Process")
+
+    # Fix name prefix if doesn't end with "_" or "-"
+    if not name_prefix.endswith("_") and not name_prefix.endswith("-"):
+        name_prefix += "_"
+
+    results_dict = {
+        "frequency": "daily",
+        "images_pending_export": [],
+        "images_excluded": [],
+        "images_to_export": [],
+        "export_tasks": [],
+    }
+
+    ee_terra_ic = ee.imagecollection.ImageCollection(DEFAULT_TERRA_COLLECTION)
+    ee_aqua_ic = ee.imagecollection.ImageCollection(DEFAULT_AQUA_COLLECTION)
+    ee_aoi_fc = ee.featurecollection.FeatureCollection(aoi_path)
+    ee_dem_img = ee.image.Image(dem_path)
+    trailing_days = 2  # hardcode for now
+    leading_days = 2  # hardcode for now
+
+    if days_list:
+        date_sequence = days_list
+    else:
+        date_sequence = utils.make_dates_seq(
+            date.fromisoformat(DEFAULT_START_DT), date.today()
+        )
+
+    images_pending_export = _daily_images_pending_export(
+        expected_dates=date_sequence,
+        daily_collection_path=daily_collection_path,
+        name_prefix=name_prefix,
+    )
+
+    # Only report excluded existing if days_list is provided
+    if days_list:
+        excluded_existing = sorted(set(date_sequence) - set(images_pending_export))
+        excluded_existing = [{_day: "already exported"} for _day in excluded_existing]
+        if excluded_existing:
+            logger.info(f"Images excluded: {excluded_existing}")
+            results_dict["images_excluded"].extend(excluded_existing)
+
+    if not images_pending_export:
+        return results_dict
+
+    logger.info(f"Images pending export: {len(images_pending_export)} days")
+    results_dict["images_pending_export"] = images_pending_export
+
+    # keep only days with Terra and Aqua images and their leading buffer days
+    terra_image_dates, aqua_image_dates = async_client.run_concurrently(
+        [
+            (utils.get_collection_dates, ee_terra_ic),
+            (utils.get_collection_dates, ee_aqua_ic),
+        ]
+    )
+    images_to_export = sorted(
+        set(
+            _check_days_are_complete(
+                images_pending_export, terra_image_dates, leading_days=leading_days
+            )
+        ).intersection(
+            _check_days_are_complete(
+                images_pending_export, aqua_image_dates, leading_days=leading_days
+            )
+        )
+    )
+    images_excluded_incomplete = sorted(
+        set(images_pending_export) - set(images_to_export)
+    )
+    images_excluded_incomplete = [
+        {_day: "Day incomplete"} for _day in images_excluded_incomplete
+    ]
+    results_dict["images_excluded"].extend(images_excluded_incomplete)
+    if images_excluded_incomplete:
+        logger.info(f"Images excluded: {images_excluded_incomplete}")
+
+    if not images_to_export:
+        return results_dict
+
+    results_dict["images_to_export"] = images_to_export
+
+    batches = _group_consecutive_dates(images_to_export, batch_size)
+    logger.info(
+        f"Exporting {len(images_to_export)} days in {len(batches)} batches ({export_mode})"
+    )
+
+    export_tasks = []
+    for batch in batches:
+        image_names = daily_image_names(name_prefix, batch)
+        try:
+            # reclass and impute the batch once, including its buffer days
+            batch_dates = utils.make_dates_seq(
+                date.fromisoformat(batch[0]) - timedelta(days=trailing_days),
+                date.fromisoformat(batch[-1]) + timedelta(days=leading_days),
+            )
+            ee_cloud_snow_ic = reclass_and_impute.tac_reclass_and_impute(
+                utils.filter_collection_by_dates(ee_terra_ic, batch_dates),
+                utils.filter_collection_by_dates(ee_aqua_ic, batch_dates),
+                ee_aoi_fc,
+                ee_dem_img,
+            )
+            ee_daily_imgs = [
+                _get_daily_image(ee_cloud_snow_ic, _day, export_profile)
+                for _day in batch
+            ]
+        except Exception as e:
+            for image_name in image_names:
+                export_tasks.append(
+                    {
+                        "task": None,
+                        "image": image_name,
+                        "target": "GEE Asset",
+                        "status": "failed_to_create",
+                        "error": str(e),
+                    }
+                )
+            logger.debug(f"Export task creation failed for batch: {batch[0]}")
+            continue
+
+        if export_mode == "parallel" or len(batch) == 1:
+            for _day, image_name, ee_daily_img in zip(
+                batch, image_names, ee_daily_imgs
+            ):
+                ee_daily_img = ee_daily_img.set(
+                    "system:time_start", ee.ee_date.Date(_day).millis()
+                )
+                export_tasks.append(
+                    gee_exports.create_image_export_task(
+                        ee_daily_img,
+                        image_name,
+                        daily_collection_path,
+                        ee_aoi_fc,
+                        profile=export_profile,
+                        band_names=DAILY_BANDS,
+                    )
+                )
+            continue
+
+        # Stacked images don't start with name_prefix, so they're not taken as exported days
+        suffixes = [_day.replace("-", "_") for _day in batch]
+        stack_name = f"{STACK_NAME_PREFIX}{image_names[0]}_{suffixes[-1]}"
+        ee_stacked_img = gee_exports.stack_images(ee_daily_imgs, DAILY_BANDS, suffixes)
+        stack_task = gee_exports.create_image_export_task(
+            ee_stacked_img,
+            stack_name,
+            daily_collection_path,
+            ee_aoi_fc,
+            overwrite=True,
+            profile=export_profile,
+            band_names=[
+                f"{band}_{suffix}" for suffix in suffixes for band in DAILY_BANDS
+            ],
+        )
+        stack_task["split"] = {
+            "asset": f"{daily_collection_path}/{stack_name}",
+            "collection_path": daily_collection_path,
+            "band_names": DAILY_BANDS,
+            "profile": export_profile,
+            "images": [
+                {"image": image_name, "suffix": suffix, "time_start": _day}
+                for _day, image_name, suffix in zip(batch, image_names, suffixes)
+            ],
+        }
+        export_tasks.append(stack_task)
+
+    results_dict["export_tasks"] = export_tasks
+    return results_dict
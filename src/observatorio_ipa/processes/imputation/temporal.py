@@ -2,6 +2,7 @@
 
 import ee
 
+from observatorio_ipa.gee import call_policy
 from observatorio_ipa.gee import utils as gee_utils
 from observatorio_ipa.defaults import MILLISECONDS_IN_DAY
 
@@ -156,7 +157,7 @@ def ic_impute_tac_temporal(
     )
 
     # Convert the list of ee.Dates to simple list of numbers. Otherwise, map wont work
-    keep_dates_list = ee_keep_dates_list.getInfo()
+    keep_dates_list = call_policy.get_info(ee_keep_dates_list)
     if keep_dates_list:
         keep_dates_list = [item["value"] for item in keep_dates_list]
     else:
@@ -1,6 +1,4 @@
-from venv import logger
 import ee
-import ee.batch
 import logging
 from gee_toolbox.gee import assets
 from datetime import date
@@ -13,11 +11,27 @@ from observatorio_ipa.defaults import (
     DEFAULT_CHI_PROJECTION,
     DEFAULT_SCALE,
 )
+from observatorio_ipa.gee import asset_index
+from observatorio_ipa.gee import async_client
+from observatorio_ipa.gee import call_policy
+from observatorio_ipa.gee import export_profiles
+from observatorio_ipa.gee import exports as gee_exports
+from observatorio_ipa.gee import fingerprint
+from observatorio_ipa.gee import sharding as gee_sharding
 from observatorio_ipa.gee import utils
 from observatorio_ipa.processes import reclass_and_impute
+from observatorio_ipa.utils import tracing
 
 logger = logging.getLogger(__name__)
 
+MONTHLY_BANDS = ["Snow_TAC", "Cloud_TAC"]
+# Per pixel number of daily images in the mean of provisional images, used to fold new days
+VALID_DAYS_BAND = "Valid_days"
+MONTHLY_PROPERTIES = ["year", "month", "n_days", "provisional"]
+STACK_NAME_PREFIX = "stack_"
+TRAILING_DAYS = 2  # hardcode for now
+LEADING_DAYS = 2  # hardcode for now
+
 
 def _create_ym_sequence(start_date: date, end_date: date) -> list[str]:
     """
@@ -57,6 +71,9 @@ def _monthly_images_pending_export(
     """
     Get the dates of images that have not been exported to assets
 
+    Exported images are looked up in the shared asset index if installed (see gee.asset_index),
+    otherwise the collection is listed.
+
     Args:
         expected_dates (list[str]): List of expected dates in the format "YYYY-MM"
         monthly_collection_path (str): Path to asset collection or folder with exported images
@@ -74,19 +91,25 @@ def _monthly_images_pending_export(
     if not isinstance(expected_dates, list):
         raise TypeError("expected_dates must be a list")
 
-    # Get names of images already exported to assets
-    exported_images = assets.list_assets(
-        parent=monthly_collection_path, asset_types=["Image"]
-    )
-    exported_images = assets.get_asset_names(exported_images)
-    exported_images = [img.split("/")[-1] for img in exported_images]
+    index = asset_index.get_index()
+    if index is not None:
+        exported_image_dts = index.periods(monthly_collection_path, name_prefix)
+    else:
+        # Get names of images already exported to assets
+        exported_images = assets.list_assets(
+            parent=monthly_collection_path, asset_types=["Image"]
+        )
+        exported_images = assets.get_asset_names(exported_images)
+        exported_images = [img.split("/")[-1] for img in exported_images]
 
-    # Get only images that start with the required prefix
-    exported_images = [img for img in exported_images if img.startswith(name_prefix)]
+        # Get only images that start with the required prefix
+        exported_images = [
+            img for img in exported_images if img.startswith(name_prefix)
+        ]
 
-    # Get Year-month from image names. Expects names to end with "YYYY_MM"
-    exported_image_dts = [img[-7:] for img in exported_images]
-    exported_image_dts = [img.replace("_", "-") for img in exported_image_dts]
+        # Get Year-month from image names. Expects names to end with "YYYY_MM"
+        exported_image_dts = [img[-7:] for img in exported_images]
+        exported_image_dts = [img.replace("_", "-") for img in exported_image_dts]
 
     # Get dates of images that have not been exported
     images_pending_export = list(set(expected_dates) - set(exported_image_dts))
@@ -251,6 +274,9 @@ def _ic_monthly_mean(
     """
     Calculate the monthly mean of bands Snow_TAC and Cloud_TAC from an image collection for a given year-month
 
+    The number of daily images used is saved in property 'n_days' and used as weight by the yearly
+    export process.
+
     Args:
     ee_ym (str): Year-month string in the format "YYYY-MM"
     ee_collection (ee.imagecollection.ImageCollection): Image collection to calculate the monthly mean
@@ -276,44 +302,525 @@ def _ic_monthly_mean(
         .clip(ee_aoi_fc)
         .set("year", i_year)
         .set("month", i_month)
+        .set("n_days", selected.size())
+        .set("provisional", 0)
         .set("system:time_start", ee.ee_date.Date.fromYMD(i_year, i_month, 1).millis())
     )
 
 
-def monthly_export_proc(
+def _get_provisional_images(monthly_collection_path: str, name_prefix: str) -> dict:
+    """
+    Get the exported monthly images that are provisional (month not complete when exported)
+
+    Properties are taken from the shared asset index if installed (see gee.asset_index),
+    otherwise the properties of all exported images are read with a single request.
+
+    Args:
+        monthly_collection_path (str): Path to asset collection or folder with exported images
+        name_prefix (str): Prefix of the image names
+
+    Returns:
+        dict: Dictionary with year-month "YYYY-MM" as keys and dictionaries with the 'last_day'
+            ("YYYY-MM-DD") and 'n_days' properties of the provisional images as values
+    """
+    index = asset_index.get_index()
+    if index is not None:
+        return {
+            image["period"]: {
+                "last_day": image["properties"]["last_day"],
+                "n_days": image["properties"]["n_days"],
+            }
+            for image in index.images(monthly_collection_path, name_prefix).values()
+            if image["period"]
+            and image["properties"]
+            and image["properties"].get("provisional", 0)
+        }
+
+    exported_images = assets.list_assets(
+        parent=monthly_collection_path, asset_types=["Image"]
+    )
+    exported_images = assets.get_asset_names(exported_images)
+    exported_images = [
+        img for img in exported_images if img.split("/")[-1].startswith(name_prefix)
+    ]
+    if not exported_images:
+        return {}
+
+    ee_properties = ee.ee_list.List(
+        [
+            ee.image.Image(img).toDictionary(["provisional", "last_day", "n_days"])
+            for img in exported_images
+        ]
+    )
+    images_properties = call_policy.get_info(ee_properties)
+
+    provisional_images = {}
+    for img, img_properties in zip(exported_images, images_properties):
+        if not img_properties.get("provisional", 0):
+            continue
+        provisional_images[img[-7:].replace("_", "-")] = {
+            "last_day": img_properties["last_day"],
+            "n_days": img_properties["n_days"],
+        }
+    return provisional_images
+
+
+def _get_exported_fingerprints(monthly_collection_path: str, name_prefix: str) -> dict:
+    """
+    Get the fingerprints of the exported monthly images that are not provisional
+
+    Properties are taken from the shared asset index if installed (see gee.asset_index),
+    otherwise the properties of all exported images are read with a single request.
+
+    Args:
+        monthly_collection_path (str): Path to asset collection or folder with exported images
+        name_prefix (str): Prefix of the image names
+
+    Returns:
+        dict: Dictionary with year-month "YYYY-MM" as keys and the fingerprint of the images as
+            values, None for images exported without fingerprint
+    """
+    index = asset_index.get_index()
+    if index is not None:
+        return {
+            image["period"]: (image["properties"] or {}).get(
+                fingerprint.FINGERPRINT_PROPERTY
+            )
+            for image in index.images(monthly_collection_path, name_prefix).values()
+            if image["period"] and not (image["properties"] or {}).get("provisional", 0)
+        }
+
+    exported_images = assets.list_assets(
+        parent=monthly_collection_path, asset_types=["Image"]
+    )
+    exported_images = assets.get_asset_names(exported_images)
+    exported_images = [
+        img for img in exported_images if img.split("/")[-1].startswith(name_prefix)
+    ]
+    if not exported_images:
+        return {}
+
+    ee_properties = ee.ee_list.List(
+        [
+            ee.image.Image(img).toDictionary(
+                [fingerprint.FINGERPRINT_PROPERTY, "provisional"]
+            )
+            for img in exported_images
+        ]
+    )
+    images_properties = call_policy.get_info(ee_properties)
+
+    return {
+        img[-7:].replace("_", "-"): img_properties.get(fingerprint.FINGERPRINT_PROPERTY)
+        for img, img_properties in zip(exported_images, images_properties)
+        if not img_properties.get("provisional", 0)
+    }
+
+
+def _monthly_fingerprints(
+    months: list[str], image_versions: dict, asset_update_times: dict
+) -> dict:
+    """
+    Fingerprint the inputs of monthly images, see gee.fingerprint
+
+    The inputs of a month are the dates and ingestion versions of the Terra and Aqua images of the
+    month and its buffer days, the update times of the AOI and DEM, the NDSI threshold, the number
+    of buffer days and the code version.
+
+    Args:
+        months (list[str]): List of year-month strings in the format "YYYY-MM"
+        image_versions (dict): Versions of the daily images by collection and date, see
+            gee.fingerprint.get_image_versions()
+        asset_update_times (dict): Update times of the AOI and DEM assets
+
+    Returns:
+        dict: Dictionary with year-month "YYYY-MM" as keys and fingerprints as values
+    """
+    fingerprints = {}
+    for _month in months:
+        _month_dates = _make_month_dates_seq(
+            _month, trailing_days=TRAILING_DAYS, leading_days=LEADING_DAYS
+        )
+        inputs = {
+            "month": _month,
+            "images": {
+                collection: {
+                    _date: versions[_date]
+                    for _date in _month_dates
+                    if _date in versions
+                }
+                for collection, versions in image_versions.items()
+            },
+            "assets": asset_update_times,
+            "ndsi_threshold": reclass_and_impute.NDSI_THRESHOLD,
+            "trailing_days": TRAILING_DAYS,
+            "leading_days": LEADING_DAYS,
+            "code_version": fingerprint.code_version(),
+        }
+        fingerprints[_month] = fingerprint.make_fingerprint(inputs)
+    return fingerprints
+
+
+def _current_fingerprints(months: list[str], aoi_path: str, dem_path: str) -> dict:
+    """
+    Get the current fingerprints of monthly images from the metadata of their inputs
+
+    Args:
+        months (list[str]): List of year-month strings in the format "YYYY-MM"
+        aoi_path (str): Path to the AOI feature collection
+        dem_path (str): Path to the DEM image
+
+    Returns:
+        dict: Dictionary with year-month "YYYY-MM" as keys and fingerprints as values
+    """
+    if not months:
+        return {}
+    first_day = _get_month_range_dates(min(months), trailing_days=TRAILING_DAYS)[
+        "min_trailing_date"
+    ]
+    last_day = _get_month_range_dates(max(months), leading_days=LEADING_DAYS)[
+        "max_leading_date"
+    ]
+    image_versions = fingerprint.get_image_versions(
+        [DEFAULT_TERRA_COLLECTION, DEFAULT_AQUA_COLLECTION], first_day, last_day
+    )
+    asset_update_times = fingerprint.get_asset_update_times([aoi_path, dem_path])
+    return _monthly_fingerprints(months, image_versions, asset_update_times)
+
+
+def _last_complete_day(reference_dates: list[str], leading_days: int = 0) -> str | None:
+    """
+    Get the last date whose leading buffer days are available in reference_dates
+
+    Args:
+        reference_dates (list[str]): List of dates in the format "YYYY-MM-DD"
+        leading_days (int, optional): Number of leading days required. Defaults to 0.
+
+    Returns:
+        str | None: Date in format "YYYY-MM-DD" or None if reference_dates is empty
+    """
+    if not reference_dates:
+        return None
+    return str(
+        date.fromisoformat(max(reference_dates)) - relativedelta(days=leading_days)
+    )
+
+
+def _provisional_days_range(
+    month: str, last_complete_day: str | None, provisional_image: dict | None = None
+) -> tuple[str, str] | None:
+    """
+    Get the range of days of a month that are not yet included in its monthly image
+
+    Args:
+        month (str): Year-month string in the format "YYYY-MM"
+        last_complete_day (str | None): Last date "YYYY-MM-DD" with final imputed values
+        provisional_image (dict | None): 'last_day' and 'n_days' of the existing provisional image, if any
+
+    Returns:
+        tuple[str, str] | None: First and last day "YYYY-MM-DD" of the range, None if there are no new days
+    """
+    if last_complete_day is None:
+        return None
+
+    month_range_dts = _get_month_range_dates(month)
+    if provisional_image:
+        first_day = str(
+            date.fromisoformat(provisional_image["last_day"]) + relativedelta(days=1)
+        )
+    else:
+        first_day = month_range_dts["first_day"]
+    last_day = min(last_complete_day, month_range_dts["last_day"])
+
+    if first_day > last_day:
+        return None
+    return first_day, last_day
+
+
+def _ic_fold_monthly_mean(
+    month: str,
+    ee_collection: ee.imagecollection.ImageCollection,
+    days_range: tuple[str, str],
+    ee_aoi_fc: ee.featurecollection.FeatureCollection,
+    ee_previous_img: ee.image.Image | None = None,
+    previous_n_days: int = 0,
+    provisional: bool = True,
+) -> ee.image.Image:
+    """
+    Calculate the mean of bands Snow_TAC and Cloud_TAC of a month incrementally.
+
+    The sums and counts of the new days in days_range are folded into the mean of a previous
+    (provisional) monthly image, per pixel: (previous_mean * previous_count + sum_new_days) /
+    (previous_count + count_new_days). Like the mean of the full month (see _ic_monthly_mean()),
+    pixels are averaged over the days they are not masked and are only masked if they are masked
+    in all days. Without a previous image it's the mean of the days in days_range.
+
+    Provisional images keep the per pixel count in band VALID_DAYS_BAND. Previous images without
+    the band (exported before it was added) use previous_n_days where they're not masked.
+
+    Args:
+    month (str): Year-month string in the format "YYYY-MM"
+    ee_collection (ee.imagecollection.ImageCollection): Image collection with the daily images
+    days_range (tuple[str, str]): First and last day "YYYY-MM-DD" of the new days (inclusive)
+    ee_aoi_fc (ee.featurecollection.FeatureCollection): Area of interest feature collection
+    ee_previous_img (ee.image.Image | None): Previous monthly image. Defaults to None.
+    previous_n_days (int): Number of days in the previous monthly image. Defaults to 0.
+    provisional (bool): Set the image as provisional. Defaults to True.
+
+    Returns:
+    ee.image.Image: Image with the monthly mean up to the last day in days_range
+    """
+    first_day, last_day = days_range
+    end_date = str(date.fromisoformat(last_day) + relativedelta(days=1))
+    ee_new_days_ic = ee_collection.filterDate(first_day, end_date).select(
+        ["Snow_TAC", "Cloud_TAC"]
+    )
+    ee_n_days = ee_new_days_ic.size().add(previous_n_days)
+    ee_sum_img = ee_new_days_ic.sum().unmask(0)
+    ee_count_img = ee_new_days_ic.select("Snow_TAC").count().unmask(0)
+    if ee_previous_img is not None:
+        ee_previous_tac_img = export_profiles.unscale_image(ee_previous_img)
+        ee_previous_count_img = ee.image.Image(
+            ee.Algorithms.If(
+                ee_previous_img.bandNames().contains(VALID_DAYS_BAND),
+                ee_previous_img.select(VALID_DAYS_BAND),
+                ee.image.Image.constant(previous_n_days).updateMask(
+                    ee_previous_tac_img.select("Snow_TAC").mask()
+                ),
+            )
+        ).unmask(0)
+        ee_sum_img = ee_sum_img.add(
+            ee_previous_tac_img.multiply(ee_previous_count_img).unmask(0)
+        )
+        ee_count_img = ee_count_img.add(ee_previous_count_img)
+
+    ee_mean_img = ee_sum_img.divide(ee_count_img).updateMask(ee_count_img.gt(0))
+    if provisional:
+        ee_mean_img = ee_mean_img.addBands(
+            ee_count_img.toUint8().rename(VALID_DAYS_BAND)
+        )
+
+    i_year = int(month[0:4])
+    i_month = int(month[5:7])
+    return (
+        ee_mean_img.clip(ee_aoi_fc)
+        .set("year", i_year)
+        .set("month", i_month)
+        .set("n_days", ee_n_days)
+        .set("last_day", last_day)
+        .set("provisional", int(provisional))
+        .set("system:time_start", ee.ee_date.Date.fromYMD(i_year, i_month, 1).millis())
+    )
+
+
+def _group_months(months: list[str], stack_size: int) -> list[list[str]]:
+    """
+    Split a list of months into sorted groups of at most stack_size months
+
+    Args:
+        months (list[str]): List of year-month strings in the format "YYYY-MM"
+        stack_size (int): Max number of months in a group
+
+    Returns:
+        list[list[str]]: Groups of months
+
+    Raises:
+        ValueError: If stack_size is not a positive integer
+    """
+    if stack_size < 1:
+        raise ValueError("stack_size must be a positive integer")
+    months = sorted(months)
+    return [months[i : i + stack_size] for i in range(0, len(months), stack_size)]
+
+
+def _stacked_months_export_task(
+    months: list[str],
+    ee_collection: ee.imagecollection.ImageCollection,
+    ee_aoi_fc: ee.featurecollection.FeatureCollection,
+    monthly_collection_path: str,
+    name_prefix: str,
+    export_profile: dict | None = None,
+    fingerprints: dict | None = None,
+) -> dict:
+    """
+    Create one export task for the monthly means of several months stacked as a multi-band image.
+
+    The task includes the 'split' information used by gee.exports.split_stacked_exports() to create
+    one asset per month once the stacked image is exported.
+
+    Args:
+        months (list[str]): List of year-month strings in the format "YYYY-MM"
+        ee_collection (ee.imagecollection.ImageCollection): Image collection with the daily images
+        ee_aoi_fc (ee.featurecollection.FeatureCollection): Area of interest feature collection
+        monthly_collection_path (str): Path to asset collection or folder for the monthly images
+        name_prefix (str): Prefix of the monthly image names
+        export_profile (dict | None): Export profile. Defaults to None.
+        fingerprints (dict | None): Fingerprints of the months, kept if all months have one.
+            Defaults to None.
+
+    Returns:
+        dict: Export task dictionary of the stacked image
+    """
+    suffixes = [_month.replace("-", "_") for _month in months]
+    image_names = [name_prefix + suffix for suffix in suffixes]
+    # Stacked images don't start with name_prefix, so they're not taken as exported months
+    stack_name = f"{STACK_NAME_PREFIX}{image_names[0]}_{suffixes[-1]}"
+
+    properties = MONTHLY_PROPERTIES
+    if fingerprints and all(_month in fingerprints for _month in months):
+        properties = MONTHLY_PROPERTIES + [fingerprint.FINGERPRINT_PROPERTY]
+    ee_monthly_imgs = []
+    for _month in months:
+        ee_monthly_img = _ic_monthly_mean(_month, ee_collection, ee_aoi_fc)
+        if fingerprint.FINGERPRINT_PROPERTY in properties:
+            ee_monthly_img = ee_monthly_img.set(
+                fingerprint.FINGERPRINT_PROPERTY, fingerprints[_month]
+            )
+        ee_monthly_imgs.append(
+            export_profiles.apply_export_profile(ee_monthly_img, export_profile)
+        )
+    ee_stacked_img = gee_exports.stack_images(
+        ee_monthly_imgs, MONTHLY_BANDS, suffixes, properties=properties
+    )
+    stack_task = gee_exports.create_image_export_task(
+        ee_stacked_img,
+        stack_name,
+        monthly_collection_path,
+        ee_aoi_fc,
+        overwrite=True,
+        profile=export_profile,
+        band_names=[
+            f"{band}_{suffix}" for suffix in suffixes for band in MONTHLY_BANDS
+        ],
+    )
+    stack_task["split"] = {
+        "asset": f"{monthly_collection_path}/{stack_name}",
+        "collection_path": monthly_collection_path,
+        "band_names": MONTHLY_BANDS,
+        "properties": properties,
+        "profile": export_profile,
+        "images": [
+            {"image": image_name, "suffix": suffix, "time_start": f"{_month}-01"}
+            for _month, image_name, suffix in zip(months, image_names, suffixes)
+        ],
+    }
+    return stack_task
+
+
+def _monthly_export_tasks(
+    ee_image: ee.image.Image,
+    image_name: str,
+    monthly_collection_path: str,
+    ee_aoi_fc: ee.featurecollection.FeatureCollection,
+    overwrite: bool = False,
+    export_profile: dict | None = None,
+    shards: list[list[float]] | None = None,
+) -> list[dict]:
+    """
+    Create the export tasks of a monthly image, one per shard if shards are provided
+
+    Args:
+        ee_image (ee.image.Image): Monthly image
+        image_name (str): Name of the monthly image asset
+        monthly_collection_path (str): Path to asset collection or folder for the monthly images
+        ee_aoi_fc (ee.featurecollection.FeatureCollection): Area of interest feature collection
+        overwrite (bool): Replace the image if it already exists. Defaults to False.
+        export_profile (dict | None): Export profile. Defaults to None.
+        shards (list[list[float]] | None): Shard bounds, see gee.sharding.make_shard_grid().
+            Defaults to None (single task).
+
+    Returns:
+        list[dict]: Export tasks (not started)
+    """
+    if shards:
+        return gee_sharding.create_sharded_export_tasks(
+            ee_image,
+            image_name,
+            monthly_collection_path,
+            ee_aoi_fc,
+            shards,
+            overwrite=overwrite,
+            profile=export_profile,
+            band_names=MONTHLY_BANDS,
+        )
+    return [
+        gee_exports.create_image_export_task(
+            ee_image,
+            image_name,
+            monthly_collection_path,
+            ee_aoi_fc,
+            overwrite=overwrite,
+            profile=export_profile,
+            band_names=MONTHLY_BANDS,
+        )
+    ]
+
+
+def plan_monthly_export(
     monthly_collection_path: str,
-    aoi_path: str,
-    dem_path: str,
     name_prefix: str,
     months_list: list[str] | None = None,
-):
-    # TODO: include full image name in results (to export, excluded, etc)
-    # TODO: Improve Error handling
-    # No error control added here since it's expected that all paths and parameters have been checked in main.py
-    # This process will not overwrite an image if it already exists in the target collection
+    provisional: bool = False,
+    aoi_path: str | None = None,
+    dem_path: str | None = None,
+    revalidate: bool = False,
+) -> dict:
+    """
+    Plan the monthly export: months pending export, months complete in Terra and Aqua and the
+    dates of daily images (including buffer days) needed to calculate them.
 
-    logger.info("Starting Monthly Export Process")
+    Planning only reads metadata (asset listings, collection dates, fingerprint inputs), it doesn't
+    build images or export tasks and doesn't modify assets. Provisional images that only need
+    their 'provisional' flag updated are listed in 'images_to_finalize' and updated by
+    monthly_export_proc().
 
-    # Fix name prefix if doesn't end with "_" or "-"
-    if not name_prefix.endswith("_") and not name_prefix.endswith("-"):
-        name_prefix += "_"
+    If aoi_path and dem_path are given, the complete months to export or finalize are
+    fingerprinted (see gee.fingerprint). In revalidation mode the fingerprints of the exported
+    months are compared with the current ones: months whose inputs changed are exported again
+    ('images_to_revalidate') and images without fingerprint only get the current one
+    ('images_to_fingerprint'). If the fingerprint inputs can't be read a warning is logged and
+    images are exported without fingerprint (and not revalidated).
 
-    results_dict = {
+    Args:
+        monthly_collection_path (str): Path to asset collection or folder for the monthly images
+        name_prefix (str): Prefix of the monthly image names, ending with "_" or "-"
+        months_list (list[str] | None): Months to export "YYYY-MM". Defaults to all months since
+            DEFAULT_START_DT.
+        provisional (bool): Export incomplete months as provisional images. Defaults to False.
+        aoi_path (str | None): Path to the AOI feature collection. Defaults to None.
+        dem_path (str | None): Path to the DEM image. Defaults to None.
+        revalidate (bool): Export again the exported months whose inputs changed. Defaults to
+            False.
+
+    Returns:
+        dict: Plan dictionary with the months pending export, excluded and to export, plus
+            'full_months' (calculated from all their days), 'fold_days_ranges' (first and last
+            day folded into provisional images), 'complete_months', 'provisional_images',
+            'images_to_finalize', 'images_to_revalidate', 'images_to_fingerprint',
+            'fingerprints' and 'ic_filter_dates' (dates of the daily images to process)
+
+    Raises:
+        ValueError: If revalidate is True without aoi_path and dem_path
+    """
+    if revalidate and not (aoi_path and dem_path):
+        raise ValueError("aoi_path and dem_path are required to revalidate exports")
+
+    plan = {
         "frequency": "monthly",
         "images_pending_export": [],
         "images_excluded": [],
         "images_to_export": [],
-        "export_tasks": [],
+        "full_months": [],
+        "fold_days_ranges": {},
+        "complete_months": [],
+        "provisional_images": {},
+        "images_to_finalize": [],
+        "images_to_revalidate": [],
+        "images_to_fingerprint": {},
+        "fingerprints": {},
+        "ic_filter_dates": [],
     }
 
-    # Get terra and aqua image collections, aoi and dem image
-    ee_terra_ic = ee.imagecollection.ImageCollection(DEFAULT_TERRA_COLLECTION)
-    ee_aqua_ic = ee.imagecollection.ImageCollection(DEFAULT_AQUA_COLLECTION)
-    ee_aoi_fc = ee.featurecollection.FeatureCollection(aoi_path)
-    ee_dem_img = ee.image.Image(dem_path)
-    trailing_days = 2  # hardcode for now
-    leading_days = 2  # hardcode for now
-
     if months_list:
         year_month_sequence = months_list
     else:
@@ -322,11 +829,62 @@ def monthly_export_proc(
             start_date=date.fromisoformat(DEFAULT_START_DT), end_date=date.today()
         )
 
-    # Identify images that have not been exported
-    images_pending_export = _monthly_images_pending_export(
-        expected_dates=year_month_sequence,
-        monthly_collection_path=monthly_collection_path,
-        name_prefix=name_prefix,
+    # Identify images that have not been exported, and provisional images that are pending until
+    # their month is complete. Both list the exported images, run them concurrently
+    calls = [
+        (
+            _monthly_images_pending_export,
+            year_month_sequence,
+            monthly_collection_path,
+            name_prefix,
+        ),
+        (_get_provisional_images, monthly_collection_path, name_prefix),
+    ]
+    if revalidate:
+        calls.append((_get_exported_fingerprints, monthly_collection_path, name_prefix))
+    images_pending_export, provisional_images, *exported_fingerprints = (
+        async_client.run_concurrently(calls)
+    )
+    provisional_images = {
+        _month: _properties
+        for _month, _properties in provisional_images.items()
+        if _month in year_month_sequence
+    }
+    plan["provisional_images"] = provisional_images
+
+    # Exported months whose inputs changed are pending again
+    current_fingerprints = {}
+    if revalidate:
+        exported_fingerprints = {
+            _month: _fingerprint
+            for _month, _fingerprint in exported_fingerprints[0].items()
+            if _month in year_month_sequence and _month not in images_pending_export
+        }
+        try:
+            current_fingerprints = _current_fingerprints(
+                sorted(exported_fingerprints), aoi_path, dem_path
+            )
+        except Exception as e:
+            logger.warning(f"Exported images not revalidated, fingerprint failed: {e}")
+            exported_fingerprints = {}
+        plan["images_to_revalidate"] = sorted(
+            _month
+            for _month, _fingerprint in exported_fingerprints.items()
+            if _fingerprint and _fingerprint != current_fingerprints[_month]
+        )
+        plan["images_to_fingerprint"] = {
+            _month: current_fingerprints[_month]
+            for _month, _fingerprint in sorted(exported_fingerprints.items())
+            if not _fingerprint
+        }
+        logger.info(
+            f"Images revalidated: {len(exported_fingerprints)}, inputs changed: {plan['images_to_revalidate']}"
+        )
+
+    images_pending_export = sorted(
+        set(images_pending_export)
+        .union(provisional_images)
+        .union(plan["images_to_revalidate"])
     )
 
     logger.info(f"Images pending export: {images_pending_export}")
@@ -339,118 +897,535 @@ def monthly_export_proc(
         ]
         if excluded_existing:
             logger.info(f"Images excluded: {excluded_existing}")
-            results_dict["images_excluded"].extend(excluded_existing)
+            plan["images_excluded"].extend(excluded_existing)
 
     if not images_pending_export:
-        return results_dict
-
-    results_dict["images_pending_export"] = images_pending_export
-
-    terra_image_dates = utils.get_collection_dates(ee_terra_ic)
-    aqua_image_dates = utils.get_collection_dates(ee_aqua_ic)
+        return plan
+
+    plan["images_pending_export"] = images_pending_export
+
+    terra_image_dates, aqua_image_dates = async_client.run_concurrently(
+        [
+            (
+                utils.get_collection_dates,
+                ee.imagecollection.ImageCollection(DEFAULT_TERRA_COLLECTION),
+            ),
+            (
+                utils.get_collection_dates,
+                ee.imagecollection.ImageCollection(DEFAULT_AQUA_COLLECTION),
+            ),
+        ]
+    )
 
     # keep only months that are 'complete' in Terra and  Aqua and not expecting any additional images for that month
     t_images_to_export = _check_months_are_complete(
         images_pending_export,
         terra_image_dates,
-        trailing_days=trailing_days,
-        leading_days=leading_days,
+        trailing_days=TRAILING_DAYS,
+        leading_days=LEADING_DAYS,
     )
     a_images_to_export = _check_months_are_complete(
         images_pending_export,
         aqua_image_dates,
-        trailing_days=trailing_days,
-        leading_days=leading_days,
+        trailing_days=TRAILING_DAYS,
+        leading_days=LEADING_DAYS,
     )
 
     images_to_export = list(
         set(t_images_to_export).intersection(set(a_images_to_export))
     )
-    images_excluded_incomplete = list(
-        set(images_pending_export) - set(images_to_export)
+    images_incomplete = sorted(set(images_pending_export) - set(images_to_export))
+
+    # Days to add to each month: new days of incomplete months (provisional mode) and remaining
+    # days of completed provisional images. Other months are calculated from all their days.
+    fold_days_ranges = {}
+    last_complete_day = _last_complete_day(
+        list(set(terra_image_dates).intersection(aqua_image_dates)),
+        leading_days=LEADING_DAYS,
     )
+    if provisional:
+        for _month in images_incomplete:
+            _days_range = _provisional_days_range(
+                _month, last_complete_day, provisional_images.get(_month)
+            )
+            if _days_range:
+                fold_days_ranges[_month] = _days_range
+
+    for _month in images_to_export:
+        if _month not in provisional_images:
+            continue
+        _days_range = _provisional_days_range(
+            _month,
+            _get_month_range_dates(_month)["last_day"],
+            provisional_images[_month],
+        )
+        if _days_range:
+            fold_days_ranges[_month] = _days_range
+        else:
+            # all days already included, only the provisional flag changes
+            plan["images_to_finalize"].append(_month)
+
     images_excluded_incomplete = [
-        {_month: "Month incomplete"} for _month in images_excluded_incomplete
+        {_month: "Month incomplete"}
+        for _month in images_incomplete
+        if _month not in fold_days_ranges
     ]
-    results_dict["images_excluded"].extend(images_excluded_incomplete)
+    plan["images_excluded"].extend(images_excluded_incomplete)
     if images_excluded_incomplete:
         logger.info(f"Images excluded: {images_excluded_incomplete}")
 
+    # months calculated from all their days
+    complete_months = images_to_export
+    full_months = [
+        _month for _month in complete_months if _month not in provisional_images
+    ]
+    images_to_export = sorted(set(full_months).union(fold_days_ranges))
+    plan["complete_months"] = sorted(complete_months)
+    plan["full_months"] = full_months
+    plan["fold_days_ranges"] = fold_days_ranges
+
     if images_to_export:
         logger.info(f"Images to export: {images_to_export}")
 
+    # Fingerprints stored with the complete months exported or finalized
+    if aoi_path and dem_path:
+        fingerprint_months = [
+            _month for _month in images_to_export if _month in complete_months
+        ] + plan["images_to_finalize"]
+        plan["fingerprints"] = {
+            _month: current_fingerprints[_month]
+            for _month in fingerprint_months
+            if _month in current_fingerprints
+        }
+        try:
+            plan["fingerprints"].update(
+                _current_fingerprints(
+                    sorted(set(fingerprint_months) - set(plan["fingerprints"])),
+                    aoi_path,
+                    dem_path,
+                )
+            )
+        except Exception as e:
+            # images are exported without fingerprint, revalidation only adds the current one
+            logger.warning(
+                f"Images exported without fingerprint, fingerprint failed: {e}"
+            )
+
     if not images_to_export:
-        return results_dict
+        return plan
 
-    results_dict["images_to_export"] = images_to_export
+    plan["images_to_export"] = images_to_export
 
-    # Keep only dates of interest in Terra and Aqua image collections
+    # Dates of interest in Terra and Aqua image collections
     ic_filter_dates = []
-    for _month in images_to_export:
+    for _month in full_months:
         _month_dates = _make_month_dates_seq(
-            _month, trailing_days=trailing_days, leading_days=leading_days
+            _month, trailing_days=TRAILING_DAYS, leading_days=LEADING_DAYS
         )
         ic_filter_dates.extend(_month_dates)
+    for _first_day, _last_day in fold_days_ranges.values():
+        ic_filter_dates.extend(
+            utils.make_dates_seq(
+                date.fromisoformat(_first_day) - relativedelta(days=TRAILING_DAYS),
+                date.fromisoformat(_last_day) + relativedelta(days=LEADING_DAYS),
+            )
+        )
     ic_filter_dates = list(set(ic_filter_dates))
     ic_filter_dates.sort()
+    plan["ic_filter_dates"] = ic_filter_dates
 
-    ee_filtered_terra_ic = utils.filter_collection_by_dates(
-        ee_terra_ic, ic_filter_dates
+    return plan
+
+
+def estimate_monthly_export_cost(
+    plan: dict,
+    aoi_path: str,
+    dem_path: str,
+    export_profile: dict | None = None,
+    stack_size: int = 1,
+    region_shard_size: int | None = None,
+    max_exports: int = 10,
+) -> dict:
+    """
+    Estimate the cost of a monthly export plan without creating export tasks.
+
+    - pixels: pixels of the rasterized AOI, counted in GEE with a single request
+    - pixel_days: pixels x days of daily images processed (including buffer days)
+    - graph_bytes: size of the serialized computation graph of the first monthly image. The graph
+      is built client-side only, nothing is computed.
+    - tasks: export tasks plus split (stacked months) and mosaic (sharded months) tasks
+    - rounds: rounds of at most max_exports concurrent tasks, see gee.exports.track_exports()
+
+    Args:
+        plan (dict): Plan from plan_monthly_export()
+        aoi_path (str): Path to the AOI feature collection
+        dem_path (str): Path to the DEM image
+        export_profile (dict | None): Export profile. Defaults to None (image type unchanged).
+        stack_size (int): Number of complete months exported in a single task. Defaults to 1.
+        region_shard_size (int | None): Size in pixels of the AOI shards. Defaults to None.
+        max_exports (int): Max number of export tasks running at the same time. Defaults to 10.
+
+    Returns:
+        dict: Cost estimate with keys 'images', 'days', 'pixels', 'pixel_days', 'bytes',
+            'graph_bytes', 'shards', 'tasks' and 'rounds'
+    """
+    estimate = {
+        "images": len(plan["images_to_export"]),
+        "days": len(plan["ic_filter_dates"]),
+        "pixels": 0,
+        "pixel_days": 0,
+        "bytes": 0,
+        "graph_bytes": 0,
+        "shards": 1,
+        "tasks": 0,
+        "rounds": 0,
+    }
+    if not plan["images_to_export"]:
+        return estimate
+
+    ee_aoi_fc = ee.featurecollection.FeatureCollection(aoi_path)
+    pixels = export_profiles.count_region_pixels(ee_aoi_fc)
+    dtype = export_profile["dtype"] if export_profile else None
+    estimate["pixels"] = pixels
+    estimate["pixel_days"] = pixels * estimate["days"]
+    estimate["bytes"] = (
+        pixels
+        * len(MONTHLY_BANDS)
+        * export_profiles.DTYPE_BYTES[dtype]
+        * estimate["images"]
     )
-    ee_filtered_aqua_ic = utils.filter_collection_by_dates(ee_aqua_ic, ic_filter_dates)
 
-    # APPLY MAIN PROCESS: Snow landcover reclassification and impute process
+    # Same graph as monthly_export_proc(), up to the first monthly image
     ee_cloud_snow_ic = reclass_and_impute.tac_reclass_and_impute(
-        ee_filtered_terra_ic, ee_filtered_aqua_ic, ee_aoi_fc, ee_dem_img
+        utils.filter_collection_by_dates(
+            ee.imagecollection.ImageCollection(DEFAULT_TERRA_COLLECTION),
+            plan["ic_filter_dates"],
+        ),
+        utils.filter_collection_by_dates(
+            ee.imagecollection.ImageCollection(DEFAULT_AQUA_COLLECTION),
+            plan["ic_filter_dates"],
+        ),
+        ee_aoi_fc,
+        ee.image.Image(dem_path),
+    )
+    ee_image = export_profiles.apply_export_profile(
+        _ic_monthly_mean(plan["images_to_export"][0], ee_cloud_snow_ic, ee_aoi_fc),
+        export_profile,
     )
+    estimate["graph_bytes"] = len(ee_image.serialize())
 
-    # Calculate Monthly means
-    ee_monthly_imgs_list = ee.ee_list.List(images_to_export)
-    ee_monthly_tac_ic = ee.imagecollection.ImageCollection.fromImages(
-        ee_monthly_imgs_list.map(
-            lambda ym: _ic_monthly_mean(ym, ee_cloud_snow_ic, ee_aoi_fc)
+    if region_shard_size:
+        estimate["shards"] = len(
+            gee_sharding.make_shard_grid(ee_aoi_fc, region_shard_size)
         )
+
+    # Stacked months are not sharded, see monthly_export_proc()
+    n_full = len(plan["full_months"])
+    n_fold = len(plan["fold_days_ranges"])
+    sharded = bool(region_shard_size)
+    if stack_size > 1:
+        export_tasks = -(-n_full // stack_size) + n_fold * estimate["shards"]
+        follow_up_tasks = n_full + (n_fold if sharded else 0)
+    else:
+        export_tasks = (n_full + n_fold) * estimate["shards"]
+        follow_up_tasks = n_full + n_fold if sharded else 0
+    estimate["tasks"] = export_tasks + follow_up_tasks
+    estimate["rounds"] = -(-export_tasks // max_exports) + -(
+        -follow_up_tasks // max_exports
     )
 
-    # Create list of Export tasks for monthly images
-    monthly_img_dates = utils.get_collection_dates(ee_monthly_tac_ic)
-    monthly_img_dates.sort()
+    logger.debug(f"Monthly export cost estimate: {estimate}")
+    return estimate
 
-    export_tasks = []
-    for _month in monthly_img_dates:
-        image_name = name_prefix + _month[0:7].replace("-", "_")
+
+def monthly_export_proc(
+    monthly_collection_path: str,
+    aoi_path: str,
+    dem_path: str,
+    name_prefix: str,
+    months_list: list[str] | None = None,
+    provisional: bool = False,
+    stack_size: int = 1,
+    export_profile: dict | None = None,
+    region_shard_size: int | None = None,
+    revalidate: bool = False,
+):
+    """
+    Export monthly mean images of Snow_TAC and Cloud_TAC.
+
+    Only complete months are exported, unless provisional is True. In provisional (nowcast) mode
+    incomplete months are exported with the days available so far (property 'provisional' = 1,
+    'n_days' and 'last_day'). Provisional images are always pending: each run folds only the new
+    days into the existing mean and overwrites the image, and once the month is complete the
+    image is replaced with provisional = 0.
+
+    Complete months are exported with the fingerprint of their inputs (property 'fingerprint', see
+    gee.fingerprint). In revalidation mode exported months whose inputs changed are exported again
+    and overwritten, and images exported without fingerprint get the current one.
+
+    Args:
+        monthly_collection_path (str): Path to asset collection or folder for the monthly images
+        aoi_path (str): Path to the AOI feature collection
+        dem_path (str): Path to the DEM image
+        name_prefix (str): Prefix of the monthly image names
+        months_list (list[str] | None): Months to export "YYYY-MM". Defaults to all months since
+            DEFAULT_START_DT.
+        provisional (bool): Export incomplete months as provisional images. Defaults to False.
+        stack_size (int): Number of complete months exported in a single task as a multi-band
+            image, split afterwards into monthly assets with gee.exports.split_stacked_exports().
+            Defaults to 1 (one task per month).
+        export_profile (dict | None): Export profile (dtype, pyramiding policy, etc.), see
+            gee.export_profiles. Defaults to None (image type unchanged).
+        region_shard_size (int | None): Size in pixels of the AOI shards. Each month is exported
+            as one task per shard and mosaicked afterwards with
+            gee.sharding.complete_sharded_exports(). Defaults to None (no sharding).
+        revalidate (bool): Export again the exported months whose inputs changed. Defaults to
+            False.
+
+    Returns:
+        dict: Results dictionary with the export plan and export tasks
+    """
+    # TODO: include full image name in results (to export, excluded, etc)
+    # TODO: Improve Error handling
+    # No error control added here since it's expected that all paths and parameters have been checked in main.py
+    # This process will not overwrite an image if it already exists in the target collection
+
+    logger.info("Starting Monthly Export Process")
+
+    # Fix name prefix if doesn't end with "_" or "-"
+    if not name_prefix.endswith("_") and not name_prefix.endswith("-"):
+        name_prefix += "_"
+
+    with tracing.span("plan", frequency="monthly") as plan_span:
+        plan = plan_monthly_export(
+            monthly_collection_path,
+            name_prefix,
+            months_list,
+            provisional,
+            aoi_path=aoi_path,
+            dem_path=dem_path,
+            revalidate=revalidate,
+        )
+        plan_span.set("images_to_export", len(plan["images_to_export"]))
+    results_dict = {
+        "frequency": plan["frequency"],
+        "images_pending_export": plan["images_pending_export"],
+        "images_excluded": plan["images_excluded"],
+        "images_to_export": plan["images_to_export"],
+        "export_tasks": [],
+    }
+
+    fingerprints = plan["fingerprints"]
+    for _month in plan["images_to_finalize"]:
+        image_path = (
+            f"{monthly_collection_path}/{name_prefix}{_month.replace('-', '_')}"
+        )
+        properties = {"provisional": 0}
+        if _month in fingerprints:
+            properties[fingerprint.FINGERPRINT_PROPERTY] = fingerprints[_month]
         try:
-            ee_image = ee_monthly_tac_ic.filterDate(_month).first()
-            # ee_task = ee.batch.Export.image.toAsset(
-            #     image=ee_image,
-            #     description=image_name,
-            #     assetId=pathlib.Path(monthly_collection_path, image_name).as_posix(),
-            #     region=ee_aoi_fc,
-            #     scale=CHI_DEFAULT_SCALE,
-            #     crs=CHI_DEFAULT_PROJECTION,
-            #     max_pixels=180000000,
-            # )
-            ee_task = "mock_task"
-            export_tasks.append(
-                {
-                    "task": ee_task,
-                    "image": image_name,
-                    "target": "GEE Asset",
-                    "status": "mock_created",
-                }
-            )
-            logger.debug(f"Export task created for image: {image_name}")
+            call_policy.gee_call(ee.data.setAssetProperties, image_path, properties)
         except Exception as e:
-            export_tasks.append(
+            # still provisional, finalized in the next run
+            results_dict["export_tasks"].append(
                 {
                     "task": None,
-                    "image": image_name,
+                    "image": image_path.split("/")[-1],
                     "target": "GEE Asset",
                     "status": "failed_to_create",
                     "error": str(e),
                 }
             )
-            logger.debug(f"Export task creation failed for image: {image_name}")
+            logger.warning(f"Provisional image not finalized: {image_path}: {e}")
+            continue
+        logger.info(f"Provisional image finalized: {image_path}")
+
+    # Images exported before fingerprints only get the current one, they're not exported again
+    n_fingerprinted = 0
+    for _month, _fingerprint in plan["images_to_fingerprint"].items():
+        image_path = (
+            f"{monthly_collection_path}/{name_prefix}{_month.replace('-', '_')}"
+        )
+        try:
+            call_policy.gee_call(
+                ee.data.setAssetProperties,
+                image_path,
+                {fingerprint.FINGERPRINT_PROPERTY: _fingerprint},
+            )
+        except Exception as e:
+            logger.warning(f"Fingerprint not added to {image_path}: {e}")
+            continue
+        n_fingerprinted += 1
+    if n_fingerprinted:
+        logger.info(f"Fingerprint added to {n_fingerprinted} exported images")
+
+    if not plan["images_to_export"]:
+        return results_dict
+
+    full_months = plan["full_months"]
+    fold_days_ranges = plan["fold_days_ranges"]
+    complete_months = plan["complete_months"]
+    provisional_images = plan["provisional_images"]
+
+    # Get terra and aqua image collections, aoi and dem image
+    ee_aoi_fc = ee.featurecollection.FeatureCollection(aoi_path)
+    ee_dem_img = ee.image.Image(dem_path)
+
+    # Keep only dates of interest in Terra and Aqua image collections
+    ee_filtered_terra_ic = utils.filter_collection_by_dates(
+        ee.imagecollection.ImageCollection(DEFAULT_TERRA_COLLECTION),
+        plan["ic_filter_dates"],
+    )
+    ee_filtered_aqua_ic = utils.filter_collection_by_dates(
+        ee.imagecollection.ImageCollection(DEFAULT_AQUA_COLLECTION),
+        plan["ic_filter_dates"],
+    )
+
+    # APPLY MAIN PROCESS: Snow landcover reclassification and impute process
+    ee_cloud_snow_ic = reclass_and_impute.tac_reclass_and_impute(
+        ee_filtered_terra_ic, ee_filtered_aqua_ic, ee_aoi_fc, ee_dem_img
+    )
+
+    # Split the AOI in shards exported as separate tasks and mosaicked afterwards
+    shards = None
+    if region_shard_size:
+        if stack_size > 1:
+            logger.warning("Stacked months are not sharded, only single month exports")
+        shards = gee_sharding.make_shard_grid(ee_aoi_fc, region_shard_size)
+        logger.info(f"Monthly images exported in {len(shards)} shards")
+
+    # Calculate Monthly means
+    export_tasks = []
+    if full_months and stack_size > 1:
+        for _months in _group_months(full_months, stack_size):
+            with tracing.span("build_months", months=",".join(_months)):
+                try:
+                    export_tasks.append(
+                        _stacked_months_export_task(
+                            _months,
+                            ee_cloud_snow_ic,
+                            ee_aoi_fc,
+                            monthly_collection_path,
+                            name_prefix,
+                            export_profile=export_profile,
+                            fingerprints=fingerprints,
+                        )
+                    )
+                except Exception as e:
+                    for _month in _months:
+                        export_tasks.append(
+                            {
+                                "task": None,
+                                "image": name_prefix + _month.replace("-", "_"),
+                                "target": "GEE Asset",
+                                "status": "failed_to_create",
+                                "error": str(e),
+                            }
+                        )
+                    logger.debug(f"Export task creation failed for months: {_months}")
+
+    elif full_months:
+        ee_monthly_imgs_list = ee.ee_list.List(full_months)
+        ee_monthly_tac_ic = ee.imagecollection.ImageCollection.fromImages(
+            ee_monthly_imgs_list.map(
+                lambda ym: _ic_monthly_mean(ym, ee_cloud_snow_ic, ee_aoi_fc)
+            )
+        )
+
+        # Create list of Export tasks for monthly images
+        monthly_img_dates = utils.get_collection_dates(ee_monthly_tac_ic)
+        monthly_img_dates.sort()
+
+        for _month in monthly_img_dates:
+            with tracing.span("build_month", month=_month[0:7]):
+                image_name = name_prefix + _month[0:7].replace("-", "_")
+                try:
+                    ee_image = ee.image.Image(
+                        ee_monthly_tac_ic.filterDate(_month).first()
+                    )
+                    if _month[0:7] in fingerprints:
+                        ee_image = ee_image.set(
+                            fingerprint.FINGERPRINT_PROPERTY, fingerprints[_month[0:7]]
+                        )
+                    ee_image = export_profiles.apply_export_profile(
+                        ee_image, export_profile
+                    )
+                    export_tasks.extend(
+                        _monthly_export_tasks(
+                            ee_image,
+                            image_name,
+                            monthly_collection_path,
+                            ee_aoi_fc,
+                            # months with changed inputs replace their exported image
+                            overwrite=_month[0:7] in plan["images_to_revalidate"],
+                            export_profile=export_profile,
+                            shards=shards,
+                        )
+                    )
+                except Exception as e:
+                    export_tasks.append(
+                        {
+                            "task": None,
+                            "image": image_name,
+                            "target": "GEE Asset",
+                            "status": "failed_to_create",
+                            "error": str(e),
+                        }
+                    )
+                    logger.debug(f"Export task creation failed for image: {image_name}")
+
+    # Fold new days into provisional images, or create new provisional images
+    for _month, _days_range in sorted(fold_days_ranges.items()):
+        with tracing.span("build_month", month=_month, fold=True):
+            image_name = name_prefix + _month.replace("-", "_")
+            previous_image = provisional_images.get(_month)
+            try:
+                ee_image = _ic_fold_monthly_mean(
+                    _month,
+                    ee_cloud_snow_ic,
+                    _days_range,
+                    ee_aoi_fc,
+                    ee_previous_img=(
+                        ee.image.Image(f"{monthly_collection_path}/{image_name}")
+                        if previous_image
+                        else None
+                    ),
+                    previous_n_days=previous_image["n_days"] if previous_image else 0,
+                    provisional=_month not in complete_months,
+                )
+                if _month in fingerprints:
+                    ee_image = ee_image.set(
+                        fingerprint.FINGERPRINT_PROPERTY, fingerprints[_month]
+                    )
+                ee_image = export_profiles.apply_export_profile(
+                    ee_image,
+                    export_profile,
+                    qa_bands=(
+                        [VALID_DAYS_BAND] if _month not in complete_months else None
+                    ),
+                )
+                export_tasks.extend(
+                    _monthly_export_tasks(
+                        ee_image,
+                        image_name,
+                        monthly_collection_path,
+                        ee_aoi_fc,
+                        overwrite=previous_image is not None,
+                        export_profile=export_profile,
+                        shards=shards,
+                    )
+                )
+            except Exception as e:
+                export_tasks.append(
+                    {
+                        "task": None,
+                        "image": image_name,
+                        "target": "GEE Asset",
+                        "status": "failed_to_create",
+                        "error": str(e),
+                    }
+                )
+                logger.debug(f"Export task creation failed for image: {image_name}")
 
     results_dict["export_tasks"] = export_tasks
     return results_dict
@@ -4,6 +4,8 @@ from observatorio_ipa.defaults import DEFAULT_TERRA_COLLECTION, DEFAULT_AQUA_COL
 from . import binary
 from . import merge
 
+NDSI_THRESHOLD = 40  # NDSI_Snow_Cover values at or above the threshold are snow
+
 
 def _split_cloud_snow_bands(image):
     """
@@ -28,8 +30,12 @@ def _split_cloud_snow_bands(image):
 
 def tac_reclass_and_impute(ee_terra_ic, ee_aqua_ic, ee_aoi_fc, ee_dem_img):
     # step0 reclass snow landcover
-    ee_terra_reclass_ic = binary.ic_snow_landcover_reclass(ee_terra_ic, ee_aoi_fc, 40)
-    ee_aqua_reclass_ic = binary.ic_snow_landcover_reclass(ee_aqua_ic, ee_aoi_fc, 40)
+    ee_terra_reclass_ic = binary.ic_snow_landcover_reclass(
+        ee_terra_ic, ee_aoi_fc, NDSI_THRESHOLD
+    )
+    ee_aqua_reclass_ic = binary.ic_snow_landcover_reclass(
+        ee_aqua_ic, ee_aoi_fc, NDSI_THRESHOLD
+    )
 
     # step1 merge collections
     ee_merged_ic = merge.merge(ee_terra_reclass_ic, ee_aqua_reclass_ic)
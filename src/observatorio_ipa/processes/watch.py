@@ -0,0 +1,193 @@
+"""
+Service (daemon) mode: keep the GEE session open and poll the Terra and Aqua collections for newly
+ingested days.
+
+Each poll is a single small request: the latest 'system:time_start' of both collections, filtered
+to images ingested since the last known day. Export processes run only when a month becomes
+complete (all its days plus the leading buffer days are available in Terra and Aqua), and only for
+the newly completed months, days and years instead of planning from DEFAULT_START_DT.
+"""
+
+import logging
+import time
+from datetime import UTC as datetime_UTC
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+import ee
+
+from observatorio_ipa.defaults import DEFAULT_AQUA_COLLECTION, DEFAULT_TERRA_COLLECTION
+from observatorio_ipa.gee import call_policy
+from observatorio_ipa.gee import utils
+from observatorio_ipa.processes import monthly_export
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 3600  # seconds
+FIRST_POLL_DAYS = 62  # days looked back in the first poll
+
+
+def poll_last_dates(since: str | None = None) -> dict:
+    """
+    Get the date of the latest Terra and Aqua images with a single request
+
+    Args:
+        since (str | None): Only consider images from this date "YYYY-MM-DD". Defaults to None
+            (last FIRST_POLL_DAYS days).
+
+    Returns:
+        dict: Dictionary with keys 'terra' and 'aqua' and the date "YYYY-MM-DD" of the latest image,
+            None if there are no images since the given date
+    """
+    if since is None:
+        since = str(date.today() - timedelta(days=FIRST_POLL_DAYS))
+    ee_since_filter = ee.filter.Filter.gte(
+        "system:time_start", ee.ee_date.Date(since).millis()
+    )
+    last_ms = call_policy.get_info(
+        ee.ee_list.List(
+            [
+                ee.imagecollection.ImageCollection(collection)
+                .filter(ee_since_filter)
+                .aggregate_max("system:time_start")
+                for collection in [DEFAULT_TERRA_COLLECTION, DEFAULT_AQUA_COLLECTION]
+            ]
+        )
+    )
+
+    return {
+        sensor: (
+            datetime.fromtimestamp(_ms / 1000, datetime_UTC).strftime("%Y-%m-%d")
+            if _ms
+            else None
+        )
+        for sensor, _ms in zip(["terra", "aqua"], last_ms)
+    }
+
+
+def last_complete_day(
+    last_dates: dict, leading_days: int = monthly_export.LEADING_DAYS
+) -> str | None:
+    """
+    Get the last day with final values in Terra and Aqua, i.e. with its leading buffer days ingested
+
+    Args:
+        last_dates (dict): Latest date of each collection, see poll_last_dates()
+        leading_days (int): Number of leading days required. Defaults to monthly_export.LEADING_DAYS.
+
+    Returns:
+        str | None: Date "YYYY-MM-DD" or None if a collection has no known date
+    """
+    if not all(last_dates.values()):
+        return None
+    return str(
+        date.fromisoformat(min(last_dates.values())) - timedelta(days=leading_days)
+    )
+
+
+def months_completed(previous_day: str, current_day: str) -> list[str]:
+    """
+    Get the months whose last day is after previous_day and up to current_day
+
+    Args:
+        previous_day (str): Previous last complete day "YYYY-MM-DD"
+        current_day (str): Current last complete day "YYYY-MM-DD"
+
+    Returns:
+        list[str]: Completed months "YYYY-MM" in order
+    """
+    months = []
+    _day = date.fromisoformat(previous_day) + timedelta(days=1)
+    end_day = date.fromisoformat(current_day)
+    while _day <= end_day:
+        if (_day + timedelta(days=1)).month != _day.month:
+            months.append(_day.strftime("%Y-%m"))
+        _day += timedelta(days=1)
+    return months
+
+
+def incremental_config(config: dict, months: list[str]) -> dict:
+    """
+    Limit the export processes of a configuration to the given months
+
+    Args:
+        config (dict): Script configuration
+        months (list[str]): Completed months "YYYY-MM"
+
+    Returns:
+        dict: Copy of config with 'months_list', 'days_list' (all days of the months) and
+            'years_list' (years of the months)
+    """
+    config = config.copy()
+    config["months_list"] = list(months)
+    config["days_list"] = []
+    for _month in months:
+        first_day = date.fromisoformat(f"{_month}-01")
+        last_day = (first_day + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+        config["days_list"].extend(utils.make_dates_seq(first_day, last_day))
+    config["years_list"] = sorted({_month[:4] for _month in months})
+    return config
+
+
+def watch(
+    run_exports: Callable[[list[str]], None],
+    poll_interval: int = DEFAULT_POLL_INTERVAL,
+    max_polls: int | None = None,
+) -> None:
+    """
+    Poll Terra and Aqua for new days and run the export processes when months become complete
+
+    Polling and export errors are logged and don't stop the service. Months of a failed export
+    are kept and exported again with the months of the next poll, until their export succeeds.
+
+    Args:
+        run_exports (Callable[[list[str]], None]): Function that runs the export processes of
+            the completed months, e.g. with a configuration from incremental_config()
+        poll_interval (int): Seconds between polls. Defaults to DEFAULT_POLL_INTERVAL.
+        max_polls (int | None): Max number of polls. Defaults to None (poll until interrupted).
+    """
+    logger.info(f"Watching Terra and Aqua for new days every {poll_interval} seconds")
+    last_dates = {"terra": None, "aqua": None}
+    complete_day = None
+    failed_months = []
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        if polls:
+            time.sleep(poll_interval)
+        polls += 1
+
+        try:
+            new_dates = poll_last_dates(since=complete_day)
+        except Exception as e:
+            logger.error(f"Polling Terra and Aqua failed: {e}")
+            continue
+
+        # keep the known date of a collection without new images
+        last_dates = {
+            sensor: max(
+                filter(None, [last_dates[sensor], new_dates[sensor]]), default=None
+            )
+            for sensor in last_dates
+        }
+        new_complete_day = last_complete_day(last_dates)
+        months = []
+        if new_complete_day is not None and new_complete_day != complete_day:
+            logger.debug(f"Last complete day: {new_complete_day}")
+            # the first poll only sets the reference day
+            if complete_day:
+                months = months_completed(complete_day, new_complete_day)
+            complete_day = new_complete_day
+        if months:
+            logger.info(f"Months completed: {months}")
+        if failed_months:
+            logger.info(f"Retrying export of months: {failed_months}")
+        months = sorted(set(months).union(failed_months))
+        if not months:
+            continue
+
+        try:
+            run_exports(months)
+            failed_months = []
+        except Exception as e:
+            logger.error(f"Export of months {months} failed: {e}")
+            failed_months = months
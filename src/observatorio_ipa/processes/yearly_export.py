@@ -0,0 +1,455 @@
+import calendar
+import logging
+import ee
+from datetime import date
+from gee_toolbox.gee import assets
+
+from observatorio_ipa.defaults import DEFAULT_START_DT
+from observatorio_ipa.gee import asset_index
+from observatorio_ipa.gee import async_client
+from observatorio_ipa.gee import call_policy
+from observatorio_ipa.gee import export_profiles
+from observatorio_ipa.gee import exports as gee_exports
+from observatorio_ipa.gee import fingerprint
+
+logger = logging.getLogger(__name__)
+
+TAC_BANDS = ["Snow_TAC", "Cloud_TAC"]
+# Properties of the monthly images that change when a month is re-exported (provisional months
+# folded or finalized, months revalidated)
+MONTH_VERSION_PROPERTIES = [
+    "n_days",
+    "last_day",
+    "provisional",
+    fingerprint.FINGERPRINT_PROPERTY,
+]
+
+
+def _create_year_sequence(start_date: date, end_date: date) -> list[str]:
+    """
+    Create a list of year strings between two dates (inclusive) in the format "YYYY"
+
+    Args:
+    start_date (datetime.date): Start date
+    end_date (datetime.date): End date
+
+    Returns:
+    list[str]: List of years
+    """
+    return [str(year) for year in range(start_date.year, end_date.year + 1)]
+
+
+def _month_version(properties: dict | None) -> str | None:
+    """
+    Version of a monthly image, a hash of its MONTH_VERSION_PROPERTIES
+
+    Args:
+        properties (dict | None): Properties of the monthly image
+
+    Returns:
+        str | None: Version of the image, None if its properties are unknown
+    """
+    if properties is None:
+        return None
+    values = {key: properties.get(key) for key in MONTH_VERSION_PROPERTIES}
+    # asset listings may return integer properties as floats
+    values = {
+        key: int(value) if isinstance(value, float) and value.is_integer() else value
+        for key, value in values.items()
+    }
+    return fingerprint.make_fingerprint(values)
+
+
+def _get_exported_months(monthly_collection_path: str, name_prefix: str) -> dict:
+    """
+    Get the months already exported to assets grouped by year, with the version of their images
+
+    Exported images are looked up in the shared asset index if installed (see gee.asset_index),
+    otherwise the collection is listed and the properties of the images are read with a single
+    request.
+
+    Args:
+        monthly_collection_path (str): Path to asset collection or folder with exported monthly images
+        name_prefix (str): Prefix of the monthly image names
+
+    Returns:
+        dict: Dictionary with years "YYYY" as keys and dictionaries of months "MM" to image
+            versions (see _month_version()) as values, months sorted
+    """
+    index = asset_index.get_index()
+    if index is not None:
+        images = index.images(monthly_collection_path, name_prefix).values()
+        exported_months = {}
+        for image in sorted(images, key=lambda image: image["period"] or ""):
+            if image["period"] is None or len(image["period"]) != 7:
+                continue
+            exported_months.setdefault(image["period"][:4], {})[image["period"][5:]] = (
+                _month_version(image["properties"])
+            )
+        return exported_months
+
+    exported_images = assets.list_assets(
+        parent=monthly_collection_path, asset_types=["Image"]
+    )
+    exported_images = assets.get_asset_names(exported_images)
+    exported_images = [
+        img for img in exported_images if img.split("/")[-1].startswith(name_prefix)
+    ]
+
+    # Expects names to end with "YYYY_MM"
+    exported_images = sorted(
+        img for img in exported_images if img[-7:-3].isdigit() and img[-2:].isdigit()
+    )
+    if not exported_images:
+        return {}
+
+    ee_properties = ee.ee_list.List(
+        [
+            ee.image.Image(img).toDictionary(MONTH_VERSION_PROPERTIES)
+            for img in exported_images
+        ]
+    )
+    images_properties = call_policy.get_info(ee_properties)
+
+    exported_months = {}
+    for img, img_properties in zip(exported_images, images_properties):
+        exported_months.setdefault(img[-7:-3], {})[img[-2:]] = _month_version(
+            img_properties
+        )
+    return exported_months
+
+
+def _get_exported_years(yearly_collection_path: str, name_prefix: str) -> dict:
+    """
+    Get the years already exported to assets and the months they were built from
+
+    Months and their versions are read from the 'months' and 'month_versions' properties of the
+    yearly images, from the shared asset index if installed (see gee.asset_index) or with a single
+    request. Images without the 'months' property are returned with None, and months of images
+    without the 'month_versions' property with version None.
+
+    Args:
+        yearly_collection_path (str): Path to asset collection or folder with exported yearly images
+        name_prefix (str): Prefix of the yearly image names
+
+    Returns:
+        dict: Dictionary with years "YYYY" as keys and dictionaries of months "MM" to versions of
+            the monthly images used (or None) as values
+    """
+    index = asset_index.get_index()
+    if index is not None:
+        exported_years = {}
+        for image in index.images(yearly_collection_path, name_prefix).values():
+            if image["period"] is None or len(image["period"]) != 4:
+                continue
+            exported_years[image["period"]] = _used_months(image["properties"] or {})
+        return exported_years
+
+    exported_images = assets.list_assets(
+        parent=yearly_collection_path, asset_types=["Image"]
+    )
+    exported_images = assets.get_asset_names(exported_images)
+    exported_images = [
+        img for img in exported_images if img.split("/")[-1].startswith(name_prefix)
+    ]
+    if not exported_images:
+        return {}
+
+    # Expects names to end with "YYYY"
+    ee_properties = ee.ee_list.List(
+        [
+            ee.image.Image(img).toDictionary(["months", "month_versions"])
+            for img in exported_images
+        ]
+    )
+    images_properties = call_policy.get_info(ee_properties)
+
+    return {
+        img[-4:]: _used_months(img_properties)
+        for img, img_properties in zip(exported_images, images_properties)
+    }
+
+
+def _used_months(properties: dict) -> dict | None:
+    """
+    Months used by a yearly image and their versions, from its 'months' and 'month_versions'
+    properties
+
+    Returns:
+        dict | None: Dictionary of months "MM" to versions (None if not stored), sorted by month.
+            None if the image has no 'months' property.
+    """
+    if not properties.get("months"):
+        return None
+    months = properties["months"].split(",")
+    versions = (
+        properties["month_versions"].split(",")
+        if properties.get("month_versions")
+        else [None] * len(months)
+    )
+    return dict(sorted(zip(months, versions)))
+
+
+def _yearly_images_pending_export(
+    expected_years: list[str], exported_months: dict, exported_years: dict
+) -> tuple[list[str], list[dict]]:
+    """
+    Get the years that need a new or updated yearly image
+
+    A year is pending if it doesn't have a yearly image yet, if its yearly image was built from
+    fewer monthly images than are currently exported (partial year), or if any of the monthly
+    images it was built from was exported again since (provisional months folded or finalized,
+    months revalidated). Yearly images built before month versions were stored are updated once.
+    Yearly images without information of the months they were built from are not updated.
+
+    Args:
+        expected_years (list[str]): List of expected years in the format "YYYY"
+        exported_months (dict): Exported monthly images and their versions by year, see
+            _get_exported_months()
+        exported_years (dict): Exported yearly images by year, see _get_exported_years()
+
+    Returns:
+        tuple[list[str], list[dict]]: Years pending export and excluded years with reason
+
+    Raises:
+        TypeError: If expected_years is not a list
+    """
+    if not isinstance(expected_years, list):
+        raise TypeError("expected_years must be a list")
+
+    images_pending_export = []
+    images_excluded = []
+    for _year in sorted(set(expected_years)):
+        available_months = exported_months.get(_year, {})
+        if not available_months:
+            images_excluded.append({_year: "No monthly images"})
+            continue
+
+        if _year not in exported_years:
+            images_pending_export.append(_year)
+            continue
+
+        used_months = exported_years[_year]
+        if used_months is None:
+            images_excluded.append({_year: "already exported"})
+            continue
+
+        # months whose current version is unknown (properties not read yet) are not compared
+        changed_months = [
+            _month
+            for _month, _version in available_months.items()
+            if _month not in used_months
+            or (_version is not None and used_months[_month] != _version)
+        ]
+        if not changed_months:
+            images_excluded.append({_year: "already exported"})
+            continue
+
+        images_pending_export.append(_year)
+
+    return images_pending_export, images_excluded
+
+
+def _ic_yearly_mean(
+    year: str,
+    months: list[str],
+    monthly_collection_path: str,
+    monthly_name_prefix: str,
+    ee_aoi_fc: ee.featurecollection.FeatureCollection,
+    month_versions: list[str | None] | None = None,
+) -> ee.image.Image:
+    """
+    Calculate the yearly mean of bands Snow_TAC and Cloud_TAC from exported monthly images
+
+    Monthly means are weighted by the number of daily images used to calculate them (property
+    'n_days' of the monthly images). Monthly images without the property are weighted by the number
+    of days in the month. Monthly images exported with a scaled export profile are unscaled first.
+    Weights are applied per pixel, so masked pixels in a month don't lower the yearly mean.
+
+    The versions of the monthly images (see _month_version()) are saved in property
+    'month_versions', in the same order as property 'months', to update the yearly image when a
+    month is exported again.
+
+    Args:
+    year (str): Year in the format "YYYY"
+    months (list[str]): Months "MM" of the monthly images to use
+    monthly_collection_path (str): Path to asset collection or folder with exported monthly images
+    monthly_name_prefix (str): Prefix of the monthly image names
+    ee_aoi_fc (ee.featurecollection.FeatureCollection): Area of interest feature collection
+    month_versions (list[str | None] | None): Versions of the monthly images, in the same order as
+        months. Defaults to None (versions not saved).
+
+    Returns:
+    ee.image.Image: Image with the yearly mean of Snow_TAC and Cloud_TAC
+    """
+
+    weighted_imgs = []
+    ee_total_days = ee.ee_number.Number(0)
+    for _month in months:
+        image_path = f"{monthly_collection_path}/{monthly_name_prefix}{year}_{_month}"
+        ee_monthly_img = ee.image.Image(image_path)
+        days_in_month = calendar.monthrange(int(year), int(_month))[1]
+        ee_n_days = ee.ee_number.Number(
+            ee.Algorithms.If(
+                ee_monthly_img.propertyNames().contains("n_days"),
+                ee_monthly_img.get("n_days"),
+                days_in_month,
+            )
+        )
+        ee_tac_img = export_profiles.unscale_image(ee_monthly_img, TAC_BANDS)
+        ee_weight_img = (
+            ee.image.Image.constant(ee_n_days)
+            .toFloat()
+            .updateMask(ee_tac_img.select("Snow_TAC").mask())
+            .rename("weight")
+        )
+        weighted_imgs.append(ee_tac_img.multiply(ee_n_days).addBands(ee_weight_img))
+        ee_total_days = ee_total_days.add(ee_n_days)
+
+    ee_sum_img = ee.imagecollection.ImageCollection.fromImages(weighted_imgs).sum()
+    ee_yearly_img = ee_sum_img.select(TAC_BANDS).divide(ee_sum_img.select("weight"))
+    ee_yearly_img = (
+        ee_yearly_img.clip(ee_aoi_fc)
+        .set("year", int(year))
+        .set("months", ",".join(months))
+        .set("n_months", len(months))
+        .set("n_days", ee_total_days)
+        .set("provisional", int(len(months) < 12))
+        .set("system:time_start", ee.ee_date.Date.fromYMD(int(year), 1, 1).millis())
+    )
+    if month_versions and all(month_versions):
+        ee_yearly_img = ee_yearly_img.set("month_versions", ",".join(month_versions))
+    return ee_yearly_img
+
+
+def yearly_export_proc(
+    yearly_collection_path: str,
+    monthly_collection_path: str,
+    aoi_path: str,
+    name_prefix: str,
+    monthly_name_prefix: str,
+    years_list: list[str] | None = None,
+    export_profile: dict | None = None,
+):
+    """
+    Export yearly mean images of Snow_TAC and Cloud_TAC built from already exported monthly images.
+
+    Daily images are not reprocessed, yearly images are only weighted means of the monthly images.
+    Years with only some months exported are exported as provisional images (property
+    'provisional' = 1) and overwritten in later runs as new monthly images are exported. Years are
+    also overwritten when one of their monthly images is exported again. Monthly
+    images exported in the same run are only available after their tasks finish, so they are
+    included in the next run.
+
+    Args:
+        yearly_collection_path (str): Path to asset collection or folder for the yearly images
+        monthly_collection_path (str): Path to asset collection or folder with exported monthly images
+        aoi_path (str): Path to the AOI feature collection
+        name_prefix (str): Prefix of the yearly image names
+        monthly_name_prefix (str): Prefix of the monthly image names
+        years_list (list[str] | None): Years to export "YYYY". Defaults to all years since
+            DEFAULT_START_DT.
+        export_profile (dict | None): Export profile (dtype, pyramiding policy, etc.), see
+            gee.export_profiles. Defaults to None (image type unchanged).
+
+    Returns:
+        dict: Results dictionary with the export plan and export tasks
+    """
+    # No error control added here since it's expected that all paths and parameters have been checked in main.py
+
+    logger.info("Starting Yearly Export Process")
+
+    # Fix name prefixes if they don't end with "_" or "-"
+    if not name_prefix.endswith("_") and not name_prefix.endswith("-"):
+        name_prefix += "_"
+    if not monthly_name_prefix.endswith("_") and not monthly_name_prefix.endswith("-"):
+        monthly_name_prefix += "_"
+
+    results_dict = {
+        "frequency": "yearly",
+        "images_pending_export": [],
+        "images_excluded": [],
+        "images_to_export": [],
+        "export_tasks": [],
+    }
+
+    ee_aoi_fc = ee.featurecollection.FeatureCollection(aoi_path)
+
+    if years_list:
+        year_sequence = [str(_year) for _year in years_list]
+    else:
+        year_sequence = _create_year_sequence(
+            start_date=date.fromisoformat(DEFAULT_START_DT), end_date=date.today()
+        )
+
+    exported_months, exported_years = async_client.run_concurrently(
+        [
+            (_get_exported_months, monthly_collection_path, monthly_name_prefix),
+            (_get_exported_years, yearly_collection_path, name_prefix),
+        ]
+    )
+
+    images_pending_export, images_excluded = _yearly_images_pending_export(
+        expected_years=year_sequence,
+        exported_months=exported_months,
+        exported_years=exported_years,
+    )
+
+    # Only report excluded years if years_list is provided
+    if years_list and images_excluded:
+        logger.info(f"Images excluded: {images_excluded}")
+        results_dict["images_excluded"].extend(images_excluded)
+
+    logger.info(f"Images pending export: {images_pending_export}")
+    if not images_pending_export:
+        return results_dict
+
+    results_dict["images_pending_export"] = images_pending_export
+    results_dict["images_to_export"] = images_pending_export
+
+    export_tasks = []
+    for _year in images_pending_export:
+        image_name = name_prefix + _year
+        months = sorted(exported_months[_year])
+        try:
+            ee_image = export_profiles.apply_export_profile(
+                _ic_yearly_mean(
+                    _year,
+                    months,
+                    monthly_collection_path,
+                    monthly_name_prefix,
+                    ee_aoi_fc,
+                    month_versions=[
+                        exported_months[_year][_month] for _month in months
+                    ],
+                ),
+                export_profile,
+                TAC_BANDS,
+            )
+        except Exception as e:
+            export_tasks.append(
+                {
+                    "task": None,
+                    "image": image_name,
+                    "target": "GEE Asset",
+                    "status": "failed_to_create",
+                    "error": str(e),
+                }
+            )
+            logger.debug(f"Export task creation failed for image: {image_name}")
+            continue
+
+        export_tasks.append(
+            gee_exports.create_image_export_task(
+                ee_image,
+                image_name,
+                yearly_collection_path,
+                ee_aoi_fc,
+                overwrite=_year in exported_years,
+                profile=export_profile,
+                band_names=TAC_BANDS,
+            )
+        )
+
+    results_dict["export_tasks"] = export_tasks
+    return results_dict
@@ -0,0 +1,263 @@
+"""
+Columnar (Parquet) store of snow statistics per basin and date.
+
+The store is a directory with one partition per year (hive layout, 'year=YYYY/'). Each partition
+holds Parquet files with the columns in STATS_COLUMNS:
+    - date: day of the statistics
+    - basin_id: basin label, see gee.zonal
+    - snow_pct, cloud_pct: snow and cloud cover percentages of the basin
+    - qa_counts: number of pixels of each QA_CR value in the basin
+    - written_at: time the row was written
+
+The store is append-only. Rows are buffered and each flush writes new files in the partitions of
+their years, existing files are never rewritten. Rows are sorted by basin_id and date and written in
+small row groups, so readers of one basin skip other basins using the Parquet row group statistics,
+and skip other years using the partitions. If a date and basin are written more than once (e.g. an
+image exported again), readers keep the last written row.
+
+pyarrow is an optional dependency, only imported when the store is used.
+"""
+
+import logging
+import uuid
+from datetime import UTC, date, datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+STATS_COLUMNS = [
+    "date",
+    "basin_id",
+    "snow_pct",
+    "cloud_pct",
+    "qa_counts",
+    "written_at",
+]
+PARTITION_KEY = "year"
+DEFAULT_BATCH_SIZE = 100_000
+DEFAULT_ROW_GROUP_SIZE = 10_000
+
+
+def _import_pyarrow():
+    """Import pyarrow modules, only required when the store is used"""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "pyarrow is required to write basin statistics, install the 'parquet' extra or pyarrow"
+        ) from e
+    return pyarrow
+
+
+def stats_schema():
+    """
+    Arrow schema of the basin statistics store
+
+    Returns:
+        pyarrow.Schema: Schema with the columns in STATS_COLUMNS
+    """
+    pa = _import_pyarrow()
+    return pa.schema(
+        [
+            ("date", pa.date32()),
+            ("basin_id", pa.int32()),
+            ("snow_pct", pa.float32()),
+            ("cloud_pct", pa.float32()),
+            ("qa_counts", pa.map_(pa.uint8(), pa.int64())),
+            ("written_at", pa.timestamp("s", tz="UTC")),
+        ]
+    )
+
+
+def records_from_zonal_means(records: list[dict]) -> list[dict]:
+    """
+    Convert the records of gee.zonal.ic_zonal_means() to rows of the store
+
+    Args:
+        records (list[dict]): Records with keys 'time_start' (milliseconds), 'label', 'Snow_TAC',
+            'Cloud_TAC' and optionally 'qa_counts'
+
+    Returns:
+        list[dict]: Rows with keys date, basin_id, snow_pct, cloud_pct and qa_counts
+    """
+    return [
+        {
+            "date": datetime.fromtimestamp(record["time_start"] / 1000, UTC).date(),
+            "basin_id": int(record["label"]),
+            "snow_pct": record.get("Snow_TAC"),
+            "cloud_pct": record.get("Cloud_TAC"),
+            "qa_counts": record.get("qa_counts") or {},
+        }
+        for record in records
+    ]
+
+
+class BasinStatsWriter:
+    """
+    Buffered, append-only writer of the basin statistics store.
+
+    Rows are written when the buffer reaches batch_size rows, on flush() and when the writer is
+    closed. Use it as a context manager to write the remaining rows at the end of a run.
+
+    Args:
+        root (str | Path): Directory of the store, created if it doesn't exist
+        batch_size (int): Max number of buffered rows. Defaults to DEFAULT_BATCH_SIZE.
+        row_group_size (int): Rows per Parquet row group. Defaults to DEFAULT_ROW_GROUP_SIZE.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    ):
+        if batch_size < 1 or row_group_size < 1:
+            raise ValueError("batch_size and row_group_size must be positive integers")
+        self.root = Path(root)
+        self.batch_size = batch_size
+        self.row_group_size = row_group_size
+        self.written_files = []
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, rows: list[dict]) -> None:
+        """
+        Buffer rows, writing them if the buffer is full
+
+        Args:
+            rows (list[dict]): Rows with keys date, basin_id, snow_pct, cloud_pct and qa_counts
+        """
+        self._rows.extend(rows)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> list[Path]:
+        """
+        Write the buffered rows as new files, one per year
+
+        Returns:
+            list[Path]: Files written
+        """
+        if not self._rows:
+            return []
+
+        pa = _import_pyarrow()
+        written_at = datetime.now(UTC).replace(microsecond=0)
+        file_name = f"part-{written_at:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+
+        rows_by_year = {}
+        for row in self._rows:
+            rows_by_year.setdefault(row["date"].year, []).append(row)
+
+        written = []
+        for year, rows in sorted(rows_by_year.items()):
+            rows.sort(key=lambda row: (row["basin_id"], row["date"]))
+            table = pa.table(
+                {
+                    "date": [row["date"] for row in rows],
+                    "basin_id": [row["basin_id"] for row in rows],
+                    "snow_pct": [row["snow_pct"] for row in rows],
+                    "cloud_pct": [row["cloud_pct"] for row in rows],
+                    "qa_counts": [
+                        list((row.get("qa_counts") or {}).items()) for row in rows
+                    ],
+                    "written_at": [written_at] * len(rows),
+                },
+                schema=stats_schema(),
+            )
+            partition = self.root / f"{PARTITION_KEY}={year}"
+            partition.mkdir(parents=True, exist_ok=True)
+            pa.parquet.write_table(
+                table, partition / file_name, row_group_size=self.row_group_size
+            )
+            written.append(partition / file_name)
+
+        logger.debug(f"Wrote {len(self._rows)} basin statistics rows to {written}")
+        self.written_files.extend(written)
+        self._rows = []
+        return written
+
+    def close(self) -> None:
+        """Write the remaining buffered rows"""
+        self.flush()
+
+
+def stored_dates(root: str | Path) -> set[date]:
+    """
+    Dates with statistics in the store
+
+    Only the date column is read.
+
+    Args:
+        root (str | Path): Directory of the store
+
+    Returns:
+        set[date]: Dates of the rows in the store, empty if the store doesn't exist
+    """
+    if not Path(root).is_dir() or not any(Path(root).glob("*/*.parquet")):
+        return set()
+    pa = _import_pyarrow()
+    ds = pa.dataset
+    dataset = ds.dataset(
+        str(root),
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(PARTITION_KEY, pa.int32())]), flavor="hive"
+        ),
+    )
+    dates = dataset.to_table(columns=["date"]).column("date").unique()
+    return set(dates.to_pylist())
+
+
+def read_basin_series(
+    root: str | Path,
+    basin_id: int,
+    start_year: int | None = None,
+    end_year: int | None = None,
+):
+    """
+    Read the statistics of one basin, sorted by date.
+
+    Only the partitions of the requested years are read, and row groups of other basins are skipped.
+    If a date was written more than once, the last written row is kept.
+
+    Args:
+        root (str | Path): Directory of the store
+        basin_id (int): Basin to read
+        start_year (int | None): First year to read. Defaults to None (first year in the store).
+        end_year (int | None): Last year to read. Defaults to None (last year in the store).
+
+    Returns:
+        pyarrow.Table: Table with the columns in STATS_COLUMNS
+    """
+    pa = _import_pyarrow()
+    ds = pa.dataset
+    dataset = ds.dataset(
+        str(root),
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(PARTITION_KEY, pa.int32())]), flavor="hive"
+        ),
+    )
+    expression = ds.field("basin_id") == basin_id
+    if start_year is not None:
+        expression &= ds.field(PARTITION_KEY) >= start_year
+    if end_year is not None:
+        expression &= ds.field(PARTITION_KEY) <= end_year
+
+    table = dataset.to_table(columns=STATS_COLUMNS, filter=expression)
+    table = table.sort_by([("date", "ascending"), ("written_at", "ascending")])
+
+    # keep the last written row of each date
+    dates = table.column("date").to_pylist()
+    keep = [
+        i for i in range(len(dates)) if i == len(dates) - 1 or dates[i] != dates[i + 1]
+    ]
+    return table.take(keep)
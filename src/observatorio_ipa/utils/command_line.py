@@ -65,6 +65,15 @@ def set_argument_parser() -> argparse.ArgumentParser:
         help="Prefix for monthly images",
     )
 
+    parser.add_argument(
+        "--month-provisional",
+        dest="monthly_provisional",
+        const="True",
+        default=os.getenv("OSN_MONTHLY_PROVISIONAL", "False"),
+        help="Export incomplete months as provisional images updated with each new day",
+        action="store_const",
+    )
+
     parser.add_argument(
         # "-y",
         "--year-assets-path",
@@ -104,6 +113,27 @@ def set_argument_parser() -> argparse.ArgumentParser:
         help="GEE asset path for DEM image",
     )
 
+    parser.add_argument(
+        "--basins-asset-path",
+        dest="basins_asset_path",
+        default=os.getenv("OSN_BASINS_ASSET_PATH"),
+        help="GEE asset path for basins FeatureCollection used for basin statistics",
+    )
+
+    parser.add_argument(
+        "--basin-id-property",
+        dest="basin_id_property",
+        default=os.getenv("OSN_BASIN_ID_PROPERTY"),
+        help="Integer property of the basins used as basin_id in basin statistics",
+    )
+
+    parser.add_argument(
+        "--basin-stats-path",
+        dest="basin_stats_path",
+        default=os.getenv("OSN_BASIN_STATS_PATH"),
+        help="Local directory of the basin statistics Parquet store. Statistics of exported daily images missing from the store are appended after each run",
+    )
+
     # # Options for exporting images
     # parser.add_argument(
     #     "-e",
@@ -134,6 +164,140 @@ def set_argument_parser() -> argparse.ArgumentParser:
         help="comma-separated string of years to export '2022, 2021'.",
     )
 
+    # Export arguments
+    parser.add_argument(
+        "--max-exports",
+        dest="max_exports",
+        default=os.getenv("OSN_MAX_EXPORTS", 10),
+        type=int,
+        help="Max number of export tasks running at the same time in GEE",
+    )
+
+    parser.add_argument(
+        "--gee-requests-per-second",
+        dest="gee_requests_per_second",
+        default=os.getenv("OSN_GEE_REQUESTS_PER_SECOND", 10),
+        type=float,
+        help="Max rate of requests to GEE, shared by all concurrent calls",
+    )
+
+    parser.add_argument(
+        "--asset-index",
+        dest="asset_index",
+        default=os.getenv("OSN_ASSET_INDEX", None),
+        help="JSON file with the index of exported images kept between runs, collections are only listed incrementally",
+    )
+
+    parser.add_argument(
+        "--gee-record",
+        dest="gee_record",
+        default=os.getenv("OSN_GEE_RECORD", None),
+        help="Record all GEE requests and responses of the run to this cassette file",
+    )
+
+    parser.add_argument(
+        "--gee-replay",
+        dest="gee_replay",
+        default=os.getenv("OSN_GEE_REPLAY", None),
+        help="Replay the GEE responses of a cassette file instead of connecting to GEE (no credentials needed)",
+    )
+
+    parser.add_argument(
+        "--gee-replay-latency",
+        dest="gee_replay_latency",
+        default=os.getenv("OSN_GEE_REPLAY_LATENCY", "zero"),
+        choices=["zero", "recorded"],
+        help="Answer replayed GEE requests immediately or with their recorded latency",
+    )
+
+    parser.add_argument(
+        "--trace-file",
+        dest="trace_file",
+        default=os.getenv("OSN_TRACE_FILE", None),
+        help="Write a trace of the phases of each run to this file (Chrome trace format, open with chrome://tracing or Perfetto)",
+    )
+
+    parser.add_argument(
+        "--metrics-file",
+        dest="metrics_file",
+        default=os.getenv("OSN_METRICS_FILE", None),
+        help="Write run and export metrics to this Prometheus textfile after each run (e.g. for the node-exporter textfile collector)",
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        dest="dry_run",
+        const="True",
+        default=os.getenv("OSN_DRY_RUN", "False"),
+        help="Plan the monthly export and estimate its cost without creating export tasks",
+        action="store_const",
+    )
+
+    parser.add_argument(
+        "--revalidate",
+        dest="revalidate",
+        const="True",
+        default=os.getenv("OSN_REVALIDATE", "False"),
+        help="Export again the exported monthly images whose inputs changed (compares input fingerprints)",
+        action="store_const",
+    )
+
+    parser.add_argument(
+        "--daemon",
+        dest="daemon",
+        const="True",
+        default=os.getenv("OSN_DAEMON", "False"),
+        help="Keep running after the exports and export new months as Terra and Aqua complete them",
+        action="store_const",
+    )
+
+    parser.add_argument(
+        "--poll-interval",
+        dest="poll_interval",
+        default=os.getenv("OSN_POLL_INTERVAL", 3600),
+        type=int,
+        help="Seconds between polls of Terra and Aqua for new days in daemon mode",
+    )
+
+    parser.add_argument(
+        "--month-stack-size",
+        dest="monthly_stack_size",
+        default=os.getenv("OSN_MONTHLY_STACK_SIZE", 1),
+        type=int,
+        help="Number of months exported in a single task as a multi-band image that is split afterwards",
+    )
+
+    parser.add_argument(
+        "--region-shard-size",
+        dest="region_shard_size",
+        default=os.getenv("OSN_REGION_SHARD_SIZE", None),
+        type=int,
+        help="Size in pixels of the AOI shards monthly images are exported in and mosaicked afterwards. Default is no sharding",
+    )
+
+    parser.add_argument(
+        "--export-profile",
+        dest="export_profile",
+        default=os.getenv("OSN_EXPORT_PROFILE", "default"),
+        help="Export profile for exported images: 'default', 'float32', 'uint8' or 'uint16'",
+    )
+
+    parser.add_argument(
+        "--day-batch-size",
+        dest="daily_batch_size",
+        default=os.getenv("OSN_DAILY_BATCH_SIZE", 30),
+        type=int,
+        help="Max number of consecutive days exported in a single batch",
+    )
+
+    parser.add_argument(
+        "--day-export-mode",
+        dest="daily_export_mode",
+        default=os.getenv("OSN_DAILY_EXPORT_MODE", "stack"),
+        help="'stack' exports each batch of days as one multi-band image that is split afterwards, 'parallel' exports one task per day",
+        choices=["stack", "parallel"],
+    )
+
     # Logging arguments
     parser.add_argument(
         "-l",
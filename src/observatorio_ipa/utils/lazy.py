@@ -0,0 +1,44 @@
+"""
+Lazy imports of heavy modules (ee, gee_toolbox, dateutil and the modules that use them).
+
+lazy_import() returns a module that is only executed on first attribute access, so code paths that
+don't need the module (--help, config validation) don't pay for importing it. The module is
+registered in sys.modules as usual, so later imports get the same module and it can be patched in
+tests as any other module.
+"""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Import a module lazily
+
+    Args:
+        name (str): Full name of the module, e.g. 'ee' or 'observatorio_ipa.gee.exports'
+
+    Returns:
+        ModuleType: Module, loaded on first attribute access
+
+    Raises:
+        ModuleNotFoundError: If the module doesn't exist
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    # also set the module as attribute of its parent package, as a regular import does
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -0,0 +1,299 @@
+"""
+Run and export health metrics written as a Prometheus textfile for the node-exporter textfile
+collector.
+
+The file is replaced at the end of each run (written to a temporary file and renamed, so the
+collector never reads a partial file) with gauges of the last run:
+
+- osn_run_duration_seconds, osn_run_end_timestamp_seconds
+- osn_stage_duration_seconds{stage}: phases of the run (see utils.tracing)
+- osn_images_pending{frequency}, osn_images_to_export{frequency}: export plans
+- osn_images_exported, osn_images_failed: final status of the images (split from stacks and
+  mosaicked from shards included)
+- osn_export_tasks{kind,status}: export tasks, intermediate tasks (stacks, shards) included
+- osn_export_task_queued_seconds{image}, osn_export_task_running_seconds{image}: time from task
+  creation to start and from start to the last update, from the task timestamps reported by GEE
+- osn_export_task_eecu_seconds{image}: EECU seconds of the task, when GEE reports them
+- osn_catalog_lag_days{collection}: days since the latest image of the source collections
+"""
+
+import logging
+import os
+from datetime import date
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "osn_"
+EXPORTED_STATUS = ["completed"]
+FAILED_STATUS = [
+    "failed",
+    "cancelled",
+    "failed_to_create",
+    "failed_to_start",
+    "failed_to_get_status",
+]
+
+# name: (type, help)
+METRICS = {
+    "run_duration_seconds": ("gauge", "Duration of the last run"),
+    "run_end_timestamp_seconds": ("gauge", "Unix time when the last run finished"),
+    "stage_duration_seconds": ("gauge", "Duration of the stages of the last run"),
+    "images_pending": ("gauge", "Images pending export in the last run"),
+    "images_to_export": ("gauge", "Images exported or attempted in the last run"),
+    "images_exported": ("gauge", "Images exported in the last run"),
+    "images_failed": ("gauge", "Images that failed to export in the last run"),
+    "export_tasks": ("gauge", "Export tasks of the last run by kind and status"),
+    "export_task_queued_seconds": (
+        "gauge",
+        "Time export tasks waited in the GEE queue before running",
+    ),
+    "export_task_running_seconds": ("gauge", "Time export tasks were running"),
+    "export_task_eecu_seconds": (
+        "gauge",
+        "EECU seconds used by export tasks, as reported by GEE",
+    ),
+    "catalog_lag_days": (
+        "gauge",
+        "Days since the latest image of the source collections",
+    ),
+}
+
+
+def _escape(value) -> str:
+    """Escape a label value"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def task_kind(task: dict) -> str:
+    """
+    Kind of an export task
+
+    Returns:
+        str: 'stack' (stacked images, see gee.exports.split_stacked_exports()), 'split' (image
+            split from a stack), 'shard' (see gee.sharding), 'mosaic' (image mosaicked from its
+            shards) or 'image'
+    """
+    if "split" in task:
+        return "stack"
+    if "stack" in task:
+        return "split"
+    if "shard" in task:
+        return "shard"
+    if "shard_assets" in task:
+        return "mosaic"
+    return "image"
+
+
+def latest_attempts(export_tasks: list[dict]) -> list[dict]:
+    """
+    Drop the shard tasks replaced by a retry (see gee.sharding.complete_sharded_exports())
+
+    Args:
+        export_tasks (list[dict]): Export tasks, retries after the tasks they replace
+
+    Returns:
+        list[dict]: Export tasks with only the last attempt of each shard
+    """
+    latest = {}
+    for i, task in enumerate(export_tasks):
+        if "shard" in task:
+            key = (task["shard"]["image"], task["shard"]["index"])
+        else:
+            key = i
+        latest[key] = task
+    return list(latest.values())
+
+
+def image_statuses(export_tasks: list[dict]) -> dict[str, str]:
+    """
+    Final status of the images of a run
+
+    Images are exported by single tasks, split from stacks or mosaicked from shards. Stacked images
+    that failed count as failed for all their images, and sharded images that were not mosaicked
+    take the status of their first unfinished shard.
+
+    Args:
+        export_tasks (list[dict]): Export tasks, see latest_attempts()
+
+    Returns:
+        dict[str, str]: Dictionary with image names as keys and task status as values
+    """
+    statuses = {}
+    for task in export_tasks:
+        kind = task_kind(task)
+        status = task.get("status", "pending")
+        if kind in ["image", "split", "mosaic"]:
+            statuses[task["image"]] = status
+        elif kind == "stack" and status != "completed":
+            for image in task["split"]["images"]:
+                statuses.setdefault(image["image"], status)
+
+    shard_statuses = {}
+    for task in export_tasks:
+        if task_kind(task) == "shard":
+            shard_statuses.setdefault(task["shard"]["image"], []).append(
+                task.get("status", "pending")
+            )
+    for image, _statuses in shard_statuses.items():
+        if image not in statuses:
+            unfinished = [status for status in _statuses if status != "completed"]
+            statuses[image] = unfinished[0] if unfinished else "pending"
+    return statuses
+
+
+def task_metrics(export_tasks: list[dict]) -> dict:
+    """
+    Metrics of export tasks: images exported and failed, tasks by kind and status, queued and
+    running time, and EECU usage
+
+    Images are counted from their final tasks (see image_statuses()). Task counts include the
+    intermediate tasks (stacks, shards) and the shard attempts replaced by a retry. Queued time is
+    the time from creation to start of the task and running time the time from start to the last
+    update, only available for tasks that GEE started.
+
+    Args:
+        export_tasks (list[dict]): Export tasks of the run: tasks returned by
+            gee.exports.track_exports() followed by the split, retry and mosaic tasks
+
+    Returns:
+        dict: Dictionary of metric names to lists of (labels, value) samples
+    """
+    export_tasks = [task for task in export_tasks if isinstance(task, dict)]
+    task_counts = {}
+    for task in export_tasks:
+        key = (task_kind(task), task.get("status", "pending"))
+        task_counts[key] = task_counts.get(key, 0) + 1
+
+    final_tasks = latest_attempts(export_tasks)
+    statuses = list(image_statuses(final_tasks).values())
+
+    queued, running, eecu = [], [], []
+    for task in final_tasks:
+        labels = {"image": task["image"]}
+        created = task.get("creation_timestamp_ms")
+        started = task.get("start_timestamp_ms")
+        updated = task.get("update_timestamp_ms")
+        if created is not None and started is not None:
+            queued.append((labels, max(0, started - created) / 1000))
+            if updated is not None:
+                running.append((labels, max(0, updated - started) / 1000))
+        if task.get("batch_eecu_usage_seconds") is not None:
+            eecu.append((labels, task["batch_eecu_usage_seconds"]))
+
+    return {
+        "export_tasks": [
+            ({"kind": kind, "status": status}, count)
+            for (kind, status), count in sorted(task_counts.items())
+        ],
+        "images_exported": [
+            ({}, sum(status in EXPORTED_STATUS for status in statuses))
+        ],
+        "images_failed": [({}, sum(status in FAILED_STATUS for status in statuses))],
+        "export_task_queued_seconds": queued,
+        "export_task_running_seconds": running,
+        "export_task_eecu_seconds": eecu,
+    }
+
+
+def run_metrics(
+    run_duration: float,
+    stage_durations: dict[str, float],
+    export_plans: list[dict],
+    export_tasks: list[dict],
+    last_dates: dict[str, str | None] | None = None,
+    end_time: float | None = None,
+    today: date | None = None,
+) -> dict:
+    """
+    Metrics of a run
+
+    Args:
+        run_duration (float): Duration of the run in seconds
+        stage_durations (dict[str, float]): Durations in seconds of the stages of the run
+        export_plans (list[dict]): Results of the export processes, with keys 'frequency',
+            'images_pending_export' and 'images_to_export'
+        export_tasks (list[dict]): Export tasks returned by gee.exports.track_exports()
+        last_dates (dict[str, str | None] | None): Date "YYYY-MM-DD" of the latest image of each
+            source collection, see processes.watch.poll_last_dates(). Defaults to None (no
+            catalog lag).
+        end_time (float | None): Unix time of the end of the run. Defaults to None (no end time).
+        today (date | None): Reference date of the catalog lag. Defaults to None (today).
+
+    Returns:
+        dict: Dictionary of metric names to lists of (labels, value) samples
+    """
+    metrics = {
+        "run_duration_seconds": [({}, run_duration)],
+        "stage_duration_seconds": [
+            ({"stage": stage}, duration)
+            for stage, duration in sorted(stage_durations.items())
+        ],
+        "images_pending": [
+            ({"frequency": plan["frequency"]}, len(plan["images_pending_export"]))
+            for plan in export_plans
+        ],
+        "images_to_export": [
+            ({"frequency": plan["frequency"]}, len(plan["images_to_export"]))
+            for plan in export_plans
+        ],
+    }
+    if end_time is not None:
+        metrics["run_end_timestamp_seconds"] = [({}, end_time)]
+    metrics.update(task_metrics(export_tasks))
+
+    if last_dates:
+        today = today or date.today()
+        metrics["catalog_lag_days"] = [
+            ({"collection": collection}, (today - date.fromisoformat(last_date)).days)
+            for collection, last_date in sorted(last_dates.items())
+            if last_date
+        ]
+    return metrics
+
+
+def format_metrics(metrics: dict) -> str:
+    """
+    Format metrics in the Prometheus text exposition format
+
+    Args:
+        metrics (dict): Dictionary of metric names (without METRIC_PREFIX) to lists of
+            (labels, value) samples. Metrics without samples are left out.
+
+    Returns:
+        str: Metrics text
+    """
+    lines = []
+    for name, samples in metrics.items():
+        if not samples:
+            continue
+        metric_type, metric_help = METRICS.get(name, ("gauge", name))
+        full_name = METRIC_PREFIX + name
+        lines.append(f"# HELP {full_name} {metric_help}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        for labels, value in samples:
+            if labels:
+                label_str = ",".join(
+                    f'{key}="{_escape(label)}"' for key, label in labels.items()
+                )
+                lines.append(f"{full_name}{{{label_str}}} {value}")
+            else:
+                lines.append(f"{full_name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: str | Path, metrics: dict) -> None:
+    """
+    Write metrics to a textfile, replacing it atomically
+
+    Args:
+        path (str | Path): Metrics file, should end with '.prom' for the textfile collector
+        metrics (dict): Dictionary of metric names to lists of (labels, value) samples
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(format_metrics(metrics))
+    os.replace(tmp_path, path)
+    logger.info(f"Metrics written to {path}")
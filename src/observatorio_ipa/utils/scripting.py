@@ -6,7 +6,11 @@ from datetime import datetime
 from .messaging import EmailSender, parse_emails, get_template
 from . import dates
 from . import lists
-from ..gee import assets as gee_assets
+from .lazy import lazy_import
+
+# only needed to check assets, loads ee and gee_toolbox
+gee_assets = lazy_import("observatorio_ipa.gee.assets")
+gee_async = lazy_import("observatorio_ipa.gee.async_client")
 
 logger = logging.getLogger(__name__)
 
@@ -147,6 +151,18 @@ def init_config(config: dict) -> dict:
     # convert to lists
     parse_to_lists(config)  # ? does this change the original config in-place?
 
+    if "monthly_provisional" in config:
+        config["monthly_provisional"] = parse_to_bool(config["monthly_provisional"])
+
+    if "dry_run" in config:
+        config["dry_run"] = parse_to_bool(config["dry_run"])
+
+    if "daemon" in config:
+        config["daemon"] = parse_to_bool(config["daemon"])
+
+    if "revalidate" in config:
+        config["revalidate"] = parse_to_bool(config["revalidate"])
+
     check_required_config(config)
 
     return config
@@ -197,9 +213,13 @@ def check_required_config(config: dict) -> dict:
     """
     logger.debug("Checking required config parameters...")
 
-    if config["service_credentials_file"] is None:
+    # Replayed runs don't connect to GEE
+    if config["service_credentials_file"] is None and not config.get("gee_replay"):
         raise ValueError("Service credentials file is required.")
 
+    if config.get("gee_record") and config.get("gee_replay"):
+        raise ValueError("GEE requests can't be recorded and replayed in the same run.")
+
     if (
         not config.get("daily_assets_path", False)
         and not config.get("monthly_assets_path", False)
@@ -226,6 +246,20 @@ def check_required_config(config: dict) -> dict:
     if config.get("yearly_assets_path", False):
         if not config.get("yearly_image_prefix", False):
             raise ValueError("Yearly image prefix is required for yearly export.")
+        # yearly images are built from the exported monthly images
+        if not config.get("monthly_assets_path", False):
+            raise ValueError("Monthly assets path is required for yearly export.")
+
+    if config.get("basin_stats_path", False):
+        # basin statistics are computed from the exported daily images
+        if not config.get("daily_assets_path", False):
+            raise ValueError("Daily assets path is required for basin statistics.")
+        if not config.get("basins_asset_path", False) or not config.get(
+            "basin_id_property", False
+        ):
+            raise ValueError(
+                "Basins asset path and basin id property are required for basin statistics."
+            )
 
     if config.get("months_list", False):
         if not dates.check_valid_date_list(config["days_list"]):
@@ -367,30 +401,66 @@ def check_required_assets(config: dict) -> bool:
         ValueError: If any of the required assets does not exist.
     """
     logger.debug("Checking required assets...")
+    checks = []  # (error message, check function, arguments)
     # ? daily IC
     if config.get("daily_assets_path", False):
-        if not gee_assets.check_container_exists(config["daily_assets_path"]):
-            raise ValueError(
-                f"Daily IC folder not found: {config['daily_assets_path']}"
+        checks.append(
+            (
+                f"Daily IC folder not found: {config['daily_assets_path']}",
+                gee_assets.check_container_exists,
+                (config["daily_assets_path"],),
             )
+        )
     # ? monthly IC
     if config.get("monthly_assets_path", False):
-        if not gee_assets.check_container_exists(config["monthly_assets_path"]):
-            raise ValueError(
-                f"Monthly IC folder not found: {config['monthly_assets_path']}"
+        checks.append(
+            (
+                f"Monthly IC folder not found: {config['monthly_assets_path']}",
+                gee_assets.check_container_exists,
+                (config["monthly_assets_path"],),
             )
+        )
     # ? yearly IC
     if config.get("yearly_assets_path", False):
-        if not gee_assets.check_container_exists(config["yearly_assets_path"]):
-            raise ValueError(
-                f"Yearly IC folder not found: {config['yearly_assets_path']}"
+        checks.append(
+            (
+                f"Yearly IC folder not found: {config['yearly_assets_path']}",
+                gee_assets.check_container_exists,
+                (config["yearly_assets_path"],),
+            )
+        )
+
+    # ? Basins
+    if config.get("basin_stats_path", False):
+        checks.append(
+            (
+                f"Basins FeatureCollection not found: {config['basins_asset_path']}",
+                gee_assets.check_asset_exists,
+                (config["basins_asset_path"], "TABLE"),
             )
+        )
 
     # ? AOI
-    if not gee_assets.check_asset_exists(config["aoi_asset_path"], "TABLE"):
-        raise ValueError(f"AOI FeatureCollection not found: {config['aoi_asset_path']}")
+    checks.append(
+        (
+            f"AOI FeatureCollection not found: {config['aoi_asset_path']}",
+            gee_assets.check_asset_exists,
+            (config["aoi_asset_path"], "TABLE"),
+        )
+    )
     # ? DEM
-    if not gee_assets.check_asset_exists(config["dem_asset_path"], "IMAGE"):
-        raise ValueError(f"DEM image not found: {config['dem_asset_path']}")
+    checks.append(
+        (
+            f"DEM image not found: {config['dem_asset_path']}",
+            gee_assets.check_asset_exists,
+            (config["dem_asset_path"], "IMAGE"),
+        )
+    )
+
+    # Checks are independent, run them concurrently and report the first missing asset
+    results = gee_async.run_concurrently([(check, *args) for _, check, args in checks])
+    for (err_message, _, _), exists in zip(checks, results):
+        if not exists:
+            raise ValueError(err_message)
 
     return True
@@ -0,0 +1,223 @@
+"""
+Nested trace spans of a run, written in the Chrome trace event format.
+
+Spans measure the phases of a run (run -> planning -> graph build of each month -> task submit ->
+tracking -> email) with attributes such as the month or task id, and counters such as the number
+of GEE calls made inside them (see gee.call_policy). The trace file can be opened with
+chrome://tracing or https://ui.perfetto.dev to see which phase grew when a run takes longer.
+
+Tracing is off until start() is called, spans are then a no-op. e.g.:
+
+    tracing.start()
+    with tracing.span("planning", frequency="monthly") as _span:
+        ...
+        _span.set("months", 3)
+    tracing.write_chrome_trace("trace.json")
+
+Spans are nested per thread through a context variable. gee.async_client runs calls with the
+context of the caller, so calls on its threads count in the spans of the caller.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+logger = logging.getLogger(__name__)
+
+_current_spans = contextvars.ContextVar("current_spans", default=())
+
+
+class Span:
+    """
+    A timed phase of the run with attributes and counters
+
+    Args:
+        name (str): Name of the span
+        attributes (dict | None): Attributes of the span. Defaults to None.
+        parent (Span | None): Span this span is nested in. Defaults to None.
+    """
+
+    def __init__(
+        self, name: str, attributes: dict | None = None, parent: "Span | None" = None
+    ):
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.counters = {}
+        self.start = time.perf_counter()
+        self.end = None
+        self.thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+
+    def set(self, key: str, value: Any) -> None:
+        """Set an attribute of the span"""
+        self.attributes[key] = value
+
+    def add(self, counter: str, value: int = 1) -> None:
+        """Add to a counter of the span"""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    @property
+    def duration(self) -> float | None:
+        """Duration in seconds, None if the span is open"""
+        return None if self.end is None else self.end - self.start
+
+
+class _NoopSpan:
+    """Span used when tracing is off"""
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def add(self, counter: str, value: int = 1) -> None:
+        pass
+
+
+class Tracer:
+    """Collects the finished spans of a run"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def finish(self, span: Span) -> None:
+        span.end = time.perf_counter()
+        with self._lock:
+            self.spans.append(span)
+
+    def durations(self, parent: Span) -> dict[str, float]:
+        """
+        Durations of the finished spans directly nested in a span
+
+        Args:
+            parent (Span): Parent span, e.g. the 'run' span
+
+        Returns:
+            dict[str, float]: Dictionary with span names as keys and total durations in seconds
+                as values
+        """
+        durations = {}
+        with self._lock:
+            for span in self.spans:
+                if span.parent is parent:
+                    durations[span.name] = durations.get(span.name, 0) + span.duration
+        return durations
+
+    def chrome_trace(self) -> dict:
+        """
+        Spans as Chrome trace events
+
+        Returns:
+            dict: Trace with 'traceEvents' (complete events, phase 'X', times in microseconds)
+        """
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        events = [
+            {
+                "name": span.name,
+                "ph": "X",
+                "ts": round((span.start - self.origin) * 1e6),
+                "dur": round(span.duration * 1e6),
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {**span.attributes, **span.counters},
+            }
+            for span in sorted(spans, key=lambda _span: _span.start)
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+_tracer = None
+_NOOP_SPAN = _NoopSpan()
+
+
+def start() -> Tracer:
+    """Start collecting spans, discarding the spans of a previous trace"""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop() -> None:
+    """Stop collecting spans"""
+    global _tracer
+    _tracer = None
+
+
+def get_tracer() -> Tracer | None:
+    """Current tracer, None if tracing is off"""
+    return _tracer
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span | _NoopSpan]:
+    """
+    Measure a block of code as a span nested in the current span
+
+    Args:
+        name (str): Name of the span, e.g. 'planning'
+        **attributes: Attributes of the span, e.g. month="2023-01"
+
+    Yields:
+        Span: Span to add attributes and counters to (no-op if tracing is off)
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+
+    spans = _current_spans.get()
+    _span = Span(name, attributes, parent=spans[-1] if spans else None)
+    token = _current_spans.set(spans + (_span,))
+    try:
+        yield _span
+    except BaseException as e:
+        _span.set("error", str(e) or type(e).__name__)
+        raise
+    finally:
+        _current_spans.reset(token)
+        tracer.finish(_span)
+
+
+def count(counter: str, value: int = 1) -> None:
+    """
+    Add to a counter of the current span and the spans it's nested in
+
+    Args:
+        counter (str): Name of the counter, e.g. 'gee_calls'
+        value (int): Value to add. Defaults to 1.
+    """
+    for _span in _current_spans.get():
+        _span.add(counter, value)
+
+
+def current_span() -> Span | _NoopSpan:
+    """Innermost open span, a no-op span if there is none"""
+    spans = _current_spans.get()
+    return spans[-1] if spans else _NOOP_SPAN
+
+
+def write_chrome_trace(path: str | Path) -> None:
+    """
+    Write the spans collected so far as a Chrome trace JSON file
+
+    Args:
+        path (str | Path): Trace file
+    """
+    if _tracer is None:
+        logger.warning("Tracing is off, no trace written")
+        return
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(_tracer.chrome_trace(), f, default=str)
+    logger.info(f"Trace written to {path}")
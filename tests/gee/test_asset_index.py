@@ -0,0 +1,156 @@
+import json
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from observatorio_ipa.gee import asset_index
+from observatorio_ipa.gee.asset_index import AssetIndex, image_period
+
+COLLECTION = "projects/test/assets/monthly"
+
+
+def make_asset(name, update_time="2024-01-01T00:00:00Z", properties=None):
+    return {
+        "type": "IMAGE",
+        "name": f"{COLLECTION}/{name}",
+        "updateTime": update_time,
+        "properties": properties or {},
+    }
+
+
+@pytest.fixture
+def mock_list_assets(mocker):
+    return mocker.patch(
+        "observatorio_ipa.gee.asset_index.ee.data.listAssets",
+        return_value={
+            "assets": [
+                make_asset("monthly_2024_01", properties={"provisional": 0}),
+                make_asset(
+                    "monthly_2024_02",
+                    properties={"provisional": 1, "last_day": "2024-02-20"},
+                ),
+                make_asset("stack_monthly_2024_03_2024_04"),
+                {"type": "IMAGE_COLLECTION", "name": f"{COLLECTION}/other"},
+            ]
+        },
+    )
+
+
+class TestImagePeriod:
+    @pytest.mark.parametrize(
+        "name, expected",
+        [
+            ("monthly_2024_01", "2024-01"),
+            ("monthly_2024_01_15", "2024-01-15"),
+            ("monthly_2024", "2024"),
+            ("monthly_2024_01_shard_0", None),
+            ("other_2024_01", None),
+        ],
+    )
+    def test_period(self, name, expected):
+        assert image_period(name, "monthly_") == expected
+
+
+class TestAssetIndex:
+    def test_first_use_lists_collection(self, mock_list_assets):
+        index = AssetIndex()
+        assert index.periods(COLLECTION, "monthly_") == {"2024-01", "2024-02"}
+        mock_list_assets.assert_called_once_with({"parent": COLLECTION})
+
+    def test_lookups_within_refresh_interval_dont_list(self, mock_list_assets):
+        index = AssetIndex()
+        index.periods(COLLECTION, "monthly_")
+        index.images(COLLECTION, "monthly_")
+        assert mock_list_assets.call_count == 1
+
+    def test_images_properties(self, mock_list_assets):
+        images = AssetIndex().images(COLLECTION, "monthly_")
+        assert images["monthly_2024_02"]["properties"]["last_day"] == "2024-02-20"
+        assert images["monthly_2024_02"]["period"] == "2024-02"
+        assert "stack_monthly_2024_03_2024_04" not in images
+
+    def test_incremental_refresh(self, mock_list_assets):
+        index = AssetIndex()
+        index.refresh(COLLECTION)
+        mock_list_assets.return_value = {
+            "assets": [make_asset("monthly_2024_03", "2024-04-01T00:00:00Z")]
+        }
+        assert index.refresh(COLLECTION) == 1
+        params = mock_list_assets.call_args.args[0]
+        assert params["filter"].startswith('updateTime > "')
+        assert index.periods(COLLECTION, "monthly_") == {
+            "2024-01",
+            "2024-02",
+            "2024-03",
+        }
+
+    def test_failed_incremental_refresh_lists_all(self, mock_list_assets):
+        index = AssetIndex()
+        index.refresh(COLLECTION)
+        assets = mock_list_assets.return_value
+        mock_list_assets.side_effect = [Exception("Invalid filter"), assets]
+        index.refresh(COLLECTION)
+        assert "filter" not in mock_list_assets.call_args.args[0]
+
+    def test_full_refresh_drops_deleted_images(self, mock_list_assets):
+        index = AssetIndex(full_refresh_days=0)
+        index.refresh(COLLECTION)
+        mock_list_assets.return_value = {"assets": [make_asset("monthly_2024_01")]}
+        index.refresh(COLLECTION)
+        assert "filter" not in mock_list_assets.call_args.args[0]
+        assert index.periods(COLLECTION, "monthly_") == {"2024-01"}
+
+    def test_update_from_tasks(self, mock_list_assets):
+        index = AssetIndex()
+        index.refresh(COLLECTION)
+        tasks = [
+            {"status": "completed", "asset_id": f"{COLLECTION}/monthly_2024_05"},
+            {"status": "failed", "asset_id": f"{COLLECTION}/monthly_2024_06"},
+            {
+                "status": "completed",
+                "asset_id": f"{COLLECTION}/stack_monthly_2024_07_2024_08",
+                "split": {},
+            },
+        ]
+        assert index.update_from_tasks(tasks) == 1
+        images = index.images(COLLECTION, "")
+        assert images["monthly_2024_05"]["properties"] is None
+        assert "monthly_2024_06" not in images
+        assert "stack_monthly_2024_07_2024_08" not in images
+        assert mock_list_assets.call_count == 1
+
+    def test_saved_between_runs(self, mock_list_assets, tmp_path):
+        path = tmp_path / "index.json"
+        AssetIndex(path).refresh(COLLECTION)
+        assert json.loads(path.read_text())["version"] == 1
+
+        mock_list_assets.return_value = {"assets": []}
+        index = AssetIndex(path, refresh_interval=0)
+        assert index.periods(COLLECTION, "monthly_") == {"2024-01", "2024-02"}
+        assert "filter" in mock_list_assets.call_args.args[0]
+
+    def test_invalid_file_rebuilt(self, mock_list_assets, tmp_path):
+        path = tmp_path / "index.json"
+        path.write_text('{"version": 0}')
+        assert AssetIndex(path).periods(COLLECTION, "monthly_") == {
+            "2024-01",
+            "2024-02",
+        }
+        mock_list_assets.assert_called_once_with({"parent": COLLECTION})
+
+    def test_trailing_slash(self, mock_list_assets):
+        index = AssetIndex()
+        index.refresh(COLLECTION + "/")
+        index.periods(COLLECTION, "monthly_")
+        assert mock_list_assets.call_count == 1
+
+
+class TestSharedIndex:
+    def test_set_index(self):
+        index = AssetIndex()
+        previous = asset_index.get_index()
+        try:
+            asset_index.set_index(index)
+            assert asset_index.get_index() is index
+        finally:
+            asset_index.set_index(previous)
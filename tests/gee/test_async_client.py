@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from observatorio_ipa.gee.async_client import AsyncGEEClient, run_concurrently
+
+
+def slow_call(value, delay=0.2):
+    time.sleep(delay)
+    return value
+
+
+class TestRunConcurrently:
+    def test_results_in_order(self):
+        calls = [(slow_call, 1, 0.2), (slow_call, 2, 0.0), (slow_call, 3, 0.1)]
+        assert run_concurrently(calls) == [1, 2, 3]
+
+    def test_calls_overlap(self):
+        start = time.perf_counter()
+        run_concurrently([(slow_call, i) for i in range(4)], max_workers=4)
+        assert time.perf_counter() - start < 0.6
+
+    def test_bounded_thread_pool(self):
+        running = []
+        max_running = []
+        lock = threading.Lock()
+
+        def tracked_call():
+            with lock:
+                running.append(1)
+                max_running.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+
+        run_concurrently([(tracked_call,) for _ in range(6)], max_workers=2)
+        assert max(max_running) == 2
+
+    def test_timeout(self):
+        with pytest.raises(TimeoutError):
+            run_concurrently([(slow_call, 1, 1.0)], timeout=0.05)
+
+    def test_return_exceptions(self):
+        def failing_call():
+            raise ValueError("Asset not found")
+
+        results = run_concurrently(
+            [(slow_call, 1, 0.0), (failing_call,)], return_exceptions=True
+        )
+        assert results[0] == 1
+        assert isinstance(results[1], ValueError)
+
+
+class TestAsyncGEEClient:
+    def test_get_asset(self, mocker):
+        get_asset = mocker.patch(
+            "observatorio_ipa.gee.async_client.ee.data.getAsset",
+            return_value={"type": "IMAGE"},
+        )
+
+        async def _run():
+            async with AsyncGEEClient() as client:
+                return await client.get_asset("path/to/dem")
+
+        assert asyncio.run(_run()) == {"type": "IMAGE"}
+        get_asset.assert_called_once_with("path/to/dem")
+
+    def test_list_assets(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.gee.async_client.ee.data.listAssets",
+            return_value={"assets": [{"name": "a"}]},
+        )
+
+        async def _run():
+            async with AsyncGEEClient() as client:
+                return await client.list_assets("path/to/folder")
+
+        assert asyncio.run(_run()) == [{"name": "a"}]
+
+    def test_get_asset_retried_by_call_policy(self, mocker):
+        mocker.patch("observatorio_ipa.gee.call_policy.time.sleep")
+        get_asset = mocker.patch(
+            "observatorio_ipa.gee.async_client.ee.data.getAsset",
+            side_effect=[Exception("Service unavailable"), {"type": "IMAGE"}],
+        )
+
+        async def _run():
+            async with AsyncGEEClient() as client:
+                return await client.get_asset("path/to/dem")
+
+        assert asyncio.run(_run()) == {"type": "IMAGE"}
+        assert get_asset.call_count == 2
+
+    def test_get_info_uses_call_policy(self, mocker):
+        get_info = mocker.patch(
+            "observatorio_ipa.gee.async_client.call_policy.get_info", return_value=3
+        )
+        ee_object = mocker.Mock()
+
+        async def _run():
+            async with AsyncGEEClient() as client:
+                return await client.get_info(ee_object)
+
+        assert asyncio.run(_run()) == 3
+        get_info.assert_called_once_with(ee_object)
+
+    def test_per_call_timeout(self):
+        async def _run():
+            async with AsyncGEEClient(timeout=10) as client:
+                return await client.call(slow_call, 1, 1.0, timeout=0.05)
+
+        with pytest.raises(TimeoutError):
+            asyncio.run(_run())
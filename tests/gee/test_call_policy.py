@@ -0,0 +1,170 @@
+import threading
+import time
+
+import pytest
+from ee.ee_exception import EEException
+
+from observatorio_ipa.gee.call_policy import (
+    CallPolicy,
+    RateLimiter,
+    gee_call,
+    get_info,
+    is_rate_limited,
+    is_transient,
+    retry_after,
+    set_policy,
+    get_policy,
+)
+
+
+class HttpResponse(dict):
+    def __init__(self, status, headers=None):
+        super().__init__(headers or {})
+        self.status = status
+
+
+class HttpError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.resp = HttpResponse(status, headers)
+
+
+def translated_error(status, headers=None, message="Error"):
+    """EEException raised while handling an HttpError, as ee.data does"""
+    try:
+        try:
+            raise HttpError(status, headers)
+        except HttpError:
+            raise EEException(message)
+    except EEException as e:
+        return e
+
+
+@pytest.fixture
+def sleeps(mocker):
+    return mocker.patch("observatorio_ipa.gee.call_policy.time.sleep")
+
+
+class TestErrorClassification:
+    def test_rate_limited_message(self):
+        assert is_rate_limited(EEException("Too Many Requests: Request was rejected"))
+
+    def test_rate_limited_status(self):
+        assert is_rate_limited(translated_error(429))
+
+    def test_transient(self):
+        assert is_transient(translated_error(503))
+        assert is_transient(EEException("Internal error."))
+        assert is_transient(ConnectionError())
+
+    def test_not_transient(self):
+        assert not is_transient(EEException("Image.load: Asset not found."))
+        assert not is_transient(translated_error(400))
+        assert not is_transient(EEException("Exported 500 images"))
+
+    def test_retry_after(self):
+        assert retry_after(translated_error(429, {"retry-after": "7"})) == 7.0
+        assert retry_after(translated_error(429)) is None
+        assert retry_after(EEException("Too Many Requests")) is None
+
+
+class TestCallPolicy:
+    def test_retries_transient_errors(self, mocker, sleeps):
+        func = mocker.Mock(side_effect=[EEException("Internal error."), "ok"])
+        assert CallPolicy(max_retries=3).call(func, 1, a=2) == "ok"
+        assert func.call_count == 2
+        func.assert_called_with(1, a=2)
+        assert sleeps.call_count == 1
+
+    def test_does_not_retry_permanent_errors(self, mocker, sleeps):
+        func = mocker.Mock(side_effect=EEException("Asset not found."))
+        with pytest.raises(EEException, match="Asset not found"):
+            CallPolicy().call(func)
+        assert func.call_count == 1
+        sleeps.assert_not_called()
+
+    def test_max_retries(self, mocker, sleeps):
+        func = mocker.Mock(side_effect=EEException("Service unavailable"))
+        with pytest.raises(EEException):
+            CallPolicy(max_retries=2).call(func)
+        assert func.call_count == 3
+
+    def test_non_idempotent_only_retries_rate_limit(self, mocker, sleeps):
+        func = mocker.Mock(side_effect=EEException("Service unavailable"))
+        with pytest.raises(EEException):
+            CallPolicy().call(func, idempotent=False)
+        assert func.call_count == 1
+
+        func = mocker.Mock(side_effect=[EEException("Too Many Requests"), "ok"])
+        assert CallPolicy().call(func, idempotent=False) == "ok"
+
+    def test_respects_retry_after(self, mocker, sleeps):
+        func = mocker.Mock(side_effect=[translated_error(429, {"retry-after": "3"}), 1])
+        CallPolicy().call(func)
+        sleeps.assert_called_once_with(3.0)
+
+    def test_exponential_backoff_with_jitter(self, mocker):
+        uniform = mocker.patch(
+            "observatorio_ipa.gee.call_policy.random.uniform", return_value=0.5
+        )
+        policy = CallPolicy(base_delay=1, max_delay=5)
+        assert policy.backoff_delay(0) == 0.5
+        policy.backoff_delay(2)
+        uniform.assert_called_with(0, 4)
+        policy.backoff_delay(10)
+        uniform.assert_called_with(0, 5)
+
+    def test_rate_limit_pauses_limiter(self, mocker, sleeps):
+        limiter = mocker.Mock()
+        func = mocker.Mock(side_effect=[translated_error(429, {"retry-after": "2"}), 1])
+        CallPolicy(rate_limiter=limiter).call(func)
+        limiter.pause.assert_called_once_with(2.0)
+        assert limiter.acquire.call_count == 2
+
+
+class TestRateLimiter:
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            RateLimiter(0)
+
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(rate=50, burst=5)
+        start = time.monotonic()
+        for _ in range(10):
+            limiter.acquire()
+        # 5 tokens of the burst, 5 more at 50/s
+        assert 0.07 < time.monotonic() - start < 0.5
+
+    def test_shared_between_threads(self):
+        limiter = RateLimiter(rate=100, burst=1)
+        start = time.monotonic()
+        threads = [
+            threading.Thread(target=lambda: [limiter.acquire() for _ in range(5)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 20 requests at 100/s, the first one from the burst
+        assert time.monotonic() - start > 0.15
+
+    def test_pause(self):
+        limiter = RateLimiter(rate=1000, burst=10)
+        limiter.pause(0.1)
+        assert limiter.acquire() >= 0.09
+
+
+class TestDefaultPolicy:
+    def test_set_policy(self, mocker):
+        previous = get_policy()
+        policy = CallPolicy()
+        try:
+            set_policy(policy)
+            assert get_policy() is policy
+            ee_object = mocker.Mock()
+            ee_object.getInfo.return_value = [1, 2]
+            assert get_info(ee_object) == [1, 2]
+            assert gee_call(lambda x: x + 1, 1) == 2
+        finally:
+            set_policy(previous)
@@ -0,0 +1,161 @@
+import json
+
+import httplib2
+import pytest
+
+from observatorio_ipa.gee.cassette import (
+    CassetteMiss,
+    RecordingTransport,
+    ReplayTransport,
+    cassette_project,
+    read_cassette,
+    request_key,
+)
+
+API = "https://earthengine.googleapis.com/v1"
+
+
+class FakeHttp:
+    """Inner transport answering with a counter, to tell responses apart"""
+
+    def __init__(self):
+        self.calls = []
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        self.calls.append((method, uri, body, headers))
+        response = httplib2.Response(
+            {"status": 200, "content-type": "application/json", "x-secret": "abc"}
+        )
+        return response, json.dumps({"n": len(self.calls)}).encode("utf-8")
+
+
+@pytest.fixture
+def cassette_file(tmp_path):
+    path = tmp_path / "run.cassette"
+    recorder = RecordingTransport(path, http=FakeHttp())
+    recorder.request(f"{API}/projects/my-project/algorithms?key=xyz&prettyPrint=false")
+    recorder.request(
+        f"{API}/projects/my-project/value:compute",
+        method="POST",
+        body=json.dumps({"expression": {"a": 1}}),
+    )
+    recorder.request(f"{API}/projects/my-project/operations/T1")
+    recorder.request(f"{API}/projects/my-project/operations/T1")
+    return path
+
+
+class TestRequestKey:
+    def test_ignores_api_key_and_param_order(self):
+        assert request_key("get", f"{API}/x?b=2&key=123&a=1") == request_key(
+            "GET", f"{API}/x?a=1&b=2"
+        )
+
+    def test_ignores_request_ids_and_json_formatting(self):
+        body_1 = json.dumps({"requestId": "uuid-1", "exportOptions": {"a": 1, "b": 2}})
+        body_2 = json.dumps({"exportOptions": {"b": 2, "a": 1}, "requestId": "uuid-2"})
+        assert request_key("POST", API, body_1) == request_key("POST", API, body_2)
+
+    def test_different_bodies_have_different_keys(self):
+        assert request_key("POST", API, '{"a": 1}') != request_key(
+            "POST", API, '{"a": 2}'
+        )
+
+    def test_non_json_body_kept_as_is(self):
+        assert request_key("POST", API, b"raw") == f"POST {API} raw"
+
+
+class TestRecordingTransport:
+    def test_records_interactions(self, cassette_file):
+        interactions = read_cassette(cassette_file)
+        assert len(interactions) == 4
+        assert interactions[0]["status"] == 200
+        assert json.loads(interactions[1]["content"]) == {"n": 2}
+        assert interactions[0]["latency"] >= 0
+
+    def test_keeps_only_safe_headers(self, cassette_file):
+        interaction = read_cassette(cassette_file)[0]
+        assert interaction["headers"] == {"content-type": "application/json"}
+        assert "key=xyz" not in interaction["key"]
+
+    def test_other_hosts_not_recorded(self, tmp_path):
+        path = tmp_path / "run.cassette"
+        inner = FakeHttp()
+        recorder = RecordingTransport(path, http=inner)
+        response, content = recorder.request(
+            "https://oauth2.googleapis.com/token", method="POST", body="assertion=jwt"
+        )
+        assert json.loads(content) == {"n": 1}
+        assert len(inner.calls) == 1
+        assert read_cassette(path) == []
+
+    def test_binary_content(self, tmp_path, mocker):
+        path = tmp_path / "run.cassette"
+        inner = mocker.Mock()
+        inner.request.return_value = (httplib2.Response({"status": 200}), b"\xff\x00")
+        RecordingTransport(path, http=inner).request(f"{API}/thumbnails/x:getPixels")
+        replay = ReplayTransport(path)
+        assert replay.request(f"{API}/thumbnails/x:getPixels")[1] == b"\xff\x00"
+
+
+class TestReplayTransport:
+    def test_replays_responses(self, cassette_file):
+        replay = ReplayTransport(cassette_file)
+        response, content = replay.request(
+            f"{API}/projects/my-project/value:compute",
+            method="POST",
+            body=json.dumps({"expression": {"a": 1}}),
+        )
+        assert response.status == 200
+        assert response["content-type"] == "application/json"
+        assert json.loads(content) == {"n": 2}
+
+    def test_repeated_requests_in_recorded_order(self, cassette_file):
+        replay = ReplayTransport(cassette_file)
+        uri = f"{API}/projects/my-project/operations/T1"
+        contents = [json.loads(replay.request(uri)[1])["n"] for _ in range(3)]
+        assert contents == [3, 4, 4]
+
+    def test_miss_raises(self, cassette_file):
+        replay = ReplayTransport(cassette_file)
+        with pytest.raises(CassetteMiss):
+            replay.request(f"{API}/projects/my-project/assets/missing")
+
+    def test_summary_counts_requests(self, cassette_file):
+        replay = ReplayTransport(cassette_file)
+        replay.request(f"{API}/projects/my-project/operations/T1")
+        replay.request(f"{API}/projects/my-project/operations/T1")
+        summary = replay.summary()
+        assert summary["requests"] == 2
+        assert summary["interactions"] == 4
+        assert summary["recorded_latency"] >= 0
+
+    def test_zero_latency_does_not_sleep(self, cassette_file, mocker):
+        mock_sleep = mocker.patch("observatorio_ipa.gee.cassette.time.sleep")
+        ReplayTransport(cassette_file).request(
+            f"{API}/projects/my-project/operations/T1"
+        )
+        mock_sleep.assert_not_called()
+
+    def test_recorded_latency_sleeps(self, cassette_file, mocker):
+        mock_sleep = mocker.patch("observatorio_ipa.gee.cassette.time.sleep")
+        replay = ReplayTransport(cassette_file, latency="recorded")
+        replay.request(f"{API}/projects/my-project/operations/T1")
+        mock_sleep.assert_called_once_with(read_cassette(cassette_file)[2]["latency"])
+
+    def test_invalid_latency_mode(self, cassette_file):
+        with pytest.raises(ValueError):
+            ReplayTransport(cassette_file, latency="fast")
+
+    def test_not_a_cassette(self, tmp_path):
+        path = tmp_path / "other.json"
+        path.write_text('{"a": 1}\n')
+        with pytest.raises(ValueError):
+            ReplayTransport(path)
+
+
+class TestCassetteProject:
+    def test_project_from_algorithms_request(self, cassette_file):
+        assert cassette_project(read_cassette(cassette_file)) == "my-project"
+
+    def test_default_project(self):
+        assert cassette_project([]) == "earthengine-legacy"
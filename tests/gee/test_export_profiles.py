@@ -0,0 +1,154 @@
+import pytest
+from observatorio_ipa.gee.export_profiles import (
+    check_export_profile,
+    count_region_pixels,
+    estimate_export_size,
+    get_export_profile,
+    pyramiding_policy,
+)
+from observatorio_ipa.gee.exports import create_image_export_task
+
+
+class TestGetExportProfile:
+    @pytest.mark.parametrize("name", ["default", "float32", "uint8", "uint16"])
+    def test_profiles_are_valid(self, name):
+        assert get_export_profile(name)["max_pixels"] > 0
+
+    def test_invalid_profile(self):
+        with pytest.raises(ValueError, match="Invalid export profile"):
+            get_export_profile("int4")
+
+    def test_returns_copy(self):
+        profile = get_export_profile("uint8")
+        profile["pyramiding_policy"]["Snow_TAC"] = "max"
+        assert get_export_profile("uint8")["pyramiding_policy"]["Snow_TAC"] == "mean"
+
+
+class TestCheckExportProfile:
+    def test_scale_factor_overflow(self):
+        profile = get_export_profile("uint8")
+        profile["scale_factor"] = 3
+        with pytest.raises(ValueError, match="overflows"):
+            check_export_profile(profile)
+
+    def test_invalid_pyramiding_policy(self):
+        profile = get_export_profile("uint8")
+        profile["pyramiding_policy"]["QA_CR"] = "median"
+        with pytest.raises(ValueError, match="Invalid pyramiding policy"):
+            check_export_profile(profile)
+
+
+class TestPyramidingPolicy:
+    def test_stacked_band_names(self):
+        profile = get_export_profile("uint8")
+        band_names = ["Snow_TAC_2023_01_01", "QA_CR_2023_01_01"]
+        assert pyramiding_policy(profile, band_names) == {
+            "Snow_TAC_2023_01_01": "mean",
+            "QA_CR_2023_01_01": "mode",
+        }
+
+    def test_without_band_names(self):
+        profile = get_export_profile("uint16")
+        assert pyramiding_policy(profile) == {
+            "Snow_TAC": "mean",
+            "Cloud_TAC": "mean",
+            "QA_CR": "mode",
+        }
+
+    def test_no_policies(self):
+        assert pyramiding_policy(get_export_profile("default"), ["Snow_TAC"]) is None
+        assert pyramiding_policy(None, ["Snow_TAC"]) is None
+
+
+class TestEstimateExportSize:
+    def mock_region(self, mocker, area):
+        region = mocker.Mock()
+        region.geometry.return_value.bounds.return_value.area.return_value.getInfo.return_value = (
+            area
+        )
+        return region
+
+    def test_bytes_by_dtype(self, mocker):
+        mocker.patch("observatorio_ipa.gee.export_profiles.ee.projection.Projection")
+        region = self.mock_region(mocker, area=1000 * 100**2)
+        uint8 = estimate_export_size(get_export_profile("uint8"), region, 3, scale=100)
+        uint16 = estimate_export_size(
+            get_export_profile("uint16"), region, 3, scale=100
+        )
+        assert uint8 == {"pixels": 1000, "bytes": 3000}
+        assert uint16 == {"pixels": 1000, "bytes": 6000}
+
+    def test_max_pixels(self, mocker):
+        mocker.patch("observatorio_ipa.gee.export_profiles.ee.projection.Projection")
+        profile = get_export_profile("uint8")
+        profile["max_pixels"] = 10
+        region = self.mock_region(mocker, area=11 * 100**2)
+        with pytest.raises(ValueError, match="max_pixels"):
+            estimate_export_size(profile, region, 1, scale=100)
+
+
+class TestCountRegionPixels:
+    def test_count(self, mocker):
+        ee_image = mocker.patch(
+            "observatorio_ipa.gee.export_profiles.ee.image.Image.constant"
+        )
+        mocker.patch("observatorio_ipa.gee.export_profiles.ee.reducer.Reducer.count")
+        ee_image.return_value.reduceRegion.return_value.get.return_value.getInfo.return_value = (
+            1234
+        )
+        assert count_region_pixels(mocker.Mock(), scale=100) == 1234
+        assert ee_image.return_value.reduceRegion.call_args.kwargs["scale"] == 100
+
+    def test_empty_region(self, mocker):
+        ee_image = mocker.patch(
+            "observatorio_ipa.gee.export_profiles.ee.image.Image.constant"
+        )
+        mocker.patch("observatorio_ipa.gee.export_profiles.ee.reducer.Reducer.count")
+        ee_image.return_value.reduceRegion.return_value.get.return_value.getInfo.return_value = (
+            None
+        )
+        assert count_region_pixels(mocker.Mock()) == 0
+
+
+class TestCreateImageExportTask:
+    def test_profile_export_params(self, mocker):
+        mock_to_asset = mocker.patch(
+            "observatorio_ipa.gee.exports.ee.batch.Export.image.toAsset"
+        )
+        profile = get_export_profile("uint8")
+        task = create_image_export_task(
+            mocker.Mock(),
+            "image",
+            "path/to/collection",
+            mocker.Mock(),
+            profile=profile,
+            band_names=["Snow_TAC", "QA_CR"],
+        )
+        assert task["status"] == "created"
+        kwargs = mock_to_asset.call_args.kwargs
+        assert kwargs["assetId"] == "path/to/collection/image"
+        assert kwargs["pyramidingPolicy"] == {"Snow_TAC": "mean", "QA_CR": "mode"}
+        assert kwargs["shardSize"] == 256
+        assert kwargs["maxPixels"] == profile["max_pixels"]
+
+    def test_without_profile(self, mocker):
+        mock_to_asset = mocker.patch(
+            "observatorio_ipa.gee.exports.ee.batch.Export.image.toAsset"
+        )
+        create_image_export_task(
+            mocker.Mock(), "image", "path/to/collection", mocker.Mock()
+        )
+        kwargs = mock_to_asset.call_args.kwargs
+        assert "pyramidingPolicy" not in kwargs
+        assert "shardSize" not in kwargs
+
+    def test_failed_to_create(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.gee.exports.ee.batch.Export.image.toAsset",
+            side_effect=Exception("Invalid region"),
+        )
+        task = create_image_export_task(
+            mocker.Mock(), "image", "path/to/collection", mocker.Mock()
+        )
+        assert task["status"] == "failed_to_create"
+        assert task["error"] == "Invalid region"
@@ -0,0 +1,205 @@
+import ee
+import pytest
+from observatorio_ipa.gee.exports import (
+    split_stacked_exports,
+    stack_images,
+    track_exports,
+)
+
+
+class MockTask:
+    """Task that finishes after a number of status checks"""
+
+    def __init__(self, name, running_checks=1, log=None):
+        self.name = name
+        self.running_checks = running_checks
+        self.log = log if log is not None else []
+
+    def __deepcopy__(self, memo):
+        # track_exports() deep copies the tasks, keep the shared log
+        return self
+
+    def start(self):
+        self.log.append(("start", self.name))
+
+    def status(self):
+        if self.running_checks > 0:
+            self.running_checks -= 1
+            return {"state": "RUNNING"}
+        self.log.append(("done", self.name))
+        return {"state": "COMPLETED"}
+
+
+def make_task(task, image):
+    return {"task": task, "image": image, "target": "GEE Asset", "status": "created"}
+
+
+class TestTrackExports:
+    @pytest.fixture(autouse=True)
+    def no_sleep(self, mocker):
+        mocker.patch("observatorio_ipa.gee.exports.sleep")
+
+    def test_all_tasks_complete(self):
+        tasks = [make_task(MockTask(f"t{i}"), f"image_{i}") for i in range(3)]
+        result = track_exports(tasks, sleep_time=0)
+        assert [task["status"] for task in result] == ["completed"] * 3
+
+    def test_max_concurrent(self):
+        log = []
+        tasks = [
+            make_task(MockTask(f"t{i}", running_checks=2, log=log), f"image_{i}")
+            for i in range(5)
+        ]
+        result = track_exports(tasks, sleep_time=0, max_concurrent=2)
+        assert [task["status"] for task in result] == ["completed"] * 5
+
+        running = max_running = 0
+        for event, _ in log:
+            running += 1 if event == "start" else -1
+            max_running = max(max_running, running)
+        assert max_running == 2
+        assert [name for event, name in log if event == "start"] == [
+            "t0",
+            "t1",
+            "t2",
+            "t3",
+            "t4",
+        ]
+
+    def test_skip_failed_to_create(self):
+        tasks = [
+            {
+                "task": None,
+                "image": "image_0",
+                "target": "GEE Asset",
+                "status": "failed_to_create",
+            },
+            make_task(MockTask("t1"), "image_1"),
+        ]
+        result = track_exports(tasks, sleep_time=0)
+        assert [task["status"] for task in result] == ["failed_to_create", "completed"]
+
+    def test_failed_to_start(self, mocker):
+        task = mocker.Mock()
+        task.start.side_effect = Exception("quota exceeded")
+        result = track_exports([make_task(task, "image_0")], sleep_time=0)
+        assert result[0]["status"] == "failed_to_start"
+        assert result[0]["error"] == "quota exceeded"
+
+    def test_keep_task_timestamps(self, mocker):
+        task = mocker.Mock()
+        task.status.return_value = {
+            "state": "COMPLETED",
+            "creation_timestamp_ms": 1000,
+            "start_timestamp_ms": 61000,
+            "update_timestamp_ms": 121000,
+            "batch_eecu_usage_seconds": 12.5,
+            "description": "image_0",
+        }
+        result = track_exports([make_task(task, "image_0")], sleep_time=0)
+        assert result[0]["start_timestamp_ms"] == 61000
+        assert result[0]["batch_eecu_usage_seconds"] == 12.5
+        assert "description" not in result[0]
+
+    def test_invalid_max_concurrent(self):
+        with pytest.raises(ValueError):
+            track_exports([], max_concurrent=0)
+
+    def test_export_tasks_not_list(self):
+        with pytest.raises(TypeError):
+            track_exports("task")  # type: ignore
+
+
+class TestStackImages:
+    def test_rename_bands(self, mocker):
+        mock_cat = mocker.patch("observatorio_ipa.gee.exports.ee.image.Image.cat")
+        images = [mocker.Mock(), mocker.Mock()]
+        stack_images(images, ["Snow_TAC", "QA_CR"], ["2023_01_01", "2023_01_02"])
+        images[0].select.assert_called_once_with(
+            ["Snow_TAC", "QA_CR"], ["Snow_TAC_2023_01_01", "QA_CR_2023_01_01"]
+        )
+        images[1].select.assert_called_once_with(
+            ["Snow_TAC", "QA_CR"], ["Snow_TAC_2023_01_02", "QA_CR_2023_01_02"]
+        )
+        mock_cat.assert_called_once()
+
+    def test_keep_properties(self, mocker):
+        mock_cat = mocker.patch("observatorio_ipa.gee.exports.ee.image.Image.cat")
+        mock_cat.return_value.set.return_value = mock_cat.return_value
+        image = mocker.Mock()
+        image.get.return_value = 31
+        stack_images([image], ["Snow_TAC"], ["2023_01"], properties=["n_days"])
+        mock_cat.return_value.set.assert_called_once_with("n_days_2023_01", 31)
+
+    def test_duplicated_suffixes(self, mocker):
+        with pytest.raises(ValueError):
+            stack_images([mocker.Mock(), mocker.Mock()], ["Snow_TAC"], ["a", "a"])
+
+    def test_different_lengths(self, mocker):
+        with pytest.raises(ValueError):
+            stack_images([mocker.Mock()], ["Snow_TAC"], ["a", "b"])
+
+
+class TestSplitStackedExports:
+    @pytest.fixture(autouse=True)
+    def no_sleep(self, mocker):
+        mocker.patch("observatorio_ipa.gee.exports.sleep")
+
+    def stack_task(self, status):
+        return {
+            "task": None,
+            "image": "stack_daily_2023_01_01_2023_01_02",
+            "target": "GEE Asset",
+            "status": status,
+            "split": {
+                "asset": "path/to/daily/stack_daily_2023_01_01_2023_01_02",
+                "collection_path": "path/to/daily",
+                "band_names": ["Snow_TAC"],
+                "images": [
+                    {
+                        "image": "daily_2023_01_01",
+                        "suffix": "2023_01_01",
+                        "time_start": "2023-01-01",
+                    },
+                    {
+                        "image": "daily_2023_01_02",
+                        "suffix": "2023_01_02",
+                        "time_start": "2023-01-02",
+                    },
+                ],
+            },
+        }
+
+    def test_split_completed_stack(self, mocker):
+        mock_image = mocker.patch("observatorio_ipa.gee.exports.ee.image.Image")
+        # the footprint of the stacked image is a Geometry, which has no geometry() method
+        stack_geometry = mocker.MagicMock(spec=ee.geometry.Geometry)
+        mock_image.return_value.geometry.return_value = stack_geometry
+        mocker.patch("observatorio_ipa.gee.exports.ee.ee_date.Date")
+        mock_to_asset = mocker.patch(
+            "observatorio_ipa.gee.exports.ee.batch.Export.image.toAsset",
+            side_effect=lambda **kwargs: MockTask(kwargs["description"]),
+        )
+        mock_delete = mocker.patch("observatorio_ipa.gee.exports.ee.data.deleteAsset")
+
+        result = split_stacked_exports([self.stack_task("completed")], sleep_time=0)
+
+        assert [task["image"] for task in result] == [
+            "daily_2023_01_01",
+            "daily_2023_01_02",
+        ]
+        assert [task["status"] for task in result] == ["completed", "completed"]
+        assert [call.kwargs["region"] for call in mock_to_asset.call_args_list] == [
+            stack_geometry,
+            stack_geometry,
+        ]
+        mock_delete.assert_called_once_with(
+            "path/to/daily/stack_daily_2023_01_01_2023_01_02"
+        )
+
+    def test_skip_failed_stack(self, mocker):
+        mock_to_asset = mocker.patch(
+            "observatorio_ipa.gee.exports.ee.batch.Export.image.toAsset"
+        )
+        assert split_stacked_exports([self.stack_task("failed")], sleep_time=0) == []
+        mock_to_asset.assert_not_called()
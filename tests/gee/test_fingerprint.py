@@ -0,0 +1,64 @@
+from importlib import metadata
+
+from observatorio_ipa.gee.fingerprint import (
+    code_version,
+    get_asset_update_times,
+    get_image_versions,
+    make_fingerprint,
+)
+
+
+class TestMakeFingerprint:
+    def test_key_order(self):
+        assert make_fingerprint({"a": 1, "b": [1, 2]}) == make_fingerprint(
+            {"b": [1, 2], "a": 1}
+        )
+
+    def test_different_inputs(self):
+        assert make_fingerprint({"a": 1}) != make_fingerprint({"a": 2})
+
+    def test_length(self):
+        assert len(make_fingerprint({"a": 1})) == 16
+
+
+class TestCodeVersion:
+    def test_not_installed(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.gee.fingerprint.metadata.version",
+            side_effect=metadata.PackageNotFoundError,
+        )
+        assert code_version() == "unknown"
+
+
+class TestGetImageVersions:
+    def test_versions_by_date(self, mocker):
+        mocker.patch("observatorio_ipa.gee.fingerprint.ee.ee_list.List")
+        mock_ic = mocker.patch(
+            "observatorio_ipa.gee.fingerprint.ee.imagecollection.ImageCollection"
+        )
+        mock_get_info = mocker.patch(
+            "observatorio_ipa.gee.fingerprint.call_policy.get_info",
+            return_value=[
+                [[1672531200000, 1672617600000], [11, 12]],
+                [[1672531200000], [21]],
+            ],
+        )
+        versions = get_image_versions(["terra", "aqua"], "2023-01-01", "2023-01-02")
+        assert versions == {
+            "terra": {"2023-01-01": 11, "2023-01-02": 12},
+            "aqua": {"2023-01-01": 21},
+        }
+        mock_get_info.assert_called_once()
+        mock_ic.return_value.filterDate.assert_called_with("2023-01-01", "2023-01-03")
+
+
+class TestGetAssetUpdateTimes:
+    def test_update_times(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.gee.fingerprint.ee.data.getAsset",
+            side_effect=lambda path: {"updateTime": f"{path}-time"},
+        )
+        assert get_asset_update_times(["aoi", "dem"]) == {
+            "aoi": "aoi-time",
+            "dem": "dem-time",
+        }
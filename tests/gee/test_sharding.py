@@ -0,0 +1,142 @@
+import pytest
+from observatorio_ipa.gee.sharding import (
+    complete_sharded_exports,
+    make_shard_grid,
+    retry_failed_shards,
+    shard_asset_name,
+)
+
+
+def make_shard_task(image, index, status):
+    return {
+        "task": None,
+        "image": shard_asset_name(image, index),
+        "target": "GEE Asset",
+        "status": status,
+        "shard": {"image": image, "index": index, "collection_path": "path/to"},
+    }
+
+
+class TestMakeShardGrid:
+    @pytest.fixture
+    def ee_region(self, mocker):
+        region = mocker.MagicMock()
+        region.geometry.return_value.bounds.return_value.transform.return_value.coordinates.return_value.getInfo.return_value = [
+            [[-1000, 100], [1500, 100], [1500, 900], [-1000, 900], [-1000, 100]]
+        ]
+        return region
+
+    @pytest.fixture
+    def ee_fc(self, mocker):
+        mocker.patch("observatorio_ipa.gee.sharding.ee.projection.Projection")
+        mocker.patch("observatorio_ipa.gee.sharding.ee.geometry.Geometry.Rectangle")
+        mocker.patch("observatorio_ipa.gee.sharding.ee.feature.Feature")
+        return mocker.patch(
+            "observatorio_ipa.gee.sharding.ee.featurecollection.FeatureCollection"
+        )
+
+    def test_shards_aligned_to_grid(self, ee_region, ee_fc):
+        ee_fc.return_value.filterBounds.return_value.aggregate_array.return_value.getInfo.return_value = [
+            0,
+            1,
+            2,
+        ]
+        # 2 pixels of 500m per shard side
+        shards = make_shard_grid(ee_region, shard_size=2, scale=500)
+        assert shards == [
+            [-1000, 0, 0, 1000],
+            [0, 0, 1000, 1000],
+            [1000, 0, 2000, 1000],
+        ]
+
+    def test_only_intersecting_shards(self, ee_region, ee_fc):
+        ee_fc.return_value.filterBounds.return_value.aggregate_array.return_value.getInfo.return_value = [
+            1
+        ]
+        shards = make_shard_grid(ee_region, shard_size=2, scale=500)
+        assert shards == [[0, 0, 1000, 1000]]
+
+    def test_invalid_shard_size(self, ee_region):
+        with pytest.raises(ValueError):
+            make_shard_grid(ee_region, shard_size=0)
+
+
+class TestRetryFailedShards:
+    def test_only_failed_shards_are_retried(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.gee.sharding._shard_export_task",
+            side_effect=lambda shard_info: make_shard_task(
+                shard_info["image"], shard_info["index"], "created"
+            ),
+        )
+        mock_track = mocker.patch(
+            "observatorio_ipa.gee.sharding.gee_exports.track_exports",
+            side_effect=lambda tasks, **kwargs: [
+                dict(task, status="completed") for task in tasks
+            ],
+        )
+        export_tasks = [
+            make_shard_task("img", 0, "completed"),
+            make_shard_task("img", 1, "failed"),
+            {"task": None, "image": "other", "status": "failed"},
+        ]
+
+        result = retry_failed_shards(export_tasks)
+
+        assert [task["status"] for task in result] == [
+            "completed",
+            "completed",
+            "failed",
+        ]
+        retried = mock_track.call_args.args[0]
+        assert [task["shard"]["index"] for task in retried] == [1]
+
+    def test_no_failed_shards(self, mocker):
+        mock_track = mocker.patch(
+            "observatorio_ipa.gee.sharding.gee_exports.track_exports"
+        )
+        export_tasks = [make_shard_task("img", 0, "completed")]
+        assert retry_failed_shards(export_tasks) == export_tasks
+        mock_track.assert_not_called()
+
+
+class TestCompleteShardedExports:
+    def test_no_sharded_tasks(self, mocker):
+        mock_track = mocker.patch(
+            "observatorio_ipa.gee.sharding.gee_exports.track_exports"
+        )
+        assert complete_sharded_exports([{"image": "img", "status": "completed"}]) == []
+        mock_track.assert_not_called()
+
+    def test_mosaic_completed_images_only(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.gee.sharding.retry_failed_shards",
+            side_effect=lambda tasks, **kwargs: tasks,
+        )
+        mock_mosaic = mocker.patch(
+            "observatorio_ipa.gee.sharding.mosaic_shards",
+            side_effect=lambda shard_tasks: {
+                "image": shard_tasks[0]["shard"]["image"],
+                "status": "created",
+                "shard_assets": ["path/to/shard_a", "path/to/shard_b"],
+            },
+        )
+        mocker.patch(
+            "observatorio_ipa.gee.sharding.gee_exports.track_exports",
+            side_effect=lambda tasks, **kwargs: [
+                dict(task, status="completed") for task in tasks
+            ],
+        )
+        mock_delete = mocker.patch("observatorio_ipa.gee.sharding.ee.data.deleteAsset")
+        export_tasks = [
+            make_shard_task("img_a", 0, "completed"),
+            make_shard_task("img_a", 1, "completed"),
+            make_shard_task("img_b", 0, "completed"),
+            make_shard_task("img_b", 1, "failed"),
+        ]
+
+        result = complete_sharded_exports(export_tasks)
+
+        assert [task["image"] for task in result] == ["img_a"]
+        assert mock_mosaic.call_count == 1
+        assert mock_delete.call_count == 2
@@ -0,0 +1,45 @@
+from observatorio_ipa.gee.zonal import _parse_zonal_features
+
+
+class TestParseZonalFeatures:
+    def test_records_per_image_and_label(self):
+        features = [
+            {
+                "properties": {
+                    "system:time_start": 1000,
+                    "groups": [
+                        {"label": 1, "mean": [10.0, 20.0]},
+                        {"label": 2, "mean": [30.0, 40.0]},
+                    ],
+                }
+            },
+            {"properties": {"system:time_start": 2000, "groups": []}},
+        ]
+        assert _parse_zonal_features(features, ["Snow_TAC", "Cloud_TAC"]) == [
+            {"time_start": 1000, "label": 1, "Snow_TAC": 10.0, "Cloud_TAC": 20.0},
+            {"time_start": 1000, "label": 2, "Snow_TAC": 30.0, "Cloud_TAC": 40.0},
+        ]
+
+    def test_image_without_groups(self):
+        features = [{"properties": {"system:time_start": 1000, "groups": None}}]
+        assert _parse_zonal_features(features, ["Snow_TAC"]) == []
+
+    def test_qa_counts(self):
+        features = [
+            {
+                "properties": {
+                    "system:time_start": 1000,
+                    "groups": [
+                        {"label": 1, "mean": [10.0], "histogram": {"10": 4, "40.0": 1}}
+                    ],
+                }
+            }
+        ]
+        assert _parse_zonal_features(features, ["Snow_TAC"]) == [
+            {
+                "time_start": 1000,
+                "label": 1,
+                "Snow_TAC": 10.0,
+                "qa_counts": {10: 4, 40: 1},
+            }
+        ]
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from observatorio_ipa.local.bitplanes import (
+    count_bits,
+    from_bitplane,
+    impute_tac_spatial4,
+    neighbour_counts,
+    to_bitplane,
+)
+
+# Remap table from spatial_4.impute_tac_spatial4()
+SUM_FROM = [0, 7, 9, 14, 16, 18, 21, 23, 25, 27, 28, 30, 32, 34, 36]
+SUM_TO = [0, 0, 0, 0, 0, 0, 50, 0, 0, 100, 50, 50, 0, 100, 100]
+
+
+def remap_spatial4(tac, qa):
+    """Reference implementation following the GEE 0/7/9 reclass, 4-neighbour sum and remap"""
+    reclass = np.select([tac == 50, tac == 100], [7, 9], 0).astype(np.int32)
+    padded = np.pad(reclass, 1)
+    neighbour_sum = (
+        padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]
+    )
+    remap = dict(zip(SUM_FROM, SUM_TO))
+    imputed = np.vectorize(remap.get)(neighbour_sum)
+    imputed = np.where(tac == 0, imputed, 0)
+    new_tac = np.maximum(tac, imputed).astype(tac.dtype)
+    new_qa = np.where(imputed > 0, np.maximum(qa, 40), qa).astype(qa.dtype)
+    return new_tac, new_qa
+
+
+def random_tac(shape, seed=0, p=(0.4, 0.3, 0.3)):
+    rng = np.random.default_rng(seed)
+    return rng.choice(np.array([0, 50, 100], dtype=np.uint8), size=shape, p=p)
+
+
+class TestBitplanes:
+    @pytest.mark.parametrize("n_cols", [1, 8, 63, 64, 65, 200])
+    def test_roundtrip(self, n_cols):
+        mask = random_tac((5, n_cols)) == 100
+        plane = to_bitplane(mask)
+        assert plane.dtype == np.dtype("<u8")
+        assert plane.shape == (5, -(-n_cols // 64))
+        np.testing.assert_array_equal(from_bitplane(plane, n_cols), mask)
+
+    def test_count_bits(self):
+        mask = random_tac((7, 130)) == 50
+        assert count_bits(to_bitplane(mask)) == mask.sum()
+
+    def test_neighbour_counts(self):
+        mask = random_tac((9, 150), seed=3) == 100
+        padded = np.pad(mask.astype(int), 1)
+        expected = (
+            padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]
+        )
+        ones, twos, fours = (
+            from_bitplane(p, 150).astype(int)
+            for p in neighbour_counts(to_bitplane(mask))
+        )
+        np.testing.assert_array_equal(ones + 2 * twos + 4 * fours, expected)
+
+
+class TestImputeTacSpatial4:
+    @pytest.mark.parametrize("shape", [(1, 1), (3, 3), (10, 64), (17, 129)])
+    @pytest.mark.parametrize("seed", [0, 1, 2])
+    def test_same_as_remap_table(self, shape, seed):
+        tac = random_tac(shape, seed=seed)
+        qa = np.full(shape, 21, dtype=np.uint8)
+        new_tac, new_qa = impute_tac_spatial4(tac, qa)
+        expected_tac, expected_qa = remap_spatial4(tac, qa)
+        np.testing.assert_array_equal(new_tac, expected_tac)
+        np.testing.assert_array_equal(new_qa, expected_qa)
+
+    def test_word_boundary(self):
+        tac = np.full((3, 128), 50, dtype=np.uint8)
+        tac[1, 63] = 0
+        tac[1, 64] = 0
+        new_tac, _ = impute_tac_spatial4(tac, np.full(tac.shape, 10, dtype=np.uint8))
+        assert new_tac[1, 63] == 50
+        assert new_tac[1, 64] == 50
+
+    def test_does_not_modify_input(self):
+        tac = random_tac((5, 5))
+        qa = np.full(tac.shape, 10, dtype=np.uint8)
+        tac_original = tac.copy()
+        impute_tac_spatial4(tac, qa)
+        np.testing.assert_array_equal(tac, tac_original)
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from observatorio_ipa.local.filters import (
+    DEM_NODATA_INT16,
+    dem_to_int16,
+    masked_min_filter,
+    sliding_min,
+)
+from observatorio_ipa.local.imputation import impute_tac_day, impute_tac_spatial_dem
+
+
+def brute_force_masked_min(values, mask, radius, sentinel):
+    n_rows, n_cols = values.shape
+    result = np.full(values.shape, sentinel, dtype=values.dtype)
+    for row in range(n_rows):
+        for col in range(n_cols):
+            r0, r1 = max(row - radius, 0), min(row + radius + 1, n_rows)
+            c0, c1 = max(col - radius, 0), min(col + radius + 1, n_cols)
+            window = values[r0:r1, c0:c1][mask[r0:r1, c0:c1]]
+            if window.size:
+                result[row, col] = window.min()
+    return result
+
+
+class TestSlidingMin:
+    @pytest.mark.parametrize("radius", [0, 1, 2, 3, 10])
+    def test_same_as_brute_force(self, radius):
+        values = np.random.default_rng(0).integers(-50, 50, size=(4, 23))
+        expected = np.array(
+            [
+                [row[max(i - radius, 0) : i + radius + 1].min() for i in range(23)]
+                for row in values
+            ]
+        )
+        np.testing.assert_array_equal(sliding_min(values, radius), expected)
+
+    def test_axis(self):
+        values = np.random.default_rng(1).random((9, 4))
+        np.testing.assert_array_equal(
+            sliding_min(values, 2, axis=0), sliding_min(values.T, 2).T
+        )
+
+    def test_negative_radius(self):
+        with pytest.raises(ValueError):
+            sliding_min(np.zeros(3), -1)
+
+
+class TestMaskedMinFilter:
+    @pytest.mark.parametrize("radius", [1, 2, 3])
+    @pytest.mark.parametrize("dtype", [np.int16, np.float32])
+    def test_same_as_brute_force(self, radius, dtype):
+        rng = np.random.default_rng(radius)
+        values = rng.integers(0, 6000, size=(15, 17)).astype(dtype)
+        mask = rng.random(values.shape) < 0.3
+        sentinel = np.iinfo(dtype).max if dtype == np.int16 else np.inf
+        result = masked_min_filter(values, mask, radius)
+        assert result.dtype == dtype
+        np.testing.assert_array_equal(
+            result, brute_force_masked_min(values, mask, radius, sentinel)
+        )
+
+
+class TestDemToInt16:
+    def test_nan_to_nodata(self):
+        dem = np.array([[1.4, np.nan], [1e6, 2500.6]])
+        assert dem_to_int16(dem).tolist() == [
+            [1, DEM_NODATA_INT16],
+            [DEM_NODATA_INT16, 2501],
+        ]
+
+    def test_int16_unchanged(self):
+        dem = np.arange(4, dtype=np.int16)
+        assert dem_to_int16(dem) is dem
+
+
+class TestImputeTacSpatialDem:
+    def test_radius_2_reaches_farther_snow(self):
+        tac = np.array([[100, 50, 0]], dtype=np.uint8)
+        qa = np.full(tac.shape, 10, dtype=np.uint8)
+        dem = np.array([[1000, 0, 2000]], dtype=np.int16)
+
+        assert impute_tac_spatial_dem(tac, qa, dem, radius=1)[0].tolist() == [
+            [100, 50, 0]
+        ]
+        new_tac, new_qa = impute_tac_spatial_dem(tac, qa, dem, radius=2)
+        assert new_tac.tolist() == [[100, 50, 100]]
+        assert new_qa.tolist() == [[10, 10, 50]]
+
+    def test_int16_nodata_is_ignored(self):
+        tac = np.array([[100, 0, 0]], dtype=np.uint8)
+        qa = np.full(tac.shape, 10, dtype=np.uint8)
+        dem = np.array([[DEM_NODATA_INT16, 2000, DEM_NODATA_INT16]], dtype=np.int16)
+        new_tac, _ = impute_tac_spatial_dem(
+            tac, qa, dem, radius=2, dem_nodata=DEM_NODATA_INT16
+        )
+        assert new_tac.tolist() == [[100, 0, 0]]
+
+    def test_int16_nodata_by_default(self):
+        # snow pixel without DEM data must not set the snowline to DEM_NODATA_INT16
+        tac = np.array([[100, 0, 0]], dtype=np.uint8)
+        qa = np.full(tac.shape, 10, dtype=np.uint8)
+        dem = dem_to_int16(np.array([[np.nan, 500.0, 800.0]]))
+        new_tac, new_qa = impute_tac_spatial_dem(tac, qa, dem, radius=2)
+        assert new_tac.tolist() == [[100, 0, 0]]
+        assert new_qa.tolist() == [[10, 10, 10]]
+
+    @pytest.mark.parametrize("mode", ["dense", "sparse"])
+    def test_int16_nodata_by_default_day(self, mode):
+        tac_cube = np.zeros((5, 1, 3), dtype=np.uint8)
+        tac_cube[2] = [[100, 0, 0]]
+        qa_cube = np.full(tac_cube.shape, 10, dtype=np.uint8)
+        dem = np.array([[DEM_NODATA_INT16, 500, 800]], dtype=np.int16)
+        tac, _ = impute_tac_day(tac_cube, qa_cube, 2, dem, mode=mode, dem_radius=2)
+        assert tac.tolist() == [[100, 0, 0]]
+
+    @pytest.mark.parametrize("radius", [1, 2, 3])
+    def test_sparse_equals_dense(self, radius):
+        rng = np.random.default_rng(radius)
+        shape = (5, 25, 30)
+        tac_cube = rng.choice(np.array([0, 50, 100], dtype=np.uint8), size=shape)
+        qa_cube = np.full(shape, 10, dtype=np.uint8)
+        dem = rng.integers(0, 6000, size=shape[1:], dtype=np.int16)
+        dem[::4, ::3] = DEM_NODATA_INT16
+        kwargs = {"dem_radius": radius, "dem_nodata": DEM_NODATA_INT16}
+        dense = impute_tac_day(tac_cube, qa_cube, 2, dem, mode="dense", **kwargs)
+        sparse = impute_tac_day(tac_cube, qa_cube, 2, dem, mode="sparse", **kwargs)
+        np.testing.assert_array_equal(dense[0], sparse[0])
+        np.testing.assert_array_equal(dense[1], sparse[1])
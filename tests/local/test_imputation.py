@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+from observatorio_ipa.local.imputation import (
+    impute_tac_cube,
+    impute_tac_day,
+    missing_pixels_index,
+)
+
+
+def make_cube(seed=0, shape=(5, 20, 30), missing_fraction=0.3):
+    rng = np.random.default_rng(seed)
+    tac_cube = rng.choice(np.array([50, 100], dtype=np.uint8), size=shape)
+    tac_cube[rng.random(shape) < missing_fraction] = 0
+    qa_cube = rng.choice(np.array([10, 11, 12], dtype=np.uint8), size=shape)
+    dem = rng.integers(0, 6000, size=shape[1:], dtype=np.int16)
+    return tac_cube, qa_cube, dem
+
+
+def single_day_cube(tac_day, qa_value=10):
+    """Cube with 5 days where the buffer days are all cloud so temporal steps don't impute"""
+    tac_cube = np.zeros((5,) + tac_day.shape, dtype=np.uint8)
+    tac_cube[2] = tac_day
+    qa_cube = np.full(tac_cube.shape, qa_value, dtype=np.uint8)
+    return tac_cube, qa_cube
+
+
+class TestMissingPixelsIndex:
+    def test_flat_indices(self):
+        tac = np.array([[0, 50], [100, 0]], dtype=np.uint8)
+        assert missing_pixels_index(tac).tolist() == [0, 3]
+
+    def test_no_missing(self):
+        tac = np.full((3, 3), 50, dtype=np.uint8)
+        assert missing_pixels_index(tac).size == 0
+
+
+class TestImputeTacDay:
+    @pytest.mark.parametrize("mode", ["dense", "sparse"])
+    def test_temporal_trailing_leading_match(self, mode):
+        tac_cube = np.full((5, 1, 1), 50, dtype=np.uint8)
+        tac_cube[2] = 0
+        qa_cube = np.full(tac_cube.shape, 10, dtype=np.uint8)
+        dem = np.zeros((1, 1), dtype=np.int16)
+
+        tac, qa = impute_tac_day(tac_cube, qa_cube, 2, dem, mode=mode)
+        assert tac.tolist() == [[50]]
+        assert qa.tolist() == [[20]]
+
+    @pytest.mark.parametrize("mode", ["dense", "sparse"])
+    def test_temporal_second_step(self, mode):
+        # t-1 and t+1 don't match, t-2 and t+1 do
+        tac_cube = np.array([100, 50, 0, 100, 0], dtype=np.uint8).reshape(5, 1, 1)
+        qa_cube = np.full(tac_cube.shape, 10, dtype=np.uint8)
+        dem = np.zeros((1, 1), dtype=np.int16)
+
+        tac, qa = impute_tac_day(tac_cube, qa_cube, 2, dem, mode=mode)
+        assert tac.tolist() == [[100]]
+        assert qa.tolist() == [[21]]
+
+    @pytest.mark.parametrize("mode", ["dense", "sparse"])
+    def test_spatial4_three_snow_neighbours(self, mode):
+        tac_day = np.array([[0, 100, 0], [100, 0, 100], [0, 50, 0]], dtype=np.uint8)
+        tac_cube, qa_cube = single_day_cube(tac_day)
+        dem = np.zeros((3, 3), dtype=np.int16)
+
+        tac, qa = impute_tac_day(tac_cube, qa_cube, 2, dem, mode=mode)
+        assert tac[1, 1] == 100
+        assert qa[1, 1] == 40
+
+    @pytest.mark.parametrize("mode", ["dense", "sparse"])
+    def test_spatial4_two_and_two_stays_cloud(self, mode):
+        tac_day = np.array([[0, 100, 0], [50, 0, 100], [0, 50, 0]], dtype=np.uint8)
+        tac_cube, qa_cube = single_day_cube(tac_day)
+        dem = np.zeros((3, 3), dtype=np.int16)
+
+        tac, qa = impute_tac_day(tac_cube, qa_cube, 2, dem, mode=mode)
+        assert tac[1, 1] == 0
+        assert qa[1, 1] == 10
+
+    @pytest.mark.parametrize("mode", ["dense", "sparse"])
+    def test_spatial8_dem_above_snowline(self, mode):
+        tac_day = np.array([[100, 50], [0, 0]], dtype=np.uint8)
+        tac_cube, qa_cube = single_day_cube(tac_day)
+        dem = np.array([[1000, 0], [1500, 900]], dtype=np.int16)
+
+        tac, qa = impute_tac_day(tac_cube, qa_cube, 2, dem, mode=mode)
+        assert tac.tolist() == [[100, 50], [100, 0]]
+        assert qa.tolist() == [[10, 10], [50, 10]]
+
+    @pytest.mark.parametrize("missing_fraction", [0.01, 0.2, 0.5, 0.9])
+    def test_sparse_equals_dense(self, missing_fraction):
+        tac_cube, qa_cube, dem = make_cube(missing_fraction=missing_fraction)
+        dense = impute_tac_day(tac_cube, qa_cube, 2, dem, mode="dense")
+        sparse = impute_tac_day(tac_cube, qa_cube, 2, dem, mode="sparse")
+        np.testing.assert_array_equal(dense[0], sparse[0])
+        np.testing.assert_array_equal(dense[1], sparse[1])
+
+    def test_float_dem_with_nan(self):
+        tac_cube, qa_cube, dem = make_cube(missing_fraction=0.5)
+        dem = dem.astype(np.float32)
+        dem[::3, ::2] = np.nan
+        dense = impute_tac_day(tac_cube, qa_cube, 2, dem, mode="dense")
+        sparse = impute_tac_day(tac_cube, qa_cube, 2, dem, mode="sparse")
+        np.testing.assert_array_equal(dense[0], sparse[0])
+
+    def test_does_not_modify_input(self):
+        tac_cube, qa_cube, dem = make_cube()
+        tac_original = tac_cube.copy()
+        impute_tac_day(tac_cube, qa_cube, 2, dem, mode="sparse")
+        np.testing.assert_array_equal(tac_cube, tac_original)
+
+    def test_invalid_mode(self):
+        tac_cube, qa_cube, dem = make_cube()
+        with pytest.raises(ValueError):
+            impute_tac_day(tac_cube, qa_cube, 2, dem, mode="fast")
+
+    def test_missing_buffer_days(self):
+        tac_cube, qa_cube, dem = make_cube()
+        with pytest.raises(ValueError):
+            impute_tac_day(tac_cube, qa_cube, 1, dem)
+
+
+class TestImputeTacCube:
+    def test_drops_buffer_days(self):
+        tac_cube, qa_cube, dem = make_cube(shape=(8, 5, 5))
+        tac, qa = impute_tac_cube(tac_cube, qa_cube, dem)
+        assert tac.shape == (4, 5, 5)
+        assert qa.shape == (4, 5, 5)
+
+    def test_auto_equals_dense(self):
+        tac_cube, qa_cube, dem = make_cube(shape=(7, 10, 10))
+        auto = impute_tac_cube(tac_cube, qa_cube, dem, mode="auto")
+        dense = impute_tac_cube(tac_cube, qa_cube, dem, mode="dense")
+        np.testing.assert_array_equal(auto[0], dense[0])
+        np.testing.assert_array_equal(auto[1], dense[1])
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+
+from observatorio_ipa.local.packing import (
+    CODE_CLOUD,
+    CODE_SNOW,
+    PackedTACCube,
+    count_pixels,
+    decode_qa,
+    encode_qa,
+    impute_temporal_packed,
+    pack_tac,
+    packed_equal,
+    packed_is,
+    shift_pixels,
+    shift_rows,
+    unpack_codes,
+    unpack_tac,
+)
+
+
+def random_tac(shape, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.choice(np.array([0, 50, 100], dtype=np.uint8), size=shape)
+
+
+class TestPackUnpack:
+    @pytest.mark.parametrize("n_cols", [1, 3, 4, 5, 17, 64])
+    def test_roundtrip(self, n_cols):
+        tac = random_tac((3, 7, n_cols))
+        packed = pack_tac(tac)
+        assert packed.shape == (3, 7, -(-n_cols // 4))
+        np.testing.assert_array_equal(unpack_tac(packed, n_cols), tac)
+
+    def test_bit_layout(self):
+        packed = pack_tac(np.array([0, 50, 100, 0], dtype=np.uint8))
+        assert packed.tolist() == [0b00_10_01_00]
+
+    def test_invalid_values_are_nodata(self):
+        tac = np.array([[0, 7, 100]], dtype=np.uint8)
+        assert unpack_tac(pack_tac(tac), 3).tolist() == [[0, 255, 100]]
+
+    def test_qa_roundtrip(self):
+        qa = np.array([10, 11, 12, 20, 21, 22, 40, 50], dtype=np.uint8)
+        np.testing.assert_array_equal(decode_qa(encode_qa(qa)), qa)
+
+    def test_qa_unknown_value(self):
+        assert decode_qa(encode_qa(np.array([13], dtype=np.uint8))).tolist() == [0]
+
+
+class TestPackedComparisons:
+    def test_packed_equal_matches_unpacked(self):
+        a = random_tac((10, 13), seed=1)
+        b = random_tac((10, 13), seed=2)
+        equal = unpack_codes(packed_equal(pack_tac(a), pack_tac(b)), 13)
+        np.testing.assert_array_equal(equal == 0b11, a == b)
+
+    def test_packed_is(self):
+        tac = random_tac((4, 9))
+        is_snow = unpack_codes(packed_is(pack_tac(tac), CODE_SNOW), 9)
+        np.testing.assert_array_equal(is_snow == 0b11, tac == 100)
+
+    def test_count_pixels(self):
+        tac = random_tac((6, 11))
+        assert count_pixels(packed_is(pack_tac(tac), CODE_CLOUD)) == np.sum(tac == 0)
+
+    @pytest.mark.parametrize("n", [-1, 1])
+    def test_shift_pixels(self, n):
+        tac = random_tac((5, 10))
+        shifted = unpack_tac(shift_pixels(pack_tac(tac), n), 10)
+        expected = np.full(tac.shape, 255, dtype=np.uint8)
+        if n == -1:
+            expected[:, 1:] = tac[:, :-1]
+        else:
+            expected[:, :-1] = tac[:, 1:]
+        np.testing.assert_array_equal(shifted, expected)
+
+    @pytest.mark.parametrize("n", [-1, 1])
+    def test_shift_pixels_fill_code(self, n):
+        # rows of 10 pixels: the last byte holds 2 pixels and 2 padding fields
+        tac = random_tac((5, 10))
+        packed = shift_pixels(pack_tac(tac), n, fill_code=CODE_CLOUD, n_cols=10)
+        shifted = unpack_tac(packed, 10)
+        expected = np.zeros(tac.shape, dtype=np.uint8)
+        if n == -1:
+            expected[:, 1:] = tac[:, :-1]
+        else:
+            expected[:, :-1] = tac[:, 1:]
+        np.testing.assert_array_equal(shifted, expected)
+
+    def test_shift_rows(self):
+        tac = random_tac((5, 6))
+        shifted = unpack_tac(shift_rows(pack_tac(tac), 1), 6)
+        np.testing.assert_array_equal(shifted[:-1], tac[1:])
+        assert (shifted[-1] == 255).all()
+
+    def test_shift_invalid_offset(self):
+        with pytest.raises(ValueError):
+            shift_pixels(pack_tac(random_tac((2, 4))), 2)
+
+    def test_impute_temporal_packed(self):
+        target = np.array([[0, 0, 0, 0, 50]], dtype=np.uint8)
+        trailing = np.array([[50, 100, 0, 50, 100]], dtype=np.uint8)
+        leading = np.array([[50, 100, 0, 100, 100]], dtype=np.uint8)
+        imputed, mask = impute_temporal_packed(
+            pack_tac(target), pack_tac(trailing), pack_tac(leading)
+        )
+        assert unpack_tac(imputed, 5).tolist() == [[50, 100, 0, 0, 50]]
+        assert count_pixels(mask) == 2
+
+
+class TestPackedTACCube:
+    def test_from_arrays(self):
+        tac = random_tac((4, 5, 6))
+        qa = np.full(tac.shape, 21, dtype=np.uint8)
+        cube = PackedTACCube.from_arrays(tac, qa)
+        np.testing.assert_array_equal(cube.tac(), tac)
+        np.testing.assert_array_equal(cube.qa(), qa)
+        np.testing.assert_array_equal(cube.cloud_tac(), np.where(tac == 0, 100, 0))
+        np.testing.assert_array_equal(cube.snow_tac(), np.where(tac == 100, 100, 0))
+
+    def test_from_cloud_snow(self):
+        tac = random_tac((2, 3, 9))
+        cloud = np.where(tac == 0, 100, 0)
+        snow = np.where(tac == 100, 100, 0)
+        cube = PackedTACCube.from_cloud_snow(cloud, snow)
+        np.testing.assert_array_equal(cube.tac(), tac)
+        assert cube.qa() is None
+
+    def test_tac_footprint(self):
+        tac = random_tac((10, 16, 64))
+        cube = PackedTACCube.from_arrays(tac)
+        assert cube.nbytes * 4 == tac.nbytes
+
+    def test_save_load(self, tmp_path):
+        tac = random_tac((3, 4, 5))
+        qa = np.full(tac.shape, 10, dtype=np.uint8)
+        path = tmp_path / "cube.npz"
+        PackedTACCube.from_arrays(tac, qa).save(path)
+        cube = PackedTACCube.load(path)
+        assert cube.shape == (3, 4, 5)
+        np.testing.assert_array_equal(cube.tac(), tac)
+        np.testing.assert_array_equal(cube.qa(), qa)
+
+    def test_invalid_shape(self):
+        with pytest.raises(ValueError):
+            PackedTACCube(np.zeros((2, 2, 2), dtype=np.uint8), (2, 2, 20))
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+from datetime import date, timedelta
+
+from observatorio_ipa.local import rechunk
+from observatorio_ipa.local.phenology import (
+    NO_SNOW_DAY,
+    PhenologyAccumulator,
+    hydro_year,
+    phenology_from_store,
+    snow_phenology,
+)
+
+START_DAY = date(2023, 3, 20)
+
+
+def random_cubes(n_days=40, shape=(4, 5), seed=0):
+    rng = np.random.default_rng(seed)
+    snow_tac = rng.choice(np.array([0, 100], dtype=np.uint8), size=(n_days,) + shape)
+    qa = rng.choice(
+        np.array([10, 11, 20, 40, 50], dtype=np.uint8), size=(n_days,) + shape
+    )
+    return snow_tac, qa
+
+
+def reference_pixel(snow, qa, min_run):
+    """Phenology of one pixel of one hydrological year with a per-day loop"""
+    onset, melt_out, run = NO_SNOW_DAY, NO_SNOW_DAY, 0
+    for t, is_snow in enumerate(snow):
+        run = run + 1 if is_snow else 0
+        if run == min_run and onset == NO_SNOW_DAY:
+            onset = t - min_run + 1
+        if run >= min_run:
+            melt_out = t + 1
+    return onset, melt_out, int(np.sum(snow)), int(np.sum(qa >= 20))
+
+
+class TestHydroYear:
+    def test_hydro_year(self):
+        assert hydro_year(date(2023, 3, 31)) == 2022
+        assert hydro_year(date(2023, 4, 1)) == 2023
+
+
+class TestSnowPhenology:
+    @pytest.mark.parametrize("min_run", [1, 3])
+    def test_match_per_pixel_reference(self, min_run):
+        snow_tac, qa = random_cubes()
+        results = snow_phenology(snow_tac, qa, START_DAY, min_run=min_run)
+        # 12 days of March (2022) and 28 days of April (2023)
+        assert sorted(results) == [2022, 2023]
+        assert results[2022]["n_days"] == 12
+        assert results[2023]["n_days"] == 28
+
+        year_days = {2022: slice(0, 12), 2023: slice(12, 40)}
+        for year, days in year_days.items():
+            for row in range(4):
+                for col in range(5):
+                    expected = reference_pixel(
+                        snow_tac[days, row, col] == 100, qa[days, row, col], min_run
+                    )
+                    actual = tuple(
+                        int(results[year][product][row, col])
+                        for product in ["onset", "melt_out", "duration", "imputed"]
+                    )
+                    if year == 2022:
+                        # March 20th is day 353 of the 2022 hydrological year
+                        offset = (START_DAY - date(2022, 4, 1)).days
+                        expected = tuple(
+                            v + offset if i < 2 and v != NO_SNOW_DAY else v
+                            for i, v in enumerate(expected)
+                        )
+                    assert actual == expected
+
+    def test_isolated_snowfall_with_min_run(self):
+        snow = np.array([100, 0, 100, 100, 100, 0, 100, 0], dtype=np.uint8)
+        snow_tac = snow.reshape(-1, 1, 1)
+        results = snow_phenology(snow_tac, None, date(2023, 4, 1), min_run=3)
+        assert results[2023]["onset"][0, 0] == 2
+        assert results[2023]["melt_out"][0, 0] == 5
+        assert results[2023]["duration"][0, 0] == 5
+        assert results[2023]["imputed"][0, 0] == 0
+
+    def test_no_snow(self):
+        snow_tac = np.zeros((5, 2, 2), dtype=np.uint8)
+        results = snow_phenology(snow_tac, None, date(2023, 4, 1))
+        assert np.all(results[2023]["onset"] == NO_SNOW_DAY)
+        assert np.all(results[2023]["melt_out"] == NO_SNOW_DAY)
+
+
+class TestPhenologyAccumulator:
+    def test_streaming_chunks_match_single_pass(self):
+        snow_tac, qa = random_cubes()
+        expected = snow_phenology(snow_tac, qa, START_DAY, min_run=2)
+
+        accumulator = PhenologyAccumulator((4, 5), min_run=2)
+        for day in range(0, 40, 7):
+            accumulator.update(
+                snow_tac[day : day + 7], qa[day : day + 7], START_DAY + timedelta(day)
+            )
+        results = accumulator.finalize()
+        for year in expected:
+            for product in ["onset", "melt_out", "duration", "imputed"]:
+                np.testing.assert_array_equal(
+                    results[year][product], expected[year][product]
+                )
+
+    def test_days_not_consecutive(self):
+        snow_tac, qa = random_cubes(n_days=5)
+        accumulator = PhenologyAccumulator((4, 5))
+        accumulator.update(snow_tac, qa, START_DAY)
+        with pytest.raises(ValueError):
+            accumulator.update(snow_tac, qa, START_DAY + timedelta(10))
+
+    def test_invalid_min_run(self):
+        with pytest.raises(ValueError):
+            PhenologyAccumulator((4, 5), min_run=0)
+
+
+class TestPhenologyFromStore:
+    def test_match_in_memory(self, tmp_path):
+        snow_tac, qa = random_cubes(shape=(7, 6))
+        rechunk.write_store(tmp_path / "snow", snow_tac, (16, 3, 4))
+        rechunk.write_store(tmp_path / "qa", qa, (16, 3, 4))
+        expected = snow_phenology(snow_tac, qa, START_DAY)
+
+        results = phenology_from_store(
+            tmp_path / "snow", START_DAY, qa_store=tmp_path / "qa"
+        )
+        assert sorted(results) == sorted(expected)
+        for year in expected:
+            assert results[year]["n_days"] == expected[year]["n_days"]
+            for product in ["onset", "melt_out", "duration", "imputed"]:
+                np.testing.assert_array_equal(
+                    results[year][product], expected[year][product]
+                )
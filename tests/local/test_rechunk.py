@@ -0,0 +1,157 @@
+import os
+import numpy as np
+import pytest
+
+from observatorio_ipa.local.rechunk import (
+    _cell_boundaries,
+    _rechunk_plan,
+    main,
+    parse_memory,
+    read_manifest,
+    read_region,
+    read_store,
+    rechunk,
+    write_store,
+)
+
+
+def random_cube(shape, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.choice(np.array([0, 50, 100], dtype=np.uint8), size=shape)
+
+
+def replace_then_interrupt(n_calls):
+    calls = []
+
+    def replace(src, dst):
+        calls.append(dst)
+        if len(calls) > n_calls:
+            raise KeyboardInterrupt()
+        os.rename(src, dst)
+
+    return replace
+
+
+class TestChunkStore:
+    def test_roundtrip(self, tmp_path):
+        cube = random_cube((5, 7, 9))
+        manifest = write_store(tmp_path / "cube", cube, (2, 4, 4))
+        assert manifest["chunks"] == [2, 4, 4]
+        np.testing.assert_array_equal(read_store(tmp_path / "cube"), cube)
+
+    def test_read_region(self, tmp_path):
+        cube = random_cube((5, 7, 9))
+        write_store(tmp_path / "cube", cube, (2, 4, 4))
+        region = read_region(tmp_path / "cube", (slice(1, 4), slice(3, 6), slice(0, 9)))
+        np.testing.assert_array_equal(region, cube[1:4, 3:6, 0:9])
+
+    def test_different_store_exists(self, tmp_path):
+        write_store(tmp_path / "cube", random_cube((5, 7, 9)), (2, 4, 4))
+        with pytest.raises(ValueError):
+            write_store(tmp_path / "cube", random_cube((5, 7, 9)), (5, 1, 1))
+
+
+class TestRechunk:
+    @pytest.mark.parametrize(
+        "source_chunks, target_chunks",
+        [
+            ((2, 8, 8), (10, 2, 2)),  # space-major to time-major
+            ((10, 2, 2), (2, 8, 8)),  # time-major to space-major
+            ((3, 5, 3), (4, 2, 7)),  # chunks not aligned
+        ],
+    )
+    def test_layouts(self, tmp_path, source_chunks, target_chunks):
+        cube = random_cube((10, 8, 8))
+        write_store(tmp_path / "source", cube, source_chunks)
+        manifest = rechunk(tmp_path / "source", tmp_path / "target", target_chunks)
+        assert manifest["chunks"] == list(target_chunks)
+        assert read_manifest(tmp_path / "target") == manifest
+        np.testing.assert_array_equal(read_store(tmp_path / "target"), cube)
+        assert not (tmp_path / "target.intermediate").exists()
+
+    def test_memory_budget_smaller_than_chunks(self, tmp_path, mocker):
+        cube = random_cube((10, 8, 8))
+        write_store(tmp_path / "source", cube, (2, 8, 8))
+        spy = mocker.spy(np, "save")
+        rechunk(tmp_path / "source", tmp_path / "target", (10, 4, 4), max_memory=16)
+        np.testing.assert_array_equal(read_store(tmp_path / "target"), cube)
+        assert max(call.args[1].nbytes for call in spy.call_args_list) <= 16
+
+    def test_memory_budget_too_small(self, tmp_path):
+        write_store(tmp_path / "source", random_cube((2, 2, 2)), (1, 2, 2))
+        with pytest.raises(ValueError):
+            rechunk(tmp_path / "source", tmp_path / "target", (2, 1, 1), max_memory=0)
+
+    def test_intermediate_cells_sized_from_memory(self):
+        # 25 years, space-major to time-major
+        shape = [9125, 2048, 2048]
+        read_chunks, write_chunks = _rechunk_plan(
+            shape, [8, 1024, 1024], [365, 64, 64], 1, 256 * 2**20
+        )
+        assert read_chunks == [256, 1024, 1024]
+        assert write_chunks == [9125, 448, 64]
+        boundaries = _cell_boundaries(shape, read_chunks, write_chunks, 1, 256 * 2**20)
+        cell_sizes = [np.diff(b) for b in boundaries]
+        # not the 8x64x64 intersection of source and target chunks
+        assert [sizes.min() for sizes in cell_sizes] == [165, 128, 64]
+        assert np.prod([len(sizes) for sizes in cell_sizes]) == 6912
+
+    def test_resume(self, tmp_path, mocker):
+        cube = random_cube((10, 8, 8))
+        write_store(tmp_path / "source", cube, (2, 8, 8))
+        # read groups (4, 8, 8), write groups (10, 8, 4) and 6 intermediate cells,
+        # interrupt pass 2 after the first target chunk
+        mocker.patch(
+            "observatorio_ipa.local.rechunk.os.replace",
+            side_effect=replace_then_interrupt(7),
+        )
+        with pytest.raises(KeyboardInterrupt):
+            rechunk(
+                tmp_path / "source", tmp_path / "target", (10, 4, 4), max_memory=320
+            )
+        mocker.stopall()
+
+        spy = mocker.spy(np, "save")
+        rechunk(tmp_path / "source", tmp_path / "target", (10, 4, 4), max_memory=320)
+        # read groups were already split, only the 3 pending target chunks are written
+        assert spy.call_count == 3
+        np.testing.assert_array_equal(read_store(tmp_path / "target"), cube)
+
+
+class TestParseMemory:
+    @pytest.mark.parametrize(
+        "value, expected",
+        [
+            ("512MB", 512 * 2**20),
+            ("2GB", 2 * 2**30),
+            ("1.5kb", 1536),
+            ("100", 100),
+            (64, 64),
+        ],
+    )
+    def test_valid(self, value, expected):
+        assert parse_memory(value) == expected
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            parse_memory("lots")
+
+
+class TestMain:
+    def test_command_line(self, tmp_path):
+        cube = random_cube((4, 4, 4))
+        write_store(tmp_path / "source", cube, (1, 4, 4))
+        assert (
+            main(
+                [
+                    str(tmp_path / "source"),
+                    str(tmp_path / "target"),
+                    "--chunks",
+                    "4,2,2",
+                    "--max-memory",
+                    "1KB",
+                ]
+            )
+            == 0
+        )
+        assert read_manifest(tmp_path / "target")["chunks"] == [4, 2, 2]
@@ -0,0 +1,135 @@
+import os
+import subprocess
+import sys
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from observatorio_ipa.local.shared import (
+    SharedRasterStore,
+    attach_array,
+    get_shared_array,
+    init_worker,
+)
+
+
+def _sum_shared(key):
+    return int(get_shared_array(key).astype(np.int64).sum())
+
+
+def _block_exists(name):
+    try:
+        block = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    block.close()
+    return True
+
+
+# Parent that shares a DEM with workers and is killed without any Python cleanup
+KILLED_PARENT_SCRIPT = textwrap.dedent("""
+    import os, signal
+    from concurrent.futures import ProcessPoolExecutor
+    import numpy as np
+    from observatorio_ipa.local.shared import SharedRasterStore, get_shared_array, init_worker
+
+    def _sum_shared(key):
+        return int(get_shared_array(key).sum())
+
+    if __name__ == "__main__":
+        store = SharedRasterStore()
+        specs = {"dem": store.add("dem", np.ones((10, 10), dtype=np.int16))}
+        with ProcessPoolExecutor(max_workers=2, initializer=init_worker, initargs=(specs,)) as pool:
+            list(pool.map(_sum_shared, ["dem"] * 4))
+        print(specs["dem"].name, flush=True)
+        os.kill(os.getpid(), signal.SIGKILL)
+    """)
+
+
+class TestSharedRasterStore:
+    def test_add_and_get(self):
+        dem = np.arange(12, dtype=np.int16).reshape(3, 4)
+        with SharedRasterStore() as store:
+            spec = store.add("dem", dem)
+            assert spec.shape == (3, 4)
+            assert spec.dtype == dem.dtype.str
+            np.testing.assert_array_equal(store.get("dem"), dem)
+            assert not store.get("dem").flags.writeable
+            assert store.nbytes == dem.nbytes
+
+    def test_add_dem_converts_to_int16(self):
+        with SharedRasterStore() as store:
+            store.add_dem(np.array([[1.2, np.nan]]))
+            store.add_aoi(np.array([[1, 0]]))
+            assert store.get("dem").dtype == np.int16
+            assert store.get("aoi").tolist() == [[True, False]]
+
+    def test_duplicate_key(self):
+        with SharedRasterStore() as store:
+            store.add("dem", np.zeros(2))
+            with pytest.raises(ValueError):
+                store.add("dem", np.zeros(2))
+
+    def test_blocks_unlinked_on_close(self):
+        store = SharedRasterStore()
+        spec = store.add("dem", np.zeros((2, 2), dtype=np.int16))
+        assert _block_exists(spec.name)
+        store.close()
+        assert not _block_exists(spec.name)
+        with pytest.raises(ValueError):
+            store.add("aoi", np.zeros(2))
+
+    def test_blocks_unlinked_on_exception(self):
+        with pytest.raises(RuntimeError):
+            with SharedRasterStore() as store:
+                spec = store.add("dem", np.zeros((2, 2), dtype=np.int16))
+                raise RuntimeError("worker crashed")
+        assert not _block_exists(spec.name)
+
+    def test_attach_array(self):
+        with SharedRasterStore() as store:
+            spec = store.add("aoi", np.array([[True, False]]))
+            block, view = attach_array(spec)
+            assert view.tolist() == [[True, False]]
+            del view
+            block.close()
+
+    def test_workers_read_shared_arrays(self):
+        dem = np.arange(100, dtype=np.int16).reshape(10, 10)
+        with SharedRasterStore() as store:
+            specs = {"dem": store.add("dem", dem)}
+            with ProcessPoolExecutor(
+                max_workers=2, initializer=init_worker, initargs=(specs,)
+            ) as pool:
+                results = list(pool.map(_sum_shared, ["dem"] * 4))
+            assert results == [int(dem.sum())] * 4
+            # workers exiting must not unlink the parent's blocks
+            assert _block_exists(specs["dem"].name)
+
+    @pytest.mark.skipif(not Path("/dev/shm").is_dir(), reason="needs /dev/shm")
+    def test_blocks_unlinked_when_parent_killed(self):
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+        result = subprocess.run(
+            [sys.executable, "-c", KILLED_PARENT_SCRIPT],
+            capture_output=True,
+            text=True,
+            env=env,
+            timeout=60,
+        )
+        name = result.stdout.strip()
+        assert name, result.stderr
+        # the resource tracker of the killed parent unlinks the blocks the workers attached to
+        block_path = Path("/dev/shm", name.lstrip("/"))
+        deadline = time.monotonic() + 10
+        while block_path.exists() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert not block_path.exists()
+
+    def test_get_shared_array_not_attached(self):
+        with pytest.raises(KeyError):
+            get_shared_array("not_attached")
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+from observatorio_ipa.local.zonal import (
+    rasterize_labels,
+    tac_class_counts,
+    zonal_means,
+    zonal_tac_percentages,
+)
+
+# 1x1 pixels, origin at (0, 10)
+GEOTRANSFORM = (0, 1, 0, 10, 0, -1)
+
+
+def square(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+
+
+def random_tac(shape, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.choice(np.array([0, 50, 100, 255], dtype=np.uint8), size=shape)
+
+
+class TestRasterizeLabels:
+    def test_polygons(self):
+        labels = rasterize_labels(
+            [
+                {"type": "Polygon", "coordinates": [square(0, 8, 2, 10)]},
+                {"type": "Polygon", "coordinates": [square(5, 0, 10, 5)]},
+            ],
+            (10, 10),
+            GEOTRANSFORM,
+        )
+        assert labels.dtype == np.int32
+        expected = np.zeros((10, 10), dtype=np.int32)
+        expected[0:2, 0:2] = 1
+        expected[5:10, 5:10] = 2
+        np.testing.assert_array_equal(labels, expected)
+
+    def test_polygon_with_hole(self):
+        labels = rasterize_labels(
+            [
+                {
+                    "type": "Polygon",
+                    "coordinates": [square(0, 0, 6, 6), square(2, 2, 4, 4)],
+                }
+            ],
+            (10, 10),
+            GEOTRANSFORM,
+        )
+        assert labels.sum() == 36 - 4
+        assert labels[6:8, 2:4].sum() == 0
+
+    def test_multipolygon_and_triangle(self):
+        labels = rasterize_labels(
+            [
+                {
+                    "type": "MultiPolygon",
+                    "coordinates": [
+                        [square(0, 9, 1, 10)],
+                        [[[0, 0], [4, 0], [0, 4], [0, 0]]],
+                    ],
+                }
+            ],
+            (10, 10),
+            GEOTRANSFORM,
+        )
+        assert labels[0, 0] == 1
+        # pixel centers of the triangle x + y < 4
+        assert labels[6:10, 0:4].sum() == 6
+
+    def test_outside_raster(self):
+        labels = rasterize_labels(
+            [{"type": "Polygon", "coordinates": [square(-5, -5, 1, 1)]}],
+            (10, 10),
+            GEOTRANSFORM,
+        )
+        assert labels.sum() == 1
+        assert labels[9, 0] == 1
+
+    def test_invalid_geometry(self):
+        with pytest.raises(ValueError):
+            rasterize_labels(
+                [{"type": "Point", "coordinates": [0, 0]}], (10, 10), GEOTRANSFORM
+            )
+
+
+class TestZonalStatistics:
+    @pytest.fixture
+    def labels(self):
+        rng = np.random.default_rng(1)
+        return rng.integers(0, 6, size=(20, 30)).astype(np.int32)
+
+    def test_class_counts_match_per_label_loop(self, labels):
+        tac = random_tac((20, 30))
+        counts = tac_class_counts(tac, labels, 5)
+        for label in range(1, 6):
+            in_label = labels == label
+            assert counts[label - 1].tolist() == [
+                np.sum(in_label & (tac == 0)),
+                np.sum(in_label & (tac == 50)),
+                np.sum(in_label & (tac == 100)),
+                np.sum(in_label & (tac == 255)),
+            ]
+
+    def test_percentages(self, labels):
+        tac_cube = random_tac((3, 20, 30), seed=2)
+        result = zonal_tac_percentages(tac_cube, labels, 5)
+        assert result["snow"].shape == (3, 5)
+        for day in range(3):
+            for label in range(1, 6):
+                valid = (labels == label) & (tac_cube[day] != 255)
+                assert result["n_pixels"][day, label - 1] == valid.sum()
+                assert result["snow"][day, label - 1] == pytest.approx(
+                    100 * np.mean(tac_cube[day][valid] == 100)
+                )
+                assert result["cloud"][day, label - 1] == pytest.approx(
+                    100 * np.mean(tac_cube[day][valid] == 0)
+                )
+
+    def test_percentages_without_valid_pixels(self):
+        labels = np.array([[1, 2]], dtype=np.int32)
+        tac_cube = np.array([[[100, 255]]], dtype=np.uint8)
+        result = zonal_tac_percentages(tac_cube, labels, 2)
+        assert result["snow"][0, 0] == 100
+        assert np.isnan(result["snow"][0, 1])
+
+    def test_means(self, labels):
+        rng = np.random.default_rng(3)
+        values = rng.uniform(0, 100, size=(20, 30))
+        values[0, :] = np.nan
+        means = zonal_means(values, labels, 6)
+        for label in range(1, 6):
+            assert means[label - 1] == pytest.approx(
+                np.nanmean(values[labels == label])
+            )
+        assert np.isnan(means[5])
@@ -0,0 +1,171 @@
+from datetime import date, datetime, UTC
+
+import pytest
+
+from observatorio_ipa.processes.basin_stats_export import (
+    _get_exported_days,
+    basin_stats_proc,
+)
+
+
+def time_start_of(day):
+    return int(datetime.fromisoformat(day).replace(tzinfo=UTC).timestamp() * 1000)
+
+
+class TestGetExportedDays:
+    def test_exclude_stacks_and_other_prefixes(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.basin_stats_export.asset_index.get_index",
+            return_value=None,
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.basin_stats_export.assets.list_assets",
+            return_value=[],
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.basin_stats_export.assets.get_asset_names",
+            return_value=[
+                "path/to/daily/daily_2023_01_02",
+                "path/to/daily/daily_2023_01_01",
+                "path/to/daily/stack_daily_2023_01_03_2023_01_04",
+            ],
+        )
+        assert _get_exported_days("path/to/daily", "daily_") == [
+            "2023-01-01",
+            "2023-01-02",
+        ]
+
+
+class TestBasinStatsProc:
+    @pytest.fixture(autouse=True)
+    def mock_ee(self, mocker):
+        mocker.patch("observatorio_ipa.processes.basin_stats_export.ee")
+
+    def mock_exported_days(self, mocker, days):
+        mocker.patch(
+            "observatorio_ipa.processes.basin_stats_export._get_exported_days",
+            return_value=days,
+        )
+
+    def test_no_images(self, mocker):
+        self.mock_exported_days(mocker, [])
+        mock_zonal = mocker.patch(
+            "observatorio_ipa.processes.basin_stats_export.gee_zonal.ic_zonal_means"
+        )
+        result = basin_stats_proc(
+            "path/to/daily", "daily", "path/to/basins", "basin_id", "path/to/stats"
+        )
+        assert result["images"] == 0
+        assert result["rows"] == 0
+        mock_zonal.assert_not_called()
+
+    def test_rows_are_appended(self, mocker):
+        self.mock_exported_days(mocker, ["2023-01-01"])
+        mocker.patch(
+            "observatorio_ipa.processes.basin_stats_export.gee_zonal.ic_zonal_means",
+            return_value=[
+                {
+                    "time_start": time_start_of("2023-01-01"),
+                    "label": 1,
+                    "Snow_TAC": 10.0,
+                },
+                {
+                    "time_start": time_start_of("2023-01-01"),
+                    "label": 2,
+                    "Snow_TAC": 20.0,
+                },
+            ],
+        )
+        mock_writer = mocker.patch(
+            "observatorio_ipa.processes.basin_stats_export.basin_stats.BasinStatsWriter"
+        )
+        writer = mock_writer.return_value.__enter__.return_value
+
+        result = basin_stats_proc(
+            "path/to/daily", "daily", "path/to/basins", "basin_id", "path/to/stats"
+        )
+
+        assert result["rows"] == 2
+        rows = writer.add.call_args.args[0]
+        assert [row["basin_id"] for row in rows] == [1, 2]
+        assert rows[0]["date"] == date(2023, 1, 1)
+
+    def test_days_in_store_are_skipped_and_batched(self, mocker, tmp_path):
+        self.mock_exported_days(
+            mocker, ["2023-01-01", "2023-01-02", "2023-01-03", "2023-01-04"]
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.basin_stats_export.basin_stats.stored_dates",
+            return_value={date(2023, 1, 1)},
+        )
+        batches = [
+            ["2023-01-02", "2023-01-03"],
+            ["2023-01-04"],
+        ]
+        mock_zonal = mocker.patch(
+            "observatorio_ipa.processes.basin_stats_export.gee_zonal.ic_zonal_means",
+            side_effect=[
+                [
+                    {"time_start": time_start_of(_day), "label": 1, "Snow_TAC": 1.0}
+                    for _day in _batch
+                ]
+                for _batch in batches
+            ],
+        )
+
+        result = basin_stats_proc(
+            "path/to/daily",
+            "daily",
+            "path/to/basins",
+            "basin_id",
+            str(tmp_path),
+            batch_size=2,
+        )
+
+        assert mock_zonal.call_count == 2
+        assert result["images_pending"] == 3
+        assert result["images"] == 3
+        assert result["rows"] == 3
+        # each batch is written when it's computed
+        assert len(result["files"]) == 2
+
+    def test_failed_batch_is_pending_in_next_run(self, mocker, tmp_path):
+        self.mock_exported_days(mocker, ["2023-01-01", "2023-01-02"])
+        mocker.patch(
+            "observatorio_ipa.processes.basin_stats_export.gee_zonal.ic_zonal_means",
+            side_effect=[
+                Exception("User memory limit exceeded"),
+                [{"time_start": time_start_of("2023-01-02"), "label": 1}],
+            ],
+        )
+        result = basin_stats_proc(
+            "path/to/daily",
+            "daily",
+            "path/to/basins",
+            "basin_id",
+            str(tmp_path),
+            batch_size=1,
+        )
+        assert result["images_failed"] == 1
+        assert result["images"] == 1
+
+        mock_zonal = mocker.patch(
+            "observatorio_ipa.processes.basin_stats_export.gee_zonal.ic_zonal_means",
+            return_value=[{"time_start": time_start_of("2023-01-01"), "label": 1}],
+        )
+        result = basin_stats_proc(
+            "path/to/daily", "daily", "path/to/basins", "basin_id", str(tmp_path)
+        )
+        assert result["images_pending"] == 1
+        assert mock_zonal.call_count == 1
+
+    def test_invalid_batch_size(self):
+        with pytest.raises(ValueError):
+            basin_stats_proc(
+                "path/to/daily",
+                "daily",
+                "path/to/basins",
+                "basin_id",
+                "path/to/stats",
+                batch_size=0,
+            )
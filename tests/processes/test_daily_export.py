@@ -0,0 +1,93 @@
+import pytest
+from observatorio_ipa.processes.daily_export import (
+    _check_days_are_complete,
+    _daily_images_pending_export,
+    _group_consecutive_dates,
+    daily_image_names,
+)
+
+
+class TestDailyImageNames:
+    def test_prefix_is_fixed(self):
+        assert daily_image_names("daily", ["2023-01-01", "2023-01-02"]) == [
+            "daily_2023_01_01",
+            "daily_2023_01_02",
+        ]
+
+    def test_prefix_with_separator(self):
+        assert daily_image_names("daily-", ["2023-01-01"]) == ["daily-2023_01_01"]
+
+
+class TestDailyImagesPendingExport:
+    def test_some_images_exported(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.daily_export.assets.list_assets",
+            return_value=[],
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.daily_export.assets.get_asset_names",
+            return_value=[
+                "path/to/collection/prefix_2023_01_01",
+                "path/to/collection/stack_prefix_2023_01_02_2023_01_03",
+            ],
+        )
+        expected_dates = ["2023-01-01", "2023-01-02", "2023-01-03"]
+        assert _daily_images_pending_export(
+            expected_dates, "path/to/collection", "prefix_"
+        ) == ["2023-01-02", "2023-01-03"]
+
+    def test_asset_index(self, mocker):
+        mock_index = mocker.patch(
+            "observatorio_ipa.processes.daily_export.asset_index.get_index"
+        )
+        mock_index.return_value.periods.return_value = {"2023-01-01"}
+        assert _daily_images_pending_export(
+            ["2023-01-01", "2023-01-02"], "path/to/collection", "daily_"
+        ) == ["2023-01-02"]
+
+    def test_expected_dates_not_list(self):
+        with pytest.raises(TypeError):
+            _daily_images_pending_export("2023-01-01", "path/to/collection", "prefix_")  # type: ignore
+
+
+class TestCheckDaysAreComplete:
+    def test_requires_leading_days(self):
+        reference_dates = ["2023-01-01", "2023-01-02", "2023-01-03", "2023-01-04"]
+        days = ["2023-01-01", "2023-01-02", "2023-01-03"]
+        assert _check_days_are_complete(days, reference_dates, leading_days=2) == [
+            "2023-01-01",
+            "2023-01-02",
+        ]
+
+    def test_day_without_image(self):
+        reference_dates = ["2023-01-01", "2023-01-03", "2023-01-10"]
+        assert _check_days_are_complete(["2023-01-02"], reference_dates) == []
+
+    def test_empty_reference_dates(self):
+        assert _check_days_are_complete(["2023-01-02"], []) == []
+
+
+class TestGroupConsecutiveDates:
+    def test_split_gaps(self):
+        dates = ["2023-01-05", "2023-01-01", "2023-01-02", "2023-01-04"]
+        assert _group_consecutive_dates(dates, 10) == [
+            ["2023-01-01", "2023-01-02"],
+            ["2023-01-04", "2023-01-05"],
+        ]
+
+    def test_max_size(self):
+        dates = ["2023-01-01", "2023-01-02", "2023-01-03", "2023-01-04", "2023-01-05"]
+        assert _group_consecutive_dates(dates, 2) == [
+            ["2023-01-01", "2023-01-02"],
+            ["2023-01-03", "2023-01-04"],
+            ["2023-01-05"],
+        ]
+
+    def test_month_boundary(self):
+        assert _group_consecutive_dates(["2023-01-31", "2023-02-01"], 5) == [
+            ["2023-01-31", "2023-02-01"]
+        ]
+
+    def test_invalid_max_size(self):
+        with pytest.raises(ValueError):
+            _group_consecutive_dates(["2023-01-01"], 0)
@@ -1,12 +1,22 @@
+import ee
 import pytest
 from datetime import date
 from pytest_mock import mocker
 from observatorio_ipa.processes.monthly_export import (
+    MONTHLY_BANDS,
+    _ic_fold_monthly_mean,
+    _ic_monthly_mean,
     _create_ym_sequence,
     _monthly_images_pending_export,
     _get_month_range_dates,
     _check_months_are_complete,
     _make_month_dates_seq,
+    _get_provisional_images,
+    _monthly_fingerprints,
+    _last_complete_day,
+    _provisional_days_range,
+    _group_months,
+    _stacked_months_export_task,
 )
 
 
@@ -55,6 +65,22 @@ class TestCreateYmSequence:
 
 
 class TestGetImagesPendingExport:
+    def test_asset_index(self, mocker):
+        mock_index = mocker.patch(
+            "observatorio_ipa.processes.monthly_export.asset_index.get_index"
+        )
+        mock_index.return_value.periods.return_value = {"2023-01", "2022-12"}
+        mock_list_assets = mocker.patch(
+            "observatorio_ipa.processes.monthly_export.assets.list_assets"
+        )
+        assert _monthly_images_pending_export(
+            ["2023-01", "2023-02"], "path/to/collection", "prefix"
+        ) == ["2023-02"]
+        mock_index.return_value.periods.assert_called_once_with(
+            "path/to/collection", "prefix"
+        )
+        mock_list_assets.assert_not_called()
+
     def test_no_images_exported(self, mocker):
         mocker.patch(
             "observatorio_ipa.processes.monthly_export.assets.list_assets",
@@ -479,3 +505,248 @@ class TestMakeMonthDatesSeq:
         leading_days = -2
         with pytest.raises(ValueError):
             _make_month_dates_seq(month, leading_days=leading_days)
+
+
+class TestGetProvisionalImages:
+    def test_asset_index(self, mocker):
+        mock_index = mocker.patch(
+            "observatorio_ipa.processes.monthly_export.asset_index.get_index"
+        )
+        mock_index.return_value.images.return_value = {
+            "prefix_2023_01": {"period": "2023-01", "properties": {"provisional": 0}},
+            "prefix_2023_02": {
+                "period": "2023-02",
+                "properties": {
+                    "provisional": 1,
+                    "last_day": "2023-02-10",
+                    "n_days": 10,
+                },
+            },
+            "prefix_2023_03": {"period": "2023-03", "properties": None},
+        }
+        mock_list = mocker.patch(
+            "observatorio_ipa.processes.monthly_export.ee.ee_list.List"
+        )
+        assert _get_provisional_images("path/to/collection", "prefix") == {
+            "2023-02": {"last_day": "2023-02-10", "n_days": 10}
+        }
+        mock_list.assert_not_called()
+
+    def test_only_provisional_images(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.assets.list_assets",
+            return_value=[],
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.assets.get_asset_names",
+            return_value=[
+                "path/to/collection/prefix_2023_01",
+                "path/to/collection/prefix_2023_02",
+                "path/to/collection/other_2023_02",
+            ],
+        )
+        mocker.patch("observatorio_ipa.processes.monthly_export.ee.image.Image")
+        mock_list = mocker.patch(
+            "observatorio_ipa.processes.monthly_export.ee.ee_list.List"
+        )
+        mock_list.return_value.getInfo.return_value = [
+            {"provisional": 0, "n_days": 31},
+            {"provisional": 1, "last_day": "2023-02-10", "n_days": 10},
+        ]
+        assert _get_provisional_images("path/to/collection", "prefix") == {
+            "2023-02": {"last_day": "2023-02-10", "n_days": 10}
+        }
+
+    def test_no_images(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.assets.list_assets",
+            return_value=[],
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.assets.get_asset_names",
+            return_value=[],
+        )
+        assert _get_provisional_images("path/to/collection", "prefix") == {}
+
+
+class TestMonthlyFingerprints:
+    image_versions = {
+        "terra": {"2022-12-30": 1, "2023-01-15": 1, "2023-03-01": 1},
+        "aqua": {"2023-01-15": 1},
+    }
+    asset_update_times = {"aoi": "2023-01-01T00:00:00Z"}
+
+    def fingerprint(self, image_versions=None, asset_update_times=None):
+        return _monthly_fingerprints(
+            ["2023-01"],
+            image_versions or self.image_versions,
+            asset_update_times or self.asset_update_times,
+        )["2023-01"]
+
+    def test_same_inputs(self):
+        assert self.fingerprint() == self.fingerprint()
+
+    def test_new_version_of_buffer_day(self):
+        image_versions = {**self.image_versions}
+        image_versions["terra"] = {**image_versions["terra"], "2022-12-30": 2}
+        assert self.fingerprint(image_versions) != self.fingerprint()
+
+    def test_new_day_outside_month(self):
+        image_versions = {**self.image_versions}
+        image_versions["terra"] = {**image_versions["terra"], "2023-03-01": 2}
+        assert self.fingerprint(image_versions) == self.fingerprint()
+
+    def test_asset_updated(self):
+        assert (
+            self.fingerprint(asset_update_times={"aoi": "2024-01-01T00:00:00Z"})
+            != self.fingerprint()
+        )
+
+
+class TestLastCompleteDay:
+    def test_leading_days(self):
+        assert (
+            _last_complete_day(["2023-02-28", "2023-03-02"], leading_days=2)
+            == "2023-02-28"
+        )
+
+    def test_empty(self):
+        assert _last_complete_day([], leading_days=2) is None
+
+
+class TestProvisionalDaysRange:
+    def test_new_provisional_image(self):
+        assert _provisional_days_range("2023-02", "2023-02-10") == (
+            "2023-02-01",
+            "2023-02-10",
+        )
+
+    def test_new_days_of_provisional_image(self):
+        provisional_image = {"last_day": "2023-02-10", "n_days": 10}
+        assert _provisional_days_range("2023-02", "2023-02-15", provisional_image) == (
+            "2023-02-11",
+            "2023-02-15",
+        )
+
+    def test_limited_to_month(self):
+        provisional_image = {"last_day": "2023-02-20", "n_days": 20}
+        assert _provisional_days_range("2023-02", "2023-03-10", provisional_image) == (
+            "2023-02-21",
+            "2023-02-28",
+        )
+
+    def test_no_new_days(self):
+        provisional_image = {"last_day": "2023-02-10", "n_days": 10}
+        assert (
+            _provisional_days_range("2023-02", "2023-02-10", provisional_image) is None
+        )
+
+    def test_no_complete_days_in_month(self):
+        assert _provisional_days_range("2023-02", "2023-01-30") is None
+        assert _provisional_days_range("2023-02", None) is None
+
+
+def daily_ic(snow_values, masks):
+    """Collection of daily images of January 2024 with constant Snow_TAC and Cloud_TAC"""
+    images = []
+    for day, (snow, valid) in enumerate(zip(snow_values, masks), start=1):
+        ee_img = (
+            ee.image.Image.constant(snow)
+            .rename("Snow_TAC")
+            .addBands(ee.image.Image.constant(100 - snow).rename("Cloud_TAC"))
+            .toFloat()
+            .updateMask(valid)
+            .set("system:time_start", ee.ee_date.Date.fromYMD(2024, 1, day).millis())
+        )
+        images.append(ee_img)
+    return ee.imagecollection.ImageCollection(images)
+
+
+class TestFoldMonthlyMean:
+    @pytest.mark.gee
+    @pytest.mark.parametrize(
+        "masks",
+        [
+            [1, 0, 1, 1],
+            # all days of the previous provisional image masked
+            [0, 0, 1, 1],
+        ],
+    )
+    def test_fold_matches_full_month_on_masked_days(self, pytestconfig, masks):
+        ee_aoi_fc = ee.featurecollection.FeatureCollection(pytestconfig.test_fc_path)
+        ee_ic = daily_ic([100, 0, 50, 100], masks)
+
+        ee_provisional_img = _ic_fold_monthly_mean(
+            "2024-01", ee_ic, ("2024-01-01", "2024-01-02"), ee_aoi_fc
+        )
+        ee_folded_img = _ic_fold_monthly_mean(
+            "2024-01",
+            ee_ic,
+            ("2024-01-03", "2024-01-04"),
+            ee_aoi_fc,
+            ee_previous_img=ee_provisional_img,
+            previous_n_days=2,
+            provisional=False,
+        )
+        ee_full_img = _ic_monthly_mean("2024-01", ee_ic, ee_aoi_fc)
+
+        def region_mean(ee_img):
+            return ee_img.select(MONTHLY_BANDS).reduceRegion(
+                reducer=ee.reducer.Reducer.mean(),
+                geometry=ee_aoi_fc.geometry(),
+                bestEffort=True,
+            )
+
+        folded, full = ee.ee_list.List(
+            [region_mean(ee_folded_img), region_mean(ee_full_img)]
+        ).getInfo()
+        assert full["Snow_TAC"] == pytest.approx(250 / 3)
+        assert folded == pytest.approx(full)
+
+
+class TestGroupMonths:
+    def test_groups(self):
+        months = ["2023-03", "2023-01", "2023-02", "2022-12", "2023-04"]
+        assert _group_months(months, 2) == [
+            ["2022-12", "2023-01"],
+            ["2023-02", "2023-03"],
+            ["2023-04"],
+        ]
+
+    def test_invalid_stack_size(self):
+        with pytest.raises(ValueError):
+            _group_months(["2023-01"], 0)
+
+
+class TestStackedMonthsExportTask:
+    def test_split_info(self, mocker):
+        mocker.patch("observatorio_ipa.processes.monthly_export._ic_monthly_mean")
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.gee_exports.stack_images"
+        )
+        mock_create_task = mocker.patch(
+            "observatorio_ipa.processes.monthly_export.gee_exports.create_image_export_task",
+            return_value={
+                "task": "task",
+                "image": "stack_prefix_2023_01_2023_02",
+                "target": "GEE Asset",
+                "status": "created",
+            },
+        )
+        task = _stacked_months_export_task(
+            ["2023-01", "2023-02"], mocker.Mock(), mocker.Mock(), "path", "prefix_"
+        )
+        assert mock_create_task.call_args.args[1] == "stack_prefix_2023_01_2023_02"
+        assert task["split"]["asset"] == "path/stack_prefix_2023_01_2023_02"
+        assert task["split"]["images"] == [
+            {
+                "image": "prefix_2023_01",
+                "suffix": "2023_01",
+                "time_start": "2023-01-01",
+            },
+            {
+                "image": "prefix_2023_02",
+                "suffix": "2023_02",
+                "time_start": "2023-02-01",
+            },
+        ]
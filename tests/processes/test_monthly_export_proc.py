@@ -1,8 +1,19 @@
 import pytest
-from observatorio_ipa.processes.monthly_export import monthly_export_proc
+from observatorio_ipa.processes.monthly_export import (
+    estimate_monthly_export_cost,
+    monthly_export_proc,
+    plan_monthly_export,
+)
 
 
 class TestMonthlyExportProc:
+    @pytest.fixture(autouse=True)
+    def no_provisional_images(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._get_provisional_images",
+            return_value={},
+        )
+
     def test_no_images_pending_export(self, mocker):
         mocker.patch(
             "observatorio_ipa.processes.monthly_export.ee.imagecollection.ImageCollection"
@@ -74,6 +85,19 @@ class TestMonthlyExportProc:
         mocker.patch(
             "observatorio_ipa.processes.monthly_export.ee.imagecollection.ImageCollection.fromImages"
         )
+        mock_fingerprints = mocker.patch(
+            "observatorio_ipa.processes.monthly_export._current_fingerprints",
+            return_value={"2023-01": "abc"},
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.gee_exports.create_image_export_task",
+            side_effect=lambda ee_image, image_name, *args, **kwargs: {
+                "task": "mock_task",
+                "image": image_name,
+                "target": "GEE Asset",
+                "status": "created",
+            },
+        )
 
         result = monthly_export_proc(
             monthly_collection_path="path/to/collection",
@@ -82,6 +106,7 @@ class TestMonthlyExportProc:
             name_prefix="prefix",
         )
         expected = {
+            "frequency": "monthly",
             "images_pending_export": ["2023-01"],
             "images_excluded": [],
             "images_to_export": ["2023-01"],
@@ -95,6 +120,9 @@ class TestMonthlyExportProc:
             ],
         }
         assert result == expected
+        mock_fingerprints.assert_called_once_with(
+            ["2023-01"], "path/to/aoi", "path/to/dem"
+        )
 
     def test_images_excluded_incomplete(self, mocker):
         mocker.patch(
@@ -234,3 +262,284 @@ class TestMonthlyExportProc:
         }
         # assert mocked_ic_from_images.assert_called_once()
         assert result == expected
+
+
+class TestMonthlyExportProcAssetUpdates:
+    def plan(self, **fields):
+        return {
+            "frequency": "monthly",
+            "images_pending_export": ["2023-01", "2023-02"],
+            "images_excluded": [],
+            "images_to_export": [],
+            "images_to_finalize": [],
+            "images_to_fingerprint": {},
+            "fingerprints": {},
+            **fields,
+        }
+
+    def test_finalize_failed(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.plan_monthly_export",
+            return_value=self.plan(
+                images_to_finalize=["2023-01", "2023-02"],
+                fingerprints={"2023-01": "abc"},
+            ),
+        )
+        set_properties = mocker.patch(
+            "observatorio_ipa.processes.monthly_export.ee.data.setAssetProperties",
+            side_effect=[Exception("permission denied"), None],
+        )
+        result = monthly_export_proc(
+            monthly_collection_path="path/to/collection",
+            aoi_path="path/to/aoi",
+            dem_path="path/to/dem",
+            name_prefix="prefix",
+        )
+        assert set_properties.call_count == 2
+        assert result["export_tasks"] == [
+            {
+                "task": None,
+                "image": "prefix_2023_01",
+                "target": "GEE Asset",
+                "status": "failed_to_create",
+                "error": "permission denied",
+            }
+        ]
+
+    def test_add_fingerprint_failed(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.plan_monthly_export",
+            return_value=self.plan(images_to_fingerprint={"2023-01": "abc"}),
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.ee.data.setAssetProperties",
+            side_effect=Exception("permission denied"),
+        )
+        result = monthly_export_proc(
+            monthly_collection_path="path/to/collection",
+            aoi_path="path/to/aoi",
+            dem_path="path/to/dem",
+            name_prefix="prefix",
+        )
+        assert result["export_tasks"] == []
+
+
+class TestPlanMonthlyExport:
+    @pytest.fixture(autouse=True)
+    def mock_collections(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.ee.imagecollection.ImageCollection"
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._monthly_images_pending_export",
+            return_value=["2023-01", "2023-02"],
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.utils.get_collection_dates",
+            return_value=["2023-01-01", "2023-02-01", "2023-03-02"],
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._check_months_are_complete",
+            return_value=["2023-01"],
+        )
+
+    def test_plan(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._get_provisional_images",
+            return_value={},
+        )
+        plan = plan_monthly_export(
+            "path/to/collection", "prefix_", months_list=["2023-01", "2023-02"]
+        )
+        assert plan["images_pending_export"] == ["2023-01", "2023-02"]
+        assert plan["images_to_export"] == ["2023-01"]
+        assert plan["images_excluded"] == [{"2023-02": "Month incomplete"}]
+        assert plan["full_months"] == ["2023-01"]
+        # all days of January plus buffer days
+        assert plan["ic_filter_dates"][0] == "2022-12-30"
+        assert plan["ic_filter_dates"][-1] == "2023-02-02"
+        assert len(plan["ic_filter_dates"]) == 35
+
+    def test_does_not_create_tasks_or_modify_assets(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._get_provisional_images",
+            return_value={"2023-01": {"n_days": 31, "last_day": "2023-01-31"}},
+        )
+        set_properties = mocker.patch(
+            "observatorio_ipa.processes.monthly_export.ee.data.setAssetProperties"
+        )
+        create_task = mocker.patch(
+            "observatorio_ipa.processes.monthly_export.gee_exports.create_image_export_task"
+        )
+        plan = plan_monthly_export(
+            "path/to/collection", "prefix_", months_list=["2023-01", "2023-02"]
+        )
+        assert plan["images_to_finalize"] == ["2023-01"]
+        assert plan["images_to_export"] == []
+        set_properties.assert_not_called()
+        create_task.assert_not_called()
+
+    def test_revalidate(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._get_provisional_images",
+            return_value={},
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._get_exported_fingerprints",
+            return_value={"2023-03": "old", "2023-04": "same", "2023-05": None},
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._check_months_are_complete",
+            side_effect=lambda months, *args, **kwargs: [
+                _month for _month in months if _month != "2023-02"
+            ],
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._current_fingerprints",
+            side_effect=lambda months, aoi_path, dem_path: {
+                _month: "same" for _month in months
+            },
+        )
+        plan = plan_monthly_export(
+            "path/to/collection",
+            "prefix_",
+            months_list=["2023-01", "2023-02", "2023-03", "2023-04", "2023-05"],
+            aoi_path="path/to/aoi",
+            dem_path="path/to/dem",
+            revalidate=True,
+        )
+        assert plan["images_to_revalidate"] == ["2023-03"]
+        assert plan["images_to_fingerprint"] == {"2023-05": "same"}
+        assert plan["images_to_export"] == ["2023-01", "2023-03"]
+        assert plan["fingerprints"] == {"2023-01": "same", "2023-03": "same"}
+        assert {"2023-04": "already exported"} in plan["images_excluded"]
+
+    def test_fingerprint_failure_exports_without_fingerprint(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._get_provisional_images",
+            return_value={},
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._current_fingerprints",
+            side_effect=Exception("asset not found"),
+        )
+        plan = plan_monthly_export(
+            "path/to/collection",
+            "prefix_",
+            months_list=["2023-01", "2023-02"],
+            aoi_path="path/to/aoi",
+            dem_path="path/to/dem",
+        )
+        assert plan["images_to_export"] == ["2023-01"]
+        assert plan["fingerprints"] == {}
+
+    def test_revalidate_fingerprint_failure(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._get_provisional_images",
+            return_value={},
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._get_exported_fingerprints",
+            return_value={"2023-03": "old", "2023-05": None},
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export._current_fingerprints",
+            side_effect=Exception("quota exceeded"),
+        )
+        plan = plan_monthly_export(
+            "path/to/collection",
+            "prefix_",
+            months_list=["2023-01", "2023-03", "2023-05"],
+            aoi_path="path/to/aoi",
+            dem_path="path/to/dem",
+            revalidate=True,
+        )
+        assert plan["images_to_revalidate"] == []
+        assert plan["images_to_fingerprint"] == {}
+        assert plan["images_to_export"] == ["2023-01"]
+
+    def test_revalidate_requires_aoi_and_dem(self):
+        with pytest.raises(ValueError):
+            plan_monthly_export("path/to/collection", "prefix_", revalidate=True)
+
+
+class TestEstimateMonthlyExportCost:
+    @pytest.fixture
+    def plan(self):
+        return {
+            "images_to_export": ["2023-01", "2023-02", "2023-03"],
+            "full_months": ["2023-01", "2023-02", "2023-03"],
+            "fold_days_ranges": {},
+            "ic_filter_dates": [f"2023-01-{day:02d}" for day in range(1, 31)],
+        }
+
+    @pytest.fixture(autouse=True)
+    def mock_ee(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.ee.imagecollection.ImageCollection"
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.ee.featurecollection.FeatureCollection"
+        )
+        mocker.patch("observatorio_ipa.processes.monthly_export.ee.image.Image")
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.utils.filter_collection_by_dates"
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.reclass_and_impute.tac_reclass_and_impute"
+        )
+        mocker.patch("observatorio_ipa.processes.monthly_export._ic_monthly_mean")
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.export_profiles.apply_export_profile"
+        ).return_value.serialize.return_value = ("x" * 500)
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.export_profiles.count_region_pixels",
+            return_value=1000,
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.monthly_export.gee_sharding.make_shard_grid",
+            return_value=[{}, {}, {}, {}],
+        )
+        self.create_task = mocker.patch(
+            "observatorio_ipa.processes.monthly_export.gee_exports.create_image_export_task"
+        )
+
+    def test_estimate(self, plan):
+        estimate = estimate_monthly_export_cost(
+            plan, "path/to/aoi", "path/to/dem", max_exports=2
+        )
+        assert estimate == {
+            "images": 3,
+            "days": 30,
+            "pixels": 1000,
+            "pixel_days": 30000,
+            "bytes": 3 * 1000 * 2 * 8,
+            "graph_bytes": 500,
+            "shards": 1,
+            "tasks": 3,
+            "rounds": 2,
+        }
+        self.create_task.assert_not_called()
+
+    def test_stacked_months(self, plan):
+        estimate = estimate_monthly_export_cost(
+            plan, "path/to/aoi", "path/to/dem", stack_size=2, max_exports=10
+        )
+        # 2 stacked tasks, split afterwards into 3 monthly assets
+        assert estimate["tasks"] == 5
+        assert estimate["rounds"] == 2
+
+    def test_sharded_months(self, plan):
+        estimate = estimate_monthly_export_cost(
+            plan, "path/to/aoi", "path/to/dem", region_shard_size=256, max_exports=10
+        )
+        # 4 shards per month, mosaicked afterwards
+        assert estimate["shards"] == 4
+        assert estimate["tasks"] == 3 * 4 + 3
+        assert estimate["rounds"] == 3
+
+    def test_nothing_to_export(self, plan):
+        plan["images_to_export"] = []
+        estimate = estimate_monthly_export_cost(plan, "path/to/aoi", "path/to/dem")
+        assert estimate["tasks"] == 0
+        assert estimate["pixels"] == 0
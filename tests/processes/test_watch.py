@@ -0,0 +1,124 @@
+import pytest
+
+from observatorio_ipa.processes.watch import (
+    incremental_config,
+    last_complete_day,
+    months_completed,
+    poll_last_dates,
+    watch,
+)
+
+
+class TestPollLastDates:
+    def test_single_request(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.watch.ee.imagecollection.ImageCollection"
+        )
+        mocker.patch("observatorio_ipa.processes.watch.ee.filter.Filter.gte")
+        mocker.patch("observatorio_ipa.processes.watch.ee.ee_date.Date")
+        ee_list = mocker.patch("observatorio_ipa.processes.watch.ee.ee_list.List")
+        ee_list.return_value.getInfo.return_value = [1675209600000, None]
+
+        assert poll_last_dates(since="2023-01-01") == {
+            "terra": "2023-02-01",
+            "aqua": None,
+        }
+        ee_list.return_value.getInfo.assert_called_once()
+
+
+class TestLastCompleteDay:
+    def test_min_of_collections(self):
+        last_dates = {"terra": "2023-02-03", "aqua": "2023-02-05"}
+        assert last_complete_day(last_dates, leading_days=2) == "2023-02-01"
+
+    def test_unknown_dates(self):
+        assert last_complete_day({"terra": "2023-02-03", "aqua": None}) is None
+
+
+class TestMonthsCompleted:
+    def test_no_month_end(self):
+        assert months_completed("2023-01-10", "2023-01-30") == []
+
+    def test_month_end(self):
+        assert months_completed("2023-01-30", "2023-01-31") == ["2023-01"]
+
+    def test_several_months(self):
+        assert months_completed("2022-11-30", "2023-01-31") == ["2022-12", "2023-01"]
+
+
+class TestIncrementalConfig:
+    def test_limits_lists(self):
+        config = {"months_list": [], "days_list": [], "years_list": [], "other": 1}
+        result = incremental_config(config, ["2024-02"])
+        assert result["months_list"] == ["2024-02"]
+        assert result["days_list"][0] == "2024-02-01"
+        assert result["days_list"][-1] == "2024-02-29"
+        assert len(result["days_list"]) == 29
+        assert result["years_list"] == ["2024"]
+        assert result["other"] == 1
+        assert config["months_list"] == []
+
+
+class TestWatch:
+    @pytest.fixture(autouse=True)
+    def no_sleep(self, mocker):
+        return mocker.patch("observatorio_ipa.processes.watch.time.sleep")
+
+    def test_exports_completed_months(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.watch.poll_last_dates",
+            side_effect=[
+                {"terra": "2023-01-20", "aqua": "2023-01-20"},
+                {"terra": "2023-01-25", "aqua": None},
+                {"terra": "2023-02-02", "aqua": "2023-02-02"},
+                {"terra": "2023-02-03", "aqua": "2023-02-03"},
+            ],
+        )
+        run_exports = mocker.Mock()
+        watch(run_exports, poll_interval=10, max_polls=4)
+        run_exports.assert_called_once_with(["2023-01"])
+
+    def test_first_poll_sets_reference(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.watch.poll_last_dates",
+            return_value={"terra": "2023-03-05", "aqua": "2023-03-05"},
+        )
+        run_exports = mocker.Mock()
+        watch(run_exports, max_polls=3)
+        run_exports.assert_not_called()
+
+    def test_errors_dont_stop_service(self, mocker, no_sleep):
+        mocker.patch(
+            "observatorio_ipa.processes.watch.poll_last_dates",
+            side_effect=[
+                {"terra": "2023-01-20", "aqua": "2023-01-20"},
+                Exception("Network error"),
+                {"terra": "2023-02-02", "aqua": "2023-02-02"},
+                {"terra": "2023-03-02", "aqua": "2023-03-02"},
+            ],
+        )
+        run_exports = mocker.Mock(side_effect=[Exception("Export failed"), None])
+        watch(run_exports, poll_interval=10, max_polls=4)
+        # the failed month is exported again with the next completed month
+        assert run_exports.call_args_list == [
+            mocker.call(["2023-01"]),
+            mocker.call(["2023-01", "2023-02"]),
+        ]
+        assert no_sleep.call_count == 3
+
+    def test_failed_months_retried_without_new_months(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.watch.poll_last_dates",
+            side_effect=[
+                {"terra": "2023-01-20", "aqua": "2023-01-20"},
+                {"terra": "2023-02-02", "aqua": "2023-02-02"},
+                {"terra": "2023-02-02", "aqua": "2023-02-02"},
+                {"terra": "2023-02-03", "aqua": "2023-02-03"},
+            ],
+        )
+        run_exports = mocker.Mock(side_effect=[Exception("Export failed"), None])
+        watch(run_exports, poll_interval=10, max_polls=4)
+        assert run_exports.call_args_list == [
+            mocker.call(["2023-01"]),
+            mocker.call(["2023-01"]),
+        ]
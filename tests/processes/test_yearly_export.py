@@ -0,0 +1,258 @@
+import pytest
+from observatorio_ipa.processes.yearly_export import (
+    _create_year_sequence,
+    _get_exported_months,
+    _get_exported_years,
+    _month_version,
+    _yearly_images_pending_export,
+    yearly_export_proc,
+)
+from datetime import date
+
+
+class TestCreateYearSequence:
+    def test_same_year(self):
+        assert _create_year_sequence(date(2023, 1, 1), date(2023, 12, 31)) == ["2023"]
+
+    def test_multiple_years(self):
+        assert _create_year_sequence(date(2021, 5, 1), date(2023, 1, 1)) == [
+            "2021",
+            "2022",
+            "2023",
+        ]
+
+
+class TestGetExportedMonths:
+    def test_group_by_year(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.yearly_export.assets.list_assets",
+            return_value=[],
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.yearly_export.assets.get_asset_names",
+            return_value=[
+                "path/to/collection/prefix_2023_02",
+                "path/to/collection/prefix_2023_01",
+                "path/to/collection/prefix_2022_12",
+                "path/to/collection/other_2022_11",
+            ],
+        )
+        mocker.patch("observatorio_ipa.processes.yearly_export.ee.image.Image")
+        mocker.patch("observatorio_ipa.processes.yearly_export.ee.ee_list.List")
+        mocker.patch(
+            "observatorio_ipa.processes.yearly_export.call_policy.get_info",
+            return_value=[
+                {"n_days": 31, "provisional": 0},
+                {"n_days": 31, "provisional": 0},
+                {"n_days": 10, "last_day": "2023-02-10", "provisional": 1},
+            ],
+        )
+        result = _get_exported_months("path/to/collection", "prefix_")
+        assert {_year: list(_months) for _year, _months in result.items()} == {
+            "2022": ["12"],
+            "2023": ["01", "02"],
+        }
+        assert result["2023"]["02"] == _month_version(
+            {"n_days": 10, "last_day": "2023-02-10", "provisional": 1}
+        )
+
+    def test_asset_index(self, mocker):
+        mock_index = mocker.patch(
+            "observatorio_ipa.processes.yearly_export.asset_index.get_index"
+        )
+        mock_index.return_value.images.return_value = {
+            "prefix_2023_02": {"period": "2023-02", "properties": {"n_days": 28.0}},
+            "prefix_2023_01": {"period": "2023-01", "properties": None},
+            "prefix_2022_12": {"period": "2022-12", "properties": {"n_days": 31}},
+        }
+        assert _get_exported_months("path/to/collection", "prefix_") == {
+            "2022": {"12": _month_version({"n_days": 31})},
+            "2023": {"01": None, "02": _month_version({"n_days": 28})},
+        }
+
+
+class TestMonthVersion:
+    def test_version_changes_with_properties(self):
+        provisional = {"n_days": 20, "last_day": "2023-12-20", "provisional": 1}
+        finalized = {"n_days": 31, "provisional": 0, "fingerprint": "abc"}
+        revalidated = {"n_days": 31, "provisional": 0, "fingerprint": "def"}
+        versions = {
+            _month_version(provisional),
+            _month_version(finalized),
+            _month_version(revalidated),
+        }
+        assert len(versions) == 3
+
+    def test_other_properties_ignored(self):
+        assert _month_version({"n_days": 31, "year": 2023}) == _month_version(
+            {"n_days": 31}
+        )
+
+
+class TestGetExportedYears:
+    def test_asset_index(self, mocker):
+        mock_index = mocker.patch(
+            "observatorio_ipa.processes.yearly_export.asset_index.get_index"
+        )
+        mock_index.return_value.images.return_value = {
+            "prefix_2021": {
+                "period": "2021",
+                "properties": {"months": "01,02", "month_versions": "v1,v2"},
+            },
+            "prefix_2022": {"period": "2022", "properties": {"months": "02,01"}},
+            "prefix_2023": {"period": "2023", "properties": None},
+        }
+        assert _get_exported_years("path/to/collection", "prefix_") == {
+            "2021": {"01": "v1", "02": "v2"},
+            "2022": {"01": None, "02": None},
+            "2023": None,
+        }
+
+
+class TestYearlyImagesPendingExport:
+    def test_year_not_exported(self):
+        pending, excluded = _yearly_images_pending_export(
+            ["2023"], {"2023": {"01": "v1", "02": "v2"}}, {}
+        )
+        assert pending == ["2023"]
+        assert excluded == []
+
+    def test_year_without_monthly_images(self):
+        pending, excluded = _yearly_images_pending_export(["2023"], {}, {})
+        assert pending == []
+        assert excluded == [{"2023": "No monthly images"}]
+
+    def test_year_already_exported(self):
+        months = {"01": "v1", "02": "v2"}
+        pending, excluded = _yearly_images_pending_export(
+            ["2023"], {"2023": months}, {"2023": dict(months)}
+        )
+        assert pending == []
+        assert excluded == [{"2023": "already exported"}]
+
+    def test_partial_year_with_new_months(self):
+        pending, excluded = _yearly_images_pending_export(
+            ["2023"],
+            {"2023": {"01": "v1", "02": "v2", "03": "v3"}},
+            {"2023": {"01": "v1", "02": "v2"}},
+        )
+        assert pending == ["2023"]
+        assert excluded == []
+
+    def test_month_exported_again(self):
+        # provisional December finalized after the yearly image was built
+        pending, excluded = _yearly_images_pending_export(
+            ["2023"],
+            {"2023": {"11": "v11", "12": "v12_final"}},
+            {"2023": {"11": "v11", "12": "v12_provisional"}},
+        )
+        assert pending == ["2023"]
+        assert excluded == []
+
+    def test_yearly_image_without_month_versions(self):
+        pending, _ = _yearly_images_pending_export(
+            ["2023"], {"2023": {"01": "v1"}}, {"2023": {"01": None}}
+        )
+        assert pending == ["2023"]
+
+    def test_unknown_month_version_not_compared(self):
+        pending, excluded = _yearly_images_pending_export(
+            ["2023"], {"2023": {"01": None}}, {"2023": {"01": "v1"}}
+        )
+        assert pending == []
+        assert excluded == [{"2023": "already exported"}]
+
+    def test_yearly_image_without_months_property(self):
+        pending, excluded = _yearly_images_pending_export(
+            ["2023"], {"2023": {"01": "v1", "02": "v2"}}, {"2023": None}
+        )
+        assert pending == []
+        assert excluded == [{"2023": "already exported"}]
+
+    def test_expected_years_not_list(self):
+        with pytest.raises(TypeError):
+            _yearly_images_pending_export("2023", {}, {})  # type: ignore
+
+
+class TestYearlyExportProc:
+    def test_no_images_pending_export(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.yearly_export.ee.featurecollection.FeatureCollection"
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.yearly_export._get_exported_months",
+            return_value={"2023": {"01": "v1"}},
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.yearly_export._get_exported_years",
+            return_value={"2023": {"01": "v1"}},
+        )
+
+        result = yearly_export_proc(
+            yearly_collection_path="path/to/yearly",
+            monthly_collection_path="path/to/monthly",
+            aoi_path="path/to/aoi",
+            name_prefix="yearly",
+            monthly_name_prefix="monthly",
+            years_list=["2023"],
+        )
+        assert result == {
+            "frequency": "yearly",
+            "images_pending_export": [],
+            "images_excluded": [{"2023": "already exported"}],
+            "images_to_export": [],
+            "export_tasks": [],
+        }
+
+    def test_partial_year_is_overwritten(self, mocker):
+        mocker.patch(
+            "observatorio_ipa.processes.yearly_export.ee.featurecollection.FeatureCollection"
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.yearly_export._get_exported_months",
+            return_value={
+                "2022": {"01": "v1", "02": "v2"},
+                "2023": {"01": "v1", "02": "v2"},
+            },
+        )
+        mocker.patch(
+            "observatorio_ipa.processes.yearly_export._get_exported_years",
+            return_value={"2023": {"01": "v1"}},
+        )
+        mock_mean = mocker.patch(
+            "observatorio_ipa.processes.yearly_export._ic_yearly_mean"
+        )
+        mock_create_task = mocker.patch(
+            "observatorio_ipa.processes.yearly_export.gee_exports.create_image_export_task",
+            side_effect=lambda img, name, path, region, overwrite, **kwargs: {
+                "task": "task",
+                "image": name,
+                "target": "GEE Asset",
+                "status": "created",
+                "overwrite": overwrite,
+            },
+        )
+
+        result = yearly_export_proc(
+            yearly_collection_path="path/to/yearly",
+            monthly_collection_path="path/to/monthly",
+            aoi_path="path/to/aoi",
+            name_prefix="yearly",
+            monthly_name_prefix="monthly",
+            years_list=["2022", "2023"],
+        )
+
+        assert result["images_to_export"] == ["2022", "2023"]
+        assert [task["image"] for task in result["export_tasks"]] == [
+            "yearly_2022",
+            "yearly_2023",
+        ]
+        assert [task["overwrite"] for task in result["export_tasks"]] == [False, True]
+        assert mock_mean.call_args_list[1].args[:4] == (
+            "2023",
+            ["01", "02"],
+            "path/to/monthly",
+            "monthly_",
+        )
+        assert mock_mean.call_args_list[1].kwargs["month_versions"] == ["v1", "v2"]
+        assert mock_create_task.call_count == 2
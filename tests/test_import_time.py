@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+# Modules that are slow to import and only needed once GEE processes run
+HEAVY_MODULES = ["ee", "gee_toolbox", "dateutil", "nbconvert", "logging_tree"]
+MAX_IMPORT_TIME_US = 1_000_000
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in microseconds of every module imported by `module`"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime:
+    def test_heavy_modules_not_imported(self):
+        imported = {
+            name.split(".")[0] for name in import_times("observatorio_ipa.main")
+        }
+        assert not imported & set(HEAVY_MODULES)
+
+    def test_main_import_time(self):
+        times = import_times("observatorio_ipa.main")
+        assert times["observatorio_ipa.main"] < MAX_IMPORT_TIME_US
@@ -6,6 +6,12 @@ from observatorio_ipa.main import main
 from observatorio_ipa.utils.messaging import EmailSender
 
 
+@pytest.fixture(autouse=True)
+def mock_asset_index(mocker):
+    # main() installs a shared asset index, keep it out of other tests
+    return mocker.patch("observatorio_ipa.main.gee_asset_index")
+
+
 @pytest.fixture
 def mock_config():
     return {
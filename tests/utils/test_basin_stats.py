@@ -0,0 +1,112 @@
+import pytest
+from datetime import date, datetime, UTC
+
+from observatorio_ipa.utils.basin_stats import (
+    BasinStatsWriter,
+    read_basin_series,
+    records_from_zonal_means,
+    stored_dates,
+)
+
+
+def make_row(day, basin_id, snow_pct=10.0):
+    return {
+        "date": day,
+        "basin_id": basin_id,
+        "snow_pct": snow_pct,
+        "cloud_pct": 5.0,
+        "qa_counts": {10: 3, 40: 1},
+    }
+
+
+class TestRecordsFromZonalMeans:
+    def test_convert_records(self):
+        time_start = int(datetime(2023, 7, 1, tzinfo=UTC).timestamp() * 1000)
+        records = [
+            {
+                "time_start": time_start,
+                "label": 7,
+                "Snow_TAC": 12.5,
+                "Cloud_TAC": 3.0,
+                "qa_counts": {10: 5},
+            }
+        ]
+        assert records_from_zonal_means(records) == [
+            {
+                "date": date(2023, 7, 1),
+                "basin_id": 7,
+                "snow_pct": 12.5,
+                "cloud_pct": 3.0,
+                "qa_counts": {10: 5},
+            }
+        ]
+
+
+class TestBasinStatsWriter:
+    @pytest.fixture(autouse=True)
+    def pyarrow(self):
+        return pytest.importorskip("pyarrow")
+
+    def test_partitioned_by_year(self, tmp_path):
+        with BasinStatsWriter(tmp_path) as writer:
+            writer.add([make_row(date(2022, 12, 31), 1), make_row(date(2023, 1, 1), 1)])
+        assert sorted(p.parent.name for p in writer.written_files) == [
+            "year=2022",
+            "year=2023",
+        ]
+
+    def test_batches_and_appends(self, tmp_path):
+        writer = BasinStatsWriter(tmp_path, batch_size=2)
+        writer.add([make_row(date(2023, 1, 1), 1)])
+        assert writer.written_files == []
+        writer.add([make_row(date(2023, 1, 2), 1)])
+        assert len(writer.written_files) == 1
+        writer.add([make_row(date(2023, 1, 3), 1)])
+        writer.close()
+        # new files are appended, existing files are not rewritten
+        assert len(writer.written_files) == 2
+        assert len(list((tmp_path / "year=2023").iterdir())) == 2
+
+    def test_read_basin_series(self, tmp_path):
+        with BasinStatsWriter(tmp_path) as writer:
+            writer.add(
+                [
+                    make_row(date(2023, 1, 2), 1),
+                    make_row(date(2022, 1, 1), 1),
+                    make_row(date(2023, 1, 1), 2),
+                ]
+            )
+        table = read_basin_series(tmp_path, 1)
+        assert table.column("date").to_pylist() == [date(2022, 1, 1), date(2023, 1, 2)]
+        assert table.column("qa_counts").to_pylist()[0] == [(10, 3), (40, 1)]
+
+        table = read_basin_series(tmp_path, 1, start_year=2023)
+        assert table.column("date").to_pylist() == [date(2023, 1, 2)]
+
+    def test_last_written_row_is_kept(self, tmp_path, mocker):
+        mock_datetime = mocker.patch("observatorio_ipa.utils.basin_stats.datetime")
+        mock_datetime.now.return_value = datetime(2024, 1, 1, tzinfo=UTC)
+        with BasinStatsWriter(tmp_path) as writer:
+            writer.add([make_row(date(2023, 1, 1), 1, snow_pct=10.0)])
+        mock_datetime.now.return_value = datetime(2024, 1, 2, tzinfo=UTC)
+        with BasinStatsWriter(tmp_path) as writer:
+            writer.add([make_row(date(2023, 1, 1), 1, snow_pct=20.0)])
+
+        table = read_basin_series(tmp_path, 1)
+        assert table.column("snow_pct").to_pylist() == [20.0]
+
+    def test_stored_dates(self, tmp_path):
+        assert stored_dates(tmp_path / "missing") == set()
+        with BasinStatsWriter(tmp_path) as writer:
+            writer.add(
+                [
+                    make_row(date(2022, 12, 31), 1),
+                    make_row(date(2023, 1, 1), 1),
+                    make_row(date(2023, 1, 1), 2),
+                ]
+            )
+        assert stored_dates(tmp_path) == {date(2022, 12, 31), date(2023, 1, 1)}
+
+    def test_invalid_batch_size(self, tmp_path):
+        with pytest.raises(ValueError):
+            BasinStatsWriter(tmp_path, batch_size=0)
@@ -0,0 +1,23 @@
+import sys
+
+import pytest
+
+from observatorio_ipa.utils.lazy import lazy_import
+
+
+class TestLazyImport:
+    def test_module_loaded_on_attribute_access(self, mocker):
+        mocker.patch.dict(sys.modules)
+        sys.modules.pop("colorsys", None)
+        module = lazy_import("colorsys")
+        assert sys.modules["colorsys"] is module
+        assert module.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+
+    def test_already_imported(self):
+        import json
+
+        assert lazy_import("json") is json
+
+    def test_module_not_found(self):
+        with pytest.raises(ModuleNotFoundError):
+            lazy_import("observatorio_ipa.not_a_module")
@@ -0,0 +1,158 @@
+from datetime import date
+
+from observatorio_ipa.utils import metrics
+
+
+def make_task(image, status, **fields):
+    return {
+        "task": None,
+        "image": image,
+        "target": "GEE Asset",
+        "status": status,
+        **fields,
+    }
+
+
+def split_info_of(day):
+    return {
+        "images": [
+            {"image": f"daily_2024_01_{day:02d}"},
+            {"image": f"daily_2024_01_{day + 1:02d}"},
+        ]
+    }
+
+
+class TestTaskMetrics:
+    def test_status_counts(self):
+        result = metrics.task_metrics(
+            [
+                make_task("image_0", "completed"),
+                make_task("image_1", "completed"),
+                make_task("image_2", "failed"),
+                make_task("image_3", "failed_to_create"),
+            ]
+        )
+        assert result["images_exported"] == [({}, 2)]
+        assert result["images_failed"] == [({}, 2)]
+        assert ({"kind": "image", "status": "completed"}, 2) in result["export_tasks"]
+
+    def test_images_of_stacks_counted_from_split_tasks(self):
+        result = metrics.task_metrics(
+            [
+                make_task(
+                    "stack_daily_2024_01_01", "completed", split=split_info_of(1)
+                ),
+                make_task("stack_daily_2024_01_03", "failed", split=split_info_of(3)),
+                make_task(
+                    "daily_2024_01_01", "completed", stack="stack_daily_2024_01_01"
+                ),
+                make_task("daily_2024_01_02", "failed", stack="stack_daily_2024_01_01"),
+            ]
+        )
+        # daily_2024_01_03 and daily_2024_01_04 failed with their stack
+        assert result["images_exported"] == [({}, 1)]
+        assert result["images_failed"] == [({}, 3)]
+        assert ({"kind": "stack", "status": "failed"}, 1) in result["export_tasks"]
+
+    def test_images_of_shards_counted_once(self):
+        def shard(status, index):
+            return make_task(
+                f"shard_monthly_2024_01_{index:03d}",
+                status,
+                shard={"image": "monthly_2024_01", "index": index},
+            )
+
+        result = metrics.task_metrics(
+            [
+                shard("completed", 0),
+                shard("failed", 1),
+                # retry of the failed shard and mosaic of the image
+                shard("completed", 1),
+                make_task("monthly_2024_01", "completed", shard_assets=[]),
+            ]
+        )
+        assert result["images_exported"] == [({}, 1)]
+        assert result["images_failed"] == [({}, 0)]
+        assert ({"kind": "shard", "status": "failed"}, 1) in result["export_tasks"]
+
+    def test_sharded_image_without_mosaic_failed(self):
+        result = metrics.task_metrics(
+            [
+                make_task(
+                    "shard_monthly_2024_01_000",
+                    "failed",
+                    shard={"image": "monthly_2024_01", "index": 0},
+                )
+            ]
+        )
+        assert result["images_failed"] == [({}, 1)]
+
+    def test_queued_and_running_time(self):
+        result = metrics.task_metrics(
+            [
+                make_task(
+                    "image_0",
+                    "completed",
+                    creation_timestamp_ms=1000,
+                    start_timestamp_ms=61000,
+                    update_timestamp_ms=181000,
+                    batch_eecu_usage_seconds=12.5,
+                ),
+                make_task("image_1", "failed_to_start"),
+            ]
+        )
+        assert result["export_task_queued_seconds"] == [({"image": "image_0"}, 60)]
+        assert result["export_task_running_seconds"] == [({"image": "image_0"}, 120)]
+        assert result["export_task_eecu_seconds"] == [({"image": "image_0"}, 12.5)]
+
+
+class TestRunMetrics:
+    def test_run_metrics(self):
+        result = metrics.run_metrics(
+            run_duration=300.0,
+            stage_durations={"monthly_export": 100.0, "email": 1.0},
+            export_plans=[
+                {
+                    "frequency": "monthly",
+                    "images_pending_export": ["2024-01", "2024-02"],
+                    "images_to_export": ["2024-01"],
+                }
+            ],
+            export_tasks=[make_task("monthly_2024_01", "completed")],
+            last_dates={"terra": "2024-03-01", "aqua": None},
+            today=date(2024, 3, 4),
+        )
+        assert result["run_duration_seconds"] == [({}, 300.0)]
+        assert ({"stage": "email"}, 1.0) in result["stage_duration_seconds"]
+        assert result["images_pending"] == [({"frequency": "monthly"}, 2)]
+        assert result["images_to_export"] == [({"frequency": "monthly"}, 1)]
+        assert result["catalog_lag_days"] == [({"collection": "terra"}, 3)]
+        assert "run_end_timestamp_seconds" not in result
+
+
+class TestFormatMetrics:
+    def test_format(self):
+        text = metrics.format_metrics(
+            {
+                "run_duration_seconds": [({}, 300.0)],
+                "export_task_eecu_seconds": [({"image": 'a"b'}, 12.5)],
+                "catalog_lag_days": [],
+            }
+        )
+        assert text.splitlines() == [
+            "# HELP osn_run_duration_seconds Duration of the last run",
+            "# TYPE osn_run_duration_seconds gauge",
+            "osn_run_duration_seconds 300.0",
+            "# HELP osn_export_task_eecu_seconds EECU seconds used by export tasks, as reported by GEE",
+            "# TYPE osn_export_task_eecu_seconds gauge",
+            'osn_export_task_eecu_seconds{image="a\\"b"} 12.5',
+        ]
+
+
+class TestWriteTextfile:
+    def test_write_replaces_file(self, tmp_path):
+        path = tmp_path / "observatorio_ipa.prom"
+        path.write_text("old")
+        metrics.write_textfile(path, {"run_duration_seconds": [({}, 1.0)]})
+        assert path.read_text().endswith("osn_run_duration_seconds 1.0\n")
+        assert [p.name for p in tmp_path.iterdir()] == ["observatorio_ipa.prom"]
@@ -277,6 +277,38 @@ class TestCheckRequired:
         ):
             check_required_config(config)
 
+    def test_yearly_requires_monthly_path(self):
+        config = {
+            "service_credentials_file": "path/to/credentials.json",
+            "monthly_assets_path": None,
+            "yearly_assets_path": "path/to/yearly",
+            "yearly_image_prefix": "yearly",
+            "aoi_asset_path": "path/to/aoi",
+            "dem_asset_path": "path/to/dem",
+            "years_list": ["2023"],
+        }
+        with pytest.raises(
+            ValueError, match="Monthly assets path is required for yearly export."
+        ):
+            check_required_config(config)
+
+    def test_basin_stats_requires_basins(self):
+        config = {
+            "service_credentials_file": "path/to/credentials.json",
+            "daily_assets_path": "path/to/daily",
+            "daily_image_prefix": "daily",
+            "aoi_asset_path": "path/to/aoi",
+            "dem_asset_path": "path/to/dem",
+            "basin_stats_path": "path/to/stats",
+            "basins_asset_path": None,
+            "basin_id_property": "basin_id",
+        }
+        with pytest.raises(
+            ValueError,
+            match="Basins asset path and basin id property are required for basin statistics.",
+        ):
+            check_required_config(config)
+
     def test_missing_daily_path(self):
         config = {
             "service_credentials_file": "path/to/credentials.json",
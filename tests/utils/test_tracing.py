@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from observatorio_ipa.gee import async_client
+from observatorio_ipa.gee import call_policy
+from observatorio_ipa.utils import tracing
+
+
+@pytest.fixture
+def tracer():
+    tracer = tracing.start()
+    yield tracer
+    tracing.stop()
+
+
+def events_by_name(tracer):
+    return {event["name"]: event for event in tracer.chrome_trace()["traceEvents"]}
+
+
+class TestSpan:
+    def test_spans_off_by_default(self):
+        with tracing.span("run") as _span:
+            _span.set("month", "2024-01")
+            tracing.count("gee_calls")
+        assert tracing.get_tracer() is None
+
+    def test_nested_spans(self, tracer):
+        with tracing.span("run"):
+            with tracing.span("build_month", month="2024-01") as _span:
+                _span.set("tasks", 2)
+        events = events_by_name(tracer)
+        run, build = events["run"], events["build_month"]
+        assert run["ph"] == "X"
+        assert build["args"] == {"month": "2024-01", "tasks": 2}
+        assert run["ts"] <= build["ts"]
+        assert build["ts"] + build["dur"] <= run["ts"] + run["dur"]
+
+    def test_count_adds_to_open_spans(self, tracer):
+        with tracing.span("run"):
+            tracing.count("gee_calls")
+            with tracing.span("plan"):
+                tracing.count("gee_calls", 2)
+        tracing.count("gee_calls")
+        events = events_by_name(tracer)
+        assert events["run"]["args"]["gee_calls"] == 3
+        assert events["plan"]["args"]["gee_calls"] == 2
+
+    def test_error_recorded(self, tracer):
+        with pytest.raises(ValueError):
+            with tracing.span("plan"):
+                raise ValueError("Invalid month")
+        assert events_by_name(tracer)["plan"]["args"]["error"] == "Invalid month"
+
+    def test_durations_of_nested_spans(self, tracer):
+        with tracing.span("run") as run:
+            with tracing.span("track_exports"):
+                with tracing.span("submit_task"):
+                    pass
+            with tracing.span("email"):
+                pass
+        assert set(tracer.durations(run)) == {"track_exports", "email"}
+
+    def test_current_span(self, tracer):
+        with tracing.span("run") as _span:
+            assert tracing.current_span() is _span
+
+
+class TestGEECallCount:
+    def test_policy_calls_counted(self, tracer):
+        with tracing.span("plan"):
+            call_policy.gee_call(lambda: None)
+            call_policy.gee_call(lambda: None)
+        assert events_by_name(tracer)["plan"]["args"]["gee_calls"] == 2
+
+    def test_concurrent_calls_counted_in_caller_span(self, tracer):
+        with tracing.span("plan"):
+            async_client.run_concurrently(
+                [(call_policy.gee_call, lambda x: x, i) for i in range(4)]
+            )
+        assert events_by_name(tracer)["plan"]["args"]["gee_calls"] == 4
+
+
+class TestWriteChromeTrace:
+    def test_write(self, tracer, tmp_path):
+        path = tmp_path / "traces" / "trace.json"
+        with tracing.span("run"):
+            pass
+        tracing.write_chrome_trace(path)
+        trace = json.loads(path.read_text())
+        assert trace["displayTimeUnit"] == "ms"
+        assert [event["name"] for event in trace["traceEvents"]] == ["run"]
+
+    def test_tracing_off_writes_nothing(self, tmp_path):
+        path = tmp_path / "trace.json"
+        tracing.write_chrome_trace(path)
+        assert not path.exists()